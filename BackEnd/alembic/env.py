@@ -20,6 +20,7 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.infrastructure.database.models import Base # noqa
+from app.infrastructure.database.partitions import PARTITION_NAME # noqa
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -28,6 +29,27 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+# created by hand in models.py (full-text search), they are not part of the metadata
+UNMAPPED_OBJECTS = {"search_vector", "ix_tasks_search_vector", "tasks_fts", "tasks_fts_data", "tasks_fts_idx",
+                    "tasks_fts_docsize", "tasks_fts_config"}
+
+
+# in the metadata, but only created on PostgreSQL (ddl_if in models.py)
+POSTGRESQL_OBJECTS = {"ix_tasks_title_trgm", "ix_tasks_archive_title_trgm"}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Keeps autogenerate from dropping the schema objects that are not in the metadata (the partitions of a
+    partitioned tasks table too), and from creating the PostgreSQL ones on SQLite
+    """
+    if reflected and compare_to is None and (name in UNMAPPED_OBJECTS
+                                             or type_ == "table" and PARTITION_NAME.fullmatch(name)):
+        return False
+
+    return not (name in POSTGRESQL_OBJECTS and context.get_context().dialect.name != "postgresql")
+
+
 def get_database_url():
     return global_config.settings.DEFAULT_SQLALCHEMY_DATABASE_URI
 
@@ -50,6 +72,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -63,6 +86,12 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # a connection given by the caller (the tests) is used as is
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
     configuration = config.get_section(config.config_ini_section, {})
     configuration["sqlalchemy.url"] = get_database_url()
 
@@ -73,12 +102,18 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        run_migrations(connection)
+
+
+def run_migrations(connection) -> None:
+    # SQLite can't alter most of a table, autogenerate writes batch operations (copy and move) for it
+    context.configure(
+        connection=connection, target_metadata=target_metadata, include_object=include_object,
+        render_as_batch=connection.dialect.name == "sqlite"
+    )
 
-        with context.begin_transaction():
-            context.run_migrations()
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
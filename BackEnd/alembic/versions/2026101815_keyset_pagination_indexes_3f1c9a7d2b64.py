@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: 3f1c9a7d2b64
+Revises: 8beee0539e58
+Create Date: 2026-10-18 19:15:12.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = '8beee0539e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_due_date_id', 'tasks', ['due_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
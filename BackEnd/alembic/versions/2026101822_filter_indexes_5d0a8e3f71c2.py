@@ -0,0 +1,34 @@
+"""filter indexes
+
+Revision ID: 5d0a8e3f71c2
+Revises: b7e2d45c19fa
+Create Date: 2026-10-18 22:10:03.520716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0a8e3f71c2'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d45c19fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # same columns as the primary key index, it only slowed the writes down
+    op.drop_index(op.f('ix_tasks_id'), table_name='tasks')
+    op.create_index('ix_tasks_status_created_at_id', 'tasks', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_pending_due_date_id', 'tasks', ['due_date', 'id'], unique=False,
+                    postgresql_where=sa.text("status = 'PENDING'"), sqlite_where=sa.text("status = 'PENDING'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_pending_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_status_created_at_id', table_name='tasks')
+    op.create_index(op.f('ix_tasks_id'), 'tasks', ['id'], unique=False)
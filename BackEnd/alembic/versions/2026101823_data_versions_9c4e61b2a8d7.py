@@ -0,0 +1,57 @@
+"""data versions
+
+Revision ID: 9c4e61b2a8d7
+Revises: 5d0a8e3f71c2
+Create Date: 2026-10-18 23:02:41.604317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e61b2a8d7'
+down_revision: Union[str, Sequence[str], None] = '5d0a8e3f71c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO data_versions (name, version) VALUES ('tasks', 0)")
+
+    # bumped by every statement writing tasks (see models.py), by every row on SQLite
+    if op.get_bind().dialect.name == "sqlite":
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            op.execute(
+                f"CREATE TRIGGER tasks_data_version_{operation.lower()} AFTER {operation} ON tasks BEGIN "
+                "UPDATE data_versions SET version = version + 1 WHERE name = 'tasks'; END"
+            )
+        return
+
+    op.execute(
+        "CREATE OR REPLACE FUNCTION bump_tasks_data_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        "UPDATE data_versions SET version = version + 1 WHERE name = 'tasks'; RETURN NULL; END $$"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for operation in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER tasks_data_version_{operation}")
+    else:
+        op.execute("DROP TRIGGER tasks_data_version ON tasks")
+        op.execute("DROP FUNCTION bump_tasks_data_version()")
+    op.drop_table('data_versions')
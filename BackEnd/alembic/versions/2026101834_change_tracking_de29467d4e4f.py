@@ -0,0 +1,111 @@
+"""change tracking
+
+Revision ID: de29467d4e4f
+Revises: 9c4e61b2a8d7
+Create Date: 2026-10-18 23:34:12.408135
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de29467d4e4f'
+down_revision: Union[str, Sequence[str], None] = '9c4e61b2a8d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CURRENT_DATA_VERSION = "(SELECT version FROM data_versions WHERE name = 'tasks')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sqlite = op.get_bind().dialect.name == "sqlite"
+
+    # the existing tasks get the time of the migration. SQLite can't add a column with a non constant default, its
+    # default stays a constant (the writes of the application always set the column)
+    updated_at_default = sa.text("'1970-01-01 00:00:00'") if sqlite else sa.func.now()
+    op.add_column('tasks', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=updated_at_default,
+                                     nullable=False))
+    if sqlite:
+        op.execute("UPDATE tasks SET updated_at = CURRENT_TIMESTAMP")
+    # the existing tasks are changes before any token
+    op.add_column('tasks', sa.Column('change_version', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.create_index('ix_tasks_change_version_id', 'tasks', ['change_version', 'id'], unique=False)
+    op.create_table('task_tombstones',
+    sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('change_version', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index('ix_task_tombstones_change_version_task_id', 'task_tombstones', ['change_version', 'task_id'],
+                    unique=False)
+    # the cached tasks don't have the new columns
+    op.execute("UPDATE data_versions SET version = version + 1 WHERE name = 'tasks'")
+
+    # the change versions and the tombstones are written by triggers (see models.py)
+    if sqlite:
+        op.execute(
+            "CREATE TRIGGER tasks_change_version_insert AFTER INSERT ON tasks BEGIN "
+            f"UPDATE tasks SET change_version = {CURRENT_DATA_VERSION} WHERE id = new.id; END"
+        )
+        op.execute(
+            "CREATE TRIGGER tasks_change_version_update AFTER UPDATE OF title, description, status, due_date, "
+            f"completed_at, created_at, updated_at ON tasks BEGIN UPDATE tasks SET change_version = "
+            f"{CURRENT_DATA_VERSION} WHERE id = new.id; END"
+        )
+        op.execute(
+            "CREATE TRIGGER tasks_tombstones AFTER DELETE ON tasks BEGIN INSERT OR REPLACE INTO task_tombstones "
+            f"(task_id, change_version) VALUES (old.id, {CURRENT_DATA_VERSION}); END"
+        )
+        return
+
+    # the data version is bumped before the rows are written, the change versions follow the order of the commits
+    op.execute("DROP TRIGGER tasks_data_version ON tasks")
+    op.execute(
+        "CREATE TRIGGER tasks_data_version BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION set_task_change_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        f"NEW.change_version := {CURRENT_DATA_VERSION}; RETURN NEW; END $$"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_change_version BEFORE INSERT OR UPDATE ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION set_task_change_version()"
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION add_task_tombstones() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        f"INSERT INTO task_tombstones (task_id, change_version) SELECT id, {CURRENT_DATA_VERSION} FROM deleted_tasks "
+        "ON CONFLICT (task_id) DO UPDATE SET change_version = excluded.change_version, "
+        "deleted_at = excluded.deleted_at; RETURN NULL; END $$"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_tombstones AFTER DELETE ON tasks REFERENCING OLD TABLE AS deleted_tasks "
+        "FOR EACH STATEMENT EXECUTE FUNCTION add_task_tombstones()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("tasks_tombstones", "tasks_change_version_update", "tasks_change_version_insert"):
+            op.execute(f"DROP TRIGGER {trigger}")
+    else:
+        op.execute("DROP TRIGGER tasks_tombstones ON tasks")
+        op.execute("DROP FUNCTION add_task_tombstones()")
+        op.execute("DROP TRIGGER tasks_change_version ON tasks")
+        op.execute("DROP FUNCTION set_task_change_version()")
+        op.execute("DROP TRIGGER tasks_data_version ON tasks")
+        op.execute(
+            "CREATE TRIGGER tasks_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+        )
+
+    op.drop_index('ix_task_tombstones_change_version_task_id', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    op.drop_index('ix_tasks_change_version_id', table_name='tasks')
+    op.drop_column('tasks', 'change_version')
+    op.drop_column('tasks', 'updated_at')
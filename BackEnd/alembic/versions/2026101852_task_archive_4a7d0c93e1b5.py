@@ -0,0 +1,121 @@
+"""task archive
+
+Revision ID: 4a7d0c93e1b5
+Revises: de29467d4e4f
+Create Date: 2026-10-18 23:52:06.317402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7d0c93e1b5'
+down_revision: Union[str, Sequence[str], None] = 'de29467d4e4f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASKS_COLUMNS = "id, title, description, status, due_date, completed_at, created_at, updated_at, change_version"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sqlite = op.get_bind().dialect.name == "sqlite"
+
+    if sqlite:
+        # the ids of the archived tasks must not be given again
+        _rebuild_sqlite_tasks(autoincrement=True)
+    op.create_index('ix_tasks_completed_completed_at', 'tasks', ['completed_at'], unique=False,
+                    postgresql_where=sa.text("status = 'COMPLETED'"), sqlite_where=sa.text("status = 'COMPLETED'"))
+
+    op.create_table('tasks_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    # the type of the tasks table
+    sa.Column('status', postgresql.ENUM('PENDING', 'COMPLETED', name='taskstatus', create_type=False), nullable=False),
+    sa.Column('due_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tasks_archive_created_at_id', 'tasks_archive', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_archive_due_date_id', 'tasks_archive', ['due_date', 'id'], unique=False)
+
+    # the archived tasks are part of the data version (see models.py)
+    if sqlite:
+        for operation in ("UPDATE", "DELETE"):
+            op.execute(
+                f"CREATE TRIGGER tasks_archive_data_version_{operation.lower()} AFTER {operation} ON tasks_archive "
+                "BEGIN UPDATE data_versions SET version = version + 1 WHERE name = 'tasks'; END"
+            )
+        return
+
+    op.create_index('ix_tasks_archive_title_trgm', 'tasks_archive', ['title'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.execute(
+        "CREATE TRIGGER tasks_archive_data_version BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks_archive "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    sqlite = op.get_bind().dialect.name == "sqlite"
+
+    # the archived tasks go back to the tasks table
+    op.execute(
+        f"INSERT INTO tasks ({TASKS_COLUMNS}) SELECT id, title, description, status, due_date, completed_at, "
+        "created_at, updated_at, 0 FROM tasks_archive"
+    )
+    if sqlite:
+        for operation in ("update", "delete"):
+            op.execute(f"DROP TRIGGER tasks_archive_data_version_{operation}")
+    else:
+        op.execute("DROP TRIGGER tasks_archive_data_version ON tasks_archive")
+        op.drop_index('ix_tasks_archive_title_trgm', table_name='tasks_archive', postgresql_using='gin',
+                      postgresql_ops={'title': 'gin_trgm_ops'})
+    op.drop_index('ix_tasks_archive_due_date_id', table_name='tasks_archive')
+    op.drop_index('ix_tasks_archive_created_at_id', table_name='tasks_archive')
+    op.drop_table('tasks_archive')
+    op.drop_index('ix_tasks_completed_completed_at', table_name='tasks',
+                  postgresql_where=sa.text("status = 'COMPLETED'"), sqlite_where=sa.text("status = 'COMPLETED'"))
+    if sqlite:
+        _rebuild_sqlite_tasks(autoincrement=False)
+
+
+def _rebuild_sqlite_tasks(autoincrement: bool):
+    """
+    Recreate the SQLite tasks table with or without AUTOINCREMENT (a table option SQLite can't alter): the rows are
+    copied to a new table that takes the place of the old one, then the indexes and the triggers of the old one
+    (dropped with it) are created again. Dropping the table fires no trigger.
+    """
+    connection = op.get_bind()
+    statements = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'tasks' AND type IN ('index', 'trigger') AND sql IS NOT NULL "
+        "ORDER BY type, name"
+    ).scalars().all()
+
+    op.execute(
+        "CREATE TABLE tasks_rebuilt ("
+        f"id INTEGER NOT NULL PRIMARY KEY{' AUTOINCREMENT' if autoincrement else ''}, "
+        "title VARCHAR(255) NOT NULL, "
+        "description TEXT, "
+        "status VARCHAR(9) NOT NULL, "
+        "due_date DATETIME, "
+        "completed_at DATETIME, "
+        "created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+        "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+        "change_version BIGINT DEFAULT 0 NOT NULL)"
+    )
+    op.execute(f"INSERT INTO tasks_rebuilt ({TASKS_COLUMNS}) SELECT {TASKS_COLUMNS} FROM tasks")
+    op.execute("DROP TABLE tasks")
+    op.execute("ALTER TABLE tasks_rebuilt RENAME TO tasks")
+    # the indexes before the triggers (ordered by type)
+    for statement in statements:
+        op.execute(statement)
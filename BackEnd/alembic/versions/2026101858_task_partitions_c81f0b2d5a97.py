@@ -0,0 +1,39 @@
+"""task partitions
+
+Revision ID: c81f0b2d5a97
+Revises: 4a7d0c93e1b5
+Create Date: 2026-10-18 23:58:41.205118
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+from app.infrastructure.database.partitions import is_partitioned, partition_tasks_table, unpartition_tasks_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f0b2d5a97'
+down_revision: Union[str, Sequence[str], None] = '4a7d0c93e1b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Upgrade schema: opt-in, PostgreSQL only, alembic -x partition_tasks=true upgrade head partitions the tasks table
+    on created_at (a monthly partition from the oldest task to -x partition_months_ahead=3 months ahead). The rows are
+    copied, the writes of the tasks wait for the upgrade.
+    """
+    arguments = context.get_x_argument(as_dictionary=True)
+    connection = op.get_bind()
+    if arguments.get("partition_tasks") != "true" or connection.dialect.name != "postgresql":
+        return
+
+    partition_tasks_table(connection, int(arguments.get("partition_months_ahead", 3)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    connection = op.get_bind()
+    if is_partitioned(connection):
+        unpartition_tasks_table(connection)
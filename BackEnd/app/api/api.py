@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.controllers import tasks
+from app.api.controllers import tasks, cache, admin
 
 api_router = APIRouter()
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_router.include_router(cache.router, prefix="/cache", tags=["cache"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from dependency_injector.wiring import inject, Provide
+from app.common.container import Container
+from app.infrastructure.database.slow_query_log import SlowQueryLog
+
+
+router = APIRouter()
+
+
+@router.get("/slow-queries")
+@inject
+async def get_slow_queries(
+    enabled: bool = Depends(Provide[Container.slow_query_log_enabled]),
+    slow_query_log: SlowQueryLog = Depends(Provide[Container.slow_query_log])
+):
+    """
+    Get the slowest statements run by this worker since it started (or was reset), slowest first
+    :param enabled: injected SLOW_QUERY_LOG setting
+    :param slow_query_log: injected slow query log
+    :return: the threshold and the statements with their count, durations, route, parameters and last sampled plan
+    """
+    return {
+        "enabled": enabled,
+        "threshold_ms": slow_query_log.threshold_ms,
+        "statements": slow_query_log.top()
+    }
+
+
+@router.delete("/slow-queries")
+@inject
+async def reset_slow_queries(slow_query_log: SlowQueryLog = Depends(Provide[Container.slow_query_log])):
+    """
+    Forget the slow statements recorded by this worker, e.g. after adding an index
+    :param slow_query_log: injected slow query log
+    :return: a confirmation message
+    """
+    slow_query_log.clear()
+
+    return {"message": "Slow queries cleared"}
@@ -0,0 +1,25 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from dependency_injector.wiring import inject, Provide
+from app.common.container import Container
+from app.infrastructure.cache.task_cache import TaskCache
+
+
+router = APIRouter()
+
+
+@router.get("/stats")
+@inject
+async def get_cache_stats(
+    task_cache_mode: str = Depends(Provide[Container.task_cache_mode]),
+    task_cache: Optional[TaskCache] = Depends(Provide[Container.task_cache])
+):
+    """
+    Get the hit and miss counters of the task cache, counted by this worker since it started
+    :param task_cache_mode: injected TASK_CACHE setting
+    :param task_cache: injected task cache, None when disabled
+    :return: the cache backend and its counters
+    """
+    stats = task_cache.stats if task_cache is not None else {"hits": 0, "misses": 0}
+
+    return {"backend": task_cache_mode, **stats}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Get the metrics of this worker, in the Prometheus text format
+    :return: the metrics
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,23 +1,173 @@
-from typing import Optional
+import hashlib
+import json
+import inspect
+from contextlib import aclosing
+from typing import Optional, Callable, Any, AsyncIterator, Generator
+from anyio import CancelScope, to_thread
 from datetime import datetime
 from logging import Logger
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from dependency_injector.wiring import inject, Provide
 from app.api.schemas.requests.create_task_request import CreateTaskRequest
+from app.api.schemas.requests.bulk_create_tasks_request import BulkCreateTasksRequest
+from app.api.schemas.requests.task_ids_request import TaskIdsRequest
+from app.api.schemas.responses.task_response import TaskResponse
+from app.api.schemas.responses.bulk_result_response import BulkCompleteResultResponse, BulkDeleteResultResponse
+from app.api.schemas.responses.message_response import MessageResponse
+from app.api.schemas.responses.task_stats_response import TaskStatsResponse
+from app.api.schemas.responses.task_event_response import TaskEventResponse
+from app.api.schemas.responses.task_changes_response import TaskChangesResponse
 from app.domain.entities.task import TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_event import TaskEvent
+from app.domain.entities.task_changes import TaskChangeToken, ChangeTokenExpiredError
 from app.services.tasks_service import TasksService
+from app.services.task_export import ExportFormat, EXPORT_MEDIA_TYPES
+from app.services.async_tasks_service import AsyncTasksService
 from app.common.container import Container
+from app.infrastructure.cache.export_cache import ExportCache
+from app.infrastructure.database.session import release_session, database_thread_limiter
+from app.infrastructure.events.task_event_broker import TaskEventBroker, TaskEventStreamEnded, \
+    TooManySubscriptionsError
 
 
 router = APIRouter()
 
+# Biggest page a client can ask for
+MAX_PAGE_SIZE = 1000
 
-@router.post("")
+# Most days of daily counts and of due soon window a client can ask for
+MAX_STATS_DAYS = 366
+
+# How long an event stream client waits before reconnecting, in milliseconds
+EVENTS_RETRY_MS = 3000
+
+# The lists and exports can be stored by the clients, but must be revalidated (with their ETag) before every use
+CACHE_CONTROL = "no-cache"
+
+
+async def _call(method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Calls a tasks service method from an async route.
+    Async service methods are awaited, sync ones are sent to the threadpool so they don't block the event loop.
+    :param method: the service method
+    :return: the method result
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+
+    return await run_in_threadpool(_call_and_release_session, method, *args, **kwargs)
+
+
+def _call_and_release_session(method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Calls a sync service method and releases the database connection from the same thread,
+    so a request never waits for another threadpool slot while holding a connection.
+    """
+    try:
+        return method(*args, **kwargs)
+    finally:
+        release_session()
+
+
+def _stream(chunks: Generator[bytes, None, None] | AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Adapts a service stream for a StreamingResponse.
+    Sync streams are iterated in threads of a dedicated limiter: the stream holds its database connection until
+    the end, waiting for a slot of the default threadpool while holding it could deadlock under load.
+    :param chunks: the stream returned by the service
+    :return: async iterator over the chunks
+    """
+    if inspect.isasyncgen(chunks):
+        return chunks
+
+    return _iterate_in_thread(chunks)
+
+
+async def _iterate_in_thread(chunks: Generator[bytes, None, None]) -> AsyncIterator[bytes]:
+    try:
+        while (chunk := await to_thread.run_sync(next, chunks, None, limiter=database_thread_limiter)) is not None:
+            yield chunk
+    finally:
+        # also runs when the client disconnects, the connection must be released anyway
+        with CancelScope(shield=True):
+            await to_thread.run_sync(_close_and_release_session, chunks, limiter=database_thread_limiter)
+
+
+def _close_and_release_session(chunks: Generator[bytes, None, None]):
+    try:
+        chunks.close()
+    finally:
+        release_session()
+
+
+def _etag(version: int, request: Request) -> str:
+    """
+    Build the strong ETag of a list or an export: the same data version and request give the same bytes
+    :param version: the data version read before the tasks
+    :param request: the request, its path and query parameters (in any order) select the content
+    :return: the ETag, quoted
+    """
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.blake2b(repr((request.url.path, query)).encode(), digest_size=8).hexdigest()
+
+    return f'"{version}-{digest}"'
+
+
+def _none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header (weak comparison, as for every If-None-Match)
+    :param if_none_match: the header value: *, or a comma separated list of ETags
+    :param etag: the ETag of the current content
+    :return: True if the client has the current content, the response is 304 Not Modified
+    """
+    if if_none_match is None:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+async def _cache_export(chunks: AsyncIterator[bytes], export_cache: ExportCache, etag: str) -> AsyncIterator[bytes]:
+    """
+    Pass the chunks of an export through, keeping a copy to cache the file once it is complete.
+    The copy is dropped as soon as the file gets too big for the cache, an interrupted export is not cached.
+    :param chunks: the export stream
+    :param export_cache: the cache of the exported files
+    :param etag: the ETag of the export
+    :return: async iterator over the chunks
+    """
+    parts: Optional[list[bytes]] = []
+    size = 0
+
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield chunk
+
+            if parts is not None:
+                size += len(chunk)
+                if size <= export_cache.max_file_bytes:
+                    parts.append(chunk)
+                else:
+                    parts = None
+
+    if parts is not None:
+        export_cache.set(etag, b"".join(parts))
+
+
+@router.post("", response_model=TaskResponse)
 @inject
-def create_task(
+async def create_task(
     request: CreateTaskRequest,
-    tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
     logger: Logger = Depends(Provide[Container.logger])
 ):
     """
@@ -27,9 +177,10 @@ def create_task(
     :param logger: injected logger
     :return: the created task
     """
-    logger.info(f"Creating task with title: {request.title}")
+    logger.info("Creating task with title: %s", request.title)
 
-    created_task = tasks_service.create_task(
+    created_task = await _call(
+        tasks_service.create_task,
         title=request.title,
         description=request.description,
         due_date=request.due_date
@@ -38,62 +189,380 @@ def create_task(
     return created_task
 
 
-@router.get("")
+@router.post("/bulk", response_model=list[TaskResponse])
+@inject
+async def create_tasks(
+    request: BulkCreateTasksRequest,
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Create several tasks in a single transaction
+    :param request: the create params of each task
+    :param tasks_service: injected tasks service
+    :param logger: injected logger
+    :return: the created tasks, in the order of the request
+    """
+    logger.info("Creating %d tasks", len(request.tasks))
+
+    return await _call(
+        tasks_service.create_tasks,
+        [(task.title, task.description, task.due_date) for task in request.tasks]
+    )
+
+
+@router.patch("/bulk/complete", response_model=list[BulkCompleteResultResponse])
 @inject
-def get_tasks(
+async def complete_tasks(
+    request: TaskIdsRequest,
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Mark several tasks as completed in a single transaction
+    :param request: the IDs of the tasks
+    :param tasks_service: injected tasks service
+    :param logger: injected logger
+    :return: the result of each ID, in the order of the request: found, and the task when it was found
+    """
+    logger.info("Marking %d tasks as completed", len(request.ids))
+
+    tasks = await _call(tasks_service.complete_tasks, request.ids)
+
+    return [{"id": task_id, "found": task is not None, "task": task} for task_id, task in zip(request.ids, tasks)]
+
+
+@router.delete("/bulk", response_model=list[BulkDeleteResultResponse])
+@inject
+async def delete_tasks(
+    request: TaskIdsRequest,
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Delete several tasks in a single transaction
+    :param request: the IDs of the tasks
+    :param tasks_service: injected tasks service
+    :param logger: injected logger
+    :return: the result of each ID, in the order of the request: found (and deleted) or not
+    """
+    logger.info("Deleting %d tasks", len(request.ids))
+
+    deleted = await _call(tasks_service.delete_tasks, request.ids)
+
+    return [{"id": task_id, "found": found} for task_id, found in zip(request.ids, deleted)]
+
+
+@router.get("", response_model=list[TaskResponse])
+@inject
+async def get_tasks(
+    request: Request,
+    response: Response,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     status: Optional[TaskStatus] = None,
     title_contains: Optional[str] = None,
-    tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: TaskSortField = TaskSortField.CREATED_AT,
+    order: SortOrder = SortOrder.DESC,
+    q: Optional[str] = None,
+    search_mode: SearchMode = SearchMode.SUBSTRING,
+    include_archived: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
     logger: Logger = Depends(Provide[Container.logger])
 ):
     """
-    Get tasks with optional filters
+    Get tasks with optional filters, sorted and optionally paginated.
+    When the page is full the cursor of the next page is returned in the X-Next-Cursor header.
+    The response has an ETag, send it back in If-None-Match to get a 304 Not Modified (without reading the tasks)
+    as long as no task changed.
+    A full-text search returns the best matches first (up to limit) and has no next page cursor. When more than
+    10000 tasks match, only 10000 of them (an arbitrary subset) are ranked: the best matches can be missing, add
+    words or filters to narrow the search.
+    The tasks completed long ago may be archived (TASK_ARCHIVE_AFTER_DAYS): they are listed with include_archived or
+    a from_date/to_date range, except for the pending tasks and a full-text search.
+    :param request: the request, its query parameters are part of the ETag
+    :param response: the response, used to set the next cursor and ETag headers
     :param from_date: the start date filter
     :param to_date: the end date filter
     :param status: the status filter
-    :param tasks_service: injected tasks service
     :param title_contains: filter by title substring
+    :param limit: the page size, all the tasks are returned if not set
+    :param cursor: the X-Next-Cursor of the previous page
+    :param sort: the field to sort by
+    :param order: the sort order
+    :param q: search text
+    :param search_mode: substring (of the title) or fulltext (words of the title and description, ranked)
+    :param include_archived: also list the archived tasks
+    :param if_none_match: the ETags of the lists the client has
+    :param tasks_service: injected tasks service
     :param logger: injected logger
     :return: list of tasks
     """
-    logger.info(f"Getting tasks with filters - from_date: {from_date}, to_date: {to_date}, status: {status}, title_contains: {title_contains}")
+    logger.info("Getting tasks with filters - from_date: %s, to_date: %s, status: %s, title_contains: %s, q: %s, "
+                "search_mode: %s", from_date, to_date, status, title_contains, q, search_mode)
+
+    # a search text without any word is no search
+    full_text = bool(q and q.split()) and search_mode == SearchMode.FULLTEXT
+
+    page_cursor = None
+    if cursor is not None:
+        if full_text:
+            raise HTTPException(status_code=400, detail="The full-text search does not support cursors")
+
+        try:
+            page_cursor = TaskCursor.decode(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    tasks = tasks_service.get_tasks(from_date=from_date, to_date=to_date, status=status, title_contains=title_contains)
+        if page_cursor.sort_field != sort or page_cursor.order != order:
+            raise HTTPException(status_code=400, detail="Cursor does not match the sort")
+
+    # read before the tasks: the tasks are at least as recent as the version, a write in between changes the ETag
+    # of the next request
+    etag = _etag(await _call(tasks_service.get_data_version), request)
+    if _none_match(if_none_match, etag):
+        return _not_modified(etag)
+
+    tasks = await _call(tasks_service.get_tasks, from_date=from_date, to_date=to_date, status=status,
+                        title_contains=title_contains, limit=limit, cursor=page_cursor, sort=sort, order=order,
+                        q=q, search_mode=search_mode, include_archived=include_archived)
+
+    if limit is not None and len(tasks) == limit and not full_text:
+        response.headers["X-Next-Cursor"] = TaskCursor.after(tasks[-1], sort, order).encode()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
 
     return tasks
 
 
 @router.get("/summary")
 @inject
-def export_task_summary(
-        tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+async def export_task_summary(
+        request: Request,
+        export_format: ExportFormat = Query(default=ExportFormat.XLSX, alias="format"),
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        status: Optional[TaskStatus] = None,
+        title_contains: Optional[str] = None,
+        q: Optional[str] = None,
+        search_mode: SearchMode = SearchMode.SUBSTRING,
+        include_archived: bool = False,
+        if_none_match: Optional[str] = Header(default=None),
+        tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+        export_cache: ExportCache = Depends(Provide[Container.export_cache]),
         logger: Logger = Depends(Provide[Container.logger])
 ):
     """
-    Export a summary of tasks
+    Export a summary of tasks, streamed while the tasks are read.
+    The filters are the ones of GET /api/tasks, the tasks are always ordered by ID (a full-text search is not ranked).
+    The response has an ETag like GET /api/tasks, and the files are cached until a task changes.
+    :param request: the request, its query parameters are part of the ETag
+    :param export_format: the file format: xlsx (default), csv, ndjson, parquet or arrow (IPC stream)
+    :param from_date: the start date filter
+    :param to_date: the end date filter
+    :param status: the status filter
+    :param title_contains: filter by title substring
+    :param q: search text
+    :param search_mode: substring (of the title) or fulltext (words of the title and description)
+    :param include_archived: also export the archived tasks
+    :param if_none_match: the ETags of the exports the client has
+    :param tasks_service: injected tasks service
+    :param export_cache: injected cache of the exported files
+    :param logger: injected logger
+    :return: task summary in the requested format
+    """
+    logger.info("Exporting task summary to %s with filters - from_date: %s, to_date: %s, status: %s, "
+                "title_contains: %s, q: %s, search_mode: %s", export_format.value, from_date, to_date, status,
+                title_contains, q, search_mode)
+
+    etag = _etag(await _call(tasks_service.get_data_version), request)
+    if _none_match(if_none_match, etag):
+        return _not_modified(etag)
+
+    headers = {
+        "Content-Disposition": f"attachment; filename=tasks_summary.{export_format.value}",
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL
+    }
+
+    content = export_cache.get(etag)
+    if content is not None:
+        return Response(content, media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+    chunks = tasks_service.stream_tasks_export(export_format, from_date=from_date, to_date=to_date, status=status,
+                                               title_contains=title_contains, q=q, search_mode=search_mode,
+                                               include_archived=include_archived)
+    stream = _stream(chunks)
+    if export_cache.max_file_bytes > 0:
+        stream = _cache_export(stream, export_cache, etag)
+
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=headers
+    )
+
+
+@router.get("/stats", response_model=TaskStatsResponse)
+@inject
+async def get_task_stats(
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    status: Optional[TaskStatus] = None,
+    title_contains: Optional[str] = None,
+    q: Optional[str] = None,
+    search_mode: SearchMode = SearchMode.SUBSTRING,
+    include_archived: bool = False,
+    due_within_days: int = Query(default=7, ge=0, le=MAX_STATS_DAYS),
+    days: int = Query(default=30, ge=1, le=MAX_STATS_DAYS),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Get the stats of the tasks matching the filters of GET /api/tasks, aggregated by the database: counts per status,
+    overdue and due soon pending tasks, tasks created and completed per day (UTC) and completion time percentiles.
+    The response has the same size whatever the number of tasks.
+    :param from_date: the start date filter
+    :param to_date: the end date filter, the daily counts end on its day (today without it)
+    :param status: the status filter
+    :param title_contains: filter by title substring
+    :param q: search text
+    :param search_mode: substring (of the title) or fulltext (words of the title and description)
+    :param include_archived: also count the archived tasks
+    :param due_within_days: the pending tasks due in this number of days are due soon
+    :param days: the number of days of the daily counts
+    :param tasks_service: injected tasks service
+    :param logger: injected logger
+    :return: the stats
+    """
+    logger.info("Getting task stats with filters - from_date: %s, to_date: %s, status: %s, title_contains: %s, q: %s, "
+                "search_mode: %s", from_date, to_date, status, title_contains, q, search_mode)
+
+    return await _call(tasks_service.get_stats, from_date=from_date, to_date=to_date, status=status,
+                       title_contains=title_contains, q=q, search_mode=search_mode,
+                       include_archived=include_archived, due_within_days=due_within_days, days=days)
+
+
+@router.get("/changes", response_model=TaskChangesResponse)
+@inject
+async def get_task_changes(
+    since: Optional[str] = None,
+    limit: int = Query(default=MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Get the tasks created, updated and deleted since the last sync, in the order of the changes: the cost depends on
+    the number of changes, not of tasks. Without since every task is returned (a full sync).
+    Keep the returned token and send it as since next time, right away while has_more. A 410 Gone means the
+    changes since the token are unknown: sync all the tasks again, without since.
+    :param since: the token returned by the previous call
+    :param limit: the most changes to return
     :param tasks_service: injected tasks service
     :param logger: injected logger
-    :return: task summary in xlsx format
+    :return: the changed tasks, the deleted task IDs and the next token
     """
-    logger.info("Exporting task summary to XLSX")
+    logger.info("Getting task changes since %s", since)
+
+    token = None
+    if since is not None:
+        try:
+            token = TaskChangeToken.decode(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid token")
 
-    xlsx_data = tasks_service.get_tasks_xlsx()
+    try:
+        changes = await _call(tasks_service.get_changes, since=token, limit=limit)
+    except ChangeTokenExpiredError:
+        raise HTTPException(status_code=410, detail="The changes since the token are unknown, sync all the tasks")
 
-    return Response(
-        content=xlsx_data,
-        headers={
-            "Content-Disposition": "attachment; filename=tasks_summary.xlsx"
-        }
+    return {"changed": changes.changed, "deleted": changes.deleted, "token": changes.token.encode(),
+            "has_more": changes.has_more}
+
+
+@router.get("/events")
+@inject
+async def stream_task_events(
+    broker: TaskEventBroker = Depends(Provide[Container.task_event_broker]),
+    transport: str = Depends(Provide[Container.task_events_transport]),
+    keepalive: float = Depends(Provide[Container.task_events_keepalive]),
+    logger: Logger = Depends(Provide[Container.logger])
+):
+    """
+    Stream the changes of the tasks as Server-Sent Events, from the moment the stream starts (its first line is the
+    retry field): "created", "updated" and "deleted" events with the task ID and the task after the change, and
+    "archived" when a task leaves the lists for the archive. Open the stream, then read the tasks and apply the
+    events to them. A "reset" event ends the stream when events were lost (the client was too slow, or the listener
+    of the worker reconnected) or on shutdown: read the tasks again and open a new stream.
+    :param broker: injected broker of the task events of the process
+    :param transport: injected transport of the task events, none when they are disabled
+    :param keepalive: injected seconds between two comments on an idle stream
+    :param logger: injected logger
+    :return: the event stream
+    """
+    if transport == "none":
+        raise HTTPException(status_code=404, detail="The task events are disabled")
+    if broker.subscriptions >= broker.max_subscriptions:
+        raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "5"})
+
+    logger.info("Streaming the task events")
+
+    return StreamingResponse(
+        _event_stream(broker, keepalive),
+        media_type="text/event-stream",
+        # no proxy buffering (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
-@router.get("/{task_id}")
+async def _event_stream(broker: TaskEventBroker, keepalive: float) -> AsyncIterator[bytes]:
+    """
+    The Server-Sent Events of a stream. The subscription is opened when the stream starts, so it is always closed
+    (a response that is never sent doesn't hold one). The events queued while a chunk was sent go out in one chunk.
+    :param broker: the broker of the task events
+    :param keepalive: the seconds between two comments on an idle stream
+    :return: iterator over the chunks of the stream
+    """
+    try:
+        subscription = broker.subscribe()
+    except TooManySubscriptionsError:
+        yield _server_sent_event("reset", {"reason": "busy"})
+        return
+
+    with subscription:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+        while True:
+            try:
+                events = await subscription.get(keepalive)
+            except TaskEventStreamEnded as ended:
+                yield _server_sent_event("reset", {"reason": ended.reason})
+                return
+
+            if events:
+                yield b"".join(_task_event(event) for event in events)
+            else:
+                # detects the clients that are gone, and keeps the proxies from closing an idle stream
+                yield b": keepalive\n\n"
+
+
+def _task_event(event: TaskEvent) -> bytes:
+    data = TaskEventResponse(id=event.task_id, task=event.task).model_dump_json()
+
+    return f"event: {event.type.value}\ndata: {data}\n\n".encode()
+
+
+def _server_sent_event(name: str, data: dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@router.get("/{task_id}", response_model=TaskResponse)
 @inject
-def get_task(
+async def get_task(
     task_id: int,
-    tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
     logger: Logger = Depends(Provide[Container.logger])
 ):
     """
@@ -103,9 +572,9 @@ def get_task(
     :param logger: injected logger
     :return: the task
     """
-    logger.info(f"Getting task with ID: {task_id}")
+    logger.info("Getting task with ID: %s", task_id)
 
-    task = tasks_service.get_task(task_id)
+    task = await _call(tasks_service.get_task, task_id)
 
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -113,11 +582,11 @@ def get_task(
     return task
 
 
-@router.delete("/{task_id}")
+@router.delete("/{task_id}", response_model=MessageResponse)
 @inject
-def delete_task(
+async def delete_task(
     task_id: int,
-    tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
     logger: Logger = Depends(Provide[Container.logger])
 ):
     """
@@ -127,9 +596,9 @@ def delete_task(
     :param logger: injected logger
     :return:
     """
-    logger.info(f"Deleting task with ID: {task_id}")
+    logger.info("Deleting task with ID: %s", task_id)
 
-    found = tasks_service.delete_task(task_id)
+    found = await _call(tasks_service.delete_task, task_id)
 
     if not found:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -137,11 +606,11 @@ def delete_task(
     return {"message": "Task deleted successfully"}
 
 
-@router.patch("/{task_id}/complete")
+@router.patch("/{task_id}/complete", response_model=MessageResponse)
 @inject
-def complete_task(
+async def complete_task(
     task_id: int,
-    tasks_service: TasksService = Depends(Provide[Container.tasks_service]),
+    tasks_service: TasksService | AsyncTasksService = Depends(Provide[Container.tasks_service]),
     logger: Logger = Depends(Provide[Container.logger])
 ):
     """
@@ -151,9 +620,9 @@ def complete_task(
     :param logger: injected logger
     :return:
     """
-    logger.info(f"Marking task with ID: {task_id} as completed")
+    logger.info("Marking task with ID: %s as completed", task_id)
 
-    task = tasks_service.complete_task(task_id)
+    task = await _call(tasks_service.complete_task, task_id)
 
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
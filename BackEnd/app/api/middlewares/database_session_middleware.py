@@ -0,0 +1,33 @@
+from typing import Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Scope, Receive, Send
+from app.infrastructure.database.session import request_session_scope
+from app.infrastructure.database.slow_query_log import current_request
+
+
+class DatabaseSessionMiddleware:
+    """
+    Opens a database session scope for every HTTP request.
+    The sessions are closed (and rolled back if not committed) only after the whole response was sent,
+    so streamed responses can keep reading from the database.
+    The request is also made available to the slow query log, which reports the route of the slow statements.
+    """
+
+    def __init__(self, app: ASGIApp, session_factory: Callable[[], Session],
+                 async_session_factory: Callable[[], AsyncSession]):
+        self.app = app
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_request.set(scope)
+        try:
+            async with request_session_scope(self.session_factory, self.async_session_factory):
+                await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
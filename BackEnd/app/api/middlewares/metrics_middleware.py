@@ -0,0 +1,46 @@
+import time
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.common.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS, HTTP_REQUESTS_IN_PROGRESS
+
+# any other method is counted as OTHER, the clients choose it
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status code and concurrency of the HTTP requests.
+    The requests are labelled with their route template (/api/tasks/{task_id}), not their path, so that the task IDs
+    don't create a time series each. The latency includes the whole response, streamed ones too.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        # an exception raised before the response started becomes a 500
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            # set by the router once it found the route
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(duration)
+            HTTP_REQUESTS.labels(method, route_path, str(status)).inc()
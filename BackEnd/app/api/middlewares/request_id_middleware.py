@@ -0,0 +1,39 @@
+import re
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.common.structured_logging import RequestContext, request_context, new_request_id
+
+# the ids taken from the clients (or a proxy in front), the other ones are replaced
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+class RequestIdMiddleware:
+    """
+    Gives every HTTP request an id: the X-Request-ID header of the request when there is a valid one, a new one
+    otherwise. The id is sent back in the X-Request-ID header of the response and added to the records logged
+    during the request, with its route template.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"),
+                          None)
+        if request_id is None or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = new_request_id()
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        token = request_context.set(RequestContext(request_id, scope))
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_context.reset(token)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from app.api.schemas.requests.create_task_request import CreateTaskRequest
+
+# Most items accepted by a bulk request
+MAX_BULK_SIZE = 5000
+
+
+class BulkCreateTasksRequest(BaseModel):
+    tasks: list[CreateTaskRequest] = Field(min_length=1, max_length=MAX_BULK_SIZE)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field, field_validator
+from app.api.schemas.requests.bulk_create_tasks_request import MAX_BULK_SIZE
+
+
+class TaskIdsRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BULK_SIZE)
+
+    @field_validator("ids")
+    @classmethod
+    def unique_ids(cls, ids: list[int]) -> list[int]:
+        """drop the repeated IDs (first occurrence kept), the bulk routes return one result per task"""
+        return list(dict.fromkeys(ids))
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Optional
+from app.api.schemas.responses.task_response import TaskResponse
+
+
+class BulkDeleteResultResponse(BaseModel):
+    id: int
+    found: bool
+
+
+class BulkCompleteResultResponse(BulkDeleteResultResponse):
+    task: Optional[TaskResponse] = None
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, ConfigDict
+from app.api.schemas.responses.task_response import TaskResponse
+
+
+class TaskChangesResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    # the tasks created or updated since the token, as they are now
+    changed: list[TaskResponse]
+    # the IDs of the tasks deleted since the token
+    deleted: list[int]
+    # the since of the next sync (of the next page while has_more)
+    token: str
+    has_more: bool
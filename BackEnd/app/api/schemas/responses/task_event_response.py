@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+from app.api.schemas.responses.task_response import TaskResponse
+
+
+class TaskEventResponse(BaseModel):
+    # the data of an event of GET /api/tasks/events, the event name is the change (created, updated, deleted or
+    # archived)
+    id: int
+    # the task after the change, null when deleted or too big to be sent between the workers (read it by id)
+    task: Optional[TaskResponse] = None
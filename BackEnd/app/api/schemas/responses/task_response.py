@@ -0,0 +1,18 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from datetime import datetime
+from app.domain.entities.task import TaskStatus
+
+
+class TaskResponse(BaseModel):
+    # read from the attributes of the Task entities returned by the services
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    description: Optional[str] = None
+    status: TaskStatus
+    due_date: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from datetime import date
+from app.domain.entities.task import TaskStatus
+
+
+class DailyCountResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    day: date
+    created: int
+    completed: int
+
+
+class TaskStatsResponse(BaseModel):
+    # read from the attributes of the TaskStats returned by the services
+    model_config = ConfigDict(from_attributes=True)
+
+    total: int
+    by_status: dict[TaskStatus, int]
+    overdue: int
+    due_soon: int
+    due_within_days: int
+    daily: list[DailyCountResponse]
+    # seconds from the creation to the completion, by percentile, null without any completed task
+    completion_time_percentiles: dict[int, Optional[float]]
@@ -1,50 +1,195 @@
-import logging
 from dependency_injector import containers, providers
-from app.infrastructure.database.session import get_session
+from app.common.config import settings
+from app.common.structured_logging import configure_logger
+from app.infrastructure.database.session import get_session, get_async_session, new_session, new_async_session, \
+    slow_query_log
 from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.database.async_task_repository_database import AsyncTaskRepositoryDatabase
+from app.infrastructure.cache.cache_backend import LocalCacheBackend, RedisCacheBackend
+from app.infrastructure.cache.task_cache import TaskCache
+from app.infrastructure.cache.caching_task_repository import CachingTaskRepository
+from app.infrastructure.cache.async_caching_task_repository import AsyncCachingTaskRepository
+from app.infrastructure.cache.export_cache import ExportCache
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+from app.infrastructure.memory.async_task_repository_memory import AsyncInMemoryTaskRepository
+from app.infrastructure.events.task_event_broker import TaskEventBroker
+from app.infrastructure.events.task_event_publisher import BrokerTaskEventPublisher, NotifyTaskEventPublisher
+from app.infrastructure.reminders.reminder_sink import LogReminderSink, FileReminderSink
 from app.services.tasks_service import TasksService
+from app.services.async_tasks_service import AsyncTasksService
 
 
-def configure_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+class Container(containers.DeclarativeContainer):
+    """Dependency injection container with the dependency-injector library."""
 
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    # Logger, the parent of the TaskManager.* loggers: its records are written by a thread of their own
+    logger = providers.Singleton(
+        configure_logger,
+        name="TaskManager",
+        level=settings.LOG_LEVEL,
+        log_format=settings.LOG_FORMAT,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+        rate_limit=settings.LOG_ROUTE_RATE_LIMIT
     )
-    handler.setFormatter(formatter)
 
-    logger.addHandler(handler)
+    # Database mode, selects the tasks service ("sync" or "asyncio")
+    database_mode = providers.Object(settings.DATABASE_MODE)
+
+    # Database session factories, used by DatabaseSessionMiddleware to open the sessions of each request
+    db_session_factory = providers.Factory(new_session)
+    async_db_session_factory = providers.Factory(new_async_session)
 
-    return logger
+    # Database session of the current request
+    db_session = providers.Callable(
+        get_session
+    )
 
+    async_db_session = providers.Callable(
+        get_async_session
+    )
 
-class Container(containers.DeclarativeContainer):
-    """Dependency injection container with the dependency-injector library."""
+    # Task cache, selected by the TASK_CACHE setting, shared by all the requests of the process
+    task_cache_mode = providers.Object(settings.TASK_CACHE)
 
-    # Logger
-    logger = providers.Singleton(
-        configure_logger,
-        name="TaskManager"
+    task_cache = providers.Selector(
+        task_cache_mode,
+        none=providers.Object(None),
+        local=providers.Singleton(
+            TaskCache,
+            backend=providers.Singleton(LocalCacheBackend, max_entries=settings.TASK_CACHE_MAX_ENTRIES),
+            ttl=settings.TASK_CACHE_TTL
+        ),
+        redis=providers.Singleton(
+            TaskCache,
+            backend=providers.Singleton(RedisCacheBackend, url=settings.TASK_CACHE_REDIS_URL),
+            ttl=settings.TASK_CACHE_TTL
+        )
     )
 
-    # Database session
-    db_session = providers.Resource(
-        get_session
+    # Exported files by ETag, shared by all the requests of the process
+    export_cache = providers.Singleton(
+        ExportCache,
+        max_bytes=settings.EXPORT_CACHE_MAX_BYTES,
+        max_file_bytes=settings.EXPORT_CACHE_MAX_FILE_BYTES
+    )
+
+    # Slowest statements of the process, recorded when SLOW_QUERY_LOG is on
+    slow_query_log_enabled = providers.Object(settings.SLOW_QUERY_LOG)
+    slow_query_log = providers.Object(slow_query_log)
+
+    # Task events, streamed by GET /api/tasks/events from the broker of the process. The writes send them to it
+    # directly ("local") or through PostgreSQL NOTIFY and the listener of every worker ("postgres")
+    task_events_transport = providers.Object(settings.TASK_EVENTS_TRANSPORT)
+
+    task_events_keepalive = providers.Object(settings.TASK_EVENTS_KEEPALIVE)
+
+    task_event_broker = providers.Singleton(
+        TaskEventBroker,
+        queue_size=settings.TASK_EVENTS_QUEUE_SIZE,
+        max_subscriptions=settings.TASK_EVENTS_MAX_STREAMS
+    )
+
+    task_event_publisher = providers.Selector(
+        task_events_transport,
+        none=providers.Object(None),
+        local=providers.Singleton(BrokerTaskEventPublisher, broker=task_event_broker),
+        postgres=providers.Singleton(NotifyTaskEventPublisher, channel=settings.TASK_EVENTS_CHANNEL)
+    )
+
+    # Delivery of the reminders of the tasks about to be due, selected by the TASK_REMINDERS setting
+    task_reminders = providers.Object(settings.TASK_REMINDERS)
+
+    reminder_sink = providers.Selector(
+        task_reminders,
+        none=providers.Object(None),
+        log=providers.Singleton(LogReminderSink),
+        file=providers.Singleton(FileReminderSink, path=settings.TASK_REMINDER_FILE)
     )
 
     # Repository
-    task_repository = providers.Factory(
+    database_task_repository = providers.Factory(
         TaskRepositoryDatabase,
-        session=db_session
+        session=db_session,
+        events=task_event_publisher
+    )
+
+    async_database_task_repository = providers.Factory(
+        AsyncTaskRepositoryDatabase,
+        session=async_db_session,
+        events=task_event_publisher
+    )
+
+    caching_task_repository = providers.Factory(
+        CachingTaskRepository,
+        repository=database_task_repository,
+        cache=task_cache
+    )
+
+    async_caching_task_repository = providers.Factory(
+        AsyncCachingTaskRepository,
+        repository=async_database_task_repository,
+        cache=task_cache
+    )
+
+    # The database repository, behind the cache unless TASK_CACHE is "none"
+    cached_database_task_repository = providers.Selector(
+        task_cache_mode,
+        none=database_task_repository,
+        local=caching_task_repository,
+        redis=caching_task_repository
+    )
+
+    async_cached_database_task_repository = providers.Selector(
+        task_cache_mode,
+        none=async_database_task_repository,
+        local=async_caching_task_repository,
+        redis=async_caching_task_repository
+    )
+
+    # The tasks kept in the process, shared by all its requests (never cached, they are in memory already)
+    memory_task_repository = providers.Singleton(
+        InMemoryTaskRepository,
+        snapshot_path=settings.MEMORY_SNAPSHOT_PATH,
+        events=task_event_publisher
+    )
+
+    async_memory_task_repository = providers.Singleton(
+        AsyncInMemoryTaskRepository,
+        repository=memory_task_repository
+    )
+
+    # The repository of the services, picked by the TASK_STORE setting
+    task_store = providers.Object(settings.TASK_STORE)
+
+    task_repository = providers.Selector(
+        task_store,
+        database=cached_database_task_repository,
+        memory=memory_task_repository
+    )
+
+    async_task_repository = providers.Selector(
+        task_store,
+        database=async_cached_database_task_repository,
+        memory=async_memory_task_repository
     )
 
     # Services
-    tasks_service = providers.Factory(
+    sync_tasks_service = providers.Factory(
         TasksService,
         task_repository=task_repository
     )
 
+    async_tasks_service = providers.Factory(
+        AsyncTasksService,
+        task_repository=async_task_repository
+    )
+
+    # The service the controllers get, picked by the DATABASE_MODE setting
+    tasks_service = providers.Selector(
+        database_mode,
+        sync=sync_tasks_service,
+        asyncio=async_tasks_service
+    )
+
 
@@ -0,0 +1,63 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus metrics of the process, exposed on GET /metrics.
+# Each API worker has its own: scrape every worker (or use the prometheus_client multiprocess mode).
+
+# seconds, from a primary key lookup to a big export
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to answer a request, until the last byte of the response is sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS = Counter("http_requests", "Answered requests", ["method", "route", "status"])
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being answered", ["method"])
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Time to execute a statement, until its rows are received (unless streamed)",
+    ["engine", "operation"], buckets=LATENCY_BUCKETS
+)
+DB_STATEMENT_ROWS = Histogram(
+    "db_statement_rows", "Rows returned or changed by a statement, the streamed ones are not counted",
+    ["engine", "operation"], buckets=(0, 1, 10, 100, 1000, 10000, 100000)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waited for a connection of the pool (including opening it)",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+
+EXPORT_STAGE_DURATION = Histogram(
+    "export_stage_duration_seconds", "Time spent by an export in each stage: reading the tasks, writing the file, "
+    "sending it (waiting for the client to take the chunks) and finishing it", ["format", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+TASK_CACHE_REQUESTS = Counter("task_cache_requests", "Reads of the task cache", ["result"])
+
+
+class StageTimer:
+    """
+    Splits the duration of a job into consecutive stages: every lap ends a stage and starts the next one.
+    The time of each stage is summed over all its laps and observed once the job is done.
+    """
+
+    def __init__(self, histogram: Histogram, **labels: str):
+        self._histogram = histogram
+        self._labels = labels
+        self._totals: dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        """
+        End a stage
+        :param stage: the stage that just ended
+        """
+        now = time.perf_counter()
+        self._totals[stage] = self._totals.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def observe(self):
+        """Record the time of every stage"""
+        for stage, seconds in self._totals.items():
+            self._histogram.labels(stage=stage, **self._labels).observe(seconds)
@@ -0,0 +1,213 @@
+"""
+The logging pipeline of the TaskManager loggers: a record is put on a queue by the thread logging it and written
+by a thread of its own (QueueListener), so a request never waits for the output (a slow terminal, a full pipe to
+the log collector). The records carry the id and the route of their request and are written as a JSON object per
+line. The INFO records of busy routes can be sampled (a share of the requests keep theirs) and rate limited.
+"""
+import atexit
+import copy
+import logging
+import queue
+import threading
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Literal, NamedTuple, Optional, TextIO
+import orjson
+
+
+class RequestContext(NamedTuple):
+    """the request a record was logged for"""
+
+    request_id: str
+    # the ASGI scope, the router adds the route to it
+    scope: dict
+
+    @property
+    def route(self) -> Optional[str]:
+        route = self.scope.get("route")
+
+        return route.path if route is not None else None
+
+
+# set by RequestIdMiddleware for the whole request (and the threads running its calls)
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+# the attributes of every LogRecord, the other ones come from the extra argument of the logging calls
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "route",
+                                                                                   "suppressed"}
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the request id and route to the records, in the thread logging them (where the request context is)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = request_context.get()
+        record.request_id = context.request_id if context is not None else None
+        record.route = context.route if context is not None else None
+
+        return True
+
+
+class RouteSamplingFilter(logging.Filter):
+    """
+    Drops INFO (and lower) records of the busy routes, never the warnings and errors nor the records logged outside
+    of a request. Runs after RequestContextFilter.
+    - sample_rates: the share of the requests of a route template that keep their records, decided from the request
+      id so a request keeps all of its records or none
+    - rate_limit: the most records per second of each route (a token bucket, bursts of a second), the next record
+      let through tells how many were dropped (suppressed)
+    """
+
+    def __init__(self, sample_rates: Optional[dict[str, float]] = None, rate_limit: Optional[float] = None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limit = rate_limit
+        # route: (tokens, time of the last refill, records dropped since the last one let through)
+        self._buckets: dict[str, tuple[float, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = getattr(record, "route", None)
+        if record.levelno >= logging.WARNING or route is None:
+            return True
+
+        rate = self.sample_rates.get(route)
+        if rate is not None and zlib.crc32(record.request_id.encode()) >= rate * 2 ** 32:
+            return False
+
+        if self.rate_limit is None:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            tokens, refilled_at, dropped = self._buckets.get(route, (self.rate_limit, now, 0))
+            tokens = min(tokens + (now - refilled_at) * self.rate_limit, max(self.rate_limit, 1))
+            if tokens < 1:
+                self._buckets[route] = (tokens, now, dropped + 1)
+                return False
+            self._buckets[route] = (tokens - 1, now, 0)
+
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """A record per line as a JSON object: time, level, logger, message, request id, route and the extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in ("request_id", "route", "suppressed"):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    """The previous plain text lines, with the request id"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+
+        return f"{line} - request {request_id}" if request_id is not None else line
+
+
+class LogWriter(QueueListener):
+    """The thread writing the queued records"""
+
+    def stop(self):
+        """Write the records queued so far and stop, once (the queue can be full: wait for room for the sentinel)"""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Puts the records on a bounded queue without waiting: when the writer can't keep up and the queue is full,
+    the records are dropped and counted (dropped) instead of blocking the request or growing without bound.
+    """
+
+    def __init__(self, log_queue: queue.Queue, listener: LogWriter):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into the message now, they could change before the record is written. The rest of the
+        formatting (the JSON, the traceback of an exception) is done by the writing thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logger(name: str, level: str = "INFO", log_format: Literal["json", "text"] = "json",
+                     queue_size: int = 10000, sample_rates: Optional[dict[str, float]] = None,
+                     rate_limit: Optional[float] = None, stream: Optional[TextIO] = None) -> logging.Logger:
+    """
+    Send the records of a logger (and of its children) through a queue to a thread writing them. The thread writes
+    the queued records and stops at exit.
+    :param name: the name of the logger
+    :param level: the lowest level logged
+    :param log_format: "json", an object per line, or "text"
+    :param queue_size: the most records waiting to be written, the next ones are dropped
+    :param sample_rates: the share of the requests of a route template that keep their INFO records
+    :param rate_limit: the most INFO records per second of each route, None for no limit
+    :param stream: the output, stderr by default
+    :return: the logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    log_queue = queue.Queue(queue_size)
+    listener = LogWriter(log_queue, output)
+
+    handler = DroppingQueueHandler(log_queue, listener)
+    handler.addFilter(RequestContextFilter())
+    if sample_rates or rate_limit is not None:
+        handler.addFilter(RouteSamplingFilter(sample_rates, rate_limit))
+    logger.addHandler(handler)
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    return logger
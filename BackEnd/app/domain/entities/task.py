@@ -12,13 +12,18 @@ class TaskStatus(str, enum.Enum):
 class Task:
     """entity representing a Task object"""
 
+    # no __dict__: smaller and faster to read, the lists of tasks can be long
+    __slots__ = ("id", "title", "description", "status", "due_date", "completed_at", "created_at", "updated_at")
+
     id: int
     title: str
-    description: str | None = None
-    status: TaskStatus = TaskStatus.PENDING
-    due_date: datetime | None = None
-    completed_at: datetime | None = None
+    description: str | None
+    status: TaskStatus
+    due_date: datetime | None
+    completed_at: datetime | None
     created_at: datetime
+    # the time of the last write, set by the repositories
+    updated_at: datetime | None
 
     def __init__(
         self,
@@ -29,6 +34,7 @@ class Task:
         status: TaskStatus = TaskStatus.PENDING,
         due_date: datetime | None = None,
         completed_at: datetime | None = None,
+        updated_at: datetime | None = None,
     ):
         self.id = task_id if task_id is not None else -1
         self.title = title
@@ -37,8 +43,15 @@ class Task:
         self.due_date = due_date
         self.completed_at = completed_at
         self.created_at = created_at
+        self.updated_at = updated_at
 
     def set_completed(self):
         self.status = TaskStatus.COMPLETED
         self.completed_at = datetime.now()
 
+    def complete(self, completed_at: datetime):
+        """mark a pending task as completed at completed_at, a task that is already completed keeps its completed_at"""
+        if self.status == TaskStatus.PENDING:
+            self.status = TaskStatus.COMPLETED
+            self.completed_at = completed_at
+
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+from app.domain.entities.task import TaskStatus
+
+
+def reads_archive(include_archived: bool, from_date: Optional[datetime], to_date: Optional[datetime],
+                  status: Optional[TaskStatus], full_text: bool) -> bool:
+    """
+    Whether a read of the tasks includes the archived ones (the tasks completed long ago, see
+    ITaskRepository.archive_tasks): when asked for, or when the read filters a created_at range, the archived tasks
+    may be in it. Never for the pending tasks, the archived ones are all completed, nor for a full-text search, the
+    archive has no full-text index.
+    :param include_archived: the archived tasks are asked for
+    :param from_date: the start date created for filtering
+    :param to_date: the end date created for filtering
+    :param status: the status to filter tasks
+    :param full_text: the read is a full-text search
+    :return: True if the archive must be read
+    """
+    if status == TaskStatus.PENDING or full_text:
+        return False
+
+    return include_archived or from_date is not None or to_date is not None
@@ -0,0 +1,69 @@
+import base64
+import binascii
+import json
+from typing import NamedTuple
+from app.domain.entities.task import Task
+
+
+class ChangeTokenExpiredError(ValueError):
+    """the changes since a token can't be listed anymore (or the token is not from this store): sync from scratch"""
+
+
+class TaskChangeToken:
+    """
+    position in the changes of the tasks: the change version and id of the last change a client has seen.
+    Every write gives the tasks it changes (and the tombstones of the ones it deletes) a new change version, higher
+    than the ones of the writes committed before it, so the changes after a token are the ones to apply.
+    Clients only see it as an opaque string.
+    """
+
+    version: int
+    task_id: int
+
+    def __init__(self, version: int, task_id: int):
+        self.version = version
+        self.task_id = task_id
+
+    def encode(self) -> str:
+        """
+        Encode the token as an opaque url safe string
+        :return: the encoded token
+        """
+        payload = json.dumps([self.version, self.task_id], separators=(",", ":"))
+
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "TaskChangeToken":
+        """
+        Decode a token created by encode
+        :param token: the encoded token
+        :return: the token
+        :raises ValueError: if the token is malformed
+        """
+        try:
+            payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            version, task_id = json.loads(payload)
+            if not isinstance(version, int) or not isinstance(task_id, int) or version < 0:
+                raise ValueError("token values must be integers")
+
+            return cls(version, task_id)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid token: {token}") from e
+
+
+# the position before any change, the changes since it are all the tasks
+INITIAL_CHANGE_TOKEN = TaskChangeToken(0, 0)
+
+
+class TaskChanges(NamedTuple):
+    """
+    page of the changes of the tasks after a token, in the order of the changes: the current state of the tasks
+    created or updated, and the ids of the deleted ones. A task changed several times is listed once, at its last
+    change. Continue from token, right away while has_more.
+    """
+
+    changed: list[Task]
+    deleted: list[int]
+    token: TaskChangeToken
+    has_more: bool
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import enum
+import json
+from datetime import datetime
+from app.domain.entities.task import Task
+
+
+class TaskSortField(str, enum.Enum):
+    """enum representing the fields tasks can be sorted by"""
+
+    CREATED_AT = "created_at"
+    DUE_DATE = "due_date"
+    ID = "id"
+
+
+class SortOrder(str, enum.Enum):
+    """enum representing the sort direction"""
+
+    ASC = "asc"
+    DESC = "desc"
+
+
+class TaskCursor:
+    """
+    position in a sorted list of tasks: the sort key and id of the last task of a page.
+    The next page starts right after it, clients only see it as an opaque string.
+    """
+
+    sort_field: TaskSortField
+    order: SortOrder
+    value: datetime | int | None
+    task_id: int
+
+    def __init__(self, sort_field: TaskSortField, order: SortOrder, value: datetime | int | None, task_id: int):
+        self.sort_field = sort_field
+        self.order = order
+        self.value = value
+        self.task_id = task_id
+
+    @classmethod
+    def after(cls, task: Task, sort_field: TaskSortField, order: SortOrder) -> "TaskCursor":
+        """
+        Create the cursor pointing right after a task
+        :param task: the last task of the page
+        :param sort_field: the sort field of the page
+        :param order: the sort order of the page
+        :return: the cursor
+        """
+        return cls(sort_field, order, getattr(task, sort_field.value), task.id)
+
+    def encode(self) -> str:
+        """
+        Encode the cursor as an opaque url safe string
+        :return: the encoded cursor
+        """
+        value = self.value.isoformat() if isinstance(self.value, datetime) else self.value
+        payload = json.dumps([self.sort_field.value, self.order.value, value, self.task_id], separators=(",", ":"))
+
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str) -> "TaskCursor":
+        """
+        Decode a cursor created by encode
+        :param cursor: the encoded cursor
+        :return: the cursor
+        :raises ValueError: if the cursor is malformed
+        """
+        try:
+            payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            sort_field, order, value, task_id = json.loads(payload)
+            sort_field = TaskSortField(sort_field)
+
+            if value is not None and sort_field != TaskSortField.ID:
+                value = datetime.fromisoformat(value)
+            if not isinstance(task_id, int) or (sort_field == TaskSortField.ID and value != task_id):
+                raise ValueError("cursor id mismatch")
+
+            return cls(sort_field, SortOrder(order), value, task_id)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
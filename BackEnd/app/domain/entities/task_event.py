@@ -0,0 +1,24 @@
+import enum
+from typing import NamedTuple
+from app.domain.entities.task import Task
+
+
+class TaskEventType(str, enum.Enum):
+    """enum representing the change a task event reports"""
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    # moved to the archive, it is still read by id (see ITaskRepository.archive_tasks)
+    ARCHIVED = "archived"
+
+
+class TaskEvent(NamedTuple):
+    """
+    change of a task, published once the write is committed. The task is its new state, None when it was deleted or
+    when it was too big to be sent between the workers (read it by id then)
+    """
+
+    type: TaskEventType
+    task_id: int
+    task: Task | None = None
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import NamedTuple
+from app.domain.entities.task import TaskStatus
+
+
+class TaskRecord(NamedTuple):
+    """
+    read only row of a task, used to read many tasks at once (exports) without building a Task entity for each one
+    """
+
+    id: int
+    title: str
+    description: str | None
+    status: TaskStatus
+    due_date: datetime | None
+    completed_at: datetime | None
+    created_at: datetime
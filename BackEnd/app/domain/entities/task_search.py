@@ -0,0 +1,10 @@
+import enum
+
+
+class SearchMode(str, enum.Enum):
+    """enum representing how the search text of a tasks query is matched"""
+
+    # case-insensitive substring of the title
+    SUBSTRING = "substring"
+    # words of the title and the description (stemmed), the results are ranked by relevance
+    FULLTEXT = "fulltext"
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+from app.domain.entities.task import TaskStatus
+
+# the percentiles of the completion time in the stats
+COMPLETION_TIME_PERCENTILES = (50, 90, 99)
+
+
+class DailyCount(NamedTuple):
+    """number of tasks created and completed on a day (UTC)"""
+
+    day: date
+    created: int
+    completed: int
+
+
+class TaskStats(NamedTuple):
+    """
+    aggregates of the tasks matching a query: the size doesn't depend on the number of tasks, the daily counts cover a
+    fixed number of days (with zeros) and the percentiles are a fixed set
+    """
+
+    total: int
+    by_status: dict[TaskStatus, int]
+    # pending tasks whose due date is past
+    overdue: int
+    # pending tasks due in the next due_within_days days (not overdue)
+    due_soon: int
+    due_within_days: int
+    # one per day, oldest first
+    daily: list[DailyCount]
+    # seconds from creation to completion of the completed tasks, None when there is none
+    completion_time_percentiles: dict[int, float | None]
+
+
+def daily_window(now: datetime, to_date: datetime | None, days: int) -> tuple[datetime, datetime]:
+    """
+    The days of the daily counts: the last days UTC days up to the day of to_date (now without it)
+    :param now: the current time, a naive datetime is local time
+    :param to_date: the end date created of the query
+    :param days: the number of days
+    :return: the start (inclusive) and the end (exclusive) of the window, midnights UTC
+    """
+    last_day = (to_date or now).astimezone(timezone.utc).date()
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time(), timezone.utc)
+
+    return end - timedelta(days=days), end
+
+
+def daily_counts(start: datetime, days: int, created: dict[date, int], completed: dict[date, int]) -> list[DailyCount]:
+    """
+    The daily counts of every day of a window, zero on the days without any task
+    :param start: the start of the window, see daily_window
+    :param days: the number of days
+    :param created: the number of tasks created per day, days without any can be missing
+    :param completed: the number of tasks completed per day, days without any can be missing
+    :return: the counts, oldest first
+    """
+    window = [start.date() + timedelta(days=offset) for offset in range(days)]
+
+    return [DailyCount(day, created.get(day, 0), completed.get(day, 0)) for day in window]
+
+
+def percentile_rank(percentile: int, count: int) -> int:
+    """
+    The nearest rank of a percentile: the smallest value with at least percentile % of the values at or below it,
+    the same value as PostgreSQL's percentile_disc
+    :param percentile: the percentile, 0 to 100
+    :param count: the number of values, at least 1
+    :return: the 1-based position of the value in ascending order
+    """
+    # ceil in integers, no rounding error
+    return max(1, -(-percentile * count // 100))
@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, List, AsyncIterator
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+
+
+class IAsyncTaskRepository(ABC):
+    """Interface for asynchronous Task Repository (same contract as ITaskRepository, awaitable)"""
+
+    @abstractmethod
+    async def create_task(self, task: Task) -> Task:
+        """
+        Create a new task
+        :param task: the task to create
+        :return: created task
+        """
+        pass
+
+    @abstractmethod
+    async def get_task(self, task_id: int) -> Optional[Task]:
+        """
+        Get a task by its ID, archived or not
+        :param task_id: the ID of the task
+        :return: the task if found, else None
+        """
+        pass
+
+    @abstractmethod
+    async def edit_task(self, task: Task) -> Task | None:
+        """
+        Edit an existing task
+        :param task: the task with updated information
+        :return: the updated task if successful, None if the task does not exist
+        """
+        pass
+
+    @abstractmethod
+    async def complete_task(self, task_id: int, completed_at: datetime) -> Task | None:
+        """
+        Mark a task as completed, in a single atomic update.
+        Same rule as Task.complete: a pending task changes, a completed one keeps its completed_at.
+        :param task_id: the ID of the task
+        :param completed_at: the completion time if the task is pending
+        :return: the task after the update, None if the task does not exist
+        """
+        pass
+
+    @abstractmethod
+    async def delete_task(self, task_id: int) -> bool:
+        """
+        Delete a task by its ID, archived or not
+        :param task_id: the task ID to delete
+        :return: True if deletion was successful, False if task does not exist
+        """
+        pass
+
+    @abstractmethod
+    async def create_tasks(self, tasks: List[Task]) -> List[Task]:
+        """
+        Create several tasks at once, in a single transaction
+        :param tasks: the tasks to create
+        :return: the created tasks, in the same order
+        """
+        pass
+
+    @abstractmethod
+    async def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[Task]]:
+        """
+        Mark several tasks as completed at once, in a single transaction.
+        Same rule as Task.complete: only the pending tasks change, the completed ones keep their completed_at.
+        :param task_ids: the IDs of the tasks
+        :param completed_at: the completion time of the pending tasks
+        :return: for each ID, the task after the update, None if the task does not exist
+        """
+        pass
+
+    @abstractmethod
+    async def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        """
+        Delete several tasks at once, in a single transaction
+        :param task_ids: the IDs of the tasks
+        :return: for each ID, True if the task was deleted, False if it does not exist
+        """
+        pass
+
+    @abstractmethod
+    async def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        """
+        Move tasks completed before a time to the archive, the oldest completions first, in a single transaction.
+        The archived tasks leave the task lists (and the changes, as deleted): get_task still finds them, the reads
+        of a created_at range or with include_archived return them, they can be deleted but not edited anymore.
+        Call it again until it returns less than limit, the tasks moved by a call stay moved if the next one fails.
+        :param completed_before: the tasks completed before this time are archived
+        :param limit: the most tasks to move
+        :return: the number of tasks moved
+        """
+        pass
+
+    @abstractmethod
+    async def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                        sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        include_archived: bool = False) -> List[Task]:
+        """
+        Get tasks filtered by date range and status, sorted by (sort, id)
+        :param from_date: the start date created for filtering
+        :param to_date: the end date created for filtering
+        :param status: the status to filter tasks
+        :param title_contains: string that should be contained in the task title
+        :param limit: maximum number of tasks to return, None for all of them
+        :param cursor: only return the tasks after this position (keyset pagination)
+        :param sort: the field to sort by, ties are broken by id
+        :param order: the sort order
+        :param q: search text, matched according to search_mode
+        :param search_mode: SUBSTRING matches the title like title_contains, FULLTEXT matches the words of the title
+        and the description and orders the tasks by relevance instead of sort/order (no cursor)
+        :param include_archived: also read the archived tasks, they are read anyway for a created_at range
+        (see reads_archive)
+        :return: list of tasks matching
+        """
+        pass
+
+    @abstractmethod
+    def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            batch_size: int = 1000, include_archived: bool = False) -> AsyncIterator[List[TaskRecord]]:
+        """
+        Iterate over the tasks matching the filters (ordered by id) in batches, without loading all of them in memory
+        :param from_date: the start date created for filtering
+        :param to_date: the end date created for filtering
+        :param status: the status to filter tasks
+        :param title_contains: string that should be contained in the task title
+        :param q: search text, matched according to search_mode (a full-text search only filters, no ranking)
+        :param search_mode: SUBSTRING matches the title, FULLTEXT the words of the title and the description
+        :param batch_size: number of tasks fetched from the store and returned at a time
+        :param include_archived: also read the archived tasks (see get_tasks)
+        :return: async iterator of the batches of matching task records
+        """
+        pass
+
+    @abstractmethod
+    async def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        """
+        Get the aggregates of the tasks matching the filters, computed by the store: the size of the result doesn't
+        depend on the number of tasks
+        :param now: the current time, for the overdue and due soon tasks and the default window of the daily counts
+        :param from_date: the start date created for filtering
+        :param to_date: the end date created for filtering, the daily counts end on its day (today without it)
+        :param status: the status to filter tasks
+        :param title_contains: string that should be contained in the task title
+        :param q: search text, matched according to search_mode
+        :param search_mode: SUBSTRING matches the title, FULLTEXT the words of the title and the description
+        :param due_within_days: the pending tasks due before now plus this number of days are due soon
+        :param days: the number of days (UTC) of the daily counts
+        :param include_archived: also read the archived tasks (see get_tasks)
+        :return: the stats
+        """
+        pass
+
+    @abstractmethod
+    async def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        """
+        Get the changes of the tasks after a token, in the order of the changes: reads only the changed tasks and
+        the tombstones of the deleted ones, not the other tasks
+        :param since: the token of the last sync, None for all the tasks (a full sync)
+        :param limit: the most changes to return, continue from the returned token while has_more
+        :return: the changes
+        :raises ChangeTokenExpiredError: if the changes since the token are unknown, sync from scratch
+        """
+        pass
+
+    @abstractmethod
+    async def get_data_version(self) -> int:
+        """
+        Get the version of the tasks, it changes with every write (whoever does it) and never goes back:
+        the same version means the same tasks
+        :return: the version
+        """
+        pass
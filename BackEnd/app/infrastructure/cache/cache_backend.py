@@ -0,0 +1,103 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class CacheBackend(ABC):
+    """
+    Key-value store of the task cache, values are bytes and expire after a TTL.
+    The async methods are used by the asyncio database mode, by default they call the sync ones
+    (fine for stores that don't do I/O).
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get a value
+        :param key: the key
+        :return: the value, None if missing or expired
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        """
+        Store a value
+        :param key: the key
+        :param value: the value
+        :param ttl: seconds before the value expires
+        """
+        pass
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: bytes, ttl: float):
+        self.set(key, value, ttl)
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    In process LRU store: holds at most max_entries values, the least recently used is evicted first.
+    Only coherent within a single process, use RedisCacheBackend when several workers serve the API.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # key -> (expiry on the monotonic clock, value), ordered from the least to the most recently used
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # the sync repositories run in the threadpool
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis store, shared by all the API workers. The values expire on their own, set a maxmemory with the
+    volatile-lru policy to bound it (it only evicts the keys with a TTL, safe on a shared instance).
+    """
+
+    def __init__(self, url: str):
+        # optional dependency, only needed when the cache backend is redis
+        import redis
+        import redis.asyncio
+
+        self._client = redis.Redis.from_url(url)
+        self._async_client = redis.asyncio.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, px=int(ttl * 1000))
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        return await self._async_client.get(key)
+
+    async def set_async(self, key: str, value: bytes, ttl: float):
+        await self._async_client.set(key, value, px=int(ttl * 1000))
@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import Optional, List, Iterator
+from app.domain.repositories.task_repository import ITaskRepository
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+from app.infrastructure.cache.task_cache import TaskCache
+
+
+class CachingTaskRepository(ITaskRepository):
+    """
+    Read-through cache in front of another task repository.
+    get_task and get_tasks are answered from the cache when possible, the writes go to the repository. Every read
+    starts with the data version (a primary key lookup): a write, through this repository or not, changes it and
+    so invalidates all the cached reads at once. The exports are streamed from the repository, never cached.
+    """
+
+    def __init__(self, repository: ITaskRepository, cache: TaskCache):
+        self.repository = repository
+        self.cache = cache
+
+    def create_task(self, task: Task) -> Task:
+        return self.repository.create_task(task)
+
+    def get_task(self, task_id: int) -> Optional[Task]:
+        key = self.cache.task_key(self.repository.get_data_version(), task_id)
+        task = self.cache.decode(self.cache.backend.get(key))
+
+        if task is None:
+            task = self.repository.get_task(task_id)
+            if task is not None:
+                self.cache.backend.set(key, self.cache.encode(task), self.cache.ttl)
+
+        return task
+
+    def edit_task(self, task: Task) -> Task | None:
+        return self.repository.edit_task(task)
+
+    def complete_task(self, task_id: int, completed_at: datetime) -> Task | None:
+        return self.repository.complete_task(task_id, completed_at)
+
+    def delete_task(self, task_id: int) -> bool:
+        return self.repository.delete_task(task_id)
+
+    def create_tasks(self, tasks: List[Task]) -> List[Task]:
+        return self.repository.create_tasks(tasks)
+
+    def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[Task]]:
+        return self.repository.complete_tasks(task_ids, completed_at)
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        return self.repository.delete_tasks(task_ids)
+
+    def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        return self.repository.archive_tasks(completed_before, limit)
+
+    def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                  sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  include_archived: bool = False) -> List[Task]:
+        key = self.cache.tasks_key(self.repository.get_data_version(), from_date=from_date, to_date=to_date,
+                                   status=status, title_contains=title_contains, limit=limit, cursor=cursor, sort=sort,
+                                   order=order, q=q, search_mode=search_mode,
+                                   include_archived=include_archived)
+        tasks = self.cache.decode(self.cache.backend.get(key))
+
+        if tasks is None:
+            tasks = self.repository.get_tasks(from_date, to_date, status, title_contains, limit, cursor, sort, order,
+                                              q, search_mode, include_archived)
+            self.cache.backend.set(key, self.cache.encode(tasks), self.cache.ttl)
+
+        return tasks
+
+    def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            batch_size: int = 1000, include_archived: bool = False) -> Iterator[List[TaskRecord]]:
+        return self.repository.stream_task_batches(from_date, to_date, status, title_contains, q, search_mode,
+                                                   batch_size, include_archived)
+
+    def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        # not cached: the stats depend on the time
+        return self.repository.get_stats(now, from_date, to_date, status, title_contains, q,
+                                         search_mode, due_within_days, days, include_archived)
+
+    def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        # not cached: the pages after the old tokens would rarely be asked again
+        return self.repository.get_changes(since, limit)
+
+    def get_data_version(self) -> int:
+        return self.repository.get_data_version()
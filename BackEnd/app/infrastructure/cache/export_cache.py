@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class ExportCache:
+    """
+    In process LRU of the exported files, keyed by their ETag (which contains the data version, so an entry is never
+    stale: a write makes the next exports use other keys and the old entries are evicted as the LRU ones).
+    Bounded in bytes: holds at most max_bytes of files, the files bigger than max_file_bytes are not cached.
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self._files: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        # the sync exports run in the threadpool
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get a file
+        :param key: the ETag of the file
+        :return: the file, None if it is not cached
+        """
+        with self._lock:
+            content = self._files.get(key)
+            if content is not None:
+                self._files.move_to_end(key)
+
+            return content
+
+    def set(self, key: str, content: bytes):
+        """
+        Store a file, evicting the least recently used ones to make room for it
+        :param key: the ETag of the file
+        :param content: the file, ignored if bigger than max_file_bytes
+        """
+        if len(content) > self.max_file_bytes:
+            return
+
+        with self._lock:
+            previous = self._files.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._files[key] = content
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                _, evicted = self._files.popitem(last=False)
+                self._size -= len(evicted)
+
+    @property
+    def size(self) -> int:
+        """the bytes of the cached files"""
+        return self._size
@@ -0,0 +1,84 @@
+import hashlib
+import pickle
+import threading
+from datetime import datetime
+from typing import Any, Optional
+from app.domain.entities.task_cursor import TaskCursor
+from app.infrastructure.cache.cache_backend import CacheBackend
+from app.common.metrics import TASK_CACHE_REQUESTS
+
+
+class TaskCache:
+    """
+    The cached task reads: keys, encoding and hit/miss counters, the values are kept in a CacheBackend.
+
+    Every key contains the data version read before querying the database. The version is bumped by the transaction
+    of every write, so a cached result is never older than the version of its key: a read that raced with a write
+    stores its result under the previous version, nobody asks for it anymore.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def task_key(version: int, task_id: int) -> str:
+        """
+        Build the key of a single task
+        :param version: the data version read before the query
+        :param task_id: the ID of the task
+        :return: the key
+        """
+        return f"tasks:{version}:task:{task_id}"
+
+    @staticmethod
+    def tasks_key(version: int, **filters: Any) -> str:
+        """
+        Build the key of a list of tasks, from the normalised get_tasks arguments: empty texts are no filter,
+        dates, enums and cursors are replaced by their string form
+        :param version: the data version read before the query
+        :param filters: the get_tasks arguments
+        :return: the key
+        """
+        normalised = []
+        for name, value in sorted(filters.items()):
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, TaskCursor):
+                value = value.encode()
+            elif isinstance(value, str):
+                # str enums included
+                value = str(value.value) if hasattr(value, "value") else value or None
+            normalised.append((name, value))
+
+        digest = hashlib.blake2b(repr(normalised).encode(), digest_size=16).hexdigest()
+
+        return f"tasks:{version}:list:{digest}"
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, value: Optional[bytes]) -> Any:
+        """
+        Decode a cached value and count the hit or the miss
+        :param value: the value read from the backend, None when missing
+        :return: the decoded value, None on a miss
+        """
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        TASK_CACHE_REQUESTS.labels("miss" if value is None else "hit").inc()
+
+        return None if value is None else pickle.loads(value)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """the hit and miss counters of this process"""
+        return {"hits": self.hits, "misses": self.misses}
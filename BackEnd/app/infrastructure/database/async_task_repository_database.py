@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import Optional, List, Callable, Any, AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.repositories.async_task_repository import IAsyncTaskRepository
+from app.domain.entities.task import Task as TaskEntity, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.events.task_event_publisher import TaskEventPublisher
+
+
+class AsyncTaskRepositoryDatabase(IAsyncTaskRepository):
+    """
+    Async task repository implementation using SQLAlchemy's AsyncSession.
+
+    The queries are not duplicated: every call runs the matching TaskRepositoryDatabase method through
+    AsyncSession.run_sync, which drives the async driver (asyncpg) from a greenlet on the event loop,
+    so no threadpool worker is held while waiting for the database.
+    """
+    def __init__(self, session: AsyncSession, events: Optional[TaskEventPublisher] = None):
+        self.session = session
+        self.events = events
+
+    async def create_task(self, task: TaskEntity) -> TaskEntity:
+        return await self._run(TaskRepositoryDatabase.create_task, task)
+
+    async def get_task(self, task_id: int) -> Optional[TaskEntity]:
+        return await self._run(TaskRepositoryDatabase.get_task, task_id)
+
+    async def edit_task(self, task: TaskEntity) -> TaskEntity | None:
+        return await self._run(TaskRepositoryDatabase.edit_task, task)
+
+    async def complete_task(self, task_id: int, completed_at: datetime) -> TaskEntity | None:
+        return await self._run(TaskRepositoryDatabase.complete_task, task_id, completed_at)
+
+    async def delete_task(self, task_id: int) -> bool:
+        return await self._run(TaskRepositoryDatabase.delete_task, task_id)
+
+    async def create_tasks(self, tasks: List[TaskEntity]) -> List[TaskEntity]:
+        return await self._run(TaskRepositoryDatabase.create_tasks, tasks)
+
+    async def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[TaskEntity]]:
+        return await self._run(TaskRepositoryDatabase.complete_tasks, task_ids, completed_at)
+
+    async def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        return await self._run(TaskRepositoryDatabase.delete_tasks, task_ids)
+
+    async def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        return await self._run(TaskRepositoryDatabase.archive_tasks, completed_before, limit)
+
+    async def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                        sort: TaskSortField = TaskSortField.CREATED_AT,
+                        order: SortOrder = SortOrder.DESC,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        include_archived: bool = False) -> List[TaskEntity]:
+        return await self._run(TaskRepositoryDatabase.get_tasks, from_date, to_date, status, title_contains,
+                               limit, cursor, sort, order, q, search_mode, include_archived)
+
+    async def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                                  batch_size: int = 1000,
+                                  include_archived: bool = False) -> AsyncIterator[List[TaskRecord]]:
+        # streaming can't go through run_sync, the rows are fetched with AsyncSession.stream
+        statement = TaskRepositoryDatabase._select_task_records(from_date, to_date, status, title_contains, q,
+                                                                search_mode, self.session.get_bind().dialect.name,
+                                                                batch_size, include_archived)
+
+        async for rows in (await self.session.stream(statement)).partitions():
+            yield [TaskRecord._make(row) for row in rows]
+
+    async def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        return await self._run(TaskRepositoryDatabase.get_stats, now, from_date, to_date, status, title_contains, q,
+                               search_mode, due_within_days, days, include_archived)
+
+    async def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        return await self._run(TaskRepositoryDatabase.get_changes, since, limit)
+
+    async def get_data_version(self) -> int:
+        return await self._run(TaskRepositoryDatabase.get_data_version)
+
+    async def _run(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs a sync repository method on the async session.
+        :param method: the TaskRepositoryDatabase method to run
+        :param args: the method arguments
+        :param kwargs: the method keyword arguments
+        :return: the method result
+        """
+        return await self.session.run_sync(
+            lambda sync_session: method(TaskRepositoryDatabase(sync_session, self.events), *args, **kwargs)
+        )
@@ -0,0 +1,63 @@
+import asyncio
+import asyncpg
+from sqlalchemy.engine import make_url
+
+
+class PostgresLeaderLock:
+    """
+    A PostgreSQL session advisory lock held on a connection of its own, outside of the pools: a single worker holds
+    it at a time, until it releases it or its connection is lost (PostgreSQL releases it then). The workers
+    waiting for it don't keep a connection open.
+    """
+
+    def __init__(self, url: str, name: str):
+        """
+        :param url: the URL of the database, with any driver
+        :param name: the name of the lock, the same in every worker
+        """
+        self._dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.name = name
+        self._connection: asyncpg.Connection | None = None
+
+    async def acquire(self) -> bool:
+        """
+        Take the lock if no other worker holds it, without waiting
+        :return: True if this worker holds the lock
+        """
+        if self._connection is not None:
+            return await self.held()
+
+        connection = await asyncpg.connect(self._dsn)
+        try:
+            acquired = await connection.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", self.name)
+        except BaseException:
+            connection.terminate()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+
+        self._connection = connection
+        return True
+
+    async def held(self, timeout: float = 5) -> bool:
+        """
+        Check that the lock is still held: its connection is alive
+        :param timeout: the most seconds to wait for the database
+        :return: False if the lock is lost (or was never taken), take it again with acquire
+        """
+        if self._connection is None:
+            return False
+
+        try:
+            await self._connection.fetchval("SELECT 1", timeout=timeout)
+            return True
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            await self.release()
+            return False
+
+    async def release(self):
+        """release the lock, closing its connection without waiting"""
+        if self._connection is not None:
+            self._connection.terminate()
+            self._connection = None
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func, Enum
+from datetime import datetime, timezone
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime, Text, func, Enum, Index, DDL, event, text,
+                        TypeDecorator, Dialect)
 from sqlalchemy.orm import declarative_base
 
 from app.domain.entities.task import TaskStatus
@@ -6,13 +8,237 @@ from app.domain.entities.task import TaskStatus
 Base = declarative_base()
 
 
+class UTCDateTime(TypeDecorator):
+    """
+    DateTime(timezone=True) keeping the time zone on SQLite too: SQLite has no time zones, the datetimes are stored in
+    UTC and read back as UTC. A naive datetime is local time (PostgreSQL takes it in the session time zone).
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value: datetime | None, dialect: Dialect) -> datetime | None:
+        if value is None or dialect.name != "sqlite":
+            return value
+
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def process_result_value(self, value: datetime | None, dialect: Dialect) -> datetime | None:
+        if value is None or dialect.name != "sqlite":
+            return value
+
+        return value.replace(tzinfo=timezone.utc)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # keyset pagination indexes, (sort key, id) for each sortable field
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_due_date_id", "due_date", "id"),
+        # status filter (with a created_at range or sorted by created_at), and the pending tasks by due date
+        Index("ix_tasks_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_tasks_pending_due_date_id", "due_date", "id", postgresql_where=text("status = 'PENDING'"),
+              sqlite_where=text("status = 'PENDING'")),
+        # title ILIKE '%...%' (title_contains and the substring search)
+        Index("ix_tasks_title_trgm", "title", postgresql_using="gin",
+              postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        # the changes after a sync token
+        Index("ix_tasks_change_version_id", "change_version", "id"),
+        # the completed tasks to archive, oldest completion first
+        Index("ix_tasks_completed_completed_at", "completed_at", postgresql_where=text("status = 'COMPLETED'"),
+              sqlite_where=text("status = 'COMPLETED'")),
+        # SQLite gives a new row the highest id plus one: the ids of the archived tasks (and of the deleted ones)
+        # would be given again
+        {"sqlite_autoincrement": True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # a partitioned table (PostgreSQL, see partitions.py) has the primary key (id, created_at), the ids stay unique
+    id = Column(Integer, primary_key=True)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     status = Column(Enum(TaskStatus), default=TaskStatus.PENDING, nullable=False)
-    due_date = Column(DateTime(timezone=True), nullable=True)
-    completed_at = Column(DateTime(timezone=True), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    due_date = Column(UTCDateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
+    created_at = Column(UTCDateTime, server_default=func.now(), nullable=False)
+    # set by the INSERT and UPDATE statements of SQLAlchemy, by the database for the other writers
+    updated_at = Column(UTCDateTime, default=utc_now, onupdate=utc_now, server_default=func.now(), nullable=False)
+    # the version of the last write, set by triggers (see TASK_CHANGE_VERSION_FUNCTION)
+    change_version = Column(BigInteger, server_default=text("0"), nullable=False)
+
+
+class TaskTombstone(Base):
+    """
+    Deleted task, written by a trigger of the tasks table so the clients syncing the changes learn about the
+    deletion (the task row is gone)
+    """
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_change_version_task_id", "change_version", "task_id"),
+    )
+
+    task_id = Column(Integer, primary_key=True, autoincrement=False)
+    change_version = Column(BigInteger, nullable=False)
+    deleted_at = Column(UTCDateTime, server_default=func.now(), nullable=False)
+
+
+class TaskArchive(Base):
+    """
+    Task completed long ago, moved out of the tasks table by archive_tasks of the repositories so that the tasks
+    table stays small. Same columns, without the change version: the archived tasks are read and deleted, never
+    edited. Only the reads that may need them read this table (see reads_archive).
+    """
+    __tablename__ = "tasks_archive"
+    __table_args__ = (
+        # the sorts of the lists, the archived tasks are all completed (no status index)
+        Index("ix_tasks_archive_created_at_id", "created_at", "id"),
+        Index("ix_tasks_archive_due_date_id", "due_date", "id"),
+        Index("ix_tasks_archive_title_trgm", "title", postgresql_using="gin",
+              postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    status = Column(Enum(TaskStatus), nullable=False)
+    due_date = Column(UTCDateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
+    created_at = Column(UTCDateTime, nullable=False)
+    updated_at = Column(UTCDateTime, nullable=False)
+    archived_at = Column(UTCDateTime, server_default=func.now(), nullable=False)
+
+
+# the columns copied from tasks to tasks_archive
+ARCHIVED_COLUMNS = ("id", "title", "description", "status", "due_date", "completed_at", "created_at", "updated_at")
+
+
+# Full-text search storage, created with the table but not mapped (only the search queries of the repository read it,
+# alembic/env.py keeps autogenerate away from it).
+# PostgreSQL: a stored tsvector column over the title (weight A) and the description (weight B).
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_CONFIG = "english"
+SEARCH_VECTOR_EXPRESSION = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+# SQLite: an external content FTS5 table kept in sync by triggers, its rowid is the task id.
+SQLITE_FTS_TABLE = "tasks_fts"
+
+event.listen(Task.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+for statement in (
+    f"ALTER TABLE tasks ADD COLUMN {SEARCH_VECTOR_COLUMN} tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED",
+    f"CREATE INDEX ix_tasks_search_vector ON tasks USING gin ({SEARCH_VECTOR_COLUMN})",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+for statement in (
+    f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(title, description, content='tasks', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    f"CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    f"CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.id, old.title, old.description); END",
+    f"CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+class DataVersion(Base):
+    """
+    Version counters of the data, bumped by triggers on every change of their table (whoever writes it)
+    and read to build the ETags of the API.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+
+# name of the version of the tasks table
+TASKS_DATA_VERSION = "tasks"
+
+# The version changes in the transaction of the write: it is visible with the new rows, never before them.
+# PostgreSQL: once per statement, before it writes its rows, a bulk write bumps it once (a statement changing no row
+# too). All the writes of tasks update the same row, a transaction holds its lock from its first write until it
+# commits: the versions are given in the order of the commits.
+# SQLite: once per row (no statement triggers), the writes are serialized anyway.
+TASKS_DATA_VERSION_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION bump_tasks_data_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"UPDATE data_versions SET version = version + 1 WHERE name = '{TASKS_DATA_VERSION}'; RETURN NULL; END $$"
+)
+TASKS_DATA_VERSION_TRIGGER = (
+    "CREATE TRIGGER tasks_data_version BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks "
+    "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+)
+SQLITE_TASKS_DATA_VERSION_TRIGGERS = tuple(
+    f"CREATE TRIGGER tasks_data_version_{operation.lower()} AFTER {operation} ON tasks BEGIN "
+    f"UPDATE data_versions SET version = version + 1 WHERE name = '{TASKS_DATA_VERSION}'; END"
+    for operation in ("INSERT", "UPDATE", "DELETE")
+)
+# The archived tasks are part of the version too. On SQLite the tasks are inserted in the archive by the statement
+# deleting them from the tasks table, which bumps it.
+TASKS_ARCHIVE_DATA_VERSION_TRIGGER = (
+    "CREATE TRIGGER tasks_archive_data_version BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON tasks_archive "
+    "FOR EACH STATEMENT EXECUTE FUNCTION bump_tasks_data_version()"
+)
+SQLITE_TASKS_ARCHIVE_DATA_VERSION_TRIGGERS = tuple(
+    f"CREATE TRIGGER tasks_archive_data_version_{operation.lower()} AFTER {operation} ON tasks_archive BEGIN "
+    f"UPDATE data_versions SET version = version + 1 WHERE name = '{TASKS_DATA_VERSION}'; END"
+    for operation in ("UPDATE", "DELETE")
+)
+
+# The change versions (the sync tokens): the tasks written and the tombstones of the tasks deleted get the data
+# version of their write, so the changes committed after a client read its token always have higher versions.
+# A TRUNCATE leaves no tombstones. The archived tasks leave a tombstone too: the changes are the ones of the tasks
+# table.
+_CURRENT_DATA_VERSION = f"(SELECT version FROM data_versions WHERE name = '{TASKS_DATA_VERSION}')"
+TASK_CHANGE_VERSION_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION set_task_change_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"NEW.change_version := {_CURRENT_DATA_VERSION}; RETURN NEW; END $$"
+)
+TASK_CHANGE_VERSION_TRIGGER = (
+    "CREATE TRIGGER tasks_change_version BEFORE INSERT OR UPDATE ON tasks "
+    "FOR EACH ROW EXECUTE FUNCTION set_task_change_version()"
+)
+# one INSERT for all the rows of a bulk delete
+TASK_TOMBSTONES_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION add_task_tombstones() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"INSERT INTO task_tombstones (task_id, change_version) SELECT id, {_CURRENT_DATA_VERSION} FROM deleted_tasks "
+    "ON CONFLICT (task_id) DO UPDATE SET change_version = excluded.change_version, deleted_at = excluded.deleted_at; "
+    "RETURN NULL; END $$"
+)
+TASK_TOMBSTONES_TRIGGER = (
+    "CREATE TRIGGER tasks_tombstones AFTER DELETE ON tasks REFERENCING OLD TABLE AS deleted_tasks "
+    "FOR EACH STATEMENT EXECUTE FUNCTION add_task_tombstones()"
+)
+# SQLite can't change the row in a BEFORE trigger, it is updated after the write (the columns of that UPDATE don't
+# fire the update trigger again)
+SQLITE_TASK_CHANGE_TRIGGERS = (
+    "CREATE TRIGGER tasks_change_version_insert AFTER INSERT ON tasks BEGIN "
+    f"UPDATE tasks SET change_version = {_CURRENT_DATA_VERSION} WHERE id = new.id; END",
+    "CREATE TRIGGER tasks_change_version_update AFTER UPDATE OF title, description, status, due_date, completed_at, "
+    f"created_at, updated_at ON tasks BEGIN UPDATE tasks SET change_version = {_CURRENT_DATA_VERSION} "
+    "WHERE id = new.id; END",
+    "CREATE TRIGGER tasks_tombstones AFTER DELETE ON tasks BEGIN "
+    f"INSERT OR REPLACE INTO task_tombstones (task_id, change_version) VALUES (old.id, {_CURRENT_DATA_VERSION}); END",
+)
+
+event.listen(DataVersion.__table__, "after_create",
+             DDL(f"INSERT INTO data_versions (name, version) VALUES ('{TASKS_DATA_VERSION}', 0)"))
+for statement in (TASKS_DATA_VERSION_FUNCTION, TASKS_DATA_VERSION_TRIGGER, TASK_CHANGE_VERSION_FUNCTION,
+                  TASK_CHANGE_VERSION_TRIGGER, TASK_TOMBSTONES_FUNCTION, TASK_TOMBSTONES_TRIGGER):
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_TASKS_DATA_VERSION_TRIGGERS + SQLITE_TASK_CHANGE_TRIGGERS:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+# the function is created with the tasks table, created before (the tables are created in order of name)
+event.listen(TaskArchive.__table__, "after_create",
+             DDL(TASKS_ARCHIVE_DATA_VERSION_TRIGGER).execute_if(dialect="postgresql"))
+for statement in SQLITE_TASKS_ARCHIVE_DATA_VERSION_TRIGGERS:
+    event.listen(TaskArchive.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+from anyio import to_thread
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.infrastructure.database import models
+from app.infrastructure.database.session import database_thread_limiter
+
+logger = logging.getLogger("TaskManager.partitions")
+
+# PostgreSQL only: the tasks table can be range partitioned on created_at (see partition_tasks_table), one partition
+# per month (UTC) named after it, tasks_p202610, and a default partition for the rows outside of them
+PARTITION_PREFIX = "tasks_p"
+DEFAULT_PARTITION = "tasks_default"
+PARTITION_NAME = re.compile(rf"{PARTITION_PREFIX}(\d{{4}})(\d{{2}})|{DEFAULT_PARTITION}")
+
+# the columns written by the conversions, the search vector is generated
+TASKS_COLUMNS = "id, title, description, status, due_date, completed_at, created_at, updated_at, change_version"
+
+# the version of the tombstones of the dropped partitions (see models.TASK_TOMBSTONES_FUNCTION)
+_CURRENT_DATA_VERSION = f"(SELECT version FROM data_versions WHERE name = '{models.TASKS_DATA_VERSION}')"
+
+# taken by the maintenance of the partitions, so the workers run it one at a time
+_MAINTENANCE_LOCK = "SELECT pg_advisory_xact_lock(hashtext('tasks_partitions'))"
+
+
+class PartitionChanges(NamedTuple):
+    """the partitions created and dropped by a maintenance of the tasks partitions"""
+
+    created: list[str]
+    dropped: list[str]
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """
+    The start of a month in UTC
+    :param moment: a time in the month, naive times are UTC
+    :param months: the number of months to move by from the month of moment
+    :return: the first day of the month, at midnight UTC
+    """
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    month = moment.year * 12 + moment.month - 1 + months
+
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def is_partitioned(connection: Connection) -> bool:
+    """whether the tasks table is partitioned (always False on SQLite)"""
+    if connection.dialect.name != "postgresql":
+        return False
+
+    return bool(connection.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('tasks')")))
+
+
+def partition_tasks_table(connection: Connection, months_ahead: int, now: Optional[datetime] = None):
+    """
+    Turn the tasks table into a table partitioned on created_at: a partition per month from the month of the oldest
+    task to months_ahead months after the current one, and the default partition. The rows are copied to the new
+    table (the writes wait for the copy) with their change versions, the indexes and the triggers of the old table
+    are created again on the new one (PostgreSQL creates them on each partition). The primary key of a partitioned
+    table holds the partition key: it is (id, created_at), the ids still come from the sequence of the table.
+    :param connection: a connection to the PostgreSQL database, in a transaction
+    :param months_ahead: the number of months after the current one created in advance
+    :param now: the current time
+    """
+    now = now or datetime.now(timezone.utc)
+    connection.execute(text("LOCK TABLE tasks IN EXCLUSIVE MODE"))
+    oldest = connection.scalar(text("SELECT min(created_at) FROM tasks")) or now
+    months = [month_start(oldest, months) for months in range(_months_between(oldest, now) + months_ahead + 1)]
+
+    _replace_tasks_table(connection, "PARTITION BY RANGE (created_at)", "id, created_at", [
+        f"CREATE TABLE {partition_name(month)} PARTITION OF tasks_rebuilt {_bounds(month)}" for month in months
+    ] + [f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF tasks_rebuilt DEFAULT"])
+
+
+def unpartition_tasks_table(connection: Connection):
+    """
+    Turn the partitioned tasks table back into a single table (see partition_tasks_table)
+    :param connection: a connection to the PostgreSQL database, in a transaction
+    """
+    connection.execute(text("LOCK TABLE tasks IN EXCLUSIVE MODE"))
+    _replace_tasks_table(connection, "", "id", [])
+
+
+def _replace_tasks_table(connection: Connection, partitioning: str, primary_key: str, partitions: list[str]):
+    """
+    Copy the tasks to a new table that takes the place of the old one, then create the indexes and the triggers of
+    the old one (dropped with it) again. Dropping the table fires no trigger, the data version and the change
+    versions don't change.
+    """
+    indexes = connection.scalars(text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'tasks' "
+        "AND indexname <> 'tasks_pkey' ORDER BY indexname"
+    )).all()
+    triggers = connection.scalars(text(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = 'tasks'::regclass AND NOT tgisinternal "
+        "ORDER BY tgname"
+    )).all()
+    sequence = connection.scalar(text("SELECT pg_get_serial_sequence('tasks', 'id')"))
+
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    connection.execute(text(
+        f"CREATE TABLE tasks_rebuilt (LIKE tasks INCLUDING DEFAULTS INCLUDING GENERATED) {partitioning}"
+    ))
+    for statement in partitions:
+        connection.execute(text(statement))
+    connection.execute(text(f"INSERT INTO tasks_rebuilt ({TASKS_COLUMNS}) SELECT {TASKS_COLUMNS} FROM tasks"))
+    connection.execute(text("DROP TABLE tasks"))
+    connection.execute(text("ALTER TABLE tasks_rebuilt RENAME TO tasks"))
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY tasks.id"))
+    connection.execute(text(f"ALTER TABLE tasks ADD CONSTRAINT tasks_pkey PRIMARY KEY ({primary_key})"))
+    for statement in indexes + triggers:
+        connection.execute(text(statement))
+
+
+def maintain_task_partitions(session: Session, months_ahead: int, retention_months: Optional[int] = None,
+                             now: Optional[datetime] = None) -> PartitionChanges:
+    """
+    Create the monthly partitions of the tasks up to months_ahead months after the current one and drop the ones
+    of the months before the retention, when the tasks table is partitioned (nothing otherwise). The tasks of the
+    dropped partitions leave tombstones like deleted tasks, a detached partition fires no trigger: they get the
+    next data version. The tasks of the default partition older than the retention are deleted. The caller commits.
+    :param session: a session of the PostgreSQL database
+    :param months_ahead: the number of months after the current one to create in advance
+    :param retention_months: the number of months before the current one to keep, None keeps them all
+    :param now: the current time
+    :return: the names of the partitions created and dropped
+    """
+    connection = session.connection()
+    changes = PartitionChanges([], [])
+    if not is_partitioned(connection):
+        return changes
+
+    connection.execute(text(_MAINTENANCE_LOCK))
+    now = now or datetime.now(timezone.utc)
+    existing = set(connection.scalars(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'tasks'::regclass"
+    )))
+
+    for months in range(months_ahead + 1):
+        month = month_start(now, months)
+        if partition_name(month) not in existing:
+            _create_partition(connection, month, DEFAULT_PARTITION in existing)
+            changes.created.append(partition_name(month))
+
+    if retention_months is None:
+        return changes
+
+    cutoff = month_start(now, -retention_months)
+    expired = sorted(name for name in existing if _partition_month(name) < cutoff)
+    if expired:
+        # takes the lock of the version, the tombstones get the version of this transaction
+        connection.execute(text(
+            f"UPDATE data_versions SET version = version + 1 WHERE name = '{models.TASKS_DATA_VERSION}'"
+        ))
+    for name in expired:
+        _drop_partition(connection, name)
+        changes.dropped.append(name)
+    # through the tasks table (its triggers), only the default partition can hold them
+    if DEFAULT_PARTITION in existing and connection.scalar(
+        text(f"SELECT EXISTS (SELECT FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff)"), {"cutoff": cutoff}
+    ):
+        connection.execute(text("DELETE FROM tasks WHERE created_at < :cutoff"), {"cutoff": cutoff})
+
+    return changes
+
+
+def _create_partition(connection: Connection, month: datetime, has_default: bool):
+    """
+    Create the partition of a month. The tasks of that month in the default partition (created while the partition
+    was missing) are moved to it: PostgreSQL refuses to create it otherwise. They are written again, with a new
+    change version.
+    """
+    name = partition_name(month)
+    in_month = "created_at >= :start AND created_at < :end"
+    bounds = {"start": month, "end": month_start(month, 1)}
+    moved = has_default and connection.scalar(
+        text(f"SELECT EXISTS (SELECT FROM {DEFAULT_PARTITION} WHERE {in_month})"), bounds
+    )
+
+    if moved:
+        connection.execute(text(
+            f"CREATE TEMPORARY TABLE tasks_moved ON COMMIT DROP AS SELECT {TASKS_COLUMNS} FROM {DEFAULT_PARTITION} "
+            f"WHERE {in_month}"
+        ), bounds)
+        # from the partition, the statement triggers of the tasks table don't run: no tombstones
+        connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds)
+    connection.execute(text(f"CREATE TABLE {name} PARTITION OF tasks {_bounds(month)}"))
+    if moved:
+        connection.execute(text(f"INSERT INTO tasks ({TASKS_COLUMNS}) SELECT {TASKS_COLUMNS} FROM tasks_moved"))
+        connection.execute(text("DROP TABLE tasks_moved"))
+
+
+def _drop_partition(connection: Connection, name: str):
+    """detach and drop an expired partition, its tasks leave tombstones"""
+    connection.execute(text(
+        f"INSERT INTO task_tombstones (task_id, change_version) SELECT id, {_CURRENT_DATA_VERSION} FROM {name} "
+        "ON CONFLICT (task_id) DO UPDATE SET change_version = excluded.change_version, deleted_at = excluded.deleted_at"
+    ))
+    connection.execute(text(f"ALTER TABLE tasks DETACH PARTITION {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+
+
+def _bounds(month: datetime) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+
+
+def _partition_month(name: str) -> datetime:
+    """the month of a monthly partition, the maximum time for the other ones (they are never expired)"""
+    match = PARTITION_NAME.fullmatch(name)
+    if match is None or match[1] is None:
+        return datetime.max.replace(tzinfo=timezone.utc)
+
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+
+
+def _months_between(start: datetime, end: datetime) -> int:
+    start, end = month_start(start), month_start(end)
+
+    return max((end.year - start.year) * 12 + end.month - start.month, 0)
+
+
+async def manage_task_partitions(session_factory: Callable[[], Session],
+                                 async_session_factory: Callable[[], AsyncSession], database_mode: str,
+                                 months_ahead: int, retention_months: Optional[int], interval: float):
+    """
+    Maintain the partitions of the tasks table (see maintain_task_partitions) now, then every interval seconds,
+    until cancelled. Every worker runs it, one at a time (an advisory lock), each run in its own transaction.
+    A failed run is logged and retried at the next interval.
+    :param session_factory: creates the sync sessions
+    :param async_session_factory: creates the async sessions
+    :param database_mode: the DATABASE_MODE, the sessions used
+    :param months_ahead: the number of months after the current one to create in advance
+    :param retention_months: the number of months before the current one to keep, None keeps them all
+    :param interval: the seconds between two runs
+    """
+    while True:
+        try:
+            if database_mode == "asyncio":
+                async with async_session_factory() as session:
+                    changes = await session.run_sync(maintain_task_partitions, months_ahead, retention_months)
+                    await session.commit()
+            else:
+                changes = await to_thread.run_sync(_maintain_and_commit, session_factory, months_ahead,
+                                                   retention_months, limiter=database_thread_limiter)
+            if changes.created or changes.dropped:
+                logger.info("Created the task partitions %s, dropped %s", changes.created, changes.dropped)
+        except Exception:
+            logger.exception("Could not maintain the task partitions")
+
+        await asyncio.sleep(interval)
+
+
+def _maintain_and_commit(session_factory: Callable[[], Session], months_ahead: int,
+                         retention_months: Optional[int]) -> PartitionChanges:
+    with session_factory() as session:
+        changes = maintain_task_partitions(session, months_ahead, retention_months)
+        session.commit()
+
+    return changes
@@ -1,24 +1,388 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, AsyncIterator, Any
+from anyio import CapacityLimiter, to_thread
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine.interfaces import ExecutionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import Pool, QueuePool, AsyncAdaptedQueuePool
 from app.common.config import settings
+from app.common.metrics import DB_STATEMENT_DURATION, DB_STATEMENT_ROWS, DB_POOL_CHECKOUT_WAIT
+from app.infrastructure.database import sqlite
+from app.infrastructure.database.slow_query_log import SlowQueryLog
 
-# Create database engine and session maker
-engine = create_engine(
-    settings.DEFAULT_SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,
-    echo=False
+# Connection pool settings shared by both engines
+pool_settings = dict(
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
 )
-session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The single connection of the SQLite writes, the requests wait for it up to the pool timeout
+writer_pool_settings = dict(
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+)
+
+
+# statements are counted by their first keyword, any other one is OTHER
+STATEMENT_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def instrument_engine(engine: Engine, name: str):
+    """
+    Record the latency and the rows of every statement of an engine
+    :param engine: the engine, the sync_engine of an AsyncEngine
+    :param name: the engine label of the metrics
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement: str, parameters, context: ExecutionContext, executemany: bool):
+        context.metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record(conn, cursor, statement: str, parameters, context: ExecutionContext, executemany: bool):
+        duration = time.perf_counter() - context.metrics_start
+        operation = _statement_operation(statement)
+        DB_STATEMENT_DURATION.labels(name, operation).observe(duration)
+        # -1 when unknown: streamed rows (server side cursor) or the driver doesn't count them (SQLite)
+        if cursor.rowcount >= 0:
+            DB_STATEMENT_ROWS.labels(name, operation).observe(cursor.rowcount)
+
+
+def _statement_operation(statement: str) -> str:
+    # only the start of the statement is split, it can be long
+    words = statement[:16].split(None, 1)
+    operation = words[0].upper() if words else ""
+
+    return operation if operation in STATEMENT_OPERATIONS else "OTHER"
+
+
+class _CheckoutTimer:
+    """Pool mixin timing how long the callers wait for a connection"""
+
+    engine_name: str
+
+    def _do_get(self) -> Any:
+        # the pool method that waits for (or opens) a connection, there is no pool event before the checkout
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.engine_name).observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_CheckoutTimer, QueuePool):
+    engine_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    engine_name = "asyncio"
+
+
+class InstrumentedWriterQueuePool(_CheckoutTimer, QueuePool):
+    engine_name = "sync_writer"
+
+
+class InstrumentedAsyncWriterQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    engine_name = "asyncio_writer"
+
+
+class PoolCollector(Collector):
+    """Reports the occupancy of the connection pools when the metrics are scraped"""
+
+    def __init__(self):
+        self._pools: dict[str, Pool] = {}
+
+    def add(self, name: str, pool: Pool):
+        self._pools[name] = pool
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out_connections", "Connections in use", labels=["engine"])
+        idle = GaugeMetricFamily("db_pool_idle_connections", "Open connections waiting in the pool",
+                                 labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow_connections",
+                                     "Connections open beyond pool_size (negative: pool_size not reached yet)",
+                                     labels=["engine"])
+        for name, pool in self._pools.items():
+            checked_out.add_metric([name], pool.checkedout())
+            idle.add_metric([name], pool.checkedin())
+            overflow.add_metric([name], pool.overflow())
+
+        return [checked_out, idle, overflow]
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+# the slowest statements of the process, only recorded with SLOW_QUERY_LOG
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    top_n=settings.SLOW_QUERY_TOP
+)
+
+
+# The engines are created on first use: only the one of the configured DATABASE_MODE is ever built,
+# so sync deployments don't need asyncpg and don't open a second connection pool
+@lru_cache
+def get_engine() -> Engine:
+    """
+    Get the database engine (on SQLite the engine of the reads, see get_writer_engine)
+    """
+    engine = create_engine(
+        settings.DEFAULT_SQLALCHEMY_DATABASE_URI,
+        pool_pre_ping=True,
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        **pool_settings
+    )
+    _set_up_engine(engine, "sync")
+
+    return engine
+
+
+@lru_cache
+def get_writer_engine() -> Engine:
+    """
+    Get the engine of the writes: the database engine on PostgreSQL, on SQLite a single connection
+    (see sqlite.py)
+    """
+    if settings.DATABASE_BACKEND != "sqlite":
+        return get_engine()
+
+    engine = create_engine(
+        settings.DEFAULT_SQLALCHEMY_DATABASE_URI,
+        pool_pre_ping=True,
+        echo=False,
+        poolclass=InstrumentedWriterQueuePool,
+        **writer_pool_settings
+    )
+    sqlite.configure_writer(engine)
+    _set_up_engine(engine, "sync_writer")
+
+    return engine
+
+
+@lru_cache
+def get_session_maker() -> sessionmaker[Session]:
+    """
+    Get the session maker bound to the database engine
+    """
+    if settings.DATABASE_BACKEND == "sqlite":
+        return sessionmaker(autoflush=False, class_=sqlite.SQLiteSession, writer=get_writer_engine(),
+                            readers=get_engine())
+
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """
+    Get the async database engine (used when DATABASE_MODE is "asyncio", on SQLite the engine of the reads)
+    """
+    engine = create_async_engine(
+        settings.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI,
+        pool_pre_ping=True,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+        **pool_settings
+    )
+    _set_up_engine(engine.sync_engine, "asyncio")
+
+    return engine
+
+
+@lru_cache
+def get_async_writer_engine() -> AsyncEngine:
+    """
+    Get the async engine of the writes, see get_writer_engine
+    """
+    if settings.DATABASE_BACKEND != "sqlite":
+        return get_async_engine()
+
+    engine = create_async_engine(
+        settings.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI,
+        pool_pre_ping=True,
+        echo=False,
+        poolclass=InstrumentedAsyncWriterQueuePool,
+        **writer_pool_settings
+    )
+    sqlite.configure_writer(engine.sync_engine)
+    _set_up_engine(engine.sync_engine, "asyncio_writer")
+
+    return engine
+
+
+@lru_cache
+def get_async_session_maker() -> async_sessionmaker[AsyncSession]:
+    """
+    Get the async session maker bound to the async database engine
+    """
+    if settings.DATABASE_BACKEND == "sqlite":
+        return async_sessionmaker(autoflush=False, expire_on_commit=False, sync_session_class=sqlite.SQLiteSession,
+                                  writer=get_async_writer_engine().sync_engine, readers=get_async_engine().sync_engine)
+
+    return async_sessionmaker(autoflush=False, expire_on_commit=False, bind=get_async_engine())
+
+
+async def dispose_engines():
+    """
+    Close the connections of the engines that were built, on shutdown.
+    The aiosqlite connections run in threads that keep the process alive until they are closed.
+    """
+    for get_async in (get_async_writer_engine, get_async_engine):
+        if get_async.cache_info().currsize:
+            await get_async().dispose()
+    for get_sync in (get_writer_engine, get_engine):
+        if get_sync.cache_info().currsize:
+            get_sync().dispose()
+
+
+def _set_up_engine(engine: Engine, name: str):
+    """
+    Configure a new engine: the SQLite pragmas, the metrics and the slow query log
+    :param engine: the engine, the sync_engine of an AsyncEngine
+    :param name: the engine label of the metrics
+    """
+    if engine.dialect.name == "sqlite":
+        sqlite.configure_connections(engine, settings.SQLITE_SYNCHRONOUS, settings.SQLITE_MMAP_SIZE,
+                                     settings.SQLITE_CACHE_SIZE_KB, settings.SQLITE_BUSY_TIMEOUT_MS)
+    instrument_engine(engine, name)
+    pool_collector.add(name, engine.pool)
+    if settings.SLOW_QUERY_LOG:
+        slow_query_log.instrument(engine)
+
+
+def new_session() -> Session:
+    """
+    Create a new session, the caller is responsible for closing it
+    """
+    return get_session_maker()()
+
+
+def new_async_session() -> AsyncSession:
+    """
+    Create a new async session, the caller is responsible for closing it
+    """
+    return get_async_session_maker()()
+
+
+class RequestSessions:
+    """
+    The database sessions of a single request.
+    Sessions are only opened on first use, so requests that don't touch the database never check out a connection.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], async_session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+        self._session: Session | None = None
+        self._async_session: AsyncSession | None = None
+
+    def get_session(self) -> Session:
+        if self._session is None:
+            self._session = self._session_factory()
+
+        return self._session
+
+    def get_async_session(self) -> AsyncSession:
+        if self._async_session is None:
+            self._async_session = self._async_session_factory()
+
+        return self._async_session
+
+    def release_session(self):
+        """
+        Close the sync session, rolling back anything that was not committed and returning its connection
+        to the pool. Must be called from the thread that used the session, the session can be used again after it.
+        """
+        if self._session is not None:
+            self._session.close()
 
-def get_session():
+    async def close(self):
+        """
+        Close the opened sessions, rolling back anything that was not committed and returning the connections
+        to the pool
+        """
+        if self._session is not None:
+            if self._session.in_transaction():
+                # Not released by the thread that used it, closing does blocking I/O. Waiting for a default threadpool
+                # slot while holding a connection deadlocks once all the threads are waiting for a connection.
+                await to_thread.run_sync(self._session.close, limiter=database_thread_limiter)
+            else:
+                # already released (or never used): holds no connection, closing does no I/O
+                self._session.close()
+            self._session = None
+
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+
+_request_sessions: ContextVar[RequestSessions | None] = ContextVar("request_sessions", default=None)
+
+# Threads that hold a database connection outside of the default threadpool (streamed exports, late session closes),
+# one per connection the pool can open
+database_thread_limiter = CapacityLimiter(settings.DATABASE_POOL_SIZE + settings.DATABASE_MAX_OVERFLOW)
+
+
+@asynccontextmanager
+async def request_session_scope(
+        session_factory: Callable[[], Session] = new_session,
+        async_session_factory: Callable[[], AsyncSession] = new_async_session
+) -> AsyncIterator[RequestSessions]:
     """
-    Get the session and clean up after use.
+    Open a session scope, every get_session/get_async_session call inside it returns the same session
+    and the sessions are closed when the scope exits.
+    :param session_factory: creates the sync session
+    :param async_session_factory: creates the async session
     """
-    db = session_maker()
+    sessions = RequestSessions(session_factory, async_session_factory)
+    token = _request_sessions.set(sessions)
     try:
-        yield db
+        yield sessions
     finally:
-        db.close()
+        _request_sessions.reset(token)
+        await sessions.close()
+
 
+def _current_sessions() -> RequestSessions:
+    sessions = _request_sessions.get()
 
+    if sessions is None:
+        raise RuntimeError("No database session scope, the request must go through DatabaseSessionMiddleware")
+
+    return sessions
+
+
+def get_session() -> Session:
+    """
+    Get the session of the current request.
+    """
+    return _current_sessions().get_session()
+
+
+def release_session():
+    """
+    Release the sync session of the current request (if any) from the thread that used it.
+    """
+    sessions = _request_sessions.get()
+
+    if sessions is not None:
+        sessions.release_session()
+
+
+def get_async_session() -> AsyncSession:
+    """
+    Get the async session of the current request.
+    """
+    return _current_sessions().get_async_session()
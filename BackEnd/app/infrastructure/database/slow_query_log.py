@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.interfaces import ExecutionContext
+
+logger = logging.getLogger("TaskManager.slow_queries")
+
+# The ASGI scope of the current request, set by DatabaseSessionMiddleware. The route of a slow statement is read from
+# it when the statement ends: the router has added the route to the scope by then.
+current_request: ContextVar[Optional[dict]] = ContextVar("current_request", default=None)
+
+# longest parameters representation logged and kept (a bulk insert has thousands of them)
+MAX_PARAMETERS_LENGTH = 1000
+
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERALS = re.compile(r"\b\d+(?:\.\d+)?\b")
+# the placeholders of psycopg2 (%(name)s), asyncpg ($1) and SQLite (?)
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_PLACEHOLDER_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+_REPEATED_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalise a statement so that the executions of the same query share it: literals and placeholders become ?,
+    lists of them (IN lists, rows of a multi-row INSERT) a single one, and the whitespace a single space
+    :param statement: the SQL sent to the database
+    :return: the normalised statement
+    """
+    statement = _STRING_LITERALS.sub("?", statement)
+    statement = _PLACEHOLDERS.sub("?", statement)
+    statement = _NUMBER_LITERALS.sub("?", statement)
+    statement = _PLACEHOLDER_LISTS.sub("?", statement)
+    statement = _REPEATED_ROWS.sub(r"\1", statement)
+
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+@dataclass
+class SlowStatement:
+    """the slow executions of a statement fingerprint"""
+
+    fingerprint: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    # of the slowest execution
+    route: Optional[str] = None
+    parameters: Optional[str] = None
+    last_seen: Optional[datetime] = None
+    # of the last sampled execution, PostgreSQL SELECT statements only
+    plan: Optional[str] = None
+    plan_ms: Optional[float] = None
+    id: str = field(init=False)
+
+    def __post_init__(self):
+        self.id = hashlib.blake2b(self.fingerprint.encode(), digest_size=8).hexdigest()
+
+
+class SlowQueryLog:
+    """
+    Logs the statements slower than a threshold with their parameters and route, and keeps the top_n slowest
+    fingerprints in memory (when full, a new fingerprint replaces the fastest one if it is slower).
+
+    A sample of the slow SELECT statements is run again with EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL, right after
+    them, on the same connection in a savepoint. ANALYZE executes the statement a second time: keep the sample rate
+    low, the request that gets sampled waits for it.
+    """
+
+    def __init__(self, threshold_ms: float, explain_sample_rate: float, top_n: int):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.top_n = top_n
+        self._statements: dict[str, SlowStatement] = {}
+        # the sync sessions run in the threadpool
+        self._lock = threading.Lock()
+
+    def instrument(self, engine: Engine):
+        """
+        Time the statements of an engine
+        :param engine: the engine, the sync_engine of an AsyncEngine
+        """
+        event.listen(engine, "before_cursor_execute", self._start_timer)
+        event.listen(engine, "after_cursor_execute", self._check)
+
+    @staticmethod
+    def _start_timer(conn, cursor, statement: str, parameters, context: ExecutionContext, executemany: bool):
+        context.slow_query_start = time.perf_counter()
+
+    def _check(self, conn: Connection, cursor, statement: str, parameters, context: ExecutionContext,
+               executemany: bool):
+        duration_ms = (time.perf_counter() - context.slow_query_start) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        route = _current_route()
+        shown_parameters = repr(parameters)[:MAX_PARAMETERS_LENGTH]
+        logger.warning("Slow statement (%.1f ms) from %s: %s - parameters: %s", duration_ms, route, statement,
+                       shown_parameters)
+
+        plan = None
+        if self._should_explain(conn, statement, executemany):
+            plan = self._explain(conn, statement, parameters)
+            logger.warning("Plan of the slow statement:\n%s", plan)
+
+        self.record(fingerprint(statement), duration_ms, route, shown_parameters, plan)
+
+    def _should_explain(self, conn: Connection, statement: str, executemany: bool) -> bool:
+        # EXPLAIN ANALYZE runs the statement: never the writes
+        return (conn.dialect.name == "postgresql" and not executemany
+                and statement.lstrip()[:6].upper() == "SELECT" and random.random() < self.explain_sample_rate)
+
+    @staticmethod
+    def _explain(conn: Connection, statement: str, parameters: Any) -> str:
+        """
+        Run the statement again with EXPLAIN (ANALYZE, BUFFERS), on the connection that ran it: the same transaction,
+        and no other connection is needed (the pool can be exhausted). A savepoint keeps a failure from aborting
+        the transaction of the request.
+        :return: the plan, or the error that prevented getting it
+        """
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                plan = f"EXPLAIN failed: {e}"
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+        finally:
+            cursor.close()
+
+        return plan
+
+    def record(self, statement_fingerprint: str, duration_ms: float, route: Optional[str],
+               parameters: Optional[str], plan: Optional[str] = None):
+        """
+        Add a slow execution to the top statements
+        :param statement_fingerprint: the fingerprint of the statement
+        :param duration_ms: the time it took
+        :param route: the route that ran it
+        :param parameters: the representation of its parameters
+        :param plan: its plan if it was sampled
+        """
+        with self._lock:
+            slow = self._statements.get(statement_fingerprint)
+            if slow is None:
+                if len(self._statements) >= self.top_n:
+                    fastest = min(self._statements.values(), key=lambda s: s.max_ms, default=None)
+                    if fastest is None or fastest.max_ms >= duration_ms:
+                        return
+                    del self._statements[fastest.fingerprint]
+                slow = self._statements[statement_fingerprint] = SlowStatement(statement_fingerprint)
+
+            slow.count += 1
+            slow.total_ms += duration_ms
+            slow.last_seen = datetime.now()
+            if duration_ms >= slow.max_ms:
+                slow.max_ms = duration_ms
+                slow.route = route
+                slow.parameters = parameters
+            if plan is not None:
+                slow.plan = plan
+                slow.plan_ms = duration_ms
+
+    def top(self) -> list[dict]:
+        """
+        Get the top statements
+        :return: the statements, slowest first
+        """
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda s: s.max_ms, reverse=True)
+            return [asdict(s) for s in statements]
+
+    def clear(self):
+        with self._lock:
+            self._statements.clear()
+
+
+def _current_route() -> Optional[str]:
+    scope = current_request.get()
+    if scope is None:
+        return None
+
+    route = scope.get("route")
+
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
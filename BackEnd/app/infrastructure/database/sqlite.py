@@ -0,0 +1,75 @@
+"""
+SQLite support: the pragmas of the connections and the single writer.
+
+SQLite allows one writer at a time per database file. With the WAL journal the readers never wait for it, but a
+transaction that reads first and writes later can't take the write lock once another connection committed
+(SQLITE_BUSY without waiting). So the writes go through their own engine: one connection in the process, beginning
+its transactions with BEGIN IMMEDIATE (the write lock is taken, or waited for, at the start). The requests wait for it
+in the pool, the writers of other processes with the busy timeout. The reads use the pool of the main engine.
+"""
+from typing import Any
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+
+def configure_connections(engine: Engine, synchronous: str, mmap_size: int, cache_size_kb: int,
+                          busy_timeout_ms: int):
+    """
+    Set the pragmas of every connection an engine opens
+    :param engine: the engine, the sync_engine of an AsyncEngine
+    :param synchronous: OFF, NORMAL, FULL or EXTRA
+    :param mmap_size: the bytes of the file memory mapped
+    :param cache_size_kb: the page cache of a connection
+    :param busy_timeout_ms: how long a write waits for the write lock of another connection
+    """
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA mmap_size={int(mmap_size)}",
+        # a negative size is in KiB instead of pages
+        f"PRAGMA cache_size=-{int(cache_size_kb)}",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+        "PRAGMA foreign_keys=ON",
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def configure_writer(engine: Engine):
+    """
+    Begin the transactions of an engine with BEGIN IMMEDIATE.
+    The driver's own transaction handling is turned off, it would begin them with BEGIN (deferred) before the first
+    write only.
+    :param engine: the engine, the sync_engine of an AsyncEngine
+    """
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class SQLiteSession(Session):
+    """
+    Session of a SQLite database sending the writes to the writer engine and the rest to the readers engine.
+    The writes are the INSERT, UPDATE and DELETE statements, the flushes and the ORM bulk operations (these ask for
+    the connection of a mapper, without a statement).
+    """
+
+    def __init__(self, *args, writer: Engine, readers: Engine, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.readers = readers
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs) -> Engine:
+        if self._flushing or (clause is None and mapper is not None) or getattr(clause, "is_dml", False):
+            return self.writer
+
+        return self.readers
@@ -1,92 +1,638 @@
-from datetime import datetime
-from typing import Optional, List
-from sqlalchemy.orm import Session
+from datetime import datetime, date, timedelta
+from typing import Optional, List, Iterator
+from sqlalchemy import (ColumnElement, Select, Integer, BigInteger, Float, Date, select, insert, update, delete, and_,
+                        or_, tuple_, any_, literal, literal_column, func, table, column, cast, union_all, null, true,
+                        false)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.util import AliasedClass
 from app.domain.repositories.task_repository import ITaskRepository
 from app.domain.entities.task import Task as TaskEntity, TaskStatus as TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_archive import reads_archive
+from app.domain.entities.task_event import TaskEvent, TaskEventType
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken, ChangeTokenExpiredError, INITIAL_CHANGE_TOKEN
+from app.domain.entities.task_stats import (TaskStats, COMPLETION_TIME_PERCENTILES, daily_window, daily_counts,
+                                            percentile_rank)
 from app.infrastructure.database import models
+from app.infrastructure.database.models import SEARCH_CONFIG, SEARCH_VECTOR_COLUMN, SQLITE_FTS_TABLE
+from app.infrastructure.events.task_event_publisher import TaskEventPublisher
+
+# most matches of a full-text search that are ranked, see _full_text_search
+FULL_TEXT_RANK_CANDIDATES = 10000
+# the columns of a changed task, besides its id
+CHANGE_FIELDS = ("title", "description", "status", "due_date", "completed_at", "created_at", "updated_at")
+
+# the tasks table, or the tasks and the archived tasks (see _tasks_source)
+TaskSource = type[models.Task] | AliasedClass
 
 
 class TaskRepositoryDatabase(ITaskRepository):
     """
     Task repository implementation using a SQL database with SQLAlchemy ORM.
+    The writes send their events (created, updated and deleted tasks) to the events publisher, if any.
     """
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, events: Optional[TaskEventPublisher] = None):
         self.session = session
+        self.events = events
 
     def create_task(self, task: TaskEntity) -> TaskEntity:
-        db_task = models.Task(
-            title=task.title,
-            description=task.description,
-            status=task.status,
-            due_date=task.due_date,
-            completed_at=task.completed_at,
-            created_at=task.created_at
-        )
-
-        self.session.add(db_task)
-        self.session.commit()
-        self.session.refresh(db_task)
-
-        return self._orm_to_entity(db_task)
+        # the INSERT ... RETURNING of the bulk insert, the created task is known before the commit
+        return self.create_tasks([task])[0]
 
     def get_task(self, task_id: int) -> Optional[TaskEntity]:
         db_task = self.session.query(models.Task).filter(models.Task.id == task_id).first()
 
         if db_task is None:
-            return None
+            # a primary key lookup in the archive, for the ids missing from the tasks table only
+            return self._archived([task_id]).get(task_id)
 
         return self._orm_to_entity(db_task)
 
     def edit_task(self, task: TaskEntity) -> TaskEntity | None:
-        db_task = self.session.query(models.Task).filter(models.Task.id == task.id).first()
+        # one UPDATE ... RETURNING instead of SELECT, UPDATE and the refresh SELECT
+        statement = (
+            update(models.Task)
+            .where(models.Task.id == task.id)
+            .values(
+                title=task.title,
+                description=task.description,
+                status=task.status,
+                due_date=task.due_date,
+                completed_at=task.completed_at
+            )
+            .returning(models.Task)
+            .execution_options(synchronize_session=False)
+        )
+        db_task = self.session.scalars(statement).one_or_none()
+        edited = None if db_task is None else self._orm_to_entity(db_task)
 
-        if db_task is None:
-            return None
+        self._commit([] if edited is None else [TaskEvent(TaskEventType.UPDATED, edited.id, edited)])
 
-        db_task.title = task.title
-        db_task.description = task.description
-        db_task.status = task.status
-        db_task.due_date = task.due_date
-        db_task.completed_at = task.completed_at
+        return edited
 
-        self.session.commit()
-        self.session.refresh(db_task)
+    def complete_task(self, task_id: int, completed_at: datetime) -> TaskEntity | None:
+        # the status check is part of the UPDATE, two concurrent completions can't both set completed_at
+        statement = (
+            update(models.Task)
+            .where(models.Task.id == task_id, models.Task.status == TaskStatus.PENDING)
+            .values(status=TaskStatus.COMPLETED, completed_at=completed_at)
+            .returning(models.Task)
+            .execution_options(synchronize_session=False)
+        )
+        db_task = self.session.scalars(statement).one_or_none()
+        events = [] if db_task is None else [TaskEvent(TaskEventType.UPDATED, db_task.id, self._orm_to_entity(db_task))]
 
-        return self._orm_to_entity(db_task)
+        if db_task is None:
+            # not pending: already completed (returned unchanged) or missing
+            db_task = self.session.scalars(select(models.Task).where(models.Task.id == task_id)).one_or_none()
+        completed = None if db_task is None else self._orm_to_entity(db_task)
+        if completed is None:
+            # the archived tasks are completed
+            completed = self._archived([task_id]).get(task_id)
+
+        self._commit(events)
+
+        return completed
 
     def delete_task(self, task_id: int) -> bool:
-        db_task = self.session.query(models.Task).filter(models.Task.id == task_id).first()
+        statement = (
+            delete(models.Task)
+            .where(models.Task.id == task_id)
+            .returning(models.Task.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = self.session.scalars(statement).one_or_none() is not None
+        if not deleted:
+            deleted = task_id in self._delete_archived([task_id])
 
-        if db_task is None:
-            return False
+        self._commit([TaskEvent(TaskEventType.DELETED, task_id)] if deleted else [])
+
+        return deleted
+
+    def create_tasks(self, tasks: List[TaskEntity]) -> List[TaskEntity]:
+        if not tasks:
+            return []
+
+        # multi-row INSERT ... RETURNING, the rows come back in the order of the parameters
+        statement = insert(models.Task).returning(models.Task, sort_by_parameter_order=True)
+        db_tasks = self.session.scalars(statement, [
+            {
+                "title": task.title,
+                "description": task.description,
+                "status": task.status,
+                "due_date": task.due_date,
+                "completed_at": task.completed_at,
+                "created_at": task.created_at,
+            }
+            for task in tasks
+        ]).all()
+        created = [self._orm_to_entity(db_task) for db_task in db_tasks]
+
+        self._commit([TaskEvent(TaskEventType.CREATED, task.id, task) for task in created])
+
+        return created
+
+    def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[TaskEntity]]:
+        if not task_ids:
+            return []
+
+        statement = (
+            update(models.Task)
+            .where(self._id_in(task_ids), models.Task.status == TaskStatus.PENDING)
+            .values(status=TaskStatus.COMPLETED, completed_at=completed_at)
+            .returning(models.Task)
+            .execution_options(synchronize_session=False)
+        )
+        tasks = {db_task.id: self._orm_to_entity(db_task) for db_task in self.session.scalars(statement)}
+        events = [TaskEvent(TaskEventType.UPDATED, task.id, task) for task in tasks.values()]
+
+        # the tasks that were not updated are either already completed or missing
+        others = [task_id for task_id in set(task_ids) if task_id not in tasks]
+        if others:
+            statement = select(models.Task).where(self._id_in(others))
+            tasks.update((db_task.id, self._orm_to_entity(db_task)) for db_task in self.session.scalars(statement))
+        missing = [task_id for task_id in others if task_id not in tasks]
+        if missing:
+            tasks.update(self._archived(missing))
+
+        self._commit(events)
+
+        return [tasks.get(task_id) for task_id in task_ids]
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        if not task_ids:
+            return []
+
+        statement = (
+            delete(models.Task)
+            .where(self._id_in(task_ids))
+            .returning(models.Task.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = set(self.session.scalars(statement))
+        missing = [task_id for task_id in set(task_ids) if task_id not in deleted]
+        if missing:
+            deleted.update(self._delete_archived(missing))
+
+        # once each, in the order of the request
+        self._commit([TaskEvent(TaskEventType.DELETED, task_id) for task_id in dict.fromkeys(task_ids)
+                      if task_id in deleted])
+
+        return [task_id in deleted for task_id in task_ids]
+
+    def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        task = models.Task
+        # the oldest completions first, read from the index of the completed tasks. On PostgreSQL the rows are locked
+        # and the ones locked by another transaction (a write, the archival of another worker) are skipped, a next
+        # call moves them. The copies and the deletions are committed together, a failed call moves nothing
+        candidates = (
+            select(*(getattr(task, column) for column in models.ARCHIVED_COLUMNS))
+            .where(task.status == TaskStatus.COMPLETED, task.completed_at < completed_before)
+            .order_by(task.completed_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            insert(models.TaskArchive)
+            .from_select(models.ARCHIVED_COLUMNS, candidates)
+            .returning(models.TaskArchive)
+        )
+        archived = [self._orm_to_entity(db_task) for db_task in self.session.scalars(statement)]
+
+        if archived:
+            statement = (
+                delete(task)
+                .where(self._id_in([archived_task.id for archived_task in archived]))
+                .execution_options(synchronize_session=False)
+            )
+            self.session.execute(statement)
+
+        self._commit([TaskEvent(TaskEventType.ARCHIVED, archived_task.id, archived_task) for archived_task in archived])
+
+        return len(archived)
+
+    def _archived(self, task_ids: List[int]) -> dict[int, TaskEntity]:
+        """
+        Read archived tasks
+        :param task_ids: the IDs of the tasks
+        :return: the archived tasks among them, by ID
+        """
+        statement = select(models.TaskArchive).where(self._id_in(task_ids, models.TaskArchive.id))
+
+        return {db_task.id: self._orm_to_entity(db_task) for db_task in self.session.scalars(statement)}
+
+    def _delete_archived(self, task_ids: List[int]) -> set[int]:
+        """
+        Delete archived tasks, in the transaction of the caller
+        :param task_ids: the IDs of the tasks
+        :return: the IDs of the deleted ones
+        """
+        statement = (
+            delete(models.TaskArchive)
+            .where(self._id_in(task_ids, models.TaskArchive.id))
+            .returning(models.TaskArchive.id)
+            .execution_options(synchronize_session=False)
+        )
+
+        return set(self.session.scalars(statement))
+
+    def _commit(self, events: List[TaskEvent]):
+        """
+        Commit a write and send its events: in the transaction (delivered at the commit, never if it fails) and/or
+        once committed, depending on the publisher
+        :param events: the events of the write
+        """
+        if self.events is not None and events:
+            self.events.notify(self.session, events)
 
-        self.session.delete(db_task)
         self.session.commit()
 
-        return True
+        if self.events is not None and events:
+            self.events.publish(events)
+
+    def _id_in(self, task_ids: List[int], id_column: ColumnElement[int] = models.Task.id) -> ColumnElement[bool]:
+        """
+        Build the filter selecting tasks by ID
+        :param task_ids: the IDs
+        :param id_column: the ID column, of the tasks table by default
+        :return: the filter
+        """
+        if self.session.get_bind().dialect.name == "postgresql":
+            # id = ANY(:ids) sends one array parameter, IN sends one parameter per ID (asyncpg accepts 32767)
+            return id_column == any_(literal(list(task_ids), ARRAY(Integer)))
+
+        return id_column.in_(task_ids)
 
     def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
-                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None) -> List[TaskEntity]:
-        query = self.session.query(models.Task)
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                  sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  include_archived: bool = False) -> List[TaskEntity]:
+        q = _search_text(q)
+        task = _tasks_source(include_archived, from_date, to_date, status, q, search_mode)
+        statement = self._select_tasks(from_date, to_date, status, title_contains, task)
+
+        if q and search_mode == SearchMode.FULLTEXT:
+            if cursor:
+                raise ValueError("The full-text search is ordered by relevance, it can't continue from a cursor")
+
+            statement = self._full_text_search(statement, q)
+            if limit is not None:
+                statement = statement.limit(limit)
+
+            return [self._orm_to_entity(db_task) for db_task in self.session.scalars(statement)]
+
+        if q:
+            statement = statement.where(_title_contains(q, task))
+
+        # Keyset pagination: continue after the cursor instead of using an offset, so every page costs the same
+        if cursor:
+            statement = statement.where(self._after_cursor(cursor, task))
+
+        statement = statement.order_by(*self._sort_clauses(sort, order, task))
+
+        if limit is not None:
+            statement = statement.limit(limit)
+
+        db_tasks = self.session.scalars(statement).all()
+
+        return [self._orm_to_entity(db_task) for db_task in db_tasks]
+
+    def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            batch_size: int = 1000, include_archived: bool = False) -> Iterator[List[TaskRecord]]:
+        # yield_per uses a server side cursor, only batch_size rows are in memory at a time
+        statement = self._select_task_records(from_date, to_date, status, title_contains, q, search_mode,
+                                              self.session.get_bind().dialect.name, batch_size, include_archived)
+
+        for rows in self.session.execute(statement).partitions():
+            yield [TaskRecord._make(row) for row in rows]
+
+    def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        dialect_name = self.session.get_bind().dialect.name
+        task = _tasks_source(include_archived, from_date, to_date, status, _search_text(q), search_mode)
+        matching = self._select_matching(from_date, to_date, status, title_contains, q, search_mode, dialect_name,
+                                         task)
+        pending = task.status == TaskStatus.PENDING
+        duration = _completion_seconds(dialect_name, task)
+
+        # one pass over the matching tasks for the counts (and the percentiles on PostgreSQL)
+        columns = [func.count().filter(task.status == task_status).label(task_status.name)
+                   for task_status in TaskStatus]
+        columns += [
+            func.count().filter(pending, task.due_date < now).label("overdue"),
+            func.count().filter(pending, task.due_date >= now,
+                                task.due_date < now + timedelta(days=due_within_days)).label("due_soon"),
+            func.count(task.completed_at).label("completed"),
+        ]
+        if dialect_name == "postgresql":
+            fractions = literal([percentile / 100 for percentile in COMPLETION_TIME_PERCENTILES], ARRAY(Float))
+            # the nearest rank, like percentile_rank (NULL durations, the tasks not completed, are left out)
+            columns.append(func.percentile_disc(fractions).within_group(duration).label("percentiles"))
+        summary = self.session.execute(matching.with_only_columns(*columns)).one()
+
+        if dialect_name == "postgresql":
+            values = summary.percentiles or [None] * len(COMPLETION_TIME_PERCENTILES)
+        else:
+            values = self._nearest_ranks(matching, duration, summary.completed, task)
+        percentiles = {
+            percentile: None if value is None else float(value)
+            for percentile, value in zip(COMPLETION_TIME_PERCENTILES, values)
+        }
+
+        # the daily counts of the window only, grouped by the database
+        start, end = daily_window(now, to_date, days)
+        counts = {"created": {}, "completed": {}}
+        histograms = union_all(*(
+            matching.with_only_columns(literal_column(f"'{kind}'").label("kind"), _utc_day(time, dialect_name),
+                                       func.count())
+            .where(time >= start, time < end)
+            .group_by(_utc_day(time, dialect_name))
+            for kind, time in (("created", task.created_at), ("completed", task.completed_at))
+        ))
+        for kind, day, count in self.session.execute(histograms):
+            counts[kind][date.fromisoformat(str(day))] = count
+
+        return TaskStats(
+            total=sum(summary._mapping[task_status.name] for task_status in TaskStatus),
+            by_status={task_status: summary._mapping[task_status.name] for task_status in TaskStatus},
+            overdue=summary.overdue,
+            due_soon=summary.due_soon,
+            due_within_days=due_within_days,
+            daily=daily_counts(start, days, counts["created"], counts["completed"]),
+            completion_time_percentiles=percentiles,
+        )
+
+    def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        since = since or INITIAL_CHANGE_TOKEN
+        if since.version > self.get_data_version():
+            raise ChangeTokenExpiredError("The token is newer than the tasks, it is not from this database")
+
+        task, tombstone = models.Task, models.TaskTombstone
+        since_row = tuple_(literal(since.version, BigInteger), literal(since.task_id, Integer))
+        # each side reads its (change_version, id) index from the token and stops after limit + 1 rows. A single
+        # statement: the tasks and the tombstones are read in the same snapshot, no commit falls between them
+        changed = (
+            select(task.change_version, task.id, false().label("deleted"),
+                   *(getattr(task, field) for field in CHANGE_FIELDS))
+            .where(tuple_(task.change_version, task.id) > since_row)
+            .order_by(task.change_version, task.id)
+            .limit(limit + 1)
+            .subquery()
+        )
+        deleted = (
+            select(tombstone.change_version, tombstone.task_id.label("id"), true().label("deleted"),
+                   *(cast(null(), getattr(task, field).type).label(field) for field in CHANGE_FIELDS))
+            .where(tuple_(tombstone.change_version, tombstone.task_id) > since_row)
+            .order_by(tombstone.change_version, tombstone.task_id)
+            .limit(limit + 1)
+            .subquery()
+        )
+        statement = (
+            union_all(select(changed), select(deleted))
+            .order_by(literal_column("change_version"), literal_column("id"))
+            .limit(limit + 1)
+        )
+        rows = self.session.execute(statement).all()
+
+        page = rows[:limit]
+        return TaskChanges(
+            changed=[
+                TaskEntity(row.id, row.title, row.description, row.created_at, row.status, row.due_date,
+                           row.completed_at, row.updated_at)
+                for row in page if not row.deleted
+            ],
+            deleted=[row.id for row in page if row.deleted],
+            token=TaskChangeToken(page[-1].change_version, page[-1].id) if page else since,
+            has_more=len(rows) > limit,
+        )
+
+    def get_data_version(self) -> int:
+        # bumped by the triggers of the tasks table (see models.py)
+        statement = select(models.DataVersion.version).where(models.DataVersion.name == models.TASKS_DATA_VERSION)
+
+        return self.session.scalars(statement).one()
+
+    @staticmethod
+    def _select_tasks(from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                      status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                      task: TaskSource = models.Task) -> Select:
+        """
+        Build the select of the tasks matching the filters
+        :param from_date: the start date created for filtering
+        :param to_date: the end date created for filtering
+        :param status: the status to filter tasks
+        :param title_contains: string that should be contained in the task title
+        :param task: the tasks to read, see _tasks_source
+        :return: the select statement
+        """
+        statement = select(task)
 
         # Add the filters
         if from_date:
-            query = query.filter(models.Task.created_at >= from_date)
+            statement = statement.where(task.created_at >= from_date)
         if to_date:
-            query = query.filter(models.Task.created_at <= to_date)
+            statement = statement.where(task.created_at <= to_date)
         if status:
-            query = query.filter(models.Task.status == status)
+            statement = statement.where(task.status == status)
         if title_contains:
-            query = query.filter(models.Task.title.ilike(f"%{title_contains}%"))
+            statement = statement.where(_title_contains(title_contains, task))
 
-        db_tasks = query.all()
+        return statement
 
-        return [self._orm_to_entity(db_task) for db_task in db_tasks]
+    def _full_text_search(self, statement: Select, q: str) -> Select:
+        """
+        Restrict a select of tasks to the ones matching a full-text search, ordered by relevance (title matches
+        weigh more than description ones), then by id. On PostgreSQL a search matching more than
+        FULL_TEXT_RANK_CANDIDATES tasks ranks an arbitrary subset of that size.
+        :param statement: the select of tasks
+        :param q: the search text, words (stemmed) that must all appear, PostgreSQL also supports "phrases",
+        or and -word
+        :return: the select statement
+        """
+        if self.session.get_bind().dialect.name == "sqlite":
+            # FTS5 fallback for local runs and tests: every word must appear, bm25 is lower for better matches
+            fts_table = table(SQLITE_FTS_TABLE, column("rowid"))
+            return (
+                statement.join(fts_table, fts_table.c.rowid == models.Task.id)
+                .where(_fts5_match(q))
+                .order_by(func.bm25(literal_column(SQLITE_FTS_TABLE), 1.0, 0.4), models.Task.id)
+            )
+
+        search_vector = literal_column(f"tasks.{SEARCH_VECTOR_COLUMN}")
+        ts_query = _ts_query(q)
+
+        # ranking reads the tsvector of every match: a word found in most of the tasks would rank the whole table,
+        # only the first FULL_TEXT_RANK_CANDIDATES matches are ranked so the latency stays bounded
+        candidates = (
+            statement.add_columns(search_vector.label(SEARCH_VECTOR_COLUMN))
+            .where(search_vector.op("@@")(ts_query))
+            .limit(FULL_TEXT_RANK_CANDIDATES)
+            .subquery()
+        )
+        candidate_task = aliased(models.Task, candidates)
+
+        return (
+            select(candidate_task)
+            .order_by(func.ts_rank_cd(candidates.c[SEARCH_VECTOR_COLUMN], ts_query).desc(), candidate_task.id)
+        )
+
+    @classmethod
+    def _select_task_records(cls, from_date: Optional[datetime], to_date: Optional[datetime],
+                             status: Optional[TaskStatus], title_contains: Optional[str], q: Optional[str],
+                             search_mode: SearchMode, dialect_name: str, batch_size: int,
+                             include_archived: bool = False) -> Select:
+        """
+        Build the select of the columns of TaskRecord for the tasks matching the filters, ordered by id and
+        fetched batch_size rows at a time. Plain rows skip the ORM identity map and the entity conversion.
+        A full-text search only filters the tasks, they are not ranked.
+        :param dialect_name: the database dialect, the full-text filter depends on it
+        :return: the select statement
+        """
+        task = _tasks_source(include_archived, from_date, to_date, status, _search_text(q), search_mode)
+        columns = [getattr(task, field) for field in TaskRecord._fields]
+
+        return (
+            cls._select_matching(from_date, to_date, status, title_contains, q, search_mode, dialect_name, task)
+            .with_only_columns(*columns)
+            .order_by(task.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+    @classmethod
+    def _select_matching(cls, from_date: Optional[datetime], to_date: Optional[datetime],
+                         status: Optional[TaskStatus], title_contains: Optional[str], q: Optional[str],
+                         search_mode: SearchMode, dialect_name: str, task: TaskSource = models.Task) -> Select:
+        """
+        Build the select of the tasks matching the filters and the search text, unordered (a full-text search only
+        filters the tasks)
+        :param dialect_name: the database dialect, the full-text filter depends on it
+        :param task: the tasks to read, the tasks table for a full-text search (see _tasks_source)
+        :return: the select statement
+        """
+        statement = cls._select_tasks(from_date, to_date, status, title_contains, task)
+        q = _search_text(q)
+
+        if q and search_mode == SearchMode.FULLTEXT:
+            statement = statement.where(cls._full_text_match(q, dialect_name))
+        elif q:
+            statement = statement.where(_title_contains(q, task))
+
+        return statement
 
     @staticmethod
-    def _orm_to_entity(db_task: models.Task) -> TaskEntity:
+    def _full_text_match(q: str, dialect_name: str) -> ColumnElement[bool]:
         """
-        Converts a Task ORM model to a Task entity.
+        Build the filter selecting the tasks matching a full-text search, without ranking them
+        :param q: the search text, see _full_text_search
+        :param dialect_name: the database dialect
+        :return: the filter
+        """
+        if dialect_name == "sqlite":
+            fts_table = table(SQLITE_FTS_TABLE, column("rowid"))
+            return models.Task.id.in_(select(fts_table.c.rowid).where(_fts5_match(q)))
+
+        return literal_column(f"tasks.{SEARCH_VECTOR_COLUMN}").op("@@")(_ts_query(q))
+
+    def _nearest_ranks(self, matching: Select, duration: ColumnElement, completed: int,
+                       task: TaskSource = models.Task) -> list[Optional[float]]:
+        """
+        Read the COMPLETION_TIME_PERCENTILES of the completion times, for the databases without percentile_disc:
+        the durations are numbered in order and only the ones at the percentile_rank positions are returned
+        :param matching: the select of the matching tasks
+        :param duration: the completion time expression
+        :param completed: the number of matching tasks with a completion time
+        :param task: the tasks read by matching
+        :return: the values of the percentiles, None without any completed task
+        """
+        if not completed:
+            return [None] * len(COMPLETION_TIME_PERCENTILES)
+
+        ranks = [percentile_rank(percentile, completed) for percentile in COMPLETION_TIME_PERCENTILES]
+        durations = (
+            matching.with_only_columns(duration.label("seconds"),
+                                       func.row_number().over(order_by=duration).label("position"))
+            .where(task.completed_at.is_not(None))
+            .subquery()
+        )
+        statement = select(durations.c.position, durations.c.seconds).where(durations.c.position.in_(set(ranks)))
+        # julianday is a double of days, its precision is below the millisecond
+        values = {position: round(seconds, 3) for position, seconds in self.session.execute(statement)}
+
+        return [values.get(rank) for rank in ranks]
+
+    @staticmethod
+    def _sort_clauses(sort: TaskSortField, order: SortOrder, task: TaskSource = models.Task) -> list:
+        """
+        Build the ORDER BY clauses for a sort, (sort key, id) so the order is total.
+        Tasks without a due date come last in ascending order and first in descending order (PostgreSQL default).
+        :param sort: the field to sort by
+        :param order: the sort order
+        :param task: the tasks read, see _tasks_source
+        :return: the ORDER BY clauses
+        """
+        sort_column = getattr(task, sort.value)
+        id_column = task.id
+
+        if order == SortOrder.ASC:
+            sort_clause, id_clause = sort_column.asc(), id_column.asc()
+            if sort == TaskSortField.DUE_DATE:
+                sort_clause = sort_clause.nulls_last()
+        else:
+            sort_clause, id_clause = sort_column.desc(), id_column.desc()
+            if sort == TaskSortField.DUE_DATE:
+                sort_clause = sort_clause.nulls_first()
+
+        if sort == TaskSortField.ID:
+            return [id_clause]
+
+        return [sort_clause, id_clause]
+
+    @staticmethod
+    def _after_cursor(cursor: TaskCursor, task: TaskSource = models.Task) -> ColumnElement[bool]:
+        """
+        Build the filter selecting the tasks after a cursor, in the order of _sort_clauses
+        :param cursor: the cursor
+        :param task: the tasks read, see _tasks_source
+        :return: the filter
+        """
+        ascending = cursor.order == SortOrder.ASC
+        id_column = task.id
+        id_after = id_column > cursor.task_id if ascending else id_column < cursor.task_id
+
+        if cursor.sort_field == TaskSortField.ID:
+            return id_after
+
+        sort_column = getattr(task, cursor.sort_field.value)
+
+        if cursor.sort_field == TaskSortField.CREATED_AT:
+            # row value comparison, matches the (created_at, id) index
+            row, cursor_row = tuple_(sort_column, id_column), tuple_(literal(cursor.value, sort_column.type), literal(cursor.task_id))
+            return row > cursor_row if ascending else row < cursor_row
+
+        # due_date is nullable: the null due dates come after the other ones in ascending order, before in descending
+        if cursor.value is None:
+            if ascending:
+                return and_(sort_column.is_(None), id_after)
+            return or_(and_(sort_column.is_(None), id_after), sort_column.is_not(None))
+
+        value_after = sort_column > cursor.value if ascending else sort_column < cursor.value
+        after = or_(value_after, and_(sort_column == cursor.value, id_after))
+
+        return or_(after, sort_column.is_(None)) if ascending else after
+
+    @staticmethod
+    def _orm_to_entity(db_task: models.Task | models.TaskArchive) -> TaskEntity:
+        """
+        Converts a Task (or TaskArchive) ORM model to a Task entity.
         :param db_task: the task ORM model
         :return: the task entity
         """
@@ -97,5 +643,105 @@ class TaskRepositoryDatabase(ITaskRepository):
             status=TaskStatus(db_task.status.value),
             due_date=db_task.due_date,
             completed_at=db_task.completed_at,
-            created_at=db_task.created_at
+            created_at=db_task.created_at,
+            updated_at=db_task.updated_at
         )
+
+
+def _search_text(q: Optional[str]) -> Optional[str]:
+    """
+    The search text to apply, a text without any word (empty or blank) is no search
+    :param q: the search text
+    :return: the search text, None if there is nothing to search
+    """
+    return q if q and q.split() else None
+
+
+def _tasks_source(include_archived: bool, from_date: Optional[datetime], to_date: Optional[datetime],
+                  status: Optional[TaskStatus], q: Optional[str], search_mode: SearchMode) -> TaskSource:
+    """
+    The tasks a read selects from: the tasks table, or when the archive must be read too (see reads_archive) the
+    UNION ALL of the tasks and the archived tasks, mapped as tasks. The databases apply the filters, the sort and
+    the limit of the read to both sides (PostgreSQL merges two index scans), an archive without matching tasks
+    costs an index lookup.
+    :param include_archived: the archived tasks are asked for
+    :param q: the search text (after _search_text)
+    :return: models.Task, or the alias of the union
+    """
+    if not reads_archive(include_archived, from_date, to_date, status, bool(q) and search_mode == SearchMode.FULLTEXT):
+        return models.Task
+
+    archive = models.TaskArchive
+    tasks = union_all(
+        select(*(getattr(models.Task, column) for column in models.ARCHIVED_COLUMNS), models.Task.change_version),
+        select(*(getattr(archive, column) for column in models.ARCHIVED_COLUMNS),
+               cast(null(), BigInteger).label("change_version")),
+    ).subquery("all_tasks")
+
+    return aliased(models.Task, tasks)
+
+
+def _completion_seconds(dialect_name: str, task: TaskSource = models.Task) -> ColumnElement:
+    """
+    Build the time from the creation to the completion of a task, in seconds (NULL if not completed)
+    :param dialect_name: the database dialect
+    :param task: the tasks read, see _tasks_source
+    :return: the expression
+    """
+    if dialect_name == "sqlite":
+        return (func.julianday(task.completed_at) - func.julianday(task.created_at)) * 86400
+
+    return func.extract("epoch", task.completed_at - task.created_at)
+
+
+def _utc_day(time: ColumnElement, dialect_name: str) -> ColumnElement:
+    """
+    Build the day (UTC) of a datetime column
+    :param time: the column
+    :param dialect_name: the database dialect
+    :return: the expression, a date on PostgreSQL, a YYYY-MM-DD text on SQLite (stored in UTC)
+    """
+    if dialect_name == "sqlite":
+        return func.date(time)
+
+    # a literal, not a parameter: the GROUP BY expression must be the same as the selected one
+    return cast(func.timezone(literal_column("'UTC'"), time), Date)
+
+
+def _title_contains(text: str, task: TaskSource = models.Task) -> ColumnElement[bool]:
+    """
+    Build the filter selecting the tasks whose title contains a text, case insensitive, wildcards matched literally
+    :param text: the text
+    :param task: the tasks read, see _tasks_source
+    :return: the filter
+    """
+    return task.title.ilike(f"%{_escape_like(text)}%", escape="\\")
+
+
+def _ts_query(q: str) -> ColumnElement:
+    """
+    Build the PostgreSQL tsquery of a full-text search
+    :param q: the search text, websearch syntax
+    :return: the tsquery expression
+    """
+    return func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), q)
+
+
+def _fts5_match(q: str) -> ColumnElement[bool]:
+    """
+    Build the SQLite FTS5 MATCH of a full-text search, every word must appear (quoted, so no FTS5 syntax)
+    :param q: the search text
+    :return: the filter, on the SQLITE_FTS_TABLE table
+    """
+    fts_query = " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+    return literal_column(SQLITE_FTS_TABLE).op("MATCH")(fts_query)
+
+
+def _escape_like(text: str) -> str:
+    """
+    Escape the LIKE wildcards of a text, so it is matched literally (with escape="\\")
+    :param text: the text
+    :return: the escaped text
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import asyncpg
+from sqlalchemy.engine import make_url
+from app.infrastructure.events.task_event_broker import TaskEventBroker
+from app.infrastructure.events.task_event_publisher import decode_event
+
+logger = logging.getLogger("TaskManager.events")
+
+
+async def listen_for_task_events(url: str, channel: str, broker: TaskEventBroker, check_interval: float = 15):
+    """
+    Publish to the broker of the process the task events notified on a PostgreSQL channel by the writes of every
+    worker, until cancelled. The listener has its own connection (outside of the pools), checked every
+    check_interval seconds and opened again when lost. The events notified while it was not listening are lost:
+    the streams are evicted at every connection, their clients reload the tasks.
+    :param url: the URL of the database, with any driver
+    :param channel: the channel of NotifyTaskEventPublisher
+    :param broker: the broker of the process
+    :param check_interval: the seconds between two checks of the connection, and before connecting again
+    """
+    dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def on_notification(connection, pid: int, notified_channel: str, payload: str):
+        broker.publish([decode_event(payload)])
+
+    while True:
+        try:
+            connection = await asyncpg.connect(dsn)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as error:
+            logger.warning("Could not connect to listen for the task events, retrying: %s", error)
+            await asyncio.sleep(check_interval)
+            continue
+
+        try:
+            await connection.add_listener(channel, on_notification)
+            broker.evict_all()
+            logger.info("Listening for the task events on %s", channel)
+            while True:
+                await asyncio.sleep(check_interval)
+                await connection.fetchval("SELECT 1", timeout=check_interval)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+            logger.warning("Lost the connection listening for the task events, reconnecting: %s", error)
+        finally:
+            # no waiting, this runs when the task is cancelled too
+            connection.terminate()
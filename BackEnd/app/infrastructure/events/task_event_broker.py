@@ -0,0 +1,176 @@
+"""
+In-process fan-out of the task events to the event streams of a worker.
+
+Every stream has its own bounded queue. Publishing never waits for a stream: a stream whose queue is full (a client
+reading slower than the tasks change) is evicted, it ends with a reset and the client reloads the tasks and opens a
+new one. So a slow client costs at most its queue, and never slows down the writes or the other streams.
+"""
+import asyncio
+from typing import Iterable, Optional
+from app.domain.entities.task_event import TaskEvent
+
+
+class TaskEventStreamEnded(Exception):
+    """the stream of a subscription ended, reason is "evicted" (too slow, events were lost) or "closed" (shutdown)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TooManySubscriptionsError(Exception):
+    """the broker already has its maximum number of subscriptions"""
+
+
+class TaskEventSubscription:
+    """
+    The queue of the events of a stream, from the broker to a single consumer on the event loop.
+    Use it as a context manager, it is unsubscribed on exit.
+    """
+
+    def __init__(self, broker: "TaskEventBroker", queue_size: int):
+        self._broker = broker
+        # one more slot for the end of the stream
+        self._queue: asyncio.Queue[TaskEvent | None] = asyncio.Queue(queue_size + 1)
+        self._queue_size = queue_size
+        self.end_reason: Optional[str] = None
+
+    def __enter__(self) -> "TaskEventSubscription":
+        return self
+
+    def __exit__(self, *exc_info):
+        self._broker.unsubscribe(self)
+
+    async def get(self, timeout: float) -> list[TaskEvent]:
+        """
+        Wait for the next events
+        :param timeout: the most seconds to wait
+        :return: the queued events, oldest first, empty if none came in time
+        :raise TaskEventStreamEnded: the subscription was evicted or the broker closed (after the last events)
+        """
+        if self._queue.empty() and self.end_reason is None:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            if first is not None:
+                return [first] + self._get_queued()
+
+        events = self._get_queued()
+        if not events and self.end_reason is not None:
+            raise TaskEventStreamEnded(self.end_reason)
+
+        return events
+
+    def put(self, event: TaskEvent) -> bool:
+        """queue an event, False if the queue is full"""
+        if self._queue.qsize() >= self._queue_size:
+            return False
+        self._queue.put_nowait(event)
+
+        return True
+
+    def end(self, reason: str):
+        """end the stream, an evicted subscription loses its queued events"""
+        if self.end_reason is not None:
+            return
+
+        self.end_reason = reason
+        if reason == "evicted":
+            self._get_queued()
+        # wakes up the consumer
+        self._queue.put_nowait(None)
+
+    def _get_queued(self) -> list[TaskEvent]:
+        """the queued events, without the end of the stream"""
+        events = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is not None:
+                events.append(event)
+
+        return events
+
+
+class TaskEventBroker:
+    """
+    Delivers the published task events to every subscription of the process.
+    The subscriptions live on the event loop, publish can be called from any thread (the sync repositories run in
+    the threadpool): the events are handed over to the loop.
+    """
+
+    def __init__(self, queue_size: int = 1000, max_subscriptions: int = 1000):
+        self.queue_size = queue_size
+        self.max_subscriptions = max_subscriptions
+        self._subscriptions: set[TaskEventSubscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    @property
+    def subscriptions(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> TaskEventSubscription:
+        """
+        Subscribe to the events published from now on, from the event loop
+        :return: the subscription
+        :raise TooManySubscriptionsError: there are max_subscriptions already
+        """
+        if len(self._subscriptions) >= self.max_subscriptions:
+            raise TooManySubscriptionsError(f"{self.max_subscriptions} event streams are open already")
+
+        self._loop = asyncio.get_running_loop()
+        subscription = TaskEventSubscription(self, self.queue_size)
+        if self._closed:
+            subscription.end("closed")
+        else:
+            self._subscriptions.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: TaskEventSubscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, events: Iterable[TaskEvent]):
+        """
+        Deliver events to the subscriptions, without waiting for them
+        :param events: the events, in the order of the changes
+        """
+        loop = self._loop
+        # nobody ever subscribed, there is no loop to hand the events to
+        if loop is None or not self._subscriptions:
+            return
+
+        events = list(events)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            self._deliver(events)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, events)
+
+    def evict_all(self):
+        """end every subscription as evicted, when events may have been lost (the listener reconnected)"""
+        for subscription in list(self._subscriptions):
+            self._evict(subscription)
+
+    def close(self):
+        """end every subscription and refuse new ones, on shutdown (the streams would keep the server running)"""
+        self._closed = True
+        for subscription in list(self._subscriptions):
+            subscription.end("closed")
+        self._subscriptions.clear()
+
+    def _deliver(self, events: list[TaskEvent]):
+        for subscription in list(self._subscriptions):
+            for event in events:
+                if not subscription.put(event):
+                    self._evict(subscription)
+                    break
+
+    def _evict(self, subscription: TaskEventSubscription):
+        self._subscriptions.discard(subscription)
+        subscription.end("evicted")
@@ -0,0 +1,106 @@
+"""
+How the repositories send the events of their writes, and their encoding between the workers.
+
+With several workers a write must reach the streams of all of them: NotifyTaskEventPublisher sends the events with
+PostgreSQL NOTIFY in the transaction of the write, so they are delivered when (and only if) it commits, in the
+order of the commits, to the listener of every worker (see postgres_listener.py). BrokerTaskEventPublisher hands
+them to the broker of the process once committed, for a single worker (SQLite, the tasks in memory) and the tests.
+"""
+from datetime import datetime
+from typing import Any, Optional
+import orjson
+from sqlalchemy import Text, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_event import TaskEvent, TaskEventType
+from app.infrastructure.events.task_event_broker import TaskEventBroker
+
+# PostgreSQL rejects the NOTIFY payloads of 8000 bytes or more, the bigger events are sent without their task
+MAX_NOTIFY_PAYLOAD_BYTES = 7999
+
+
+class TaskEventPublisher:
+    """Sends the events of the writes of a repository, this one sends nothing"""
+
+    def notify(self, session: Session, events: list[TaskEvent]):
+        """
+        Called in the transaction of the write, before the commit
+        :param session: the session of the write
+        :param events: the events of the write
+        """
+
+    def publish(self, events: list[TaskEvent]):
+        """
+        Called once the write is committed
+        :param events: the events of the write
+        """
+
+
+class BrokerTaskEventPublisher(TaskEventPublisher):
+    """Publishes the committed events to the broker of the process"""
+
+    def __init__(self, broker: TaskEventBroker):
+        self.broker = broker
+
+    def publish(self, events: list[TaskEvent]):
+        self.broker.publish(events)
+
+
+class NotifyTaskEventPublisher(TaskEventPublisher):
+    """Sends the events with PostgreSQL NOTIFY on a channel, in the transaction of the write"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    def notify(self, session: Session, events: list[TaskEvent]):
+        # one statement for all the events of a bulk write
+        payloads = (
+            func.unnest(literal([encode_event(event) for event in events], ARRAY(Text)))
+            .table_valued("payload")
+            .render_derived("payloads")
+        )
+        session.execute(select(func.pg_notify(self.channel, payloads.c.payload)))
+
+
+def encode_event(event: TaskEvent) -> str:
+    """
+    Encode an event in JSON, without its task if it would be too big for NOTIFY
+    :param event: the event
+    :return: the JSON text
+    """
+    payload = {"type": event.type.value, "id": event.task_id, "task": _task_fields(event.task)}
+    encoded = orjson.dumps(payload)
+    if len(encoded) > MAX_NOTIFY_PAYLOAD_BYTES:
+        encoded = orjson.dumps({**payload, "task": None})
+
+    return encoded.decode()
+
+
+def decode_event(payload: str) -> TaskEvent:
+    """
+    Decode an event encoded by encode_event
+    :param payload: the JSON text
+    :return: the event
+    """
+    fields = orjson.loads(payload)
+    task = fields["task"]
+    if task is not None:
+        task = Task(task["id"], task["title"], task["description"], _parse(task["created_at"]),
+                    TaskStatus(task["status"]), _parse(task["due_date"]), _parse(task["completed_at"]),
+                    _parse(task.get("updated_at")))
+
+    return TaskEvent(TaskEventType(fields["type"]), fields["id"], task)
+
+
+def _task_fields(task: Optional[Task]) -> Optional[dict[str, Any]]:
+    if task is None:
+        return None
+
+    return {"id": task.id, "title": task.title, "description": task.description, "status": task.status.value,
+            "due_date": task.due_date, "completed_at": task.completed_at, "created_at": task.created_at,
+            "updated_at": task.updated_at}
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Optional, List, AsyncIterator
+from app.domain.repositories.async_task_repository import IAsyncTaskRepository
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+
+
+class AsyncInMemoryTaskRepository(IAsyncTaskRepository):
+    """
+    Async interface of an InMemoryTaskRepository, for the asyncio DATABASE_MODE.
+    The calls run directly on the event loop: they don't wait for any I/O and the indexes keep them short.
+    """
+
+    def __init__(self, repository: InMemoryTaskRepository):
+        self.repository = repository
+
+    async def create_task(self, task: Task) -> Task:
+        return self.repository.create_task(task)
+
+    async def get_task(self, task_id: int) -> Optional[Task]:
+        return self.repository.get_task(task_id)
+
+    async def edit_task(self, task: Task) -> Task | None:
+        return self.repository.edit_task(task)
+
+    async def complete_task(self, task_id: int, completed_at: datetime) -> Task | None:
+        return self.repository.complete_task(task_id, completed_at)
+
+    async def delete_task(self, task_id: int) -> bool:
+        return self.repository.delete_task(task_id)
+
+    async def create_tasks(self, tasks: List[Task]) -> List[Task]:
+        return self.repository.create_tasks(tasks)
+
+    async def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[Task]]:
+        return self.repository.complete_tasks(task_ids, completed_at)
+
+    async def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        return self.repository.delete_tasks(task_ids)
+
+    async def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        return self.repository.archive_tasks(completed_before, limit)
+
+    async def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                        sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        include_archived: bool = False) -> List[Task]:
+        return self.repository.get_tasks(from_date, to_date, status, title_contains, limit, cursor, sort, order, q,
+                                         search_mode, include_archived)
+
+    async def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                                  batch_size: int = 1000,
+                                  include_archived: bool = False) -> AsyncIterator[List[TaskRecord]]:
+        for batch in self.repository.stream_task_batches(from_date, to_date, status, title_contains, q, search_mode,
+                                                         batch_size, include_archived):
+            yield batch
+
+    async def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        return self.repository.get_stats(now, from_date, to_date, status, title_contains, q,
+                                         search_mode, due_within_days, days, include_archived)
+
+    async def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        return self.repository.get_changes(since, limit)
+
+    async def get_data_version(self) -> int:
+        return self.repository.get_data_version()
@@ -0,0 +1,22 @@
+import asyncio
+import logging
+from anyio import to_thread
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+
+logger = logging.getLogger("TaskManager.snapshots")
+
+
+async def save_snapshots(repository: InMemoryTaskRepository, interval: float):
+    """
+    Save a snapshot of the in-memory tasks every interval seconds, when they changed, until cancelled.
+    The file is written in the threadpool, a failed snapshot is logged and retried at the next interval.
+    :param repository: the repository to save, with a snapshot_path
+    :param interval: the seconds between two snapshots
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await to_thread.run_sync(repository.snapshot):
+                logger.info("Saved the tasks snapshot to %s", repository.snapshot_path)
+        except OSError:
+            logger.exception("Could not save the tasks snapshot to %s", repository.snapshot_path)
@@ -0,0 +1,612 @@
+import heapq
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Optional, List, Iterator, Iterable, Callable, Any
+import orjson
+from app.domain.repositories.task_repository import ITaskRepository
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_archive import reads_archive
+from app.domain.entities.task_event import TaskEvent, TaskEventType
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken, ChangeTokenExpiredError, INITIAL_CHANGE_TOKEN
+from app.domain.entities.task_stats import (TaskStats, COMPLETION_TIME_PERCENTILES, daily_window, daily_counts,
+                                            percentile_rank)
+from app.infrastructure.events.task_event_publisher import TaskEventPublisher
+
+# version of the snapshot file layout, 2 added updated_at, 3 the archived tasks (the older files are read too)
+SNAPSHOT_FORMAT = 3
+# a status filter matching less than this share of the tasks in the range sorts its bucket instead of walking an index
+BUCKET_SHARE = 0.125
+# weight of a full-text match in the description, a match in the title weighs 1 (the weights of the SQLite FTS5 rank)
+DESCRIPTION_WEIGHT = 0.4
+
+_WORDS = re.compile(r"\w+")
+
+
+class InMemoryTaskRepository(ITaskRepository):
+    """
+    Task repository keeping the tasks in the process, for a single worker without a database (embedded mode)
+    and for the tests. Same contract as TaskRepositoryDatabase, with indexes instead of scans:
+    - the tasks by id, and their ids in order
+    - (created_at, id) sorted, for the date ranges and the created_at sort (bisect)
+    - the ids of each status
+    - the (change version, id) of the last change of every task, deleted ones included, for the changes after a token
+    The archived tasks are kept by id only, the reads that include them scan them.
+
+    The datetimes are stored timezone aware (naive ones are taken as local time, like PostgreSQL does with the
+    session time zone). The full-text search matches whole words, case insensitive, without the stemming and the
+    stop words of the databases.
+
+    The tasks are lost when the process stops, unless a snapshot_path is given: the tasks are restored from it
+    on creation and saved to it by snapshot(). The deletions are not saved, the tokens older than the snapshot are
+    expired once restored.
+
+    The writes publish their events to the events publisher, if any, in the order of the changes.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, events: Optional[TaskEventPublisher] = None):
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.events = events
+        self._tasks: dict[int, Task] = {}
+        self._ids: list[int] = []
+        self._created_at: list[tuple[datetime, int]] = []
+        self._by_status: dict[TaskStatus, set[int]] = {status: set() for status in TaskStatus}
+        self._archive: dict[int, Task] = {}
+        # the change version of a change is the data version after the write
+        self._changes: list[tuple[int, int]] = []
+        self._change_versions: dict[int, int] = {}
+        # the changes of lower versions are unknown
+        self._changes_since = 0
+        self._next_id = 1
+        self._data_version = 0
+        self._snapshot_version: Optional[int] = None
+        # the sync requests run in the threadpool
+        self._lock = threading.RLock()
+
+        if self.snapshot_path is not None and self.snapshot_path.exists():
+            self.restore()
+
+    def create_task(self, task: Task) -> Task:
+        with self._lock:
+            created = _copy(self._insert(task))
+            self._data_version += 1
+            self._track(created.id)
+            self._publish([TaskEvent(TaskEventType.CREATED, created.id, created)])
+
+            return created
+
+    def get_task(self, task_id: int) -> Optional[Task]:
+        with self._lock:
+            task = self._tasks.get(task_id, self._archive.get(task_id))
+
+            return None if task is None else _copy(task)
+
+    def edit_task(self, task: Task) -> Task | None:
+        with self._lock:
+            stored = self._tasks.get(task.id)
+            if stored is None:
+                return None
+
+            # like the database, the creation time is not editable
+            stored.title = task.title
+            stored.description = task.description
+            stored.due_date = _aware(task.due_date)
+            stored.completed_at = _aware(task.completed_at)
+            stored.updated_at = datetime.now(timezone.utc)
+            self._set_status(stored, task.status)
+            self._data_version += 1
+            self._track(stored.id)
+            edited = _copy(stored)
+            self._publish([TaskEvent(TaskEventType.UPDATED, edited.id, edited)])
+
+            return edited
+
+    def complete_task(self, task_id: int, completed_at: datetime) -> Task | None:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                # the archived tasks are completed
+                archived = self._archive.get(task_id)
+                return None if archived is None else _copy(archived)
+
+            if self._complete(task, completed_at):
+                self._publish([TaskEvent(TaskEventType.UPDATED, task_id, _copy(task))])
+
+            return _copy(task)
+
+    def delete_task(self, task_id: int) -> bool:
+        with self._lock:
+            deleted = self._delete(task_id) or self._delete_archived(task_id)
+            if deleted:
+                self._publish([TaskEvent(TaskEventType.DELETED, task_id)])
+
+            return deleted
+
+    def create_tasks(self, tasks: List[Task]) -> List[Task]:
+        with self._lock:
+            created = [_copy(self._insert(task)) for task in tasks]
+            if created:
+                self._data_version += 1
+            for task in created:
+                self._track(task.id)
+            self._publish([TaskEvent(TaskEventType.CREATED, task.id, task) for task in created])
+
+            return created
+
+    def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[Task]]:
+        with self._lock:
+            completed = []
+            events = []
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is not None and self._complete(task, completed_at):
+                    events.append(TaskEvent(TaskEventType.UPDATED, task_id, _copy(task)))
+                if task is None:
+                    task = self._archive.get(task_id)
+                completed.append(None if task is None else _copy(task))
+            self._publish(events)
+
+            return completed
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        with self._lock:
+            # like the database, a repeated id is reported deleted every time
+            deleted = {task_id for task_id in set(task_ids) if self._delete(task_id) or self._delete_archived(task_id)}
+            self._publish([TaskEvent(TaskEventType.DELETED, task_id) for task_id in dict.fromkeys(task_ids)
+                           if task_id in deleted])
+
+            return [task_id in deleted for task_id in task_ids]
+
+    def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        completed_before = _aware(completed_before)
+
+        with self._lock:
+            # the completion times are not indexed, a heap of limit tasks picks the oldest ones
+            tasks = (self._tasks[task_id] for task_id in self._by_status[TaskStatus.COMPLETED])
+            tasks = (task for task in tasks if task.completed_at is not None and task.completed_at < completed_before)
+            archived = heapq.nsmallest(limit, tasks, key=lambda task: (task.completed_at, task.id))
+            for task in archived:
+                # a deletion for the changes
+                self._delete(task.id)
+                self._archive[task.id] = task
+            self._publish([TaskEvent(TaskEventType.ARCHIVED, task.id, _copy(task)) for task in archived])
+
+            return len(archived)
+
+    def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                  sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  include_archived: bool = False) -> List[Task]:
+        q = _search_text(q)
+
+        with self._lock:
+            if q and search_mode == SearchMode.FULLTEXT:
+                if cursor:
+                    raise ValueError("The full-text search is ordered by relevance, it can't continue from a cursor")
+
+                tasks = self._matching(from_date, to_date, status, title_contains, None)
+                words = _words(q)
+                ranked = [(rank, task) for task in tasks if (rank := _rank(task, words)) > 0]
+                ranked.sort(key=lambda item: (-item[0], item[1].id))
+                return [_copy(task) for _, task in islice(ranked, limit)]
+
+            if reads_archive(include_archived, from_date, to_date, status, False):
+                tasks = self._matching(from_date, to_date, status, title_contains, q)
+                tasks += self._archived(from_date, to_date, title_contains, q)
+                return [_copy(task) for task in islice(_sorted(tasks, sort, order, cursor), limit)]
+
+            tasks = (self._tasks[task_id] for task_id in self._ordered_ids(from_date, to_date, status, sort, order,
+                                                                           cursor))
+            texts = [text.lower() for text in (title_contains, q) if text]
+            if texts:
+                tasks = (task for task in tasks if all(text in task.title.lower() for text in texts))
+
+            return [_copy(task) for task in islice(tasks, limit)]
+
+    def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            batch_size: int = 1000, include_archived: bool = False) -> Iterator[List[TaskRecord]]:
+        q = _search_text(q)
+
+        # the records are copied at once: the batches show the tasks as they were when the export started
+        with self._lock:
+            if q and search_mode == SearchMode.FULLTEXT:
+                tasks = self._matching(from_date, to_date, status, title_contains, None)
+                words = _words(q)
+                tasks = [task for task in tasks if _rank(task, words) > 0]
+            else:
+                tasks = self._matching(from_date, to_date, status, title_contains, q)
+                if reads_archive(include_archived, from_date, to_date, status, False):
+                    tasks += self._archived(from_date, to_date, title_contains, q)
+            records = [_record(task) for task in sorted(tasks, key=lambda task: task.id)]
+
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
+
+    def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        q = _search_text(q)
+        now = _aware(now)
+        due_soon_end = now + timedelta(days=due_within_days)
+        start, end = daily_window(now, to_date, days)
+        by_status = {task_status: 0 for task_status in TaskStatus}
+        overdue = due_soon = 0
+        created, completed = Counter(), Counter()
+        durations = []
+
+        with self._lock:
+            if q and search_mode == SearchMode.FULLTEXT:
+                tasks = self._matching(from_date, to_date, status, title_contains, None)
+                words = _words(q)
+                tasks = [task for task in tasks if _rank(task, words) > 0]
+            else:
+                tasks = self._matching(from_date, to_date, status, title_contains, q)
+                if reads_archive(include_archived, from_date, to_date, status, False):
+                    tasks += self._archived(from_date, to_date, title_contains, q)
+
+            for task in tasks:
+                by_status[task.status] += 1
+                if task.status == TaskStatus.PENDING and task.due_date is not None:
+                    overdue += task.due_date < now
+                    due_soon += now <= task.due_date < due_soon_end
+                if start <= task.created_at < end:
+                    created[task.created_at.astimezone(timezone.utc).date()] += 1
+                if task.completed_at is not None:
+                    durations.append((task.completed_at - task.created_at).total_seconds())
+                    if start <= task.completed_at < end:
+                        completed[task.completed_at.astimezone(timezone.utc).date()] += 1
+
+        durations.sort()
+        percentiles = {
+            percentile: durations[percentile_rank(percentile, len(durations)) - 1] if durations else None
+            for percentile in COMPLETION_TIME_PERCENTILES
+        }
+
+        return TaskStats(
+            total=len(tasks),
+            by_status=by_status,
+            overdue=overdue,
+            due_soon=due_soon,
+            due_within_days=due_within_days,
+            daily=daily_counts(start, days, created, completed),
+            completion_time_percentiles=percentiles,
+        )
+
+    def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        since = since or INITIAL_CHANGE_TOKEN
+
+        with self._lock:
+            if since.version > self._data_version or 0 < since.version < self._changes_since:
+                raise ChangeTokenExpiredError("The changes since the token are not known, sync from scratch")
+
+            start = bisect_right(self._changes, (since.version, since.task_id))
+            page = self._changes[start:start + limit]
+
+            # the deleted tasks keep their last change
+            return TaskChanges(
+                changed=[_copy(self._tasks[task_id]) for _, task_id in page if task_id in self._tasks],
+                deleted=[task_id for _, task_id in page if task_id not in self._tasks],
+                token=TaskChangeToken(*page[-1]) if page else since,
+                has_more=start + limit < len(self._changes),
+            )
+
+    def get_data_version(self) -> int:
+        with self._lock:
+            return self._data_version
+
+    def snapshot(self) -> bool:
+        """
+        Save the tasks to the snapshot file if they changed since the last snapshot (or restore).
+        The file is replaced atomically: a crash while saving keeps the previous snapshot.
+        :return: True if the file was written
+        """
+        if self.snapshot_path is None:
+            raise ValueError("No snapshot path")
+
+        with self._lock:
+            if self._data_version == self._snapshot_version:
+                return False
+
+            version = self._data_version
+            content = {
+                "format": SNAPSHOT_FORMAT,
+                "data_version": version,
+                "next_id": self._next_id,
+                "tasks": [_snapshot_row(self._tasks[task_id]) for task_id in self._ids],
+                "archive": [_snapshot_row(task) for task in self._archive.values()],
+            }
+
+        # serialized and written outside of the lock, the records are copies
+        temporary_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        temporary_path.write_bytes(orjson.dumps(content))
+        os.replace(temporary_path, self.snapshot_path)
+        self._snapshot_version = version
+
+        return True
+
+    def restore(self):
+        """Replace the tasks with the ones of the snapshot file"""
+        content = orjson.loads(self.snapshot_path.read_bytes())
+        if content["format"] not in (1, 2, SNAPSHOT_FORMAT):
+            raise ValueError(f"Unknown snapshot format {content['format']}")
+
+        with self._lock:
+            self._tasks.clear()
+            self._ids.clear()
+            self._created_at.clear()
+            for ids in self._by_status.values():
+                ids.clear()
+            self._changes.clear()
+            self._change_versions.clear()
+            self._archive = {task.id: task for task in map(_parse_row, content.get("archive", []))}
+
+            version = content["data_version"]
+            for task in map(_parse_row, content["tasks"]):
+                self._add(task)
+                self._created_at.append((task.created_at, task.id))
+                # the tasks are listed in order of id
+                self._changes.append((version, task.id))
+                self._change_versions[task.id] = version
+            self._created_at.sort()
+            self._next_id = content["next_id"]
+            self._data_version = self._snapshot_version = version
+            # every task is a change at the version of the snapshot: the clients synced up to it get the tasks
+            # again, the older tokens may have missed deletions
+            self._changes_since = version
+
+    def _publish(self, events: list[TaskEvent]):
+        """publish the events of a write, under the lock so they come in the order of the changes"""
+        if self.events is not None and events:
+            self.events.publish(events)
+
+    def _insert(self, task: Task) -> Task:
+        stored = Task(self._next_id, task.title, task.description, _aware(task.created_at), task.status,
+                      _aware(task.due_date), _aware(task.completed_at), datetime.now(timezone.utc))
+        self._next_id += 1
+        self._add(stored)
+        insort(self._created_at, (stored.created_at, stored.id))
+
+        return stored
+
+    def _add(self, task: Task):
+        """index a task, except in _created_at (insort or sort it)"""
+        self._tasks[task.id] = task
+        self._ids.append(task.id)
+        self._by_status[task.status].add(task.id)
+
+    def _delete(self, task_id: int) -> bool:
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return False
+
+        del self._ids[bisect_left(self._ids, task_id)]
+        del self._created_at[bisect_left(self._created_at, (task.created_at, task_id))]
+        self._by_status[task.status].discard(task_id)
+        self._data_version += 1
+        self._track(task_id)
+
+        return True
+
+    def _delete_archived(self, task_id: int) -> bool:
+        if self._archive.pop(task_id, None) is None:
+            return False
+
+        # not in the changes anymore, already reported deleted
+        self._data_version += 1
+
+        return True
+
+    def _complete(self, task: Task, completed_at: datetime) -> bool:
+        """complete a pending task, False if it was completed already"""
+        if task.status != TaskStatus.PENDING:
+            return False
+
+        task.completed_at = _aware(completed_at)
+        task.updated_at = datetime.now(timezone.utc)
+        self._set_status(task, TaskStatus.COMPLETED)
+        self._data_version += 1
+        self._track(task.id)
+
+        return True
+
+    def _track(self, task_id: int):
+        """record a change of a task at the current data version, in place of its previous one"""
+        previous = self._change_versions.get(task_id)
+        if previous is not None:
+            del self._changes[bisect_left(self._changes, (previous, task_id))]
+        self._change_versions[task_id] = self._data_version
+        insort(self._changes, (self._data_version, task_id))
+
+    def _set_status(self, task: Task, status: TaskStatus):
+        self._by_status[task.status].discard(task.id)
+        self._by_status[status].add(task.id)
+        task.status = status
+
+    def _created_at_range(self, from_date: Optional[datetime], to_date: Optional[datetime]) -> tuple[int, int]:
+        """the slice of _created_at between the dates (inclusive)"""
+        low = bisect_left(self._created_at, (_aware(from_date),)) if from_date else 0
+        high = bisect_right(self._created_at, (_aware(to_date), float("inf"))) if to_date else len(self._created_at)
+
+        return low, high
+
+    def _matching(self, from_date: Optional[datetime], to_date: Optional[datetime], status: Optional[TaskStatus],
+                  title_contains: Optional[str], q: Optional[str]) -> list[Task]:
+        """the tasks matching the filters, in no particular order"""
+        low, high = self._created_at_range(from_date, to_date)
+        if status is not None and len(self._by_status[status]) < (high - low):
+            tasks = (self._tasks[task_id] for task_id in self._by_status[status])
+            tasks = (task for task in tasks if _in_range(task, from_date, to_date))
+        else:
+            tasks = (self._tasks[task_id] for _, task_id in islice(self._created_at, low, high))
+            if status is not None:
+                tasks = (task for task in tasks if task.status == status)
+
+        texts = [text.lower() for text in (title_contains, q) if text]
+
+        return [task for task in tasks if all(text in task.title.lower() for text in texts)]
+
+    def _archived(self, from_date: Optional[datetime], to_date: Optional[datetime], title_contains: Optional[str],
+                  q: Optional[str]) -> list[Task]:
+        """the archived tasks matching the filters (all completed), in no particular order"""
+        texts = [text.lower() for text in (title_contains, q) if text]
+
+        return [task for task in self._archive.values()
+                if _in_range(task, from_date, to_date) and all(text in task.title.lower() for text in texts)]
+
+    def _ordered_ids(self, from_date: Optional[datetime], to_date: Optional[datetime], status: Optional[TaskStatus],
+                     sort: TaskSortField, order: SortOrder, cursor: Optional[TaskCursor]) -> Iterable[int]:
+        """
+        The ids of the tasks in the date range and status, in the order of the sort, after the cursor.
+        The created_at and id sorts walk their index and stop as soon as the page is full, unless the filters
+        select few tasks: then these are sorted. The due_date sort always sorts the tasks in the range.
+        """
+        descending = order == SortOrder.DESC
+        low, high = self._created_at_range(from_date, to_date)
+        bucket = self._by_status[status] if status is not None else None
+        few = bucket is not None and len(bucket) < (high - low) * BUCKET_SHARE
+        narrow_range = high - low < len(self._ids) * BUCKET_SHARE
+
+        if sort == TaskSortField.CREATED_AT and not few:
+            if cursor:
+                key = (_aware(cursor.value), cursor.task_id)
+                if descending:
+                    high = bisect_left(self._created_at, key, low, high)
+                else:
+                    low = max(low, bisect_right(self._created_at, key, low, high))
+            positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+            task_ids = (self._created_at[position][1] for position in positions)
+            return task_ids if bucket is None else (task_id for task_id in task_ids if task_id in bucket)
+
+        if sort == TaskSortField.ID and not few and not narrow_range:
+            start, stop = 0, len(self._ids)
+            if cursor:
+                if descending:
+                    stop = bisect_left(self._ids, cursor.task_id)
+                else:
+                    start = bisect_right(self._ids, cursor.task_id)
+            positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+            tasks = (self._tasks[self._ids[position]] for position in positions)
+            return (task.id for task in tasks
+                    if (bucket is None or task.id in bucket) and _in_range(task, from_date, to_date))
+
+        if bucket is not None and few:
+            tasks = [self._tasks[task_id] for task_id in bucket]
+            tasks = [task for task in tasks if _in_range(task, from_date, to_date)]
+        else:
+            tasks = [self._tasks[task_id] for _, task_id in islice(self._created_at, low, high)]
+            if bucket is not None:
+                tasks = [task for task in tasks if task.id in bucket]
+
+        return [task.id for task in _sorted(tasks, sort, order, cursor)]
+
+
+def _sorted(tasks: list[Task], sort: TaskSortField, order: SortOrder, cursor: Optional[TaskCursor]) -> list[Task]:
+    """the tasks after the cursor, in the order of the sort"""
+    descending = order == SortOrder.DESC
+    sort_key = _sort_key(sort)
+    if cursor:
+        cursor_key = _cursor_key(cursor)
+        tasks = [task for task in tasks if (sort_key(task) < cursor_key if descending
+                                            else sort_key(task) > cursor_key)]
+
+    return sorted(tasks, key=sort_key, reverse=descending)
+
+
+def _sort_key(sort: TaskSortField) -> Callable[[Task], Any]:
+    """
+    The key of the ascending order of a sort, ties broken by id. Without a due date a task comes after the others
+    in ascending order, so before them in descending order (like PostgreSQL).
+    """
+    if sort == TaskSortField.ID:
+        return lambda task: (task.id,)
+    if sort == TaskSortField.CREATED_AT:
+        return lambda task: (task.created_at, task.id)
+
+    return lambda task: (0, task.due_date, task.id) if task.due_date is not None else (1, task.id)
+
+
+def _cursor_key(cursor: TaskCursor) -> tuple:
+    """the key of _sort_key of the task the cursor points after"""
+    if cursor.sort_field == TaskSortField.ID:
+        return (cursor.task_id,)
+    if cursor.sort_field == TaskSortField.CREATED_AT:
+        return _aware(cursor.value), cursor.task_id
+
+    return (0, _aware(cursor.value), cursor.task_id) if cursor.value is not None else (1, cursor.task_id)
+
+
+def _in_range(task: Task, from_date: Optional[datetime], to_date: Optional[datetime]) -> bool:
+    return (from_date is None or task.created_at >= _aware(from_date)) and \
+        (to_date is None or task.created_at <= _aware(to_date))
+
+
+def _rank(task: Task, words: list[str]) -> float:
+    """the relevance of a task for a full-text search, 0 unless every word is in the title or the description"""
+    title_words = set(_words(task.title))
+    description_words = set(_words(task.description or ""))
+    rank = 0.0
+    for word in words:
+        if word not in title_words and word not in description_words:
+            return 0.0
+        rank += (word in title_words) + DESCRIPTION_WEIGHT * (word in description_words)
+
+    return rank
+
+
+def _words(text: str) -> list[str]:
+    return _WORDS.findall(text.lower())
+
+
+def _search_text(q: Optional[str]) -> Optional[str]:
+    """the search text to apply, a text without any word (empty or blank) is no search"""
+    return q if q and q.split() else None
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    """a naive datetime is local time"""
+    return value.astimezone() if value is not None and value.tzinfo is None else value
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _copy(task: Task) -> Task:
+    """the stored tasks are never handed out, the callers can change theirs"""
+    return Task(task.id, task.title, task.description, task.created_at, task.status, task.due_date, task.completed_at,
+                task.updated_at)
+
+
+def _parse_row(row: list) -> Task:
+    """the task of a _snapshot_row, the rows of the format 1 have no updated_at"""
+    task_id, title, description, status, due_date, completed_at, created_at, *updated_at = row
+
+    return Task(task_id, title, description, _parse(created_at), TaskStatus(status), _parse(due_date),
+                _parse(completed_at), _parse(updated_at[0]) if updated_at else _parse(created_at))
+
+
+def _snapshot_row(task: Task) -> list:
+    return [task.id, task.title, task.description, task.status.value, _format(task.due_date),
+            _format(task.completed_at), _format(task.created_at), _format(task.updated_at)]
+
+
+def _format(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _record(task: Task) -> TaskRecord:
+    return TaskRecord(task.id, task.title, task.description, task.status, task.due_date, task.completed_at,
+                      task.created_at)
@@ -0,0 +1,52 @@
+"""
+Where the reminders of the tasks about to be due are delivered (see DueReminderScheduler). The sinks here are
+stand-ins for a real delivery (mail, push): one logs them, the other appends them to a file another process can
+follow.
+"""
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+import orjson
+from anyio import to_thread
+from app.domain.entities.task import Task
+
+
+class ReminderSink:
+    """Delivers the reminders of the tasks about to be due, this one delivers nothing"""
+
+    async def send(self, tasks: list[Task]):
+        """
+        Called on the event loop when the tasks are about to be due, once per task and due date
+        :param tasks: the pending tasks, soonest due first
+        """
+
+
+class LogReminderSink(ReminderSink):
+    """Logs the reminders (TaskManager.reminders)"""
+
+    def __init__(self, logger_name: str = "TaskManager.reminders"):
+        self.logger = logging.getLogger(logger_name)
+
+    async def send(self, tasks: list[Task]):
+        for task in tasks:
+            self.logger.info("Task %d %r is due at %s", task.id, task.title, task.due_date.isoformat())
+
+
+class FileReminderSink(ReminderSink):
+    """Appends the reminders to a file, a JSON object per line, written in the threadpool"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    async def send(self, tasks: list[Task]):
+        reminded_at = datetime.now(timezone.utc).isoformat()
+        lines = b"".join(
+            orjson.dumps({"id": task.id, "title": task.title, "due_date": task.due_date.isoformat(),
+                          "reminded_at": reminded_at}) + b"\n"
+            for task in tasks
+        )
+        await to_thread.run_sync(self._append, lines)
+
+    def _append(self, lines: bytes):
+        with self.path.open("ab") as file:
+            file.write(lines)
@@ -1,30 +1,137 @@
+import asyncio
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.api.api import api_router
+from app.api.controllers import metrics
+from app.api.middlewares.database_session_middleware import DatabaseSessionMiddleware
+from app.api.middlewares.metrics_middleware import MetricsMiddleware
+from app.api.middlewares.request_id_middleware import RequestIdMiddleware
 from app.common import config
 from app.common.container import Container
+from app.infrastructure.database.leader_lock import PostgresLeaderLock
+from app.infrastructure.database.partitions import manage_task_partitions
+from app.infrastructure.database.session import dispose_engines
+from app.infrastructure.events.postgres_listener import listen_for_task_events
+from app.infrastructure.memory.snapshots import save_snapshots
+from app.services.due_reminders import DueReminderScheduler
+from app.services.task_archival import archive_completed_tasks
 
 # init the dependency injection
 container = Container()
-container.wire(modules=["app.api.controllers.tasks"])
+container.wire(modules=["app.api.controllers.tasks", "app.api.controllers.cache", "app.api.controllers.admin"])
+# the handler of the TaskManager loggers, before anything logs
+container.logger()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Saves the in-memory tasks periodically and on shutdown (when they are kept in memory with a snapshot file),
+    archives the old completed tasks (TASK_ARCHIVE_AFTER_DAYS), maintains the partitions of the tasks
+    (TASK_PARTITION_MONTHS_AHEAD), listens for the task events of all the workers (TASK_EVENTS postgres), sends the
+    reminders of the tasks about to be due (TASK_REMINDERS), ends the event streams and closes the database
+    connections on shutdown
+    """
+    repository = snapshots = None
+    if container.task_store() == "memory" and config.settings.MEMORY_SNAPSHOT_PATH:
+        repository = container.memory_task_repository()
+        snapshots = asyncio.create_task(save_snapshots(repository, config.settings.MEMORY_SNAPSHOT_INTERVAL))
+
+    archival = None
+    if config.settings.TASK_ARCHIVE_AFTER_DAYS is not None:
+        archival = asyncio.create_task(archive_completed_tasks(
+            container.tasks_service, container.db_session_factory, container.async_db_session_factory,
+            config.settings.TASK_ARCHIVE_AFTER_DAYS, config.settings.TASK_ARCHIVE_BATCH_SIZE,
+            config.settings.TASK_ARCHIVE_INTERVAL
+        ))
+
+    partitions = None
+    if config.settings.TASK_PARTITION_MONTHS_AHEAD is not None:
+        partitions = asyncio.create_task(manage_task_partitions(
+            container.db_session_factory, container.async_db_session_factory, container.database_mode(),
+            config.settings.TASK_PARTITION_MONTHS_AHEAD, config.settings.TASK_PARTITION_RETENTION_MONTHS,
+            config.settings.TASK_PARTITION_INTERVAL
+        ))
+
+    broker = container.task_event_broker()
+    listener = None
+    if container.task_events_transport() == "postgres":
+        listener = asyncio.create_task(listen_for_task_events(
+            config.settings.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI, config.settings.TASK_EVENTS_CHANNEL, broker,
+            config.settings.TASK_EVENTS_KEEPALIVE
+        ))
+
+    reminders = None
+    if container.task_reminders() != "none":
+        # with the events of every worker, the worker holding the lock sends all the reminders
+        lock = None
+        if container.task_events_transport() == "postgres":
+            lock = PostgresLeaderLock(config.settings.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI, "task_reminders")
+        reminders = asyncio.create_task(DueReminderScheduler(
+            container.tasks_service, container.db_session_factory, container.async_db_session_factory, broker,
+            container.reminder_sink(), config.settings.TASK_REMINDER_LEAD, config.settings.TASK_REMINDER_WINDOW,
+            lock, config.settings.TASK_REMINDER_LOCK_INTERVAL
+        ).run())
+
+    try:
+        yield
+    finally:
+        broker.close()
+        if reminders is not None:
+            reminders.cancel()
+        if listener is not None:
+            listener.cancel()
+        if archival is not None:
+            archival.cancel()
+        if partitions is not None:
+            partitions.cancel()
+        if snapshots is not None:
+            snapshots.cancel()
+            await to_thread.run_sync(repository.snapshot)
+        await dispose_engines()
+
+
 app = FastAPI(
     title=config.settings.PROJECT_NAME,
     version=config.settings.VERSION,
     description=config.settings.DESCRIPTION,
+    # the response models are serialized by pydantic, orjson only encodes the result
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Add API routes
 app.include_router(api_router, prefix="/api")
 
+# Prometheus metrics, at the usual path
+app.include_router(metrics.router)
+
+# Opens the database sessions of each request and closes them once the response is sent
+app.add_middleware(
+    DatabaseSessionMiddleware,
+    session_factory=container.db_session_factory,
+    async_session_factory=container.async_db_session_factory
+)
+
 # Sets all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[str(origin) for origin in config.settings.BACKEND_CORS_ORIGINS],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Request-ID"]
 )
 
 # Guards against HTTP Host Header attacks
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=config.settings.ALLOWED_HOSTS)
+
+# Gives every request an id, in the X-Request-ID header of the response and in its log records
+app.add_middleware(RequestIdMiddleware)
+
+# Latency, status and concurrency of the requests, outermost so the time of the other middlewares is included
+app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,200 @@
+from datetime import datetime, timedelta
+from anyio import to_thread
+from app.domain.repositories.async_task_repository import IAsyncTaskRepository
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+from app.services.task_export import EXPORT_BATCH_SIZE, ExportFormat, create_export_writer
+from app.common.metrics import EXPORT_STAGE_DURATION, StageTimer
+from typing import Optional, AsyncIterator
+
+
+class AsyncTasksService:
+    """Async version of TasksService, used when the database runs in asyncio mode"""
+
+    def __init__(self, task_repository: IAsyncTaskRepository):
+        self.task_repository = task_repository
+
+    async def create_task(self, title: str, description: Optional[str], due_date: Optional[datetime]) -> Task:
+        """
+        Create a new task
+        :param title: title of the task
+        :param description: the description of the task
+        :param due_date: the due date of the task
+        :return: The created task
+        """
+        task = Task(title=title, description=description, task_id=None, due_date=due_date, created_at=datetime.now())
+
+        return await self.task_repository.create_task(task)
+
+    async def get_task(self, task_id: int) -> Task | None:
+        """
+        Get a task by its ID
+        :param task_id: ID of the task
+        :return: The task or None if not found
+        """
+        return await self.task_repository.get_task(task_id)
+
+    async def complete_task(self, task_id: int) -> Task | None:
+        """
+        Mark a task as completed
+        :param task_id: ID of the task
+        :return: The updated task or None if task does not exist
+        """
+        return await self.task_repository.complete_task(task_id, datetime.now())
+
+    async def delete_task(self, task_id: int) -> bool:
+        """
+        Delete a task by its ID
+        :param task_id: ID of the task
+        :return: True if the task was deleted, False otherwise
+        """
+        return await self.task_repository.delete_task(task_id)
+
+    async def create_tasks(self, new_tasks: list[tuple[str, Optional[str], Optional[datetime]]]) -> list[Task]:
+        """
+        Create several tasks in one go
+        :param new_tasks: the (title, description, due_date) of each task
+        :return: The created tasks, in the same order
+        """
+        created_at = datetime.now()
+        tasks = [
+            Task(title=title, description=description, task_id=None, due_date=due_date, created_at=created_at)
+            for title, description, due_date in new_tasks
+        ]
+
+        return await self.task_repository.create_tasks(tasks)
+
+    async def complete_tasks(self, task_ids: list[int]) -> list[Task | None]:
+        """
+        Mark several tasks as completed in one go
+        :param task_ids: IDs of the tasks
+        :return: for each ID, the updated task or None if the task does not exist
+        """
+        return await self.task_repository.complete_tasks(task_ids, datetime.now())
+
+    async def delete_tasks(self, task_ids: list[int]) -> list[bool]:
+        """
+        Delete several tasks in one go
+        :param task_ids: IDs of the tasks
+        :return: for each ID, True if the task was deleted, False if it does not exist
+        """
+        return await self.task_repository.delete_tasks(task_ids)
+
+    async def archive_tasks(self, older_than_days: float, batch_size: int) -> int:
+        """
+        Move a batch of the tasks completed more than a number of days ago to the archive
+        :param older_than_days: the tasks completed before this number of days ago are archived
+        :param batch_size: the most tasks to move
+        :return: the number of tasks moved, batch_size when more are left
+        """
+        return await self.task_repository.archive_tasks(datetime.now() - timedelta(days=older_than_days), batch_size)
+
+    async def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                        sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  include_archived: bool = False) -> list[Task]:
+        """
+        Get tasks with optional filters
+        :param from_date: from create date to filter
+        :param to_date: to create date to filter
+        :param status: status to filter
+        :param title_contains: title substring to filter
+        :param limit: page size, None for all the tasks
+        :param cursor: position to continue from, TaskCursor.after the last task of the previous page
+        :param sort: field to sort by
+        :param order: sort order
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or ranked full-text search (the rank replaces the sort)
+        :param include_archived: also read the archived tasks (read anyway for a date range)
+        :return: List of tasks
+        """
+        return await self.task_repository.get_tasks(from_date, to_date, status, title_contains, limit, cursor, sort,
+                                                    order, q, search_mode, include_archived)
+
+    async def get_tasks_xlsx(self) -> bytes:
+        """
+        Export tasks to an xlsx file
+        :return: Bytes of the xlsx file
+        """
+        return b"".join([chunk async for chunk in self.stream_tasks_export(ExportFormat.XLSX)])
+
+    async def stream_tasks_export(self, export_format: ExportFormat = ExportFormat.XLSX,
+                                  from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                                  status: Optional[TaskStatus] = None,
+                                  title_contains: Optional[str] = None,
+                                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                                  include_archived: bool = False) -> AsyncIterator[bytes]:
+        """
+        Export the tasks matching the filters, streamed: the tasks are read and written in batches
+        :param export_format: the file format
+        :param from_date: from create date to filter
+        :param to_date: to create date to filter
+        :param status: status to filter
+        :param title_contains: title substring to filter
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or full-text (only filters, the export stays ordered by id)
+        :param include_archived: also export the archived tasks (exported anyway for a date range)
+        :return: async iterator over the bytes of the file
+        """
+        timer = StageTimer(EXPORT_STAGE_DURATION, format=export_format.value)
+        writer = create_export_writer(export_format)
+        batches = self.task_repository.stream_task_batches(from_date, to_date, status, title_contains, q, search_mode,
+                                                           EXPORT_BATCH_SIZE, include_archived)
+
+        while (records := await anext(batches, None)) is not None:
+            timer.lap("read")
+            # encoding and compressing are CPU bound, keep them off the event loop
+            chunk = await to_thread.run_sync(writer.write_batch, records)
+            timer.lap("write")
+            if chunk:
+                yield chunk
+                timer.lap("send")
+
+        last_chunk = await to_thread.run_sync(writer.close)
+        timer.lap("close")
+        timer.observe()
+
+        yield last_chunk
+
+    async def get_stats(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                        status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                        q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                        due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        """
+        Get the aggregates of the tasks matching the filters: counts per status, overdue and due soon pending tasks,
+        tasks created and completed per day and percentiles of the completion time
+        :param from_date: from create date to filter
+        :param to_date: to create date to filter, the daily counts end on its day (today without it)
+        :param status: status to filter
+        :param title_contains: title substring to filter
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or full-text
+        :param due_within_days: the pending tasks due in this number of days are due soon
+        :param days: the number of days of the daily counts
+        :param include_archived: also count the archived tasks (counted anyway for a date range)
+        :return: the stats
+        """
+        return await self.task_repository.get_stats(datetime.now(), from_date, to_date, status, title_contains, q,
+                                                    search_mode, due_within_days, days, include_archived)
+
+    async def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        """
+        Get the tasks created, updated and deleted since a sync token
+        :param since: the token of the last sync, None for all the tasks
+        :param limit: the most changes to return
+        :return: the changes and the token to continue from
+        :raises ChangeTokenExpiredError: if the changes since the token are unknown
+        """
+        return await self.task_repository.get_changes(since, limit)
+
+    async def get_data_version(self) -> int:
+        """
+        Get the version of the tasks, it changes with every write
+        :return: the version
+        """
+        return await self.task_repository.get_data_version()
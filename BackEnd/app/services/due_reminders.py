@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import inspect
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Optional
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_event import TaskEvent, TaskEventType
+from app.infrastructure.database.leader_lock import PostgresLeaderLock
+from app.infrastructure.database.session import request_session_scope, release_session, database_thread_limiter
+from app.infrastructure.events.task_event_broker import TaskEventBroker, TaskEventStreamEnded
+from app.infrastructure.reminders.reminder_sink import ReminderSink
+from app.services.tasks_service import TasksService
+from app.services.async_tasks_service import AsyncTasksService
+
+logger = logging.getLogger("TaskManager.reminders")
+
+
+class DueReminderScheduler:
+    """
+    Sends a reminder for every pending task lead seconds before it is due. The tasks due within the next window
+    seconds are read from the store (the pending tasks sorted by due date, from the index of the pending tasks by
+    due date, a page at a time) and kept in a min-heap of their due dates: the scheduler sleeps until the next
+    reminder, the next read of the window or the next task event. The task events (creations, edits, completions,
+    deletions) update the heap in between, so the whole table is never polled.
+
+    A single worker runs it when there is a lock (the tasks in PostgreSQL, their events sent to every worker):
+    the others wait for the lock, and take over within check_interval seconds when its worker stops. Without a
+    lock every worker sends the reminders of its own tasks. A reminder is sent once per task and due date, lead
+    seconds early at most: a task due sooner than that is reminded right away. The reminders of the tasks due during
+    a restart can be sent twice, the ones of the tasks due while no worker ran are not sent.
+    """
+
+    def __init__(self, new_service: Callable[[], TasksService | AsyncTasksService],
+                 session_factory: Callable[[], Session], async_session_factory: Callable[[], AsyncSession],
+                 broker: TaskEventBroker, sink: ReminderSink, lead: float, window: float,
+                 lock: Optional[PostgresLeaderLock] = None, check_interval: float = 30, batch_size: int = 500):
+        """
+        :param new_service: creates the tasks service, once per read (its repository uses the session of the read)
+        :param session_factory: creates the sync sessions, like for the requests
+        :param async_session_factory: creates the async sessions
+        :param broker: the task events of the process
+        :param sink: delivers the reminders
+        :param lead: the seconds before the due date a reminder is sent
+        :param window: the seconds of due dates read from the store at a time
+        :param lock: taken to run the scheduler in a single worker, None to run it in every worker
+        :param check_interval: the seconds between two checks of the lock, and before trying again after a failure
+        :param batch_size: the number of tasks read from the store at a time
+        """
+        self._new_service = new_service
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+        self._broker = broker
+        self._sink = sink
+        self._lead = timedelta(seconds=lead)
+        self._window = timedelta(seconds=window)
+        self._lock = lock
+        self._check_interval = check_interval
+        self._batch_size = batch_size
+
+        # the pending tasks due from now to the horizon, by id, and their (due date, id) in a heap. An entry of the
+        # heap whose task is gone or due at another time is skipped when it comes up.
+        self._tasks: dict[int, Task] = {}
+        self._heap: list[tuple[datetime, int]] = []
+        # the due dates already reminded, by task id
+        self._reminded: dict[int, datetime] = {}
+        self._horizon = self._reload_at = self._lock_checked_at = datetime.now(timezone.utc)
+
+    async def run(self):
+        """Send the reminders until cancelled or until the broker is closed (on shutdown)"""
+        while True:
+            try:
+                if self._lock is not None and not await self._lock.acquire():
+                    await asyncio.sleep(self._check_interval)
+                    continue
+                try:
+                    if not await self._schedule():
+                        return
+                finally:
+                    if self._lock is not None:
+                        await self._lock.release()
+            except Exception:
+                logger.exception("The task reminders failed, starting again")
+                await asyncio.sleep(self._check_interval)
+
+    async def _schedule(self) -> bool:
+        """
+        Send the reminders until the events are lost or the lock is lost
+        :return: False if the broker was closed, True to start again
+        """
+        # subscribed before the read, the changes committed during the read are not missed
+        with self._broker.subscribe() as subscription:
+            await self._load(datetime.now(timezone.utc))
+            while True:
+                now = datetime.now(timezone.utc)
+                if now >= self._reload_at:
+                    await self._load(now)
+                await self._send_due(now)
+
+                try:
+                    events = await subscription.get(self._sleep_time(now))
+                except TaskEventStreamEnded as ended:
+                    # evicted: events were lost, read the tasks again
+                    return ended.reason != "closed"
+                await self._apply(events)
+
+                now = datetime.now(timezone.utc)
+                if self._lock is not None and now - self._lock_checked_at >= timedelta(seconds=self._check_interval):
+                    self._lock_checked_at = now
+                    if not await self._lock.held():
+                        logger.warning("Lost the lock of the task reminders")
+                        return True
+
+    async def _load(self, now: datetime):
+        """read the pending tasks due within the window, a page at a time from the soonest due"""
+        horizon = now + self._lead + self._window
+        loaded = []
+        cursor = TaskCursor(TaskSortField.DUE_DATE, SortOrder.ASC, now, 0)
+        while True:
+            page = await self._call("get_tasks", status=TaskStatus.PENDING, limit=self._batch_size, cursor=cursor,
+                                    sort=TaskSortField.DUE_DATE, order=SortOrder.ASC)
+            # the tasks without a due date come last
+            in_window = [task for task in page if task.due_date is not None and _aware(task.due_date) <= horizon]
+            loaded += in_window
+            if len(in_window) < self._batch_size:
+                break
+            cursor = TaskCursor.after(page[-1], TaskSortField.DUE_DATE, SortOrder.ASC)
+
+        self._horizon = horizon
+        self._reload_at = now + self._window
+        self._tasks = {}
+        self._heap = []
+        self._reminded = {task_id: due for task_id, due in self._reminded.items() if due >= now}
+        for task in loaded:
+            self._track(task, now)
+
+    async def _apply(self, events: list[TaskEvent]):
+        """update the due tasks with the changes of the events"""
+        now = datetime.now(timezone.utc)
+        unknown = []
+        for event in events:
+            if event.type in (TaskEventType.DELETED, TaskEventType.ARCHIVED):
+                self._tasks.pop(event.task_id, None)
+            elif event.task is None:
+                # too big to be sent between the workers
+                unknown.append(event.task_id)
+            else:
+                self._track(event.task, now)
+
+        for task_id in unknown:
+            task = await self._call("get_task", task_id)
+            if task is None:
+                self._tasks.pop(task_id, None)
+            else:
+                self._track(task, now)
+
+    def _track(self, task: Task, now: datetime):
+        """keep a task if it is pending, due within the window and not reminded yet, forget it otherwise"""
+        due = _aware(task.due_date)
+        if task.status != TaskStatus.PENDING or due is None or not now <= due <= self._horizon \
+                or self._reminded.get(task.id) == due:
+            self._tasks.pop(task.id, None)
+            return
+
+        previous = self._tasks.get(task.id)
+        self._tasks[task.id] = task
+        if previous is None or _aware(previous.due_date) != due:
+            heapq.heappush(self._heap, (due, task.id))
+
+    async def _send_due(self, now: datetime):
+        """send the reminders of the tasks due before now plus the lead"""
+        due_tasks = []
+        while self._heap and self._heap[0][0] - self._lead <= now:
+            due, task_id = heapq.heappop(self._heap)
+            task = self._tasks.get(task_id)
+            if task is None or _aware(task.due_date) != due:
+                continue
+            del self._tasks[task_id]
+            self._reminded[task_id] = due
+            due_tasks.append(task)
+
+        if due_tasks:
+            try:
+                await self._sink.send(due_tasks)
+            except Exception:
+                logger.exception("Could not send the reminders of the tasks %s", [task.id for task in due_tasks])
+
+    def _sleep_time(self, now: datetime) -> float:
+        """the seconds until the next reminder, the next read or the next check of the lock"""
+        wake_at = self._reload_at
+        if self._heap:
+            wake_at = min(wake_at, self._heap[0][0] - self._lead)
+        seconds = (wake_at - now).total_seconds()
+        if self._lock is not None:
+            seconds = min(seconds, self._check_interval)
+
+        return max(seconds, 0)
+
+    async def _call(self, method: str, *args, **kwargs):
+        """call a method of a new tasks service, with a session of its own"""
+        async with request_session_scope(self._session_factory, self._async_session_factory):
+            call = getattr(self._new_service(), method)
+            if inspect.iscoroutinefunction(call):
+                return await call(*args, **kwargs)
+
+            return await to_thread.run_sync(partial(_call_and_release_session, call, *args, **kwargs),
+                                            limiter=database_thread_limiter)
+
+
+def _call_and_release_session(call: Callable, *args, **kwargs):
+    """the sync session must be released from the thread that used it"""
+    try:
+        return call(*args, **kwargs)
+    finally:
+        release_session()
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    """naive datetimes are local time, like the stores take them"""
+    return value.astimezone() if value is not None and value.tzinfo is None else value
@@ -0,0 +1,63 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.infrastructure.database.session import request_session_scope, release_session, database_thread_limiter
+from app.services.tasks_service import TasksService
+from app.services.async_tasks_service import AsyncTasksService
+
+logger = logging.getLogger("TaskManager.archival")
+
+
+async def archive_completed_tasks(new_service: Callable[[], TasksService | AsyncTasksService],
+                                  session_factory: Callable[[], Session],
+                                  async_session_factory: Callable[[], AsyncSession],
+                                  older_than_days: float, batch_size: int, interval: float):
+    """
+    Move the tasks completed more than older_than_days ago to the archive, then again every interval seconds, until
+    cancelled. Each run moves batches of batch_size tasks, each in its own short transaction, until a batch is not
+    full: the writes of the requests never wait long for the rows or for the connection. A failed run is logged and
+    retried at the next interval, the batches already moved stay moved.
+    :param new_service: creates the tasks service, once per batch (its repository uses the session of the batch)
+    :param session_factory: creates the sync sessions, like for the requests
+    :param async_session_factory: creates the async sessions
+    :param older_than_days: the tasks completed before this number of days ago are archived
+    :param batch_size: the most tasks moved in a transaction
+    :param interval: the seconds between two runs
+    """
+    while True:
+        try:
+            archived = 0
+            while True:
+                async with request_session_scope(session_factory, async_session_factory):
+                    moved = await _archive_batch(new_service(), older_than_days, batch_size)
+                archived += moved
+                if moved < batch_size:
+                    break
+                # let the requests run between the batches
+                await asyncio.sleep(0)
+            if archived:
+                logger.info("Archived %d completed tasks", archived)
+        except Exception:
+            logger.exception("Could not archive the completed tasks")
+
+        await asyncio.sleep(interval)
+
+
+async def _archive_batch(service: TasksService | AsyncTasksService, older_than_days: float, batch_size: int) -> int:
+    if inspect.iscoroutinefunction(service.archive_tasks):
+        return await service.archive_tasks(older_than_days, batch_size)
+
+    return await to_thread.run_sync(_archive_and_release_session, service, older_than_days, batch_size,
+                                    limiter=database_thread_limiter)
+
+
+def _archive_and_release_session(service: TasksService, older_than_days: float, batch_size: int) -> int:
+    """the sync session must be released from the thread that used it"""
+    try:
+        return service.archive_tasks(older_than_days, batch_size)
+    finally:
+        release_session()
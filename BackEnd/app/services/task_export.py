@@ -0,0 +1,250 @@
+import csv
+import enum
+import io
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.domain.entities.task_record import TaskRecord
+from app.services.xlsx_stream_writer import XlsxStreamWriter, ChunkBuffer
+
+# number of tasks read and written at a time by the exports
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, enum.Enum):
+    """enum representing the file formats of the tasks export"""
+
+    XLSX = "xlsx"
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+XLSX_SHEET_NAME = "Tasks"
+XLSX_HEADERS = ["Title", "Description", "Status", "Due Date", "Completed At", "Created At"]
+
+# columns of the data formats (csv, ndjson, parquet, arrow), every field of the task
+EXPORT_COLUMNS = list(TaskRecord._fields)
+
+
+class TaskExportWriter(ABC):
+    """
+    Writes an export file incrementally: every batch of tasks is converted as it arrives and the produced bytes are
+    returned right away, so the file can be sent while the next batches are read.
+    """
+
+    @abstractmethod
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        """
+        Append a batch of tasks to the file
+        :param records: the tasks
+        :return: the bytes of the file produced since the last call (can be empty)
+        """
+        pass
+
+    @abstractmethod
+    def close(self) -> bytes:
+        """
+        Finish the file
+        :return: the last bytes of the file
+        """
+        pass
+
+
+class XlsxTaskWriter(TaskExportWriter):
+    """The human readable summary: one sheet, formatted dates and no id"""
+
+    def __init__(self):
+        self._writer = XlsxStreamWriter(XLSX_SHEET_NAME, XLSX_HEADERS)
+
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        return self._writer.write_rows(task_to_xlsx_row(record) for record in records)
+
+    def close(self) -> bytes:
+        return self._writer.close()
+
+
+class CsvTaskWriter(TaskExportWriter):
+    """Every column, ISO 8601 dates and empty values for the missing ones"""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        self._writer.writerows(
+            (record.id, record.title, record.description, record.status.value, _iso(record.due_date),
+             _iso(record.completed_at), _iso(record.created_at))
+            for record in records
+        )
+
+        return self._drain()
+
+    def close(self) -> bytes:
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        return data
+
+
+class NdjsonTaskWriter(TaskExportWriter):
+    """One JSON object per line, ISO 8601 dates and null for the missing values"""
+
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        lines = [
+            json.dumps({
+                "id": record.id,
+                "title": record.title,
+                "description": record.description,
+                "status": record.status.value,
+                "due_date": _iso(record.due_date),
+                "completed_at": _iso(record.completed_at),
+                "created_at": _iso(record.created_at),
+            }, ensure_ascii=False, separators=(",", ":"))
+            for record in records
+        ]
+
+        return "".join(line + "\n" for line in lines).encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+# timestamps are exported in UTC, the naive ones (SQLite) are taken as UTC
+ARROW_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("description", pa.string()),
+    ("status", pa.dictionary(pa.int8(), pa.string())),
+    ("due_date", pa.timestamp("us", tz="UTC")),
+    ("completed_at", pa.timestamp("us", tz="UTC")),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+
+def _record_batch(records: list[TaskRecord]) -> pa.RecordBatch:
+    """
+    Build the columnar batch of the tasks
+    :param records: the tasks
+    :return: the record batch, with the ARROW_SCHEMA
+    """
+    ids, titles, descriptions, statuses, due_dates, completed_ats, created_ats = zip(*records)
+
+    return pa.record_batch([
+        pa.array(ids, pa.int64()),
+        pa.array(titles, pa.string()),
+        pa.array(descriptions, pa.string()),
+        pa.array([status.value for status in statuses], ARROW_SCHEMA.field("status").type),
+        pa.array(due_dates, ARROW_SCHEMA.field("due_date").type),
+        pa.array(completed_ats, ARROW_SCHEMA.field("completed_at").type),
+        pa.array(created_ats, ARROW_SCHEMA.field("created_at").type),
+    ], schema=ARROW_SCHEMA)
+
+
+class ArrowTaskWriter(TaskExportWriter):
+    """Arrow IPC stream, one record batch per batch of tasks"""
+
+    def __init__(self):
+        self._buffer = ChunkBuffer()
+        self._writer = pa.ipc.new_stream(self._buffer, ARROW_SCHEMA)
+
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        if records:
+            self._writer.write_batch(_record_batch(records))
+
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+
+        return self._buffer.drain()
+
+
+class ParquetTaskWriter(TaskExportWriter):
+    """
+    Parquet file, zstd compressed. The batches are grouped in row groups of row_group_size tasks:
+    readers skip and decode whole row groups, small ones would cost more than they save.
+    """
+
+    def __init__(self, row_group_size: int = 64 * 1024):
+        self._buffer = ChunkBuffer()
+        self._writer = pq.ParquetWriter(self._buffer, ARROW_SCHEMA, compression="zstd")
+        self._row_group_size = row_group_size
+        self._pending: list[pa.RecordBatch] = []
+        self._pending_rows = 0
+
+    def write_batch(self, records: list[TaskRecord]) -> bytes:
+        if records:
+            self._pending.append(_record_batch(records))
+            self._pending_rows += len(records)
+
+        if self._pending_rows >= self._row_group_size:
+            self._write_row_group()
+
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        self._write_row_group()
+        self._writer.close()
+
+        return self._buffer.drain()
+
+    def _write_row_group(self):
+        if self._pending:
+            self._writer.write_table(pa.Table.from_batches(self._pending), row_group_size=self._pending_rows)
+            self._pending = []
+            self._pending_rows = 0
+
+
+_WRITERS: dict[ExportFormat, type[TaskExportWriter]] = {
+    ExportFormat.XLSX: XlsxTaskWriter,
+    ExportFormat.CSV: CsvTaskWriter,
+    ExportFormat.NDJSON: NdjsonTaskWriter,
+    ExportFormat.PARQUET: ParquetTaskWriter,
+    ExportFormat.ARROW: ArrowTaskWriter,
+}
+
+
+def create_export_writer(export_format: ExportFormat) -> TaskExportWriter:
+    """
+    Create the writer of an export format
+    :param export_format: the format
+    :return: a new writer
+    """
+    return _WRITERS[export_format]()
+
+
+def task_to_xlsx_row(record: TaskRecord) -> list[str | None]:
+    """
+    Build the row of a task in the xlsx summary
+    :param record: the task
+    :return: the row values, None for the empty cells
+    """
+    return [
+        record.title,
+        record.description or None,
+        record.status.value,
+        record.due_date.strftime("%Y-%m-%d %H:%M:%S") if record.due_date else None,
+        record.completed_at.strftime("%Y-%m-%d %H:%M:%S") if record.completed_at else None,
+        record.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    ]
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
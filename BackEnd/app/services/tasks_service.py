@@ -1,9 +1,13 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.domain.repositories.task_repository import ITaskRepository
 from app.domain.entities.task import Task, TaskStatus
-from openpyxl import Workbook
-from io import BytesIO
-from typing import Optional
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
+from app.services.task_export import EXPORT_BATCH_SIZE, ExportFormat, create_export_writer
+from app.common.metrics import EXPORT_STAGE_DURATION, StageTimer
+from typing import Optional, Iterator
 
 
 class TasksService:
@@ -36,15 +40,7 @@ class TasksService:
         :param task_id: ID of the task
         :return: The updated task or None if task does not exist
         """
-        task = self.task_repository.get_task(task_id)
-
-        if task is None:
-            return None
-
-        if task.status == TaskStatus.PENDING:
-            task.set_completed()
-
-        return self.task_repository.edit_task(task)
+        return self.task_repository.complete_task(task_id, datetime.now())
 
     def delete_task(self, task_id: int) -> bool:
         """
@@ -54,47 +50,147 @@ class TasksService:
         """
         return self.task_repository.delete_task(task_id)
 
+    def create_tasks(self, new_tasks: list[tuple[str, Optional[str], Optional[datetime]]]) -> list[Task]:
+        """
+        Create several tasks in one go
+        :param new_tasks: the (title, description, due_date) of each task
+        :return: The created tasks, in the same order
+        """
+        created_at = datetime.now()
+        tasks = [
+            Task(title=title, description=description, task_id=None, due_date=due_date, created_at=created_at)
+            for title, description, due_date in new_tasks
+        ]
+
+        return self.task_repository.create_tasks(tasks)
+
+    def complete_tasks(self, task_ids: list[int]) -> list[Task | None]:
+        """
+        Mark several tasks as completed in one go
+        :param task_ids: IDs of the tasks
+        :return: for each ID, the updated task or None if the task does not exist
+        """
+        return self.task_repository.complete_tasks(task_ids, datetime.now())
+
+    def delete_tasks(self, task_ids: list[int]) -> list[bool]:
+        """
+        Delete several tasks in one go
+        :param task_ids: IDs of the tasks
+        :return: for each ID, True if the task was deleted, False if it does not exist
+        """
+        return self.task_repository.delete_tasks(task_ids)
+
+    def archive_tasks(self, older_than_days: float, batch_size: int) -> int:
+        """
+        Move a batch of the tasks completed more than a number of days ago to the archive
+        :param older_than_days: the tasks completed before this number of days ago are archived
+        :param batch_size: the most tasks to move
+        :return: the number of tasks moved, batch_size when more are left
+        """
+        return self.task_repository.archive_tasks(datetime.now() - timedelta(days=older_than_days), batch_size)
+
     def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
-                  status: Optional[str] = None, title_contains: Optional[str] = None) -> list[Task]:
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                  sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+            include_archived: bool = False) -> list[Task]:
         """
         Get tasks with optional filters
-        :param from_date: from create date to fileter
+        :param from_date: from create date to filter
         :param to_date: to create date to filter
-        :param status: status to filterj
+        :param status: status to filter
         :param title_contains: title substring to filter
+        :param limit: page size, None for all the tasks
+        :param cursor: position to continue from, TaskCursor.after the last task of the previous page
+        :param sort: field to sort by
+        :param order: sort order
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or ranked full-text search (the rank replaces the sort)
+        :param include_archived: also read the archived tasks (read anyway for a date range)
         :return: List of tasks
         """
-        return self.task_repository.get_tasks(from_date, to_date, status, title_contains)
+        return self.task_repository.get_tasks(from_date, to_date, status, title_contains, limit, cursor, sort, order,
+                                          q, search_mode, include_archived)
 
     def get_tasks_xlsx(self) -> bytes:
         """
         Export tasks to an xlsx file
         :return: Bytes of the xlsx file
         """
-        tasks = self.task_repository.get_tasks()
-
-        # create the xlsx file
-        workbook = Workbook()
-        sheet = workbook.active
-        sheet.title = "Tasks"
-
-        headers = ["Title", "Description", "Status", "Due Date", "Completed At", "Created At"]
-        sheet.append(headers)
-
-        for task in tasks:
-            sheet.append([
-                task.title,
-                task.description or "",
-                task.status.value,
-                task.due_date.strftime("%Y-%m-%d %H:%M:%S") if task.due_date else "",
-                task.completed_at.strftime("%Y-%m-%d %H:%M:%S") if task.completed_at else "",
-                task.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            ])
-
-        # save the file to a bytes buffer
-        output = BytesIO()
-        workbook.save(output)
-        output.seek(0)
-        return output.getvalue()
+        return b"".join(self.stream_tasks_export(ExportFormat.XLSX))
+
+    def stream_tasks_export(self, export_format: ExportFormat = ExportFormat.XLSX,
+                            from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None,
+                            title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            include_archived: bool = False) -> Iterator[bytes]:
+        """
+        Export the tasks matching the filters, streamed: the tasks are read and written in batches
+        :param export_format: the file format
+        :param from_date: from create date to filter
+        :param to_date: to create date to filter
+        :param status: status to filter
+        :param title_contains: title substring to filter
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or full-text (only filters, the export stays ordered by id)
+        :param include_archived: also export the archived tasks (exported anyway for a date range)
+        :return: iterator over the bytes of the file
+        """
+        timer = StageTimer(EXPORT_STAGE_DURATION, format=export_format.value)
+        writer = create_export_writer(export_format)
+        batches = self.task_repository.stream_task_batches(from_date, to_date, status, title_contains, q, search_mode,
+                                                           EXPORT_BATCH_SIZE, include_archived)
+
+        while (records := next(batches, None)) is not None:
+            timer.lap("read")
+            chunk = writer.write_batch(records)
+            timer.lap("write")
+            if chunk:
+                yield chunk
+                timer.lap("send")
+
+        last_chunk = writer.close()
+        timer.lap("close")
+        timer.observe()
+
+        yield last_chunk
+
+    def get_stats(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        """
+        Get the aggregates of the tasks matching the filters: counts per status, overdue and due soon pending tasks,
+        tasks created and completed per day and percentiles of the completion time
+        :param from_date: from create date to filter
+        :param to_date: to create date to filter, the daily counts end on its day (today without it)
+        :param status: status to filter
+        :param title_contains: title substring to filter
+        :param q: search text, matched according to search_mode
+        :param search_mode: substring of the title, or full-text
+        :param due_within_days: the pending tasks due in this number of days are due soon
+        :param days: the number of days of the daily counts
+        :param include_archived: also count the archived tasks (counted anyway for a date range)
+        :return: the stats
+        """
+        return self.task_repository.get_stats(datetime.now(), from_date, to_date, status, title_contains, q,
+                                              search_mode, due_within_days, days, include_archived)
 
+    def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        """
+        Get the tasks created, updated and deleted since a sync token
+        :param since: the token of the last sync, None for all the tasks
+        :param limit: the most changes to return
+        :return: the changes and the token to continue from
+        :raises ChangeTokenExpiredError: if the changes since the token are unknown
+        """
+        return self.task_repository.get_changes(since, limit)
 
+    def get_data_version(self) -> int:
+        """
+        Get the version of the tasks, it changes with every write
+        :return: the version
+        """
+        return self.task_repository.get_data_version()
@@ -0,0 +1,145 @@
+import re
+import zipfile
+from typing import Iterable, Any
+from xml.sax.saxutils import escape
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">\
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>\
+<Default Extension="xml" ContentType="application/xml"/>\
+<Override PartName="/xl/workbook.xml" \
+ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>\
+<Override PartName="/xl/worksheets/sheet1.xml" \
+ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\
+<Relationship Id="rId1" \
+Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>\
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" \
+xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">\
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\
+<Relationship Id="rId1" \
+Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>\
+</Relationships>"""
+
+_SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+_SHEET_END = "</sheetData></worksheet>"
+
+# modification time of the zip entries, the earliest a zip file can store
+_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# control characters are not allowed in XML 1.0
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ChunkBuffer:
+    """write-only, non seekable file object collecting what a writer outputs until it is drained"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class XlsxStreamWriter:
+    """
+    Writes a single sheet xlsx file incrementally with constant memory.
+
+    The rows are compressed into the zip as they are written and every call returns the bytes produced so far,
+    so the file can be sent while it is still being written. Unlike openpyxl (even in write-only mode, which
+    assembles the zip on save) nothing is kept besides the compressor state. Cells are written as inline strings.
+    """
+
+    def __init__(self, sheet_name: str, headers: list[str]):
+        self._buffer = ChunkBuffer()
+        # the output is not seekable, zipfile writes data descriptors after each entry instead
+        self._zip = zipfile.ZipFile(self._buffer, "w", compression=zipfile.ZIP_DEFLATED)
+        self._zip.writestr(_zip_entry("[Content_Types].xml"), _CONTENT_TYPES)
+        self._zip.writestr(_zip_entry("_rels/.rels"), _ROOT_RELS)
+        self._zip.writestr(_zip_entry("xl/workbook.xml"),
+                           _WORKBOOK.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        self._zip.writestr(_zip_entry("xl/_rels/workbook.xml.rels"), _WORKBOOK_RELS)
+
+        self._sheet = self._zip.open(_zip_entry("xl/worksheets/sheet1.xml"), "w", force_zip64=True)
+        self._sheet.write(_SHEET_START.encode())
+        self._row_count = 0
+        self._append_rows([headers])
+
+    def write_rows(self, rows: Iterable[Iterable[Any]]) -> bytes:
+        """
+        Append rows to the sheet
+        :param rows: the rows, None cells are left empty
+        :return: the bytes of the file produced since the last call (can be empty, the compressor buffers)
+        """
+        self._append_rows(rows)
+
+        return self._buffer.drain()
+
+    def _append_rows(self, rows: Iterable[Iterable[Any]]):
+        parts = []
+        for row in rows:
+            self._row_count += 1
+            cells = "".join(
+                "<c/>" if value is None else
+                f'<c t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+                for value in row
+            )
+            parts.append(f'<row r="{self._row_count}">{cells}</row>')
+
+        self._sheet.write("".join(parts).encode())
+
+    def close(self) -> bytes:
+        """
+        Finish the file
+        :return: the last bytes of the file
+        """
+        self._sheet.write(_SHEET_END.encode())
+        self._sheet.close()
+        self._zip.close()
+
+        return self._buffer.drain()
+
+
+def _zip_entry(name: str) -> zipfile.ZipInfo:
+    """
+    Zip entry with a fixed modification time (zipfile would use the current time), the same rows always give the
+    same bytes so the exports can have a strong ETag
+    """
+    entry = zipfile.ZipInfo(name, date_time=_ENTRY_DATE_TIME)
+    entry.compress_type = zipfile.ZIP_DEFLATED
+
+    return entry
+
+
+def _xml_text(value: Any) -> str:
+    return escape(_INVALID_XML_CHARS.sub("", str(value)))
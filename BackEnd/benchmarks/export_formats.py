@@ -0,0 +1,71 @@
+"""
+Cost of the tasks export in each format: time to produce it, size, and time for a client to read it back.
+
+Exports the tasks table of the database configured in .env (seeded with --rows tasks first unless --keep is given)
+through TasksService.stream_tasks_export, the same path as GET /api/tasks/summary without the HTTP layer.
+
+usage: python -m benchmarks.export_formats [--rows 300000] [--keep]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.common.container import Container
+from app.infrastructure.database.session import request_session_scope
+from app.services.task_export import ExportFormat
+from benchmarks.export_memory import seed_tasks
+
+
+def _read(export_format: ExportFormat, content: bytes) -> int:
+    """
+    Reads an export the way a client would (every value decoded)
+    :return: the number of tasks read
+    """
+    if export_format == ExportFormat.XLSX:
+        sheet = openpyxl.load_workbook(io.BytesIO(content), read_only=True).active
+        return sum(1 for _ in sheet.iter_rows(values_only=True)) - 1
+    if export_format == ExportFormat.CSV:
+        return sum(1 for _ in csv.reader(io.StringIO(content.decode()))) - 1
+    if export_format == ExportFormat.NDJSON:
+        return sum(1 for line in content.decode().splitlines() if json.loads(line))
+    if export_format == ExportFormat.PARQUET:
+        return pq.read_table(io.BytesIO(content)).num_rows
+    return pa.ipc.open_stream(content).read_all().num_rows
+
+
+async def _export(export_format: ExportFormat) -> bytes:
+    async with request_session_scope():
+        tasks_service = Container().sync_tasks_service()
+        return b"".join(tasks_service.stream_tasks_export(export_format))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--keep", action="store_true", help="export the tasks already in the database")
+    args = parser.parse_args()
+
+    if not args.keep:
+        seed_tasks(args.rows)
+
+    print(f"{'format':<8} {'export s':>9} {'size MB':>8} {'read s':>8} {'rows':>8}")
+    for export_format in ExportFormat:
+        start = time.perf_counter()
+        content = asyncio.run(_export(export_format))
+        export_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = _read(export_format, content)
+        read_seconds = time.perf_counter() - start
+
+        print(f"{export_format.value:<8} {export_seconds:>9.2f} {len(content) / 1024 / 1024:>8.2f} "
+              f"{read_seconds:>8.2f} {rows:>8}")
+
+
+if __name__ == "__main__":
+    main()
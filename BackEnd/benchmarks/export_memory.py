@@ -0,0 +1,106 @@
+"""
+Peak memory of the tasks summary export, the old in memory workbook against the streamed xlsx.
+
+Seeds the tasks table of the database configured in .env with the given number of rows, then builds the export once
+per approach in a fresh interpreter and reports its peak RSS (the baseline RSS of an interpreter that only imports the
+app is printed too).
+
+usage: python -m benchmarks.export_memory [--rows 10000 100000 300000]
+"""
+import argparse
+import io
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+from sqlalchemy import delete, insert
+from app.infrastructure.database import models
+from app.infrastructure.database.session import get_engine, request_session_scope
+from app.common.container import Container
+from app.services.task_export import ExportFormat, XLSX_HEADERS, XLSX_SHEET_NAME, task_to_xlsx_row
+
+
+def seed_tasks(rows: int):
+    now = datetime.now()
+    with get_engine().begin() as connection:
+        connection.execute(delete(models.Task))
+        for start in range(0, rows, 10000):
+            connection.execute(insert(models.Task), [
+                {"title": f"export {i}", "description": "description " * 5, "status": "pending",
+                 "created_at": now, "due_date": now + timedelta(days=i % 30)}
+                for i in range(start, min(start + 10000, rows))
+            ])
+
+
+def _buffered_export(tasks_service) -> int:
+    # what the summary route did before streaming: every task and the whole workbook in memory
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = XLSX_SHEET_NAME
+    worksheet.append(XLSX_HEADERS)
+    for task in tasks_service.get_tasks(limit=None):
+        worksheet.append(task_to_xlsx_row(task))
+    output = io.BytesIO()
+    workbook.save(output)
+    return len(output.getvalue())
+
+
+def _streamed_export(tasks_service) -> int:
+    return sum(len(chunk) for chunk in tasks_service.stream_tasks_export(ExportFormat.XLSX))
+
+
+async def _export(approach: str) -> int:
+    async with request_session_scope():
+        tasks_service = Container().sync_tasks_service()
+        if approach == "buffered":
+            return _buffered_export(tasks_service)
+        if approach == "streamed":
+            return _streamed_export(tasks_service)
+        return 0
+
+
+def measure(approach: str) -> dict:
+    """
+    Runs one export in a fresh interpreter
+    :param approach: "baseline", "buffered" or "streamed"
+    :return: the peak RSS in MB, the duration and the size of the file
+    """
+    output = subprocess.run([sys.executable, "-m", "benchmarks.export_memory", "--child", approach],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return {"peak_mb": float(output[0]), "seconds": float(output[1]), "size_mb": float(output[2])}
+
+
+def _child(approach: str):
+    import asyncio
+    start = time.perf_counter()
+    size = asyncio.run(_export(approach))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KB on linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.1f} {elapsed:.2f} {size / 1024 / 1024:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    print(f"baseline peak RSS: {measure('baseline')['peak_mb']:.1f} MB")
+    print(f"{'rows':>8} {'approach':<9} {'peak MB':>8} {'seconds':>8} {'file MB':>8}")
+    for rows in args.rows:
+        seed_tasks(rows)
+        for approach in ("buffered", "streamed"):
+            result = measure(approach)
+            print(f"{rows:>8} {approach:<9} {result['peak_mb']:>8.1f} {result['seconds']:>8.2f} "
+                  f"{result['size_mb']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+End-to-end load test of the whole stack (routing, middlewares, Container wiring, services, database pool) with
+latency percentiles per route.
+
+The requests are sent at a fixed rate (open loop): a slow response does not delay the next requests, and every
+latency is measured from the time its request was due, so a server that falls behind shows it in the percentiles
+instead of silently lowering the load. A request due while --max-in-flight requests are still waiting is not sent
+and counted as dropped.
+
+--mix sets the share of each operation:
+- create: POST /api/tasks
+- list: GET /api/tasks, a page of 50 tasks
+- complete: PATCH /api/tasks/{id}/complete on a random known task
+- delete: DELETE /api/tasks/{id} on a known task (a created one when there is one)
+- export: GET /api/tasks/summary in --export-format
+
+Targets:
+- inprocess: the app is called through httpx.ASGITransport in this process, with the settings of .env. No network and
+  no server, but the load generator shares the event loop (and the CPU) with the app.
+- uvicorn: a uvicorn server on localhost with --sweep-workers workers, each with a pool of --sweep-pool-size
+  connections (DATABASE_POOL_SIZE, no overflow).
+Both use the DATABASE_MODE of the environment or of .env.
+
+--sweep-workers / --sweep-pool-size (uvicorn) run every combination at each --rps, in increasing order, and stop a
+combination at its first saturated rate: less than 95% of the rate served, more than 1% errors, or a p99 above
+--slo-ms. The last rate that was not saturated is its saturation point.
+
+The tasks table of the database of .env is replaced with --seed tasks first (0 keeps it).
+
+usage: python -m benchmarks.load_test [--target inprocess|uvicorn] [--rps 50] [--duration 30]
+                                      [--mix create=20,list=50,complete=15,delete=10,export=5] [--seed 10000]
+       python -m benchmarks.load_test --target uvicorn --rps 50 100 200 400 --sweep-workers 1 2 4
+                                      --sweep-pool-size 5 10 20 [--output load-results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import httpx
+from app.infrastructure.database.session import get_engine
+from benchmarks.dataset import seed_tasks
+
+DEFAULT_MIX = "create=20,list=50,complete=15,delete=10,export=5"
+PAGE_SIZE = 50
+# known task IDs kept for the complete and delete operations
+MAX_KNOWN_TASKS = 10000
+# saturation: share of the rate that must be served, highest error rate
+MIN_SERVED = 0.95
+MAX_ERROR_RATE = 0.01
+
+
+@dataclass
+class RouteStats:
+    """the requests of one route in a run"""
+
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    dropped: int = 0
+
+    def summary(self, duration: float) -> dict:
+        latencies = sorted(self.latencies)
+        sent = len(latencies)
+        return {
+            "requests": sent,
+            "throughput": (sent - self.errors) / duration,
+            "error_rate": self.errors / sent if sent else 0.0,
+            "dropped": self.dropped,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] * 1000 if latencies else None,
+        }
+
+
+def percentile(latencies: list[float], percent: float) -> Optional[float]:
+    """
+    Nearest-rank percentile
+    :param latencies: sorted latencies in seconds
+    :param percent: the percentile
+    :return: the percentile in ms, None without latencies
+    """
+    if not latencies:
+        return None
+
+    return latencies[max(math.ceil(len(latencies) * percent / 100) - 1, 0)] * 1000
+
+
+class Load:
+    """The operations of the mix, sharing the IDs of the tasks they know"""
+
+    def __init__(self, client: httpx.AsyncClient, export_format: str):
+        self.client = client
+        self.export_format = export_format
+        self.task_ids: list[int] = []
+        self.created_ids: list[int] = []
+        self.operations: dict[str, tuple[str, Callable[[], Awaitable[httpx.Response]]]] = {
+            "create": ("POST /api/tasks", self.create),
+            "list": ("GET /api/tasks", self.list),
+            "complete": ("PATCH /api/tasks/{task_id}/complete", self.complete),
+            "delete": ("DELETE /api/tasks/{task_id}", self.delete),
+            "export": ("GET /api/tasks/summary", self.export),
+        }
+
+    async def load_task_ids(self):
+        response = await self.client.get("/api/tasks", params={"limit": 1000})
+        response.raise_for_status()
+        self.task_ids = [task["id"] for task in response.json()]
+
+    async def create(self) -> httpx.Response:
+        response = await self.client.post("/api/tasks", json={"title": "load test task", "description": None})
+        if response.status_code == 200 and len(self.created_ids) < MAX_KNOWN_TASKS:
+            self.created_ids.append(response.json()["id"])
+        return response
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get("/api/tasks", params={"limit": PAGE_SIZE})
+
+    async def complete(self) -> httpx.Response:
+        return await self.client.patch(f"/api/tasks/{self._known_id()}/complete")
+
+    async def delete(self) -> httpx.Response:
+        # the created tasks first, the seeded ones stay for the other operations as long as possible
+        task_id = self.created_ids.pop() if self.created_ids else self._known_id()
+        if task_id in self.task_ids:
+            self.task_ids.remove(task_id)
+        return await self.client.delete(f"/api/tasks/{task_id}")
+
+    async def export(self) -> httpx.Response:
+        return await self.client.get("/api/tasks/summary", params={"format": self.export_format})
+
+    def _known_id(self) -> int:
+        known = self.task_ids or self.created_ids
+        # an unknown ID answers 404, counted as an error
+        return random.choice(known) if known else 0
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight)
+
+    unknown = set(weights) - {"create", "list", "complete", "delete", "export"}
+    if unknown:
+        raise ValueError(f"unknown operations in the mix: {', '.join(sorted(unknown))}")
+
+    return weights
+
+
+async def run_load(client: httpx.AsyncClient, mix: dict[str, float], rps: float, duration: float,
+                   max_in_flight: int, export_format: str) -> dict:
+    """
+    Send the requests of the mix at a fixed rate
+    :param client: the client of the API
+    :param mix: the weight of each operation
+    :param rps: the requests per second
+    :param duration: seconds of load
+    :param max_in_flight: requests waiting for a response above which the due requests are dropped
+    :param export_format: the format of the exports
+    :return: the results, overall and per route
+    """
+    load = Load(client, export_format)
+    await load.load_task_ids()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {load.operations[name][0]: RouteStats() for name in names}
+    overall = RouteStats()
+    in_flight: set[asyncio.Task] = set()
+
+    async def call(route: str, operation: Callable[[], Awaitable[httpx.Response]], due: float):
+        try:
+            status_code = (await operation()).status_code
+        except httpx.HTTPError:
+            status_code = 0
+        latency = time.perf_counter() - due
+        for route_stats in (stats[route], overall):
+            route_stats.latencies.append(latency)
+            if not 200 <= status_code < 400:
+                route_stats.errors += 1
+
+    start = time.perf_counter()
+    for sent in itertools.count():
+        due = start + sent / rps
+        if due - start >= duration:
+            break
+        await asyncio.sleep(max(due - time.perf_counter(), 0))
+
+        route, operation = load.operations[random.choices(names, weights)[0]]
+        if len(in_flight) >= max_in_flight:
+            stats[route].dropped += 1
+            overall.dropped += 1
+            continue
+
+        task = asyncio.create_task(call(route, operation, due))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    await asyncio.gather(*in_flight)
+    # the requests were due over the duration, the last responses can come later
+    elapsed = max(time.perf_counter() - start, duration)
+
+    return {
+        "rps": rps,
+        **overall.summary(elapsed),
+        "routes": {route: route_stats.summary(elapsed) for route, route_stats in stats.items()},
+    }
+
+
+def saturated(result: dict, slo_ms: float) -> bool:
+    served = result["throughput"] / result["rps"]
+    return (served < MIN_SERVED or result["error_rate"] > MAX_ERROR_RATE or result["dropped"] > 0
+            or (result["p99_ms"] or 0) > slo_ms)
+
+
+async def run_in_process(args: argparse.Namespace, mix: dict[str, float]) -> list[dict]:
+    # imported here: the uvicorn target must not build the engines in this process
+    from app.main import app, container
+
+    # the INFO log of every request would slow the app down and flood the results
+    container.logger().setLevel(logging.WARNING)
+
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=120) as client:
+        for rps in sorted(args.rps):
+            result = await run_load(client, mix, rps, args.duration, args.max_in_flight, args.export_format)
+            results.append({"target": "inprocess", **result})
+            print_result(results[-1])
+            if saturated(result, args.slo_ms):
+                break
+
+    return results
+
+
+async def _wait_until_up(client: httpx.AsyncClient):
+    for _ in range(300):
+        try:
+            await client.get("/api/tasks/0")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+
+    raise RuntimeError("server did not start")
+
+
+async def run_uvicorn(args: argparse.Namespace, mix: dict[str, float], workers: int, pool_size: int) -> list[dict]:
+    """
+    Run the rates against a uvicorn server, until the first saturated one
+    :param args: the command line arguments
+    :param mix: the weight of each operation
+    :param workers: the uvicorn workers
+    :param pool_size: the connections of the pool of each worker
+    :return: the result of each rate
+    """
+    env = {**os.environ, "DATABASE_POOL_SIZE": str(pool_size), "DATABASE_MAX_OVERFLOW": "0", "ALLOWED_HOSTS": '["*"]'}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=env, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+    )
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120) as client:
+            await _wait_until_up(client)
+            for rps in sorted(args.rps):
+                result = await run_load(client, mix, rps, args.duration, args.max_in_flight, args.export_format)
+                results.append({"target": "uvicorn", "workers": workers, "pool_size": pool_size, **result})
+                print_result(results[-1])
+                if saturated(result, args.slo_ms):
+                    break
+    finally:
+        server.terminate()
+        server.wait()
+
+    return results
+
+
+def print_result(result: dict):
+    config = f"workers={result['workers']} pool={result['pool_size']} " if result["target"] == "uvicorn" else ""
+    print(f"\n{config}target {result['rps']:g} req/s: {result['throughput']:.1f} req/s served, "
+          f"{result['error_rate']:.1%} errors, {result['dropped']} dropped")
+    print(f"  {'route':<36} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in [*result["routes"].items(), ("all", result)]:
+        p50, p95, p99 = (f"{stats[key]:.1f}" if stats[key] is not None else "-"
+                         for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"  {route:<36} {stats['requests']:>9} {stats['throughput']:>8.1f} {stats['error_rate']:>7.1%} "
+              f"{p50:>9} {p95:>9} {p99:>9}")
+
+
+def print_saturation(results: list[dict], slo_ms: float):
+    print("\nsaturation points (highest rate served within the SLO):")
+    for (workers, pool_size), runs in itertools.groupby(results, key=lambda r: (r["workers"], r["pool_size"])):
+        served = [r for r in runs if not saturated(r, slo_ms)]
+        point = f"{served[-1]['rps']:g} req/s" if served else "below the lowest rate"
+        print(f"  workers={workers} pool={pool_size}: {point}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--rps", type=float, nargs="+", default=[50], help="request rates, run in increasing order")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per rate")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--export-format", default="csv")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--slo-ms", type=float, default=500, help="highest p99 of a rate that is not saturated")
+    parser.add_argument("--seed", type=int, default=10000, help="tasks to seed the database with, 0 keeps them")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sweep-workers", type=int, nargs="+", default=[1], help="uvicorn workers")
+    parser.add_argument("--sweep-pool-size", type=int, nargs="+", default=[5], help="connections per worker")
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.target == "inprocess" and (args.sweep_workers != [1] or args.sweep_pool_size != [5]):
+        parser.error("the workers and pool sizes can only be swept with --target uvicorn")
+
+    if args.seed:
+        seed_tasks(get_engine(), args.seed)
+        get_engine().dispose()
+
+    if args.target == "inprocess":
+        results = asyncio.run(run_in_process(args, mix))
+    else:
+        results = []
+        for workers, pool_size in itertools.product(args.sweep_workers, args.sweep_pool_size):
+            results += asyncio.run(run_uvicorn(args, mix, workers, pool_size))
+        print_saturation(results, args.slo_ms)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
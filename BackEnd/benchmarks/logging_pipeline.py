@@ -0,0 +1,119 @@
+"""
+Time spent by a request in its log record of GET /api/tasks (the filters line), at a given request rate and with
+an output that takes --write-delay microseconds per write (a busy terminal, a pipe to a log collector that lags):
+
+- previous: the StreamHandler of the TaskManager logger, written by the thread logging, f-string message.
+- current: configure_logger, the record is queued and written (as JSON) by the thread of the pipeline.
+- sampled: the same with LOG_SAMPLE_RATES {"/api/tasks": 0.1}.
+
+The requests are logged from a single thread, like the async controllers log from the event loop: while a write
+blocks, no other request is served. Each rate runs for --duration seconds, paced; the achieved rate falls below the
+target when the logging can't keep up.
+
+usage: python -m benchmarks.logging_pipeline [--rps 1000 5000 20000] [--write-delay 0 200] [--duration 3]
+"""
+import argparse
+import io
+import logging
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from app.common.structured_logging import configure_logger, request_context, RequestContext, new_request_id
+
+SCOPE = {"route": SimpleNamespace(path="/api/tasks")}
+
+
+class SlowStream(io.TextIOBase):
+    """An output taking delay seconds per write, the text is dropped"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        # blocked in the write like on a full pipe, the other threads run meanwhile
+        if self.delay:
+            time.sleep(self.delay)
+        return len(text)
+
+
+def previous_logger(name: str, stream: io.TextIOBase) -> logging.Logger:
+    """the configure_logger of the container before the pipeline"""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+
+    return logger
+
+
+def previous_log(logger: logging.Logger, filters: dict):
+    logger.info(f"Getting tasks with filters - from_date: {filters['from_date']}, to_date: {filters['to_date']}, "
+                f"status: {filters['status']}, title_contains: {filters['title_contains']}, q: {filters['q']}, "
+                f"search_mode: {filters['search_mode']}")
+
+
+def current_log(logger: logging.Logger, filters: dict):
+    logger.info("Getting tasks with filters - from_date: %s, to_date: %s, status: %s, title_contains: %s, q: %s, "
+                "search_mode: %s", filters["from_date"], filters["to_date"], filters["status"],
+                filters["title_contains"], filters["q"], filters["search_mode"])
+
+
+def run(logger: logging.Logger, log, rps: int, duration: float) -> tuple[float, list[float]]:
+    """
+    Log one record per request at the target rate
+    :return: the achieved requests per second and the microseconds of each logging call
+    """
+    filters = {"from_date": datetime(2026, 1, 1), "to_date": None, "status": "pending", "title_contains": "report",
+               "q": None, "search_mode": "substring"}
+    interval = 1 / rps
+    timings = []
+    start = time.perf_counter()
+    next_request = start
+    while next_request - start < duration:
+        while time.perf_counter() < next_request:
+            pass
+        token = request_context.set(RequestContext(new_request_id(), SCOPE))
+        before = time.perf_counter()
+        log(logger, filters)
+        timings.append((time.perf_counter() - before) * 1e6)
+        request_context.reset(token)
+        # behind the schedule the next request starts right away
+        next_request = max(next_request + interval, time.perf_counter() - interval)
+
+    return len(timings) / (time.perf_counter() - start), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--write-delay", type=float, nargs="+", default=[0, 200], help="microseconds")
+    parser.add_argument("--duration", type=float, default=3)
+    args = parser.parse_args()
+
+    print(f"{'write us':>8} {'target':>7} {'path':<9} {'req/s':>8} {'p50 us':>7} {'p99 us':>8} {'dropped':>8}")
+    for delay in args.write_delay:
+        for rps in args.rps:
+            for label in ("previous", "current", "sampled"):
+                name = f"LoggingBenchmark.{label}.{delay}.{rps}"
+                stream = SlowStream(delay / 1e6)
+                if label == "previous":
+                    logger, log = previous_logger(name, stream), previous_log
+                else:
+                    sample_rates = {"/api/tasks": 0.1} if label == "sampled" else None
+                    logger, log = configure_logger(name, stream=stream, sample_rates=sample_rates), current_log
+                logger.propagate = False
+
+                achieved, timings = run(logger, log, rps, args.duration)
+                handler = logger.handlers[0]
+                dropped = getattr(handler, "dropped", 0)
+                if label != "previous":
+                    handler.listener.stop()
+                quantiles = statistics.quantiles(timings, n=100)
+                print(f"{delay:>8.0f} {rps:>7} {label:<9} {achieved:>8.0f} {quantiles[49]:>7.1f} "
+                      f"{quantiles[98]:>8.1f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
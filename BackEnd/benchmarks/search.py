@@ -0,0 +1,91 @@
+"""
+Latency of the title and full-text searches of GET /api/tasks on a large table, with and without the search indexes.
+
+Seeds the tasks table of the database configured in .env (PostgreSQL, migrated to head) with --rows tasks made of
+random words (zipf distributed, so a few words are very common and most are rare) unless --keep is given, then runs
+each query --repeat times through TaskRepositoryDatabase.get_tasks. "no index" runs the same query with the index
+scans disabled for the transaction, which is the plan PostgreSQL had before the migration.
+
+usage: python -m benchmarks.search [--rows 1000000] [--repeat 20] [--keep]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+from sqlalchemy import delete, insert, text
+from app.domain.entities.task_search import SearchMode
+from app.infrastructure.database import models
+from app.infrastructure.database.session import get_engine, get_session_maker
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+
+# (label, get_tasks keyword arguments)
+QUERIES = [
+    ("title_contains, rare", {"title_contains": "word4321"}),
+    ("substring q, rare", {"q": "rd4321"}),
+    ("substring q, common", {"q": "word1 ", "limit": 50}),
+    ("fulltext, rare", {"q": "word4321", "search_mode": SearchMode.FULLTEXT, "limit": 50}),
+    ("fulltext, two words", {"q": "word12 word345", "search_mode": SearchMode.FULLTEXT, "limit": 50}),
+    ("fulltext, common", {"q": "word1", "search_mode": SearchMode.FULLTEXT, "limit": 50}),
+]
+
+
+def _words(count: int) -> str:
+    return " ".join(f"word{min(int(random.paretovariate(0.6)), 50000)}" for _ in range(count))
+
+
+def seed_tasks(rows: int):
+    random.seed(42)
+    now = datetime.now()
+    with get_engine().begin() as connection:
+        connection.execute(delete(models.Task))
+        for start in range(0, rows, 10000):
+            connection.execute(insert(models.Task), [
+                {"title": _words(4), "description": _words(15), "status": "pending", "created_at": now}
+                for _ in range(start, min(start + 10000, rows))
+            ])
+        connection.execute(text("ANALYZE tasks"))
+
+
+def measure(kwargs: dict, repeat: int, use_indexes: bool) -> tuple[float, int]:
+    """
+    Runs a search several times
+    :param kwargs: the get_tasks arguments
+    :param repeat: number of runs
+    :param use_indexes: False to disable the index scans
+    :return: the median latency in ms and the number of tasks returned
+    """
+    latencies = []
+    found = 0
+    for _ in range(repeat):
+        with get_session_maker()() as session:
+            if not use_indexes:
+                session.execute(text("SET LOCAL enable_indexscan = off"))
+                session.execute(text("SET LOCAL enable_bitmapscan = off"))
+            start = time.perf_counter()
+            found = len(TaskRepositoryDatabase(session).get_tasks(**kwargs))
+            latencies.append(time.perf_counter() - start)
+
+    return statistics.median(latencies) * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="search the tasks already in the database")
+    args = parser.parse_args()
+
+    if not args.keep:
+        seed_tasks(args.rows)
+
+    print(f"{'query':<22} {'tasks':>6} {'index ms':>9} {'no index ms':>12}")
+    for label, kwargs in QUERIES:
+        indexed_ms, found = measure(kwargs, args.repeat, True)
+        # the sequential scans are slow, a few runs are enough
+        scan_ms, _ = measure(kwargs, min(args.repeat, 3), False)
+        print(f"{label:<22} {found:>6} {indexed_ms:>9.1f} {scan_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
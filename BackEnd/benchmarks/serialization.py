@@ -0,0 +1,112 @@
+"""
+CPU time of turning a list of tasks into the body of the GET /api/tasks response, and memory of the Task entities.
+
+- previous: Task entities with a __dict__, no response model: FastAPI's jsonable_encoder walks every object, then
+  JSONResponse encodes the result with the json module.
+- current: Task entities with __slots__, validated and serialized by pydantic-core through the route response model
+  (list[TaskResponse]), then encoded by ORJSONResponse.
+
+No database involved: the tasks are built in memory, every path runs --repeat times and the best run is kept.
+
+usage: python -m benchmarks.serialization [--tasks 10000 100000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from app.domain.entities.task import Task, TaskStatus
+from app.main import app
+
+
+class PreviousTask:
+    """The Task entity as it was before __slots__"""
+
+    id: int
+    title: str
+    description: str | None = None
+    status: TaskStatus = TaskStatus.PENDING
+    due_date: datetime | None = None
+    completed_at: datetime | None = None
+    created_at: datetime
+
+    def __init__(self, task_id: int | None, title: str, description: str | None, created_at: datetime,
+                 status: TaskStatus = TaskStatus.PENDING, due_date: datetime | None = None,
+                 completed_at: datetime | None = None):
+        self.id = task_id if task_id is not None else -1
+        self.title = title
+        self.description = description
+        self.status = status
+        self.due_date = due_date
+        self.completed_at = completed_at
+        self.created_at = created_at
+
+
+def build_tasks(task_class: type, count: int) -> list:
+    now = datetime.now().astimezone()
+    return [
+        task_class(task_id=i, title=f"Task {i}", description=f"Description of the task {i}" if i % 2 else None,
+                   created_at=now - timedelta(minutes=i),
+                   status=TaskStatus.COMPLETED if i % 3 == 0 else TaskStatus.PENDING,
+                   due_date=now + timedelta(days=i % 30) if i % 4 else None,
+                   completed_at=now if i % 3 == 0 else None)
+        for i in range(count)
+    ]
+
+
+def previous_body(tasks: list) -> bytes:
+    return JSONResponse(jsonable_encoder(tasks)).body
+
+
+def current_body(tasks: list) -> bytes:
+    # the response model of the route, as FastAPI applies it
+    route = next(route for route in app.routes
+                 if isinstance(route, APIRoute) and route.path == "/api/tasks" and "GET" in route.methods)
+    content = asyncio.run(serialize_response(field=route.response_field, response_content=tasks))
+
+    return ORJSONResponse(content).body
+
+
+def best_time(function, tasks: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(tasks)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def entities_memory(task_class: type, count: int) -> int:
+    """bytes allocated by count entities (and their values)"""
+    tracemalloc.start()
+    tasks = build_tasks(task_class, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tasks':>7} {'path':<9} {'ms':>9} {'us/task':>8} {'entities MB':>12} {'body MB':>8}")
+    for count in args.tasks:
+        for label, task_class, function in (("previous", PreviousTask, previous_body), ("current", Task, current_body)):
+            tasks = build_tasks(task_class, count)
+            seconds = best_time(function, tasks, args.repeat)
+            body = function(tasks)
+            memory = entities_memory(task_class, count)
+            print(f"{count:>7} {label:<9} {seconds * 1000:>9.1f} {seconds / count * 1e6:>8.2f} "
+                  f"{memory / 1e6:>12.1f} {len(body) / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
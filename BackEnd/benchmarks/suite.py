@@ -0,0 +1,337 @@
+"""
+Timings of the hot paths of the backend at several table sizes, written to a JSON file that can be compared with the
+one of a previous run to catch the regressions.
+
+run: seeds the database of --url (the one of .env by default, PostgreSQL or SQLite) with each --rows count of tasks
+(benchmarks/dataset.py, the tasks table is emptied first), then times:
+- every TaskRepositoryDatabase method, each call in a new session (like a request)
+- get_tasks with every combination of filters, sort, order and cursor, a page of PAGE_SIZE tasks
+- TasksService.get_tasks_xlsx, up to --max-export-rows tasks (it reads the whole table)
+- _orm_to_entity over BATCH_SIZE loaded tasks
+- the JSON encoding of BATCH_SIZE tasks by the response model of GET /api/tasks
+The first call of every benchmark warms up and is not counted. The tasks created by the benchmarks are deleted again,
+the completed ones are random tasks made pending first.
+
+compare: prints the change of the median of every benchmark between two result files, and exits with 1 when one got
+slower by more than --threshold (and by more than --min-ms, the noise of the fastest calls).
+
+usage: python -m benchmarks.suite run [--url sqlite:///benchmark.db] [--rows 10000 1000000] [--repeat 10]
+                                      [--output results.json] [--keep]
+       python -m benchmarks.suite compare baseline.json results.json [--threshold 0.2] [--min-ms 0.1]
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+import sqlalchemy
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from app.common.config import settings
+from app.domain.entities.task import Task as TaskEntity, TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.infrastructure.database import models
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.services.tasks_service import TasksService
+from benchmarks.dataset import NOW, count_tasks, seed_tasks
+from benchmarks.serialization import current_body
+
+PAGE_SIZE = 50
+# tasks of the bulk writes, of the entity conversion and of the JSON encoding
+BATCH_SIZE = 100
+
+DATE_FILTERS = {
+    "all dates": {},
+    "one day": {"from_date": NOW - timedelta(days=2), "to_date": NOW - timedelta(days=1)},
+}
+STATUS_FILTERS = {
+    "any status": {},
+    "pending": {"status": TaskStatus.PENDING},
+    "completed": {"status": TaskStatus.COMPLETED},
+}
+TEXT_FILTERS = {
+    "no text": {},
+    "title_contains": {"title_contains": "abc"},
+    "substring": {"q": "task 12"},
+    "fulltext": {"q": "1234", "search_mode": SearchMode.FULLTEXT},
+}
+
+
+def get_tasks_queries() -> list[tuple[str, dict, bool]]:
+    """
+    Every combination of the get_tasks filters, with each sort and order for the first page and the next one
+    :return: the name, the get_tasks arguments and whether to continue from the cursor of the first page
+    """
+    queries = []
+    for (date_id, date), (status_id, status), (text_id, text_filter) in itertools.product(
+            DATE_FILTERS.items(), STATUS_FILTERS.items(), TEXT_FILTERS.items()):
+        filters = {**date, **status, **text_filter}
+
+        if text_filter.get("search_mode") == SearchMode.FULLTEXT:
+            # ranked by relevance, no sort and no cursor
+            queries.append((f"{date_id}, {status_id}, {text_id}", filters, False))
+            continue
+
+        for sort, order, with_cursor in itertools.product(TaskSortField, SortOrder, [False, True]):
+            page = "next page" if with_cursor else "first page"
+            queries.append((f"{date_id}, {status_id}, {text_id}, {sort.value} {order.value}, {page}",
+                            {**filters, "sort": sort, "order": order}, with_cursor))
+
+    return queries
+
+
+def measure(session_maker: sessionmaker, repeat: int, run: Callable[[Session, Any], Any],
+            prepare: Callable[[Session], Any] = lambda session: None) -> dict:
+    """
+    Time a call, each time in a new session
+    :param session_maker: creates the sessions
+    :param repeat: the number of timed calls
+    :param run: the timed call, gets the session and the result of prepare
+    :param prepare: the setup of a call, not timed
+    :return: the statistics of the timings in milliseconds
+    """
+    timings = []
+    for _ in range(repeat + 1):
+        with session_maker() as session:
+            argument = prepare(session)
+            start = time.perf_counter()
+            run(session, argument)
+            timings.append((time.perf_counter() - start) * 1000)
+            session.rollback()
+
+    timings = timings[1:]
+
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "stdev_ms": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+class Suite:
+    """The benchmarks of one table size"""
+
+    def __init__(self, session_maker: sessionmaker, rows: int, repeat: int, max_export_rows: int):
+        self.session_maker = session_maker
+        self.rows = rows
+        self.repeat = repeat
+        self.max_export_rows = max_export_rows
+        self.random = random.Random(42)
+        self.created_ids: list[int] = []
+        with session_maker() as session:
+            self.min_id, self.max_id = session.execute(select(func.min(models.Task.id),
+                                                              func.max(models.Task.id))).one()
+
+    def run(self) -> list[dict]:
+        results = []
+        for name, run, prepare, repeat in self.benchmarks():
+            result = measure(self.session_maker, repeat, run, prepare)
+            results.append({"name": name, "rows": self.rows, **result})
+            print(f"{self.rows:>9} {name:<90} {result['median_ms']:>10.3f} ms", flush=True)
+
+        return results
+
+    def benchmarks(self) -> list[tuple[str, Callable, Callable, int]]:
+        """
+        :return: the name, timed call, setup and number of runs of every benchmark, in the order they run
+        """
+        repository = TaskRepositoryDatabase
+        repeat = self.repeat
+        benchmarks = [
+            ("repository.create_task", lambda s, task: self.created_ids.append(repository(s).create_task(task).id),
+             lambda s: self._new_tasks(1)[0], repeat),
+            ("repository.get_task", lambda s, task_id: repository(s).get_task(task_id),
+             lambda s: self._random_ids(1)[0], repeat),
+            ("repository.edit_task", lambda s, task: repository(s).edit_task(task),
+             lambda s: repository(s).get_task(self._random_ids(1)[0]), repeat),
+            ("repository.complete_task", lambda s, task_id: repository(s).complete_task(task_id, datetime.now()),
+             lambda s: self._pending_ids(s, 1)[0], repeat),
+            ("repository.delete_task", lambda s, task_id: repository(s).delete_task(task_id),
+             lambda s: self.created_ids.pop(), repeat),
+            (f"repository.create_tasks[{BATCH_SIZE}]",
+             lambda s, tasks: self.created_ids.extend(task.id for task in repository(s).create_tasks(tasks)),
+             lambda s: self._new_tasks(BATCH_SIZE), repeat),
+            (f"repository.complete_tasks[{BATCH_SIZE}]",
+             lambda s, task_ids: repository(s).complete_tasks(task_ids, datetime.now()),
+             lambda s: self._pending_ids(s, BATCH_SIZE), repeat),
+            (f"repository.delete_tasks[{BATCH_SIZE}]", lambda s, task_ids: repository(s).delete_tasks(task_ids),
+             lambda s: [self.created_ids.pop() for _ in range(BATCH_SIZE)], repeat),
+            ("repository.get_data_version", lambda s, _: repository(s).get_data_version(), lambda s: None, repeat),
+            ("repository.stream_task_batches[first batch]",
+             lambda s, _: next(repository(s).stream_task_batches()), lambda s: None, repeat),
+        ]
+
+        for name, filters, with_cursor in get_tasks_queries():
+            cursor = self._second_page_cursor(filters) if with_cursor else None
+            if with_cursor and cursor is None:
+                # a single page
+                continue
+            benchmarks.append((
+                f"repository.get_tasks[{name}]",
+                lambda s, _, filters=filters, cursor=cursor: repository(s).get_tasks(limit=PAGE_SIZE, cursor=cursor,
+                                                                                     **filters),
+                lambda s: None, repeat
+            ))
+
+        benchmarks += [
+            (f"repository._orm_to_entity[{BATCH_SIZE}]",
+             lambda s, db_tasks: [repository._orm_to_entity(db_task) for db_task in db_tasks],
+             lambda s: s.scalars(select(models.Task).limit(BATCH_SIZE)).all(), repeat),
+            (f"json.tasks_response[{BATCH_SIZE}]", lambda s, tasks: current_body(tasks),
+             lambda s: repository(s).get_tasks(limit=BATCH_SIZE), repeat),
+        ]
+
+        if self.rows <= self.max_export_rows:
+            # reads and writes the whole table, a few runs are enough
+            benchmarks.append(("service.get_tasks_xlsx", lambda s, _: TasksService(repository(s)).get_tasks_xlsx(),
+                               lambda s: None, min(repeat, 3)))
+
+        return benchmarks
+
+    def _new_tasks(self, count: int) -> list[TaskEntity]:
+        return [TaskEntity(None, "benchmark task", "created by the benchmark", created_at=NOW) for _ in range(count)]
+
+    def _random_ids(self, count: int) -> list[int]:
+        return self.random.sample(range(self.min_id, self.max_id + 1), count)
+
+    def _pending_ids(self, session: Session, count: int) -> list[int]:
+        """random tasks, made pending so that completing them does the whole work"""
+        task_ids = self._random_ids(count)
+        session.execute(update(models.Task).where(models.Task.id.in_(task_ids))
+                        .values(status=TaskStatus.PENDING, completed_at=None))
+        session.commit()
+
+        return task_ids
+
+    def _second_page_cursor(self, filters: dict) -> Optional[TaskCursor]:
+        with self.session_maker() as session:
+            first_page = TaskRepositoryDatabase(session).get_tasks(limit=PAGE_SIZE, **filters)
+
+        if len(first_page) < PAGE_SIZE:
+            return None
+
+        return TaskCursor.after(first_page[-1], filters["sort"], filters["order"])
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace):
+    engine = create_engine(args.url)
+    session_maker = sessionmaker(bind=engine, autoflush=False)
+    results = []
+
+    for rows in args.rows:
+        if not (args.keep and count_tasks(engine) == rows):
+            seed_tasks(engine, rows, progress=rows > 1000000)
+        results += Suite(session_maker, rows, args.repeat, args.max_export_rows).run()
+
+    output = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "database": engine.dialect.name,
+            "server_version": ".".join(str(part) for part in engine.dialect.server_version_info or ()),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    engine.dispose()
+
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"results written to {args.output}")
+
+
+def compare(args: argparse.Namespace) -> int:
+    """
+    :return: the exit code, 1 if a benchmark regressed
+    """
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    if baseline["meta"]["database"] != current["meta"]["database"]:
+        print(f"warning: comparing {baseline['meta']['database']} with {current['meta']['database']}")
+
+    baseline_results = {(result["name"], result["rows"]): result for result in baseline["results"]}
+    regressions = 0
+    changes = []
+    print(f"{'rows':>9} {'benchmark':<90} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+    for result in current["results"]:
+        key = (result["name"], result["rows"])
+        previous = baseline_results.pop(key, None)
+        if previous is None:
+            print(f"{result['rows']:>9} {result['name']:<90} {'-':>12} {result['median_ms']:>11.3f} {'new':>8}")
+            continue
+
+        change = result["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0.0
+        changes.append(change)
+        slower = result["median_ms"] - previous["median_ms"] > args.min_ms
+        flag = ""
+        if change > args.threshold and slower:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold and previous["median_ms"] - result["median_ms"] > args.min_ms:
+            flag = "  faster"
+        print(f"{result['rows']:>9} {result['name']:<90} {previous['median_ms']:>12.3f} {result['median_ms']:>11.3f} "
+              f"{change:>+8.1%}{flag}")
+
+    for name, rows in baseline_results:
+        print(f"{rows:>9} {name:<90} missing from the current run")
+
+    # every benchmark slower (or faster) by about the same amount: the machine changed, not the code
+    if changes:
+        print(f"median change of all the benchmarks: {statistics.median(changes):+.1%}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%}")
+
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--url", default=settings.DEFAULT_SQLALCHEMY_DATABASE_URI,
+                            help="database to seed, the one of .env by default (its tasks are replaced)")
+    run_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    run_parser.add_argument("--repeat", type=int, default=10)
+    run_parser.add_argument("--max-export-rows", type=int, default=1000000)
+    run_parser.add_argument("--output", default="benchmark-results.json")
+    run_parser.add_argument("--keep", action="store_true",
+                            help="don't seed the database again if it has the number of tasks already")
+
+    compare_parser = commands.add_parser("compare", help="compare two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged")
+    compare_parser.add_argument("--min-ms", type=float, default=0.1, help="smaller slowdowns are noise")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Throughput comparison of the sync (psycopg2 + threadpool) and asyncio (asyncpg) database modes.
+
+Starts the API under uvicorn once per DATABASE_MODE against the database configured in .env, empties the tasks table,
+seeds a few tasks and then hammers the read and write routes with a fixed number of concurrent clients.
+
+usage: python -m benchmarks.throughput [--concurrency 200] [--duration 10] [--port 8765]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+from sqlalchemy import delete
+from app.infrastructure.database import models
+from app.infrastructure.database.session import get_engine
+
+
+async def _wait_until_up(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/api/tasks/0")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+
+    raise RuntimeError("server did not start")
+
+
+async def _worker(client: httpx.AsyncClient, task_ids: list[int], deadline: float, latencies: list[float],
+                  errors: list[int]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        roll = random.random()
+
+        try:
+            if roll < 0.6:
+                response = await client.get(f"/api/tasks/{random.choice(task_ids)}")
+            elif roll < 0.9:
+                response = await client.get("/api/tasks", params={"title_contains": f"bench {random.randint(0, 9)}"})
+            else:
+                response = await client.post("/api/tasks", json={"title": "bench write", "description": None})
+            status_code = response.status_code
+        except httpx.TransportError:
+            status_code = 0
+
+        latencies.append(time.perf_counter() - start)
+        if not 200 <= status_code < 400:
+            errors.append(status_code)
+
+
+async def _run_load(base_url: str, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await _wait_until_up(client)
+
+        task_ids = []
+        for i in range(50):
+            response = await client.post("/api/tasks", json={"title": f"bench {i % 10}", "description": "seed"})
+            task_ids.append(response.json()["id"])
+
+        latencies: list[float] = []
+        errors: list[int] = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_worker(client, task_ids, deadline, latencies, errors) for _ in range(concurrency)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": len(errors),
+    }
+
+
+def run_mode(mode: str, concurrency: int, duration: float, port: int) -> dict:
+    """
+    Runs the load against a uvicorn server started with the given DATABASE_MODE
+    :param mode: "sync" or "asyncio"
+    :param concurrency: number of concurrent clients
+    :param duration: seconds of load
+    :param port: port for the server
+    :return: the measured results
+    """
+    # every mode starts from the same (empty) table
+    with get_engine().begin() as connection:
+        connection.execute(delete(models.Task))
+
+    env = {**os.environ, "DATABASE_MODE": mode, "ALLOWED_HOSTS": '["*"]'}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+    )
+    try:
+        return asyncio.run(_run_load(f"http://127.0.0.1:{port}", concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in ("sync", "asyncio"):
+        result = run_mode(mode, args.concurrency, args.duration, args.port)
+        print(f"{mode:<8} {result['requests']:>9} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
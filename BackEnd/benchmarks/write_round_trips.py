@@ -0,0 +1,130 @@
+"""
+Round trips and latency of completing, editing and deleting one task, the previous read-then-write repository
+methods against the single UPDATE/DELETE ... RETURNING ones.
+
+Seeds the tasks table of the database configured in .env with --tasks pending tasks, then runs each operation once
+per task through a repository, in a new session per operation (like a request). The statements sent to the
+database are counted with a before_cursor_execute listener, plus one for the COMMIT.
+
+usage: python -m benchmarks.write_round_trips [--tasks 2000]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+from sqlalchemy import delete, event, insert, select
+from app.domain.entities.task import Task as TaskEntity
+from app.infrastructure.database import models
+from app.infrastructure.database.session import get_engine, get_session_maker
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+
+
+class PreviousTaskRepository(TaskRepositoryDatabase):
+    """The write methods as they were before the UPDATE ... RETURNING ones"""
+
+    def complete_task(self, task_id: int, completed_at: datetime) -> TaskEntity | None:
+        # TasksService.complete_task read the task, then edited it
+        task = self.get_task(task_id)
+        if task is None:
+            return None
+        task.complete(completed_at)
+
+        return self.edit_task(task)
+
+    def edit_task(self, task: TaskEntity) -> TaskEntity | None:
+        db_task = self.session.query(models.Task).filter(models.Task.id == task.id).first()
+        if db_task is None:
+            return None
+
+        db_task.title = task.title
+        db_task.description = task.description
+        db_task.status = task.status
+        db_task.due_date = task.due_date
+        db_task.completed_at = task.completed_at
+        self.session.commit()
+        self.session.refresh(db_task)
+
+        return self._orm_to_entity(db_task)
+
+    def delete_task(self, task_id: int) -> bool:
+        db_task = self.session.query(models.Task).filter(models.Task.id == task_id).first()
+        if db_task is None:
+            return False
+
+        self.session.delete(db_task)
+        self.session.commit()
+
+        return True
+
+
+def _operations(repository: TaskRepositoryDatabase, task_id: int) -> dict:
+    edited = TaskEntity(task_id=task_id, title="edited", description=None, created_at=datetime.now())
+
+    return {
+        "complete": lambda: repository.complete_task(task_id, datetime.now()),
+        "edit": lambda: repository.edit_task(edited),
+        "delete": lambda: repository.delete_task(task_id),
+    }
+
+
+def seed_tasks(count: int) -> list[int]:
+    now = datetime.now()
+    with get_engine().begin() as connection:
+        connection.execute(delete(models.Task))
+        connection.execute(insert(models.Task), [
+            {"title": f"task {i}", "status": "pending", "created_at": now} for i in range(count)
+        ])
+        return list(connection.scalars(select(models.Task.id).order_by(models.Task.id)))
+
+
+def measure(repository_class: type, task_ids: list[int]) -> dict[str, tuple[float, float]]:
+    """
+    Runs every operation once per task
+    :param repository_class: the repository to measure
+    :param task_ids: the tasks, deleted by the run
+    :return: for each operation, the statements per call and the median latency in ms
+    """
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", count)
+    # psycopg2 sends BEGIN along with the first statement, the COMMIT is a round trip of its own
+    event.listen(engine, "commit", count)
+
+    results = {}
+    try:
+        for operation in ("complete", "edit", "delete"):
+            statements = 0
+            latencies = []
+            for task_id in task_ids:
+                with get_session_maker()() as session:
+                    call = _operations(repository_class(session), task_id)[operation]
+                    start = time.perf_counter()
+                    call()
+                    latencies.append(time.perf_counter() - start)
+            results[operation] = (statements / len(task_ids), statistics.median(latencies) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        event.remove(engine, "commit", count)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'operation':<10} {'repository':<9} {'statements':>10} {'median ms':>10}")
+    for label, repository_class in (("previous", PreviousTaskRepository), ("current", TaskRepositoryDatabase)):
+        results = measure(repository_class, seed_tasks(args.tasks))
+        for operation, (statements, median_ms) in results.items():
+            print(f"{operation:<10} {label:<9} {statements:>10.1f} {median_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from app.domain.repositories.task_repository import ITaskRepository
 from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_record import TaskRecord
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import TaskStats, DailyCount
+from app.domain.entities.task_changes import TaskChanges, TaskChangeToken
 
 
 class MockTaskRepository(ITaskRepository):
@@ -9,12 +14,15 @@ class MockTaskRepository(ITaskRepository):
 
     def __init__(self):
         self.tasks: List[Task] = []
+        self.archived: List[Task] = []
         self._next_id = 1
+        self.data_version = 0
 
     def create_task(self, task: Task) -> Task:
         task.id = self._next_id
         self._next_id += 1
         self.tasks.append(task)
+        self.data_version += 1
 
         return task
 
@@ -29,19 +37,86 @@ class MockTaskRepository(ITaskRepository):
         for i, existing_task in enumerate(self.tasks):
             if existing_task.id == task.id:
                 self.tasks[i] = task
+                self.data_version += 1
                 return task
 
         return None
 
+    def complete_task(self, task_id: int, completed_at: datetime) -> Task | None:
+        task = self.get_task(task_id)
+        if task is not None:
+            task.complete(completed_at)
+            self.data_version += 1
+
+        return task
+
     def delete_task(self, task_id: int) -> bool:
         for i, task in enumerate(self.tasks):
             if task.id == task_id:
                 self.tasks.pop(i)
+                self.data_version += 1
                 return True
 
         return False
 
+    def create_tasks(self, tasks: List[Task]) -> List[Task]:
+        return [self.create_task(task) for task in tasks]
+
+    def complete_tasks(self, task_ids: List[int], completed_at: datetime) -> List[Optional[Task]]:
+        return [self.complete_task(task_id, completed_at) for task_id in task_ids]
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        return [self.delete_task(task_id) for task_id in task_ids]
+
+    def archive_tasks(self, completed_before: datetime, limit: int) -> int:
+        # the archived tasks are moved to a list of their own, no read logic
+        completed = [task for task in self.tasks if task.completed_at is not None]
+        archived = sorted((task for task in completed if task.completed_at < completed_before),
+                          key=lambda task: task.completed_at)[:limit]
+        for task in archived:
+            self.tasks.remove(task)
+        self.archived.extend(archived)
+        if archived:
+            self.data_version += 1
+
+        return len(archived)
+
     def get_tasks(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
-                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None) -> List[Task]:
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  limit: Optional[int] = None, cursor: Optional[TaskCursor] = None,
+                  sort: TaskSortField = TaskSortField.CREATED_AT, order: SortOrder = SortOrder.DESC,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  include_archived: bool = False) -> List[Task]:
         # no filter logic this is part of the actual repo
         return self.tasks
+
+    def stream_task_batches(self, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                            status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                            q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                            batch_size: int = 1000, include_archived: bool = False) -> Iterator[List[TaskRecord]]:
+        records = [
+            TaskRecord(task.id, task.title, task.description, task.status, task.due_date, task.completed_at,
+                       task.created_at)
+            for task in self.tasks
+        ]
+
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
+
+    def get_stats(self, now: datetime, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                  status: Optional[TaskStatus] = None, title_contains: Optional[str] = None,
+                  q: Optional[str] = None, search_mode: SearchMode = SearchMode.SUBSTRING,
+                  due_within_days: int = 7, days: int = 30, include_archived: bool = False) -> TaskStats:
+        # counts of all the tasks, no filter or daily logic
+        by_status = {status: sum(task.status == status for task in self.tasks) for status in TaskStatus}
+        return TaskStats(len(self.tasks), by_status, 0, 0, due_within_days,
+                         [DailyCount(now.date(), 0, 0)] * days, {50: None, 90: None, 99: None})
+
+    def get_changes(self, since: Optional[TaskChangeToken] = None, limit: int = 1000) -> TaskChanges:
+        # every task is a change of the current version, no deletions
+        tasks = self.tasks if since is None or since.version < self.data_version else []
+
+        return TaskChanges(tasks[:limit], [], TaskChangeToken(self.data_version, 0), len(tasks) > limit)
+
+    def get_data_version(self) -> int:
+        return self.data_version
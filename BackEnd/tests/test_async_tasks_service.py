@@ -0,0 +1,66 @@
+"""Unit tests for AsyncTasksService using a mock async repository."""
+import pytest
+from datetime import datetime, timedelta
+from app.services.async_tasks_service import AsyncTasksService
+from app.domain.entities.task import TaskStatus
+from tests.mock_async_task_repository import MockAsyncTaskRepository
+
+
+@pytest.mark.anyio
+class TestAsyncTasksService:
+    """Test suite for AsyncTasksService"""
+
+    @pytest.fixture
+    def mock_repo(self):
+        """Fixture to provide a fresh mock repository for each test"""
+        return MockAsyncTaskRepository()
+
+    @pytest.fixture
+    def service(self, mock_repo):
+        """Fixture to provide an AsyncTasksService with a mock repository"""
+        return AsyncTasksService(mock_repo)
+
+    async def test_create_and_get_task(self, service, mock_repo):
+        """Test creating a task and reading it back"""
+        due_date = datetime.now() + timedelta(days=1)
+
+        task = await service.create_task("Test Task", "Test Description", due_date)
+        retrieved_task = await service.get_task(task.id)
+
+        assert retrieved_task is not None
+        assert retrieved_task.title == "Test Task"
+        assert retrieved_task.due_date == due_date
+        assert retrieved_task.status == TaskStatus.PENDING
+        assert len(mock_repo.tasks) == 1
+
+    async def test_complete_task_twice_keeps_original_timestamp(self, service):
+        """Test that completing a task twice does not update the completed_at timestamp"""
+        task = await service.create_task("Task", "Desc", datetime.now())
+
+        first = await service.complete_task(task.id)
+        first_completed_at = first.completed_at
+        second = await service.complete_task(task.id)
+
+        assert second.status == TaskStatus.COMPLETED
+        assert second.completed_at == first_completed_at
+
+    async def test_complete_task_not_found(self, service):
+        """Test completing a non-existent task"""
+        assert await service.complete_task(123) is None
+
+    async def test_delete_task(self, service):
+        """Test deleting an existing and a non-existent task"""
+        task = await service.create_task("Task to delete", None, None)
+
+        assert await service.delete_task(task.id) is True
+        assert await service.delete_task(task.id) is False
+        assert await service.get_task(task.id) is None
+
+    async def test_get_tasks_xlsx(self, service):
+        """Test generating XLSX off the event loop"""
+        await service.create_task("Task 1", None, None)
+
+        xlsx_data = await service.get_tasks_xlsx()
+
+        assert isinstance(xlsx_data, bytes)
+        assert len(xlsx_data) > 0
@@ -0,0 +1,168 @@
+"""Unit tests for the read-through task cache, in front of the mock repository."""
+import pytest
+from datetime import datetime
+from app.domain.entities.task import Task, TaskStatus
+from app.infrastructure.cache import cache_backend
+from app.infrastructure.cache.cache_backend import LocalCacheBackend
+from app.infrastructure.cache.task_cache import TaskCache
+from app.infrastructure.cache.caching_task_repository import CachingTaskRepository
+from app.infrastructure.cache.async_caching_task_repository import AsyncCachingTaskRepository
+from tests.mock_task_repository import MockTaskRepository
+from tests.mock_async_task_repository import MockAsyncTaskRepository
+
+
+class CountingTaskRepository(MockTaskRepository):
+    """Mock repository counting the reads that reach it"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_task(self, task_id: int):
+        self.reads += 1
+        return super().get_task(task_id)
+
+    def get_tasks(self, *args, **kwargs):
+        self.reads += 1
+        return super().get_tasks(*args, **kwargs)
+
+
+def new_task(title: str) -> Task:
+    return Task(task_id=None, title=title, description=None, created_at=datetime.now())
+
+
+class TestCachingTaskRepository:
+    """Test suite for CachingTaskRepository"""
+
+    @pytest.fixture
+    def backend(self):
+        """Fixture to provide the store of the cache, stands in for Redis"""
+        return LocalCacheBackend(max_entries=100)
+
+    @pytest.fixture
+    def repository(self):
+        """Fixture to provide the repository behind the cache"""
+        return CountingTaskRepository()
+
+    @pytest.fixture
+    def cache(self, backend):
+        """Fixture to provide the task cache"""
+        return TaskCache(backend, ttl=60)
+
+    @pytest.fixture
+    def caching_repository(self, repository, cache):
+        """Fixture to provide the caching repository"""
+        return CachingTaskRepository(repository, cache)
+
+    def test_get_task_is_cached(self, caching_repository, repository, cache):
+        """Test that a task is read from the repository once"""
+        task = caching_repository.create_task(new_task("Task"))
+
+        first = caching_repository.get_task(task.id)
+        second = caching_repository.get_task(task.id)
+
+        assert first.title == second.title == "Task"
+        assert repository.reads == 1
+        assert cache.stats == {"hits": 1, "misses": 1}
+
+    def test_missing_task_is_not_cached(self, caching_repository, repository):
+        """Test that reading a missing task always goes to the repository"""
+        assert caching_repository.get_task(123) is None
+        assert caching_repository.get_task(123) is None
+        assert repository.reads == 2
+
+    def test_get_tasks_key_is_normalised(self, caching_repository, repository):
+        """Test that equivalent filters share a cache entry and different ones don't"""
+        caching_repository.create_task(new_task("Task"))
+
+        caching_repository.get_tasks(title_contains="", status=TaskStatus.PENDING)
+        caching_repository.get_tasks(title_contains=None, status=TaskStatus("pending"))
+        caching_repository.get_tasks(status=TaskStatus.COMPLETED)
+
+        assert repository.reads == 2
+
+    def test_writes_invalidate(self, caching_repository, repository):
+        """Test that every write makes the next reads go to the repository"""
+        task = caching_repository.create_task(new_task("Task"))
+        caching_repository.get_tasks()
+        caching_repository.get_task(task.id)
+
+        caching_repository.complete_task(task.id, datetime.now())
+        completed = caching_repository.get_task(task.id)
+        caching_repository.create_task(new_task("Other task"))
+        titles = [t.title for t in caching_repository.get_tasks()]
+        caching_repository.delete_task(task.id)
+
+        assert completed.status == TaskStatus.COMPLETED
+        assert titles == ["Task", "Other task"]
+        assert caching_repository.get_task(task.id) is None
+        # 5 reads reach the repository, plus the one of the mock complete_task
+        assert repository.reads == 6
+
+    def test_writes_around_the_cache_invalidate(self, caching_repository, repository):
+        """Test that a write that does not go through the cache still invalidates it, through the data version"""
+        task = caching_repository.create_task(new_task("Task"))
+        caching_repository.get_task(task.id)
+
+        repository.complete_task(task.id, datetime.now())
+
+        assert caching_repository.get_task(task.id).status == TaskStatus.COMPLETED
+        assert repository.reads == 3
+
+    def test_ttl(self, caching_repository, repository, monkeypatch):
+        """Test that the cached reads expire after the TTL"""
+        task = caching_repository.create_task(new_task("Task"))
+        caching_repository.get_task(task.id)
+        now = cache_backend.time.monotonic()
+
+        monkeypatch.setattr(cache_backend.time, "monotonic", lambda: now + 61)
+        caching_repository.get_task(task.id)
+
+        assert repository.reads == 2
+
+    def test_workers_sharing_a_backend_stay_coherent(self, backend, repository, caching_repository):
+        """Test that a write through one worker invalidates the reads cached by another one using the same store"""
+        other_worker = CachingTaskRepository(repository, TaskCache(backend, ttl=60))
+        task = caching_repository.create_task(new_task("Task"))
+        other_worker.get_task(task.id)
+
+        caching_repository.complete_task(task.id, datetime.now())
+
+        assert other_worker.get_task(task.id).status == TaskStatus.COMPLETED
+
+
+class TestLocalCacheBackend:
+    """Test suite for LocalCacheBackend"""
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the store keeps max_entries values, evicting the least recently used"""
+        backend = LocalCacheBackend(max_entries=2)
+        backend.set("a", b"1", 60)
+        backend.set("b", b"2", 60)
+        backend.get("a")
+
+        backend.set("c", b"3", 60)
+
+        assert len(backend) == 2
+        assert backend.get("b") is None
+        assert backend.get("a") == b"1"
+        assert backend.get("c") == b"3"
+
+
+@pytest.mark.anyio
+class TestAsyncCachingTaskRepository:
+    """Test suite for AsyncCachingTaskRepository"""
+
+    async def test_read_through_and_invalidation(self):
+        """Test that reads are cached and writes invalidate them"""
+        cache = TaskCache(LocalCacheBackend(), ttl=60)
+        repository = AsyncCachingTaskRepository(MockAsyncTaskRepository(), cache)
+        task = await repository.create_task(new_task("Task"))
+
+        await repository.get_tasks()
+        await repository.get_tasks()
+        await repository.complete_task(task.id, datetime.now())
+        tasks = await repository.get_tasks()
+
+        assert tasks[0].status == TaskStatus.COMPLETED
+        assert cache.stats == {"hits": 1, "misses": 2}
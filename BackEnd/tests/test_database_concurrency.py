@@ -0,0 +1,91 @@
+"""Concurrency tests for the request scoped database sessions, running the API against a SQLite database."""
+import asyncio
+import time
+import httpx
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.infrastructure.database import models
+
+# Simulated database round trip of every statement, so the requests compete for pool connections
+STATEMENT_LATENCY = 0.005
+REQUESTS = 200
+
+
+class PoolUsage:
+    """Tracks the highest number of connections checked out of a pool at the same time"""
+
+    def __init__(self, engine):
+        self.checked_out = 0
+        self.max_checked_out = 0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, *args):
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _on_checkin(self, *args):
+        self.checked_out -= 1
+
+
+@pytest.mark.anyio
+class TestDatabaseConcurrency:
+    """Test suite for the per request database sessions"""
+
+    @pytest.fixture(autouse=True)
+    def seed_tasks(self, database_path):
+        """Fixture to seed the test database with a few tasks"""
+        engine = create_engine(f"sqlite:///{database_path}")
+
+        with sessionmaker(bind=engine)() as session:
+            session.add_all(models.Task(title=f"Task {i}", created_at=datetime.now()) for i in range(10))
+            session.commit()
+
+        engine.dispose()
+
+    @staticmethod
+    def use_sync_database(use_database, pool_size: int) -> PoolUsage:
+        engine = use_database("sync", pool_size=pool_size)
+        event.listen(engine, "before_cursor_execute", lambda *args: time.sleep(STATEMENT_LATENCY))
+
+        return PoolUsage(engine)
+
+    @staticmethod
+    async def fire_requests() -> list[httpx.Response]:
+        """Sends all the requests at once"""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            return await asyncio.gather(*(client.get(f"/api/tasks/{i % 10 + 1}") for i in range(REQUESTS)))
+
+    async def test_sync_parallel_requests_use_their_own_session(self, use_database):
+        """Test that parallel requests in sync mode don't share a session"""
+        pool_usage = self.use_sync_database(use_database, pool_size=8)
+
+        responses = await self.fire_requests()
+
+        assert [response.status_code for response in responses] == [200] * REQUESTS
+        assert pool_usage.max_checked_out == 8
+        assert pool_usage.checked_out == 0
+
+    async def test_async_parallel_requests_use_their_own_session(self, use_database):
+        """Test that parallel requests in asyncio mode don't share a session"""
+        pool_usage = PoolUsage(use_database("asyncio", pool_size=8))
+
+        responses = await self.fire_requests()
+
+        assert [response.status_code for response in responses] == [200] * REQUESTS
+        assert 1 < pool_usage.max_checked_out <= 8
+        assert pool_usage.checked_out == 0
+
+    async def test_concurrency_scales_with_pool_size(self, use_database):
+        """Test that the parallel requests use as many connections as the pool allows, and no more"""
+        for pool_size in (1, 4, 8):
+            pool_usage = self.use_sync_database(use_database, pool_size=pool_size)
+
+            responses = await self.fire_requests()
+
+            assert [response.status_code for response in responses] == [200] * REQUESTS
+            assert pool_usage.max_checked_out == pool_size
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import container
+from app.domain.entities.task import Task
+from app.infrastructure.database.leader_lock import PostgresLeaderLock
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.events.task_event_broker import TaskEventBroker
+from app.infrastructure.events.task_event_publisher import BrokerTaskEventPublisher
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+from app.infrastructure.reminders.reminder_sink import ReminderSink, LogReminderSink, FileReminderSink
+from app.services.due_reminders import DueReminderScheduler
+from app.services.tasks_service import TasksService
+
+LEAD = 3600
+WINDOW = 3600
+
+
+class ListReminderSink(ReminderSink):
+    """Keeps the reminded tasks"""
+
+    def __init__(self):
+        self.reminded: list[Task] = []
+
+    async def send(self, tasks: list[Task]):
+        self.reminded += tasks
+
+
+class NeverLock:
+    """A lock held by another worker"""
+
+    async def acquire(self) -> bool:
+        return False
+
+    async def release(self):
+        pass
+
+
+def edit(service: TasksService, task: Task, **changes) -> Task:
+    """edit a task through the repository of the service (the API has no edit route)"""
+    edited = Task(task_id=task.id, title=task.title, description=task.description, created_at=task.created_at,
+                  status=task.status, due_date=task.due_date, completed_at=task.completed_at)
+    for name, value in changes.items():
+        setattr(edited, name, value)
+
+    return service.task_repository.edit_task(edited)
+
+
+def due_in(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+async def wait_for(condition, timeout: float = 2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+class TestDueReminderScheduler:
+    """Test suite for the reminders of the tasks about to be due"""
+
+    @pytest.fixture
+    def broker(self):
+        """Fixture to provide the task event broker of the test"""
+        broker = TaskEventBroker(queue_size=100, max_subscriptions=10)
+        yield broker
+        broker.close()
+
+    @pytest.fixture
+    def service(self, broker):
+        """Fixture to provide a tasks service on an in-memory store publishing its events to the broker"""
+        return TasksService(InMemoryTaskRepository(events=BrokerTaskEventPublisher(broker)))
+
+    @pytest.fixture
+    def sink(self):
+        """Fixture to provide a sink keeping the reminders"""
+        return ListReminderSink()
+
+    @pytest.fixture
+    async def start(self, service, broker, sink):
+        """Fixture to provide a function starting a scheduler on the service, it is stopped at the end of the test"""
+        running = []
+
+        async def start_scheduler(batch_size: int = 500):
+            scheduler = DueReminderScheduler(lambda: service, lambda: None, lambda: None, broker, sink, LEAD, WINDOW,
+                                             batch_size=batch_size)
+            running.append(asyncio.create_task(scheduler.run()))
+            # subscribed and loaded
+            await wait_for(lambda: broker.subscriptions == 1)
+            await asyncio.sleep(0.05)
+
+        yield start_scheduler
+
+        for task in running:
+            task.cancel()
+
+    async def test_reminds_the_tasks_due_soon(self, service, sink, start):
+        """Test that the tasks due within the lead are reminded once, the later and the done ones are not"""
+        soon, later, done, _ = [service.create_task(title, None, due_date) for title, due_date in [
+            ("Soon", due_in(60)), ("Later", due_in(LEAD + 600)), ("Done", due_in(60)), ("No due date", None)
+        ]]
+        service.complete_task(done.id)
+        # past the first page
+        await start(batch_size=1)
+
+        assert [task.id for task in sink.reminded] == [soon.id]
+
+        edit(service, soon, title="Soon, renamed")
+        await asyncio.sleep(0.05)
+        assert [task.id for task in sink.reminded] == [soon.id]
+
+    async def test_wakes_up_when_a_task_is_due(self, service, sink, start):
+        """Test that a task is reminded when it gets within the lead, without any event"""
+        task = service.create_task("Task", None, due_in(LEAD + 0.3))
+        await start()
+
+        assert sink.reminded == []
+        await wait_for(lambda: sink.reminded)
+        assert [reminded.id for reminded in sink.reminded] == [task.id]
+
+    async def test_follows_the_task_events(self, service, sink, start):
+        """Test that the tasks created, moved, completed and deleted after the read are followed"""
+        await start()
+
+        moved = service.create_task("Moved", None, due_in(LEAD + 600))
+        completed = service.create_task("Completed", None, due_in(LEAD + 0.2))
+        deleted = service.create_task("Deleted", None, due_in(LEAD + 0.2))
+        created = service.create_task("Created", None, due_in(LEAD + 0.2))
+        edit(service, moved, due_date=due_in(LEAD + 0.2))
+        service.complete_task(completed.id)
+        service.delete_task(deleted.id)
+        await wait_for(lambda: len(sink.reminded) == 2)
+        await asyncio.sleep(0.3)
+
+        assert sorted(task.id for task in sink.reminded) == [moved.id, created.id]
+
+    async def test_needs_the_lock(self, service, sink):
+        """Test that a worker without the lock sends no reminder"""
+        service.create_task("Soon", None, due_in(60))
+        scheduler = DueReminderScheduler(lambda: service, lambda: None, lambda: None, TaskEventBroker(), sink, LEAD,
+                                         WINDOW, lock=NeverLock(), check_interval=0.01)
+        running = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.1)
+        running.cancel()
+
+        assert sink.reminded == []
+
+    async def test_stops_when_the_broker_closes(self, service, broker, sink):
+        """Test that the scheduler ends on shutdown"""
+        scheduler = DueReminderScheduler(lambda: service, lambda: None, lambda: None, broker, sink, LEAD, WINDOW)
+        running = asyncio.create_task(scheduler.run())
+        await wait_for(lambda: broker.subscriptions == 1)
+
+        broker.close()
+
+        await asyncio.wait_for(running, 1)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("mode", ["sync", "asyncio"])
+async def test_reads_the_database(use_database, database_path, mode):
+    """Test that the scheduler reads the due tasks of the database with the sessions of the DATABASE_MODE"""
+    use_database(mode)
+    engine = create_engine(f"sqlite:///{database_path}")
+    with sessionmaker(bind=engine)() as session:
+        soon = TaskRepositoryDatabase(session).create_task(
+            Task(task_id=None, title="Soon", description=None, created_at=datetime.now(), due_date=due_in(60))
+        )
+    engine.dispose()
+    sink = ListReminderSink()
+    scheduler = DueReminderScheduler(container.tasks_service, container.db_session_factory,
+                                     container.async_db_session_factory, container.task_event_broker(), sink, LEAD,
+                                     WINDOW)
+    running = asyncio.create_task(scheduler.run())
+    try:
+        await wait_for(lambda: sink.reminded)
+    finally:
+        running.cancel()
+
+    assert [task.id for task in sink.reminded] == [soon.id]
+
+
+@pytest.mark.anyio
+class TestReminderSinks:
+    """Test suite for the delivery of the reminders"""
+
+    @pytest.fixture
+    def tasks(self) -> list[Task]:
+        """Fixture to provide a task about to be due"""
+        return [Task(task_id=1, title="Report", description=None, created_at=datetime(2026, 1, 1),
+                     due_date=datetime(2026, 1, 2, tzinfo=timezone.utc))]
+
+    async def test_file_sink(self, tmp_path, tasks):
+        """Test that the reminders are appended to the file, a JSON object per line"""
+        sink = FileReminderSink(str(tmp_path / "reminders.jsonl"))
+
+        await sink.send(tasks)
+        await sink.send(tasks)
+
+        lines = [json.loads(line) for line in (tmp_path / "reminders.jsonl").read_text().splitlines()]
+        assert [(line["id"], line["due_date"]) for line in lines] == [(1, "2026-01-02T00:00:00+00:00")] * 2
+
+    async def test_log_sink(self, caplog, tasks):
+        """Test that the reminders are logged"""
+        with caplog.at_level(logging.INFO, logger="TaskManager.reminders"):
+            await LogReminderSink().send(tasks)
+
+        assert "Task 1 'Report' is due at 2026-01-02T00:00:00+00:00" in caplog.messages
+
+
+@pytest.mark.anyio
+async def test_postgres_leader_lock(postgres_url):
+    """Test that a single worker holds the lock, another one takes it once released"""
+    first = PostgresLeaderLock(postgres_url, "test_reminders")
+    second = PostgresLeaderLock(postgres_url, "test_reminders")
+    try:
+        assert await first.acquire()
+        assert await first.acquire()
+        assert not await second.acquire()
+        assert await first.held()
+
+        await first.release()
+
+        assert not await first.held()
+        assert await second.acquire()
+    finally:
+        await first.release()
+        await second.release()
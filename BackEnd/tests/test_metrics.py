@@ -0,0 +1,90 @@
+"""Tests of the Prometheus metrics and of the instrumentation recording them."""
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from app.main import app
+from app.infrastructure.database.session import instrument_engine, InstrumentedQueuePool, PoolCollector
+
+
+def sample(name: str, **labels: str) -> float:
+    """the current value of a metric sample, 0 if it was never recorded"""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.anyio
+class TestMetrics:
+    """Test suite for GET /metrics and the request, statement and export metrics"""
+
+    @pytest.fixture
+    def engine(self, use_database):
+        """Fixture to point the API at the test database, its statements are recorded with the engine label test"""
+        engine = use_database("sync")
+        instrument_engine(engine, "test")
+
+        return engine
+
+    @pytest.fixture
+    async def client(self, engine):
+        """Fixture to provide a client of the API using the test database"""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            yield client
+
+    async def test_request_metrics(self, client):
+        """Test that the requests are counted by route template and status, and timed"""
+        labels = {"method": "GET", "route": "/api/tasks/{task_id}"}
+        not_found = sample("http_requests_total", status="404", **labels)
+        timed = sample("http_request_duration_seconds_count", **labels)
+        unmatched = sample("http_requests_total", method="GET", route="unmatched", status="404")
+
+        await client.get("/api/tasks/123")
+        await client.get("/api/tasks/456")
+        await client.get("/not/a/route")
+
+        assert sample("http_requests_total", status="404", **labels) == not_found + 2
+        assert sample("http_request_duration_seconds_count", **labels) == timed + 2
+        assert sample("http_requests_total", method="GET", route="unmatched", status="404") == unmatched + 1
+        assert sample("http_requests_in_progress", method="GET") == 0
+
+    async def test_statement_and_export_metrics(self, client):
+        """Test that the statements of the engine and the stages of an export are recorded"""
+        inserts = sample("db_statement_duration_seconds_count", engine="test", operation="INSERT")
+        reads = sample("export_stage_duration_seconds_count", format="csv", stage="read")
+
+        await client.post("/api/tasks", json={"title": "Task"})
+        await client.get("/api/tasks/summary", params={"format": "csv"})
+
+        assert sample("db_statement_duration_seconds_count", engine="test", operation="INSERT") == inserts + 1
+        assert sample("export_stage_duration_seconds_count", format="csv", stage="read") == reads + 1
+        assert sample("export_stage_duration_seconds_count", format="csv", stage="close") >= 1
+
+    async def test_metrics_endpoint(self, client):
+        """Test that the metrics are exposed in the Prometheus text format"""
+        await client.get("/api/tasks/123")
+
+        response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="GET",route="/api/tasks/{task_id}",status="404"}' in response.text
+
+
+class TestPoolMetrics:
+    """Test suite for the connection pool metrics"""
+
+    def test_checkout_wait_and_occupancy(self, database_path):
+        """Test that waiting for a connection is timed and that the collector reports the connections in use"""
+        engine = create_engine(f"sqlite:///{database_path}", poolclass=InstrumentedQueuePool, pool_size=2)
+        collector = PoolCollector()
+        collector.add("test", engine.pool)
+        waits = sample("db_pool_checkout_wait_seconds_count", engine="sync")
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            in_use = {metric.name: metric.samples[0].value for metric in collector.collect()}
+        engine.dispose()
+
+        assert sample("db_pool_checkout_wait_seconds_count", engine="sync") == waits + 1
+        assert in_use == {"db_pool_checked_out_connections": 1, "db_pool_idle_connections": 0,
+                          "db_pool_overflow_connections": -1}
@@ -0,0 +1,195 @@
+"""
+Query plan regression tests: every filter combination of get_tasks must be served by an index on a large table.
+
+Runs against the PostgreSQL database of TEST_DATABASE_URL (skipped without it), the tasks table is recreated.
+The archived tasks are older than the other ones, the reads of a date range or with include_archived read both.
+"""
+import itertools
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from app.domain.entities.task import TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_changes import TaskChangeToken
+from app.infrastructure.database import models
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+
+ROWS = 200000
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# 2% pending tasks, a third without due date, one task created per minute
+SEED_SQL = f"""
+INSERT INTO tasks (title, description, status, due_date, completed_at, created_at)
+SELECT 'task ' || i || ' ' || md5(i::text), 'description of task ' || i,
+       CASE WHEN i % 50 = 0 THEN 'PENDING' ELSE 'COMPLETED' END::taskstatus,
+       CASE WHEN i % 3 = 0 THEN NULL ELSE TIMESTAMPTZ '{NOW.isoformat()}' + (i % 365) * INTERVAL '1 day' END,
+       CASE WHEN i % 50 = 0 THEN NULL ELSE TIMESTAMPTZ '{NOW.isoformat()}' END,
+       TIMESTAMPTZ '{NOW.isoformat()}' - i * INTERVAL '1 minute'
+FROM generate_series(1, {ROWS}) AS i
+"""
+
+# as many archived tasks, created before the other ones, completed the next day
+ARCHIVE_SEED_SQL = f"""
+INSERT INTO tasks_archive (id, title, description, status, due_date, completed_at, created_at, updated_at)
+SELECT {ROWS} + i, 'task ' || ({ROWS} + i) || ' ' || md5(i::text), 'description of archived task ' || i,
+       'COMPLETED'::taskstatus,
+       CASE WHEN i % 3 = 0 THEN NULL ELSE TIMESTAMPTZ '{NOW.isoformat()}' - (i % 365) * INTERVAL '1 day' END,
+       TIMESTAMPTZ '{NOW.isoformat()}' - ({ROWS} + i) * INTERVAL '1 minute' + INTERVAL '1 day',
+       TIMESTAMPTZ '{NOW.isoformat()}' - ({ROWS} + i) * INTERVAL '1 minute',
+       TIMESTAMPTZ '{NOW.isoformat()}' - ({ROWS} + i) * INTERVAL '1 minute' + INTERVAL '1 day'
+FROM generate_series(1, {ROWS}) AS i
+"""
+
+DATE_FILTERS = {
+    "all dates": {},
+    "one day": {"from_date": NOW - timedelta(days=2), "to_date": NOW - timedelta(days=1)},
+    "archived day": {"from_date": NOW - timedelta(days=200), "to_date": NOW - timedelta(days=199)},
+    "include archived": {"include_archived": True},
+}
+STATUS_FILTERS = {
+    "any status": {},
+    "pending": {"status": TaskStatus.PENDING},
+    "completed": {"status": TaskStatus.COMPLETED},
+}
+TEXT_FILTERS = {
+    "no text": {},
+    "title_contains": {"title_contains": "abc"},
+    "substring": {"q": "task 12"},
+    "fulltext": {"q": "1234", "search_mode": SearchMode.FULLTEXT},
+}
+
+
+def _filter_combinations() -> list:
+    combinations = []
+    for (date_id, date), (status_id, status), (text_id, text_filter) in itertools.product(
+            DATE_FILTERS.items(), STATUS_FILTERS.items(), TEXT_FILTERS.items()):
+        filters = {**date, **status, **text_filter}
+
+        if text_filter.get("search_mode") == SearchMode.FULLTEXT:
+            # ranked by relevance, no sort and no cursor
+            combinations.append(pytest.param(filters, False, id=f"{date_id}-{status_id}-{text_id}"))
+            continue
+
+        for sort, order, with_cursor in itertools.product(TaskSortField, SortOrder, [False, True]):
+            page = "next page" if with_cursor else "first page"
+            combinations.append(pytest.param(
+                {**filters, "sort": sort, "order": order}, with_cursor,
+                id=f"{date_id}-{status_id}-{text_id}-{sort.value}-{order.value}-{page}"
+            ))
+
+    return combinations
+
+
+@pytest.fixture(scope="module")
+def engine(postgres_url):
+    """
+    Fixture to provide an engine on the test database with the tasks table and the archive seeded with ROWS tasks
+    each and analyzed
+    """
+    engine = create_engine(postgres_url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text(SEED_SQL))
+        connection.execute(text(ARCHIVE_SEED_SQL))
+        connection.execute(text("ANALYZE tasks"))
+        connection.execute(text("ANALYZE tasks_archive"))
+
+    yield engine
+
+    models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def capture_selects(session: Session, call, kind: str = "SELECT") -> list[tuple[str, dict]]:
+    """
+    Run a repository call and capture the SELECT statements it sends
+    :param session: the session used by the repository
+    :param call: function running the repository call
+    :param kind: the first keyword of the statements to capture
+    :return: the statements and their parameters
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(kind):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return statements
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """
+    Find the sequential scans of a plan
+    :param plan: a node of an EXPLAIN (FORMAT JSON) plan
+    :return: the names of the relations read with a sequential scan
+    """
+    found = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+
+    return found
+
+
+@pytest.mark.parametrize("filters, with_cursor", _filter_combinations())
+def test_get_tasks_uses_indexes(engine, filters, with_cursor):
+    """Test that a page of get_tasks never reads the tasks table with a sequential scan"""
+    with Session(engine) as session:
+        repository = TaskRepositoryDatabase(session)
+        cursor = None
+        if with_cursor:
+            first_page = repository.get_tasks(limit=50, **filters)
+            if len(first_page) < 50:
+                pytest.skip("single page")
+            cursor = TaskCursor.after(first_page[-1], filters["sort"], filters["order"])
+
+        statements = capture_selects(session, lambda: repository.get_tasks(limit=50, cursor=cursor, **filters))
+
+        assert len(statements) == 1
+        statement, parameters = statements[0]
+        plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+
+    assert seq_scans(plan[0]["Plan"]) == [], f"sequential scan in the plan of {statement}\n{plan}"
+
+
+
+@pytest.mark.parametrize("synced", [False, True], ids=["full sync", "since the last change"])
+def test_get_changes_uses_indexes(engine, synced):
+    """Test that get_changes reads the changes from the indexes of the tasks and the tombstones, not the tables"""
+    with Session(engine) as session:
+        repository = TaskRepositoryDatabase(session)
+        token = TaskChangeToken(repository.get_data_version(), 0) if synced else None
+
+        statements = capture_selects(session, lambda: repository.get_changes(token, limit=50))
+
+        statement, parameters = statements[-1]
+        plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+
+    assert seq_scans(plan[0]["Plan"]) == [], f"sequential scan in the plan of {statement}\n{plan}"
+
+
+def test_archive_tasks_uses_indexes(engine):
+    """Test that archive_tasks picks the oldest completed tasks from the partial index, not the whole table"""
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # the commits of the repository release savepoints, the archived tasks are rolled back at the end
+        with Session(connection, join_transaction_mode="create_savepoint") as session:
+            repository = TaskRepositoryDatabase(session)
+
+            statements = capture_selects(session, lambda: repository.archive_tasks(NOW + timedelta(seconds=1), 50),
+                                         kind="INSERT")
+
+            statement, parameters = statements[0]
+            plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        transaction.rollback()
+
+    assert seq_scans(plan[0]["Plan"]) == [], f"sequential scan in the plan of {statement}\n{plan}"
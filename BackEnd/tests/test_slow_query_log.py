@@ -0,0 +1,143 @@
+"""Tests of the slow query log and of GET /api/admin/slow-queries."""
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+from app.main import app, container
+from app.infrastructure.database import models
+from app.infrastructure.database.slow_query_log import SlowQueryLog, fingerprint
+
+
+class TestFingerprint:
+    """Test suite for the normalisation of the statements"""
+
+    def test_placeholders_and_literals(self):
+        """Test that the placeholders of every driver and the literals are replaced"""
+        assert fingerprint("SELECT * FROM tasks WHERE id = %(id_1)s AND status = 'pending'") == \
+            "SELECT * FROM tasks WHERE id = ? AND status = ?"
+        assert fingerprint("SELECT * FROM tasks WHERE id = $1::INTEGER LIMIT 10") == \
+            "SELECT * FROM tasks WHERE id = ?::INTEGER LIMIT ?"
+        assert fingerprint("SELECT * FROM tasks WHERE id = ?") == "SELECT * FROM tasks WHERE id = ?"
+
+    def test_lists_and_whitespace(self):
+        """Test that IN lists, the rows of an insert and the whitespace don't make distinct fingerprints"""
+        assert fingerprint("DELETE FROM tasks\n  WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)") == \
+            "DELETE FROM tasks WHERE id IN (?)"
+        assert fingerprint("INSERT INTO tasks (title, status) VALUES (?, ?), (?, ?), (?, ?)") == \
+            "INSERT INTO tasks (title, status) VALUES (?)"
+
+
+class TestSlowQueryLog:
+    """Test suite for the slowest statements kept in memory"""
+
+    def test_executions_are_aggregated(self):
+        """Test that the executions of a fingerprint are counted, the route and parameters of the slowest kept"""
+        log = SlowQueryLog(threshold_ms=0, explain_sample_rate=0, top_n=5)
+
+        log.record("SELECT ?", 30, "GET /a", "(1,)")
+        log.record("SELECT ?", 50, "GET /b", "(2,)")
+        log.record("SELECT ?", 10, "GET /c", "(3,)")
+
+        [statement] = log.top()
+        assert statement["count"] == 3
+        assert statement["total_ms"] == 90
+        assert statement["max_ms"] == 50
+        assert (statement["route"], statement["parameters"]) == ("GET /b", "(2,)")
+
+    def test_top_is_bounded(self):
+        """Test that a new fingerprint replaces the fastest one only if it is slower"""
+        log = SlowQueryLog(threshold_ms=0, explain_sample_rate=0, top_n=2)
+        log.record("SELECT 1", 10, None, None)
+        log.record("SELECT 2", 20, None, None)
+
+        log.record("SELECT 3", 5, None, None)
+        log.record("SELECT 4", 30, None, None)
+
+        assert [s["fingerprint"] for s in log.top()] == ["SELECT 4", "SELECT 2"]
+
+
+@pytest.mark.anyio
+class TestSlowQueriesApi:
+    """Test suite for the slow statements of the requests"""
+
+    @pytest.fixture
+    def slow_query_log(self):
+        """Fixture to provide a slow query log recording every statement, in place of the one of the process"""
+        log = SlowQueryLog(threshold_ms=0, explain_sample_rate=1, top_n=20)
+        container.slow_query_log.override(log)
+        yield log
+        container.slow_query_log.reset_override()
+
+    @pytest.fixture(params=["sync", "asyncio"])
+    async def client(self, request, use_database, slow_query_log):
+        """Fixture to provide a client of the API using the test database, its statements go to the slow query log"""
+        slow_query_log.instrument(use_database(request.param))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            yield client
+
+    async def test_slow_statements_are_listed(self, client):
+        """Test that the statements are listed with the route template that ran them"""
+        response = await client.post("/api/tasks", json={"title": "Task"})
+        await client.get(f"/api/tasks/{response.json()['id']}")
+
+        response = await client.get("/api/admin/slow-queries")
+
+        assert response.status_code == 200
+        statements = response.json()["statements"]
+        inserts = [s for s in statements if s["fingerprint"].startswith("INSERT INTO tasks")]
+        assert [s["route"] for s in inserts] == ["POST /api/tasks"]
+        assert "GET /api/tasks/{task_id}" in {s["route"] for s in statements}
+        # EXPLAIN is only run on PostgreSQL
+        assert all(s["plan"] is None for s in statements)
+
+    async def test_reset(self, client):
+        """Test that the recorded statements can be cleared"""
+        await client.post("/api/tasks", json={"title": "Task"})
+
+        await client.delete("/api/admin/slow-queries")
+
+        assert (await client.get("/api/admin/slow-queries")).json()["statements"] == []
+
+
+class TestExplain:
+    """Test suite for the plans captured on PostgreSQL"""
+
+    @pytest.fixture
+    def slow_query_log(self):
+        """Fixture to provide a slow query log recording and explaining every statement"""
+        return SlowQueryLog(threshold_ms=0, explain_sample_rate=1, top_n=20)
+
+    @pytest.fixture
+    def engine(self, postgres_url, slow_query_log):
+        """Fixture to provide an engine on the test database with the tasks schema, its statements go to the log"""
+        engine = create_engine(postgres_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        slow_query_log.instrument(engine)
+
+        yield engine
+
+        models.Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    def test_selects_are_explained(self, engine, slow_query_log):
+        """Test that the plan of a SELECT is captured, and that the writes are never run again"""
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO tasks (title, status, created_at) VALUES ('Task', 'PENDING', now())"))
+            connection.execute(text("SELECT * FROM tasks WHERE title = :title"), {"title": "Task"})
+
+        statements = {s["fingerprint"]: s for s in slow_query_log.top()}
+        assert "Buffers" in statements["SELECT * FROM tasks WHERE title = ?"]["plan"]
+        assert statements["INSERT INTO tasks (title, status, created_at) VALUES (?, now())"]["plan"] is None
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM tasks")).scalar() == 1
+
+    def test_failed_explain_keeps_the_transaction(self, engine):
+        """Test that an EXPLAIN that fails is reported as such without aborting the transaction of the request"""
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+            plan = SlowQueryLog._explain(connection, "SELECT * FROM missing_table", {})
+
+            assert plan.startswith("EXPLAIN failed")
+            assert connection.execute(text("SELECT 2")).scalar() == 2
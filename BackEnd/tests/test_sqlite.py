@@ -0,0 +1,252 @@
+"""Tests of the SQLite backend: the settings, the pragmas, the single writer and the migrations."""
+import threading
+import pytest
+from alembic import command
+from alembic.config import Config
+from pydantic import ValidationError
+from sqlalchemy import create_engine, event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.common.config import Settings, PROJECT_DIR
+from app.domain.entities.task import TaskStatus
+from app.domain.entities.task_search import SearchMode
+from app.infrastructure.database import models
+from app.infrastructure.database.sqlite import configure_connections, configure_writer, SQLiteSession
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.database.async_task_repository_database import AsyncTaskRepositoryDatabase
+from tests.test_task_repository_conformance import new_task
+
+
+class TestDatabaseSettings:
+    """Test suite for the database URL settings"""
+
+    def test_database_url_drivers(self):
+        """Test that the driver of each DATABASE_MODE is set on the URL"""
+        sqlite = Settings(DATABASE_URL="sqlite:///./tasks.db")
+        postgresql = Settings(DATABASE_URL="postgresql://user:secret@db:5432/tasks")
+
+        assert sqlite.DATABASE_BACKEND == "sqlite"
+        assert sqlite.DEFAULT_SQLALCHEMY_DATABASE_URI == "sqlite+pysqlite:///./tasks.db"
+        assert sqlite.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI == "sqlite+aiosqlite:///./tasks.db"
+        assert postgresql.DATABASE_BACKEND == "postgresql"
+        assert postgresql.DEFAULT_SQLALCHEMY_DATABASE_URI == "postgresql+psycopg2://user:secret@db:5432/tasks"
+        assert postgresql.DEFAULT_SQLALCHEMY_ASYNC_DATABASE_URI == "postgresql+asyncpg://user:secret@db:5432/tasks"
+
+    def test_default_database_values(self):
+        """Test that without DATABASE_URL the DEFAULT_DATABASE_* values build a PostgreSQL URL"""
+        settings = Settings(DATABASE_URL=None, DEFAULT_DATABASE_HOSTNAME="db", DEFAULT_DATABASE_USER="user",
+                            DEFAULT_DATABASE_PASSWORD="secret", DEFAULT_DATABASE_PORT=5432, DEFAULT_DATABASE_DB="tasks")
+
+        assert settings.DEFAULT_SQLALCHEMY_DATABASE_URI == "postgresql+psycopg2://user:secret@db:5432/tasks"
+
+    @pytest.mark.parametrize("values", [
+        {"DATABASE_URL": None, "DEFAULT_DATABASE_HOSTNAME": None},
+        {"DATABASE_URL": "mysql://user@db/tasks"},
+        {"DATABASE_URL": "sqlite://"},
+        {"DATABASE_URL": "sqlite:///:memory:"},
+        {"DATABASE_URL": "sqlite:///./tasks.db", "TASK_PARTITION_MONTHS_AHEAD": 3},
+        {"DATABASE_URL": "sqlite:///./tasks.db", "TASK_REMINDERS": "log", "TASK_EVENTS": "none"},
+        {"DATABASE_URL": "sqlite:///./tasks.db", "TASK_REMINDERS": "file"},
+        {"DATABASE_URL": "sqlite:///./tasks.db", "LOG_SAMPLE_RATES": {"/api/tasks": 2}},
+    ])
+    def test_invalid_database(self, values):
+        """
+        Test that a missing, unsupported or in-memory database is rejected, and the settings of the background jobs
+        it can't run, and the sample rates of the logs out of 0 to 1
+        """
+        with pytest.raises(ValidationError):
+            Settings(**values)
+
+    def test_memory_store_needs_no_database(self):
+        """Test that the tasks kept in memory don't need any database setting"""
+        settings = Settings(TASK_STORE="memory", DATABASE_URL=None, DEFAULT_DATABASE_HOSTNAME=None)
+
+        assert settings.TASK_STORE == "memory"
+
+
+class TestSQLiteEngines:
+    """Test suite for the SQLite connections: the pragmas and the writes going through a single writer"""
+
+    @pytest.fixture
+    def engines(self, database_path):
+        """Fixture to provide the readers and the writer engines of the SQLite test database"""
+        url = f"sqlite:///{database_path}"
+        readers = create_engine(url, pool_size=4, max_overflow=0)
+        writer = create_engine(url, pool_size=1, max_overflow=0)
+        for engine in (readers, writer):
+            configure_connections(engine, "NORMAL", mmap_size=1024 * 1024, cache_size_kb=2048, busy_timeout_ms=5000)
+        configure_writer(writer)
+
+        yield readers, writer
+
+        readers.dispose()
+        writer.dispose()
+
+    @pytest.fixture
+    def session_maker(self, engines):
+        """Fixture to provide the sessions routing the writes to the writer"""
+        readers, writer = engines
+
+        return sessionmaker(autoflush=False, class_=SQLiteSession, writer=writer, readers=readers)
+
+    def test_pragmas(self, engines):
+        """Test that every connection uses the WAL journal and the configured pragmas"""
+        readers, _ = engines
+
+        with readers.connect() as connection:
+            pragmas = {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                       for name in ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout")}
+
+        assert pragmas == {"journal_mode": "wal", "synchronous": 1, "mmap_size": 1024 * 1024, "cache_size": -2048,
+                           "busy_timeout": 5000}
+
+    def test_writes_go_to_the_writer(self, engines, session_maker):
+        """Test that the writes begin with BEGIN IMMEDIATE on the writer and the reads use the readers"""
+        statements = {"readers": [], "writer": []}
+        for name, engine in zip(("readers", "writer"), engines):
+            event.listen(engine, "before_cursor_execute",
+                         lambda conn, cursor, statement, *args, name=name: statements[name].append(statement))
+
+        with session_maker() as session:
+            repository = TaskRepositoryDatabase(session)
+            task = repository.create_task(new_task("Task"))
+            repository.complete_task(task.id, task.created_at)
+            repository.create_tasks([new_task("First"), new_task("Second")])
+            repository.get_tasks()
+
+        writes = [statement.split()[0] for statement in statements["writer"]]
+        # one transaction per write, the bulk insert can send several statements
+        assert writes[:4] == ["BEGIN", "INSERT", "BEGIN", "UPDATE"]
+        assert writes[4:] in (["BEGIN", "INSERT"], ["BEGIN", "INSERT", "INSERT"])
+        assert {statement for statement in statements["writer"] if statement.startswith("BEGIN")} == {"BEGIN IMMEDIATE"}
+        assert {statement.split()[0] for statement in statements["readers"]} == {"SELECT"}
+
+    def test_readers_dont_wait_for_the_writer(self, engines, session_maker):
+        """Test that the readers see the last commit while a write transaction is open"""
+        readers, writer = engines
+        count = select(func.count()).select_from(models.Task)
+
+        with writer.connect() as connection:
+            connection.execute(text("INSERT INTO tasks (title, status, created_at) "
+                                    "VALUES ('Task', 'PENDING', '2026-01-01 00:00:00')"))
+            with readers.connect() as reader:
+                during = reader.execute(count).scalar()
+            connection.commit()
+
+        with readers.connect() as reader:
+            after = reader.execute(count).scalar()
+
+        assert (during, after) == (0, 1)
+
+    def test_concurrent_writers(self, session_maker):
+        """Test that writes from many threads are serialized without any "database is locked" error"""
+        errors = []
+
+        def write(thread: int):
+            try:
+                with session_maker() as session:
+                    repository = TaskRepositoryDatabase(session)
+                    for i in range(20):
+                        task = repository.create_task(new_task(f"Task {thread}-{i}"))
+                        repository.get_task(task.id)
+                        repository.complete_task(task.id, task.created_at)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=write, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with session_maker() as session:
+            completed = TaskRepositoryDatabase(session).get_tasks(status=TaskStatus.COMPLETED)
+
+        assert errors == []
+        assert len(completed) == 160
+
+    @pytest.mark.anyio
+    async def test_async_sessions(self, database_path):
+        """Test the writes and reads of the asyncio mode with aiosqlite"""
+        url = f"sqlite+aiosqlite:///{database_path}"
+        readers = create_async_engine(url, pool_size=2, max_overflow=0)
+        writer = create_async_engine(url, pool_size=1, max_overflow=0)
+        for engine in (readers, writer):
+            configure_connections(engine.sync_engine, "NORMAL", mmap_size=0, cache_size_kb=2048, busy_timeout_ms=5000)
+        configure_writer(writer.sync_engine)
+        session_maker = async_sessionmaker(autoflush=False, expire_on_commit=False, sync_session_class=SQLiteSession,
+                                           writer=writer.sync_engine, readers=readers.sync_engine)
+
+        try:
+            async with session_maker() as session:
+                repository = AsyncTaskRepositoryDatabase(session)
+                created = await repository.create_tasks([new_task("First"), new_task("Second")])
+                await repository.complete_tasks([task.id for task in created], created[0].created_at)
+                tasks = await repository.get_tasks()
+        finally:
+            await readers.dispose()
+            await writer.dispose()
+
+        assert {task.status for task in tasks} == {TaskStatus.COMPLETED}
+        assert tasks[0].created_at.tzinfo is not None
+
+
+class TestMigrations:
+    """Test suite for the Alembic migrations, on SQLite and PostgreSQL"""
+
+    @pytest.fixture(params=["sqlite", "postgresql"])
+    def engine(self, request, tmp_path):
+        """Fixture to provide an empty database of each backend"""
+        if request.param == "sqlite":
+            engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+        else:
+            engine = create_engine(request.getfixturevalue("postgres_url"))
+            models.Base.metadata.drop_all(engine)
+            with engine.begin() as connection:
+                connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+        yield engine
+
+        if request.param == "postgresql":
+            with engine.begin() as connection:
+                connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+            models.Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    @staticmethod
+    def run_alembic(engine, run):
+        """
+        Run an Alembic command on a database, without the logging setup of alembic.ini
+        :param engine: the engine of the database
+        :param run: function taking the Alembic config
+        """
+        config = Config()
+        config.set_main_option("script_location", str(PROJECT_DIR / "alembic"))
+        with engine.begin() as connection:
+            config.attributes["connection"] = connection
+            run(config)
+
+    def test_upgrade_matches_the_models(self, engine):
+        """Test that the migrated schema is the one of the models and works with the repository"""
+        self.run_alembic(engine, lambda config: command.upgrade(config, "head"))
+        # raises if autogenerate finds differences
+        self.run_alembic(engine, command.check)
+
+        with sessionmaker(bind=engine)() as session:
+            repository = TaskRepositoryDatabase(session)
+            version = repository.get_data_version()
+            repository.create_task(new_task("Budget review", description="quarterly"))
+            found = repository.get_tasks(q="budget", search_mode=SearchMode.FULLTEXT)
+
+            assert [task.title for task in found] == ["Budget review"]
+            assert repository.get_data_version() > version
+
+    def test_downgrade(self, engine):
+        """Test that the migrations can be rolled back to an empty database and applied again"""
+        self.run_alembic(engine, lambda config: command.upgrade(config, "head"))
+        self.run_alembic(engine, lambda config: command.downgrade(config, "base"))
+
+        assert inspect(engine).get_table_names() == ["alembic_version"]
+
+        self.run_alembic(engine, lambda config: command.upgrade(config, "head"))
+        assert {"tasks", "data_versions"} <= set(inspect(engine).get_table_names())
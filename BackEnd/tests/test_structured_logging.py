@@ -0,0 +1,193 @@
+"""Tests of the logging pipeline: the JSON records, the request ids, the sampling and the queue."""
+import io
+import json
+import logging
+import threading
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.main import app
+from app.common.structured_logging import (configure_logger, request_context, RequestContext, new_request_id,
+                                           DroppingQueueHandler)
+
+
+class BlockedStream(io.StringIO):
+    """An output whose writes wait until it is unblocked, like a full pipe"""
+
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.unblocked.wait(5)
+        return super().write(text)
+
+
+def in_request(route: str, request_id: str = None) -> RequestContext:
+    """the context of a request of a route template"""
+    return RequestContext(request_id or new_request_id(), {"route": SimpleNamespace(path=route)})
+
+
+class TestLoggingPipeline:
+    """Test suite for configure_logger"""
+
+    @pytest.fixture
+    def pipeline(self):
+        """Fixture to provide a function configuring a test logger writing to a stream, the records written on read"""
+        loggers = []
+
+        def configure(stream=None, **options):
+            stream = stream or io.StringIO()
+            logger = configure_logger(f"LoggingTest{len(loggers)}", stream=stream, **options)
+            logger.propagate = False
+            loggers.append(logger)
+
+            def written() -> list[dict]:
+                handler.listener.stop()
+                return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+            handler: DroppingQueueHandler = logger.handlers[0]
+            return logger, written
+
+        yield configure
+
+        for logger in loggers:
+            handler = logger.handlers[0]
+            handler.listener.stop()
+            logger.removeHandler(handler)
+
+    def test_json_records(self, pipeline):
+        """Test that a record is a JSON object with its request, extra fields and exception"""
+        logger, written = pipeline()
+        tasks = [1, 2]
+        token = request_context.set(in_request("/api/tasks", "abc"))
+        try:
+            logger.info("Deleting %d tasks: %s", len(tasks), tasks, extra={"user": "alice"})
+            try:
+                raise ValueError("broken")
+            except ValueError:
+                logger.exception("Failed")
+        finally:
+            request_context.reset(token)
+        # the arguments are merged when logging
+        tasks.append(3)
+        logger.warning("Outside of a request")
+
+        info, error, warning = written()
+        assert {name: info[name] for name in ("level", "logger", "message", "request_id", "route", "user")} == {
+            "level": "INFO", "logger": "LoggingTest0", "message": "Deleting 2 tasks: [1, 2]", "request_id": "abc",
+            "route": "/api/tasks", "user": "alice"
+        }
+        assert "time" in info
+        assert error["message"] == "Failed" and "ValueError: broken" in error["exception"]
+        assert "request_id" not in warning and "route" not in warning
+
+    def test_text_records(self, pipeline):
+        """Test that the text lines end with the request id"""
+        stream = io.StringIO()
+        logger, written = pipeline(stream, log_format="text")
+        token = request_context.set(in_request("/api/tasks", "abc"))
+        try:
+            logger.info("Creating task with title: %s", "Report")
+        finally:
+            request_context.reset(token)
+        logger.handlers[0].listener.stop()
+
+        assert stream.getvalue().rstrip().endswith("INFO - Creating task with title: Report - request abc")
+
+    def test_never_blocks(self, pipeline):
+        """Test that logging returns while the output is blocked, the records past the queue are dropped"""
+        stream = BlockedStream()
+        logger, written = pipeline(stream, queue_size=10)
+
+        start = time.perf_counter()
+        for number in range(100):
+            logger.info("Record %d", number)
+        elapsed = time.perf_counter() - start
+        stream.unblocked.set()
+
+        assert elapsed < 1
+        records = written()
+        assert 10 <= len(records) <= 11
+        assert logger.handlers[0].dropped == 100 - len(records)
+        assert records[-1]["message"] == f"Record {len(records) - 1}"
+
+    def test_route_sampling(self, pipeline):
+        """Test that a share of the requests of a sampled route keep their records, the warnings are all kept"""
+        logger, written = pipeline(sample_rates={"/api/tasks": 0.25})
+        for _ in range(1000):
+            token = request_context.set(in_request("/api/tasks"))
+            try:
+                logger.info("First")
+                logger.info("Second")
+                logger.warning("Warning")
+            finally:
+                request_context.reset(token)
+        token = request_context.set(in_request("/api/tasks/{task_id}"))
+        try:
+            logger.info("Other route")
+        finally:
+            request_context.reset(token)
+        logger.info("Outside of a request")
+
+        records = written()
+        kept = {}
+        for record in records:
+            kept.setdefault(record["request_id"] if "request_id" in record else None, []).append(record["message"])
+        sampled = [messages for messages in kept.values() if "First" in messages]
+        assert 150 < len(sampled) < 350
+        # all the records of a request or none
+        assert all(messages == ["First", "Second", "Warning"] for messages in sampled)
+        assert sum(record["message"] == "Warning" for record in records) == 1000
+        assert {"Other route", "Outside of a request"} <= {record["message"] for record in records}
+
+    def test_route_rate_limit(self, pipeline):
+        """Test that a route logs up to the limit per second, the next record tells how many were dropped"""
+        logger, written = pipeline(rate_limit=5)
+        token = request_context.set(in_request("/api/tasks"))
+        try:
+            for number in range(20):
+                logger.info("Record %d", number)
+            logger.error("Error")
+            time.sleep(0.3)
+            logger.info("After a while")
+        finally:
+            request_context.reset(token)
+
+        records = written()
+        assert [record["message"] for record in records] == [f"Record {number}" for number in range(5)] + [
+            "Error", "After a while"
+        ]
+        assert records[-1]["suppressed"] == 15
+
+
+@pytest.mark.anyio
+class TestRequestIds:
+    """Test suite for the X-Request-ID of the requests"""
+
+    @pytest.fixture
+    async def client(self, use_database):
+        """Fixture to provide a client of the API using the test database"""
+        use_database("sync")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            yield client
+
+    async def test_new_request_ids(self, client):
+        """Test that every response gets a new id, the invalid ones of the client are replaced"""
+        first = await client.get("/api/tasks")
+        second = await client.get("/api/tasks", headers={"X-Request-ID": "not a valid id!"})
+
+        ids = [first.headers["X-Request-ID"], second.headers["X-Request-ID"]]
+        assert ids[0] != ids[1]
+        assert all(len(request_id) == 32 for request_id in ids)
+
+    async def test_records_of_the_request(self, client, caplog):
+        """Test that the id of the client is sent back and added to the records of the request, with its route"""
+        with caplog.at_level(logging.INFO, logger="TaskManager"):
+            response = await client.get("/api/tasks/123", headers={"X-Request-ID": "client-id.1"})
+
+        assert response.headers["X-Request-ID"] == "client-id.1"
+        record = next(record for record in caplog.records if record.getMessage() == "Getting task with ID: 123")
+        assert (record.request_id, record.route) == ("client-id.1", "/api/tasks/{task_id}")
@@ -0,0 +1,257 @@
+"""Tests of the task events: the broker of the process, the events of the repositories and LISTEN/NOTIFY."""
+import asyncio
+import pytest
+from anyio import to_thread
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.domain.entities.task import TaskStatus
+from app.domain.entities.task_event import TaskEvent, TaskEventType
+from app.infrastructure.database import models
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.events.postgres_listener import listen_for_task_events
+from app.infrastructure.events.task_event_broker import TaskEventBroker, TaskEventStreamEnded, \
+    TooManySubscriptionsError
+from app.infrastructure.events.task_event_publisher import TaskEventPublisher, NotifyTaskEventPublisher, \
+    encode_event, decode_event
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+from tests.test_task_repository_conformance import new_task, BASE
+
+
+def deleted(task_id: int) -> TaskEvent:
+    return TaskEvent(TaskEventType.DELETED, task_id)
+
+
+class RecordingPublisher(TaskEventPublisher):
+    """Publisher keeping the events it is given, and whether they were given before the commit"""
+
+    def __init__(self):
+        self.notified: list[TaskEvent] = []
+        self.published: list[TaskEvent] = []
+
+    def notify(self, session: Session, events: list[TaskEvent]):
+        assert session.in_transaction()
+        self.notified += events
+
+    def publish(self, events: list[TaskEvent]):
+        self.published += events
+
+
+@pytest.mark.anyio
+class TestTaskEventBroker:
+    """Test suite for the fan-out of the events to the streams of the process"""
+
+    @staticmethod
+    def events(*task_ids: int) -> list[TaskEvent]:
+        return [deleted(task_id) for task_id in task_ids]
+
+    async def test_fan_out(self):
+        """Test that every subscription gets the events in order, and only the ones published after it started"""
+        broker = TaskEventBroker()
+        broker.publish(self.events(1))
+
+        with broker.subscribe() as first, broker.subscribe() as second:
+            broker.publish(self.events(2, 3))
+            broker.publish(self.events(4))
+
+            assert await first.get(1) == self.events(2, 3, 4)
+            assert await second.get(1) == self.events(2, 3, 4)
+            assert await first.get(0.01) == []
+
+        assert broker.subscriptions == 0
+
+    async def test_publish_from_a_thread(self):
+        """Test that the events published from the threadpool (sync repositories) reach the loop"""
+        broker = TaskEventBroker()
+
+        with broker.subscribe() as subscription:
+            await to_thread.run_sync(broker.publish, self.events(1))
+
+            assert await subscription.get(1) == self.events(1)
+
+    async def test_slow_subscription_is_evicted(self):
+        """Test that a full queue ends its stream, without blocking the publisher or the other subscriptions"""
+        broker = TaskEventBroker(queue_size=2)
+
+        with broker.subscribe() as slow, broker.subscribe() as fast:
+            broker.publish(self.events(1, 2))
+            assert await fast.get(1) == self.events(1, 2)
+            broker.publish(self.events(3))
+            assert await fast.get(1) == self.events(3)
+
+            # the queued events of an evicted subscription are lost, its client reloads the tasks
+            with pytest.raises(TaskEventStreamEnded) as ended:
+                await slow.get(1)
+            assert ended.value.reason == "evicted"
+            assert broker.subscriptions == 1
+
+    async def test_close(self):
+        """Test that closing ends the streams after their queued events, and refuses new subscriptions"""
+        broker = TaskEventBroker()
+        subscription = broker.subscribe()
+        broker.publish(self.events(1))
+
+        waiting = asyncio.create_task(broker.subscribe().get(10))
+        await asyncio.sleep(0)
+        broker.close()
+
+        assert await subscription.get(1) == self.events(1)
+        with pytest.raises(TaskEventStreamEnded):
+            await subscription.get(1)
+        with pytest.raises(TaskEventStreamEnded):
+            await waiting
+        with pytest.raises(TaskEventStreamEnded):
+            await broker.subscribe().get(1)
+
+    async def test_max_subscriptions(self):
+        """Test that the subscriptions are limited"""
+        broker = TaskEventBroker(max_subscriptions=1)
+
+        with broker.subscribe():
+            with pytest.raises(TooManySubscriptionsError):
+                broker.subscribe()
+
+        broker.subscribe()
+
+
+class TestTaskEventEncoding:
+    """Test suite for the encoding of the events sent between the workers"""
+
+    def test_round_trip(self):
+        """Test that an event is decoded back with its task"""
+        task = new_task("Task", due_days=2, description="Details")
+        task.id = 5
+
+        decoded = decode_event(encode_event(TaskEvent(TaskEventType.CREATED, 5, task)))
+
+        assert (decoded.type, decoded.task_id) == (TaskEventType.CREATED, 5)
+        assert (decoded.task.title, decoded.task.description, decoded.task.status) == \
+            ("Task", "Details", TaskStatus.PENDING)
+        assert (decoded.task.created_at, decoded.task.due_date) == (task.created_at, task.due_date)
+        assert decode_event(encode_event(deleted(5))) == deleted(5)
+
+    def test_big_task_is_left_out(self):
+        """Test that a task too big for NOTIFY is not sent, only its id"""
+        task = new_task("Task", description="x" * 10000)
+        task.id = 5
+
+        payload = encode_event(TaskEvent(TaskEventType.UPDATED, 5, task))
+
+        assert len(payload) < 8000
+        assert decode_event(payload) == TaskEvent(TaskEventType.UPDATED, 5, None)
+
+
+@pytest.fixture(params=["memory", "sqlite", "postgresql"])
+def repository(request):
+    """Fixture to provide an empty task repository of each store, recording its events (repository.events)"""
+    publisher = RecordingPublisher()
+    if request.param == "memory":
+        yield InMemoryTaskRepository(events=publisher)
+        return
+
+    if request.param == "sqlite":
+        engine = create_engine(f"sqlite:///{request.getfixturevalue('database_path')}")
+    else:
+        engine = create_engine(request.getfixturevalue("postgres_url"))
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+
+    yield TaskRepositoryDatabase(session, publisher)
+
+    session.close()
+    if request.param == "postgresql":
+        models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+class TestRepositoryEvents:
+    """Test suite for the events of the writes of the repositories"""
+
+    def test_write_events(self, repository):
+        """Test the events of every write: only the tasks that changed, once each, in order"""
+        task = repository.create_task(new_task("Task"))
+        first, second = repository.create_tasks([new_task("First"), new_task("Second")])
+        task.title = "Edited"
+        repository.edit_task(task)
+        repository.complete_task(task.id, BASE)
+        repository.complete_task(task.id, BASE)
+        repository.complete_tasks([task.id, second.id, 12345], BASE)
+        repository.delete_task(task.id)
+        repository.delete_task(task.id)
+        repository.delete_tasks([second.id, 12345, first.id, second.id])
+
+        events = repository.events.published
+        assert [(event.type, event.task_id) for event in events] == [
+            (TaskEventType.CREATED, task.id),
+            (TaskEventType.CREATED, first.id),
+            (TaskEventType.CREATED, second.id),
+            (TaskEventType.UPDATED, task.id),
+            (TaskEventType.UPDATED, task.id),
+            (TaskEventType.UPDATED, second.id),
+            (TaskEventType.DELETED, task.id),
+            (TaskEventType.DELETED, second.id),
+            (TaskEventType.DELETED, first.id),
+        ]
+        assert events[3].task.title == "Edited"
+        assert events[4].task.status == TaskStatus.COMPLETED
+        assert events[6].task is None
+
+    def test_database_events_are_sent_in_the_transaction(self, repository):
+        """Test that the database repository gives the events to the publisher before and after the commit"""
+        if isinstance(repository, InMemoryTaskRepository):
+            pytest.skip("the tasks in memory have no transaction")
+
+        repository.create_task(new_task("Task"))
+
+        assert repository.events.notified == repository.events.published
+
+
+@pytest.mark.anyio
+class TestPostgresNotify:
+    """Test suite for the events sent between the workers with LISTEN/NOTIFY"""
+
+    @pytest.fixture
+    def session(self, postgres_url):
+        """Fixture to provide a session of an empty PostgreSQL database"""
+        engine = create_engine(postgres_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        session = sessionmaker(autoflush=False, bind=engine)()
+
+        yield session
+
+        session.close()
+        models.Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    async def test_listener_publishes_the_committed_events(self, session, postgres_url):
+        """Test that the listener publishes the events of the committed writes, not the ones rolled back"""
+        broker = TaskEventBroker()
+        repository = TaskRepositoryDatabase(session, NotifyTaskEventPublisher("test_task_events"))
+
+        with broker.subscribe() as subscription:
+            listener = asyncio.create_task(listen_for_task_events(postgres_url, "test_task_events", broker))
+            try:
+                # the listener evicts the streams once connected, the ones opened before can have missed events
+                with pytest.raises(TaskEventStreamEnded):
+                    await subscription.get(10)
+                with broker.subscribe() as subscription:
+                    created = await to_thread.run_sync(repository.create_tasks, [new_task("First"), new_task("Second")])
+                    await to_thread.run_sync(repository.delete_task, created[0].id)
+                    events = await subscription.get(10)
+                    while len(events) < 3:
+                        events += await subscription.get(10)
+
+                    NotifyTaskEventPublisher("test_task_events").notify(session, [deleted(created[1].id)])
+                    session.rollback()
+                    later = await subscription.get(0.5)
+            finally:
+                listener.cancel()
+
+        assert [(event.type, event.task_id) for event in events] == [
+            (TaskEventType.CREATED, created[0].id), (TaskEventType.CREATED, created[1].id),
+            (TaskEventType.DELETED, created[0].id)
+        ]
+        assert events[1].task.title == "Second"
+        assert events[1].task.created_at == created[1].created_at
+        assert later == []
@@ -0,0 +1,234 @@
+"""
+Tests of the partitioned tasks table (PostgreSQL only, skipped without TEST_DATABASE_URL): the opt-in migration,
+the partition pruning of the created_at filters and the maintenance of the partitions.
+"""
+import asyncio
+from argparse import Namespace
+from datetime import datetime, timedelta, timezone
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_cursor import TaskSortField, SortOrder
+from app.infrastructure.database import models
+from app.infrastructure.database.partitions import (is_partitioned, partition_tasks_table, maintain_task_partitions,
+                                                     manage_task_partitions, month_start, partition_name,
+                                                     DEFAULT_PARTITION)
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from tests.test_query_plans import SEED_SQL, NOW, capture_selects, seq_scans
+from tests.test_sqlite import TestMigrations
+
+
+def partitions(engine) -> set[str]:
+    """the partitions of the tasks table"""
+    with engine.connect() as connection:
+        return set(connection.scalars(text(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'tasks'::regclass"
+        )))
+
+
+def partitioned_table(engine) -> bool:
+    with engine.connect() as connection:
+        return is_partitioned(connection)
+
+
+def relations(plan: dict) -> set[str]:
+    """
+    Find the relations read by a plan
+    :param plan: a node of an EXPLAIN (FORMAT JSON) plan
+    :return: the names of the tables read, by any scan
+    """
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= relations(child)
+
+    return found
+
+
+def new_task(title: str, created_at: datetime) -> Task:
+    return Task(task_id=None, title=title, description=None, created_at=created_at, status=TaskStatus.PENDING,
+                due_date=None, completed_at=None)
+
+
+@pytest.fixture
+def engine(postgres_url):
+    """Fixture to provide an engine on the empty test database"""
+    engine = create_engine(postgres_url)
+    models.Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+    yield engine
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def partitioned(engine):
+    """Fixture to provide an engine on a partitioned tasks table, with partitions from NOW to a month after"""
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        partition_tasks_table(connection, months_ahead=1, now=NOW)
+
+    return engine
+
+
+class TestPartitionMigration:
+    """Test suite for the migration partitioning the tasks table"""
+
+    @staticmethod
+    def upgrade(engine, revision: str, *x_arguments: str):
+        def run(config):
+            config.cmd_opts = Namespace(x=list(x_arguments))
+            command.upgrade(config, revision)
+
+        TestMigrations.run_alembic(engine, run)
+
+    def test_upgrade_is_opt_in(self, engine):
+        """Test that the tasks table is only partitioned with -x partition_tasks=true"""
+        self.upgrade(engine, "head")
+
+        assert not partitioned_table(engine)
+
+    def test_upgrade_and_downgrade(self, engine):
+        """Test that the tasks are kept with their change versions through the partitioning and back"""
+        self.upgrade(engine, "4a7d0c93e1b5")
+        with Session(engine) as session:
+            created = TaskRepositoryDatabase(session).create_tasks(
+                [new_task(f"Task {months}", NOW - timedelta(days=31 * months)) for months in range(3)]
+            )
+            token = TaskRepositoryDatabase(session).get_changes(None, limit=10).token
+
+        self.upgrade(engine, "head", "partition_tasks=true", "partition_months_ahead=2")
+
+        assert partitions(engine) >= {"tasks_p202510", "tasks_p202511", "tasks_p202512", DEFAULT_PARTITION}
+        # the partitions are not in the models, they are not dropped
+        TestMigrations.run_alembic(engine, command.check)
+        with Session(engine) as session:
+            repository = TaskRepositoryDatabase(session)
+            assert repository.get_changes(token, limit=10)[:2] == ([], [])
+            added = repository.create_task(new_task("Added", NOW))
+            assert [task.id for task in repository.get_tasks(sort=TaskSortField.ID, order=SortOrder.ASC)] == \
+                [task.id for task in created] + [added.id]
+
+        TestMigrations.run_alembic(engine, lambda config: command.downgrade(config, "-1"))
+
+        assert not partitioned_table(engine)
+        assert "tasks_default" not in inspect(engine).get_table_names()
+        self.upgrade(engine, "head")
+        TestMigrations.run_alembic(engine, command.check)
+        with Session(engine) as session:
+            repository = TaskRepositoryDatabase(session)
+            assert len(repository.get_tasks()) == 4
+            # the triggers are back
+            repository.delete_task(added.id)
+            assert repository.get_changes(token, limit=10).deleted == [added.id]
+
+
+class TestPartitionPruning:
+    """Test suite for the plans of the reads of a created_at range on the partitioned tasks table"""
+
+    @pytest.fixture(scope="class")
+    def seeded(self, postgres_url):
+        """Fixture to provide an engine on a partitioned tasks table with the tasks of test_query_plans"""
+        engine = create_engine(postgres_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(text(SEED_SQL))
+            partition_tasks_table(connection, months_ahead=1, now=NOW)
+            connection.execute(text("ANALYZE tasks"))
+
+        yield engine
+
+        models.Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    @pytest.mark.parametrize("sort", [TaskSortField.CREATED_AT, TaskSortField.DUE_DATE, TaskSortField.ID])
+    @pytest.mark.parametrize("status", [None, TaskStatus.PENDING, TaskStatus.COMPLETED])
+    def test_date_range_reads_its_partitions(self, seeded, sort, status):
+        """Test that a page of get_tasks in a created_at range only reads the partitions of the range"""
+        assert len(partitions(seeded)) > 5
+        with Session(seeded) as session:
+            repository = TaskRepositoryDatabase(session)
+            statements = capture_selects(session, lambda: repository.get_tasks(
+                limit=50, from_date=datetime(2025, 11, 20, tzinfo=timezone.utc),
+                to_date=datetime(2025, 12, 10, tzinfo=timezone.utc), status=status, sort=sort, order=SortOrder.ASC
+            ))
+
+            statement, parameters = statements[0]
+            plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+
+        read = {name for name in relations(plan[0]["Plan"]) if name.startswith("tasks_")} - {"tasks_archive"}
+        assert read == {"tasks_p202511", "tasks_p202512"}, plan
+        assert seq_scans(plan[0]["Plan"]) == [], plan
+
+
+class TestPartitionMaintenance:
+    """Test suite for maintain_task_partitions"""
+
+    def test_nothing_without_partitions(self, engine):
+        """Test that a single tasks table is left as is"""
+        models.Base.metadata.create_all(engine)
+
+        with Session(engine) as session:
+            assert maintain_task_partitions(session, months_ahead=3, retention_months=0) == ([], [])
+
+    def test_creates_the_partitions_ahead(self, partitioned):
+        """Test that the missing partitions are created, the tasks of their months move from the default one"""
+        with Session(partitioned) as session:
+            moved = TaskRepositoryDatabase(session).create_task(new_task("Moved", datetime(2026, 3, 2)))
+
+            changes = maintain_task_partitions(session, months_ahead=2, now=datetime(2026, 2, 15))
+            session.commit()
+
+            assert changes.created == ["tasks_p202603", "tasks_p202604"]
+            assert maintain_task_partitions(session, months_ahead=2, now=datetime(2026, 2, 15)).created == []
+            assert TaskRepositoryDatabase(session).get_task(moved.id).title == "Moved"
+            assert session.scalar(text("SELECT count(*) FROM tasks_p202603")) == 1
+
+    def test_drops_the_expired_partitions(self, partitioned):
+        """Test that the partitions before the retention are dropped, their tasks leave tombstones"""
+        with Session(partitioned) as session:
+            repository = TaskRepositoryDatabase(session)
+            old, default, kept = repository.create_tasks([
+                new_task("Old", NOW + timedelta(days=1)), new_task("Default", datetime(2020, 1, 1)),
+                new_task("Kept", NOW + timedelta(days=40))
+            ])
+            token = repository.get_changes(None, limit=10).token
+            version = repository.get_data_version()
+
+            changes = maintain_task_partitions(session, months_ahead=0, retention_months=0, now=datetime(2026, 2, 15))
+            session.commit()
+
+            assert changes.dropped == ["tasks_p202601"]
+            assert partitions(partitioned) == {"tasks_p202602", DEFAULT_PARTITION}
+            assert [task.id for task in repository.get_tasks()] == [kept.id]
+            assert repository.get_data_version() > version
+            assert sorted(repository.get_changes(token, limit=10).deleted) == [old.id, default.id]
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("mode", ["sync", "asyncio"])
+    async def test_background_maintenance(self, partitioned, postgres_url, mode):
+        """Test that the maintenance loop creates the partitions of the coming months with the sessions of a mode"""
+        async_engine = create_async_engine(make_url(postgres_url).set(drivername="postgresql+asyncpg"))
+        maintenance = asyncio.create_task(manage_task_partitions(
+            sessionmaker(bind=partitioned), async_sessionmaker(bind=async_engine), mode, 1, None, 3600
+        ))
+        expected = {partition_name(month_start(datetime.now(timezone.utc), months)) for months in range(2)}
+        try:
+            for _ in range(100):
+                if expected <= partitions(partitioned):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            maintenance.cancel()
+            await async_engine.dispose()
+
+        assert expected <= partitions(partitioned)
@@ -0,0 +1,594 @@
+"""
+Contract tests of the task repositories: the same tests run against the in-memory repository, SQLite and
+PostgreSQL (skipped without TEST_DATABASE_URL), with a single and a partitioned tasks table, so the stores stay
+interchangeable.
+"""
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from app.domain.entities.task import Task, TaskStatus
+from app.domain.entities.task_cursor import TaskCursor, TaskSortField, SortOrder
+from app.domain.entities.task_search import SearchMode
+from app.domain.entities.task_stats import DailyCount
+from app.domain.entities.task_changes import TaskChangeToken, ChangeTokenExpiredError
+from app.infrastructure.database import models
+from app.infrastructure.database.partitions import partition_tasks_table
+from app.infrastructure.database.task_repository_database import TaskRepositoryDatabase
+from app.infrastructure.memory.task_repository_memory import InMemoryTaskRepository
+
+BASE = datetime(2026, 1, 1, 12, 0)
+# the stats count the days in UTC
+UTC_BASE = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def new_task(title: str, minutes: int = 0, status: TaskStatus = TaskStatus.PENDING, due_days: int | None = None,
+             description: str | None = None) -> Task:
+    """A task created minutes after BASE, due due_days after BASE"""
+    return Task(
+        task_id=None,
+        title=title,
+        description=description,
+        created_at=BASE + timedelta(minutes=minutes),
+        status=status,
+        due_date=None if due_days is None else BASE + timedelta(days=due_days),
+        completed_at=BASE if status == TaskStatus.COMPLETED else None
+    )
+
+
+def reference_order(tasks: list[Task], sort: TaskSortField, order: SortOrder) -> list[int]:
+    """The ids of the tasks in the order of a sort, ties by id, tasks without a due date last in ascending order"""
+    def key(task: Task):
+        if sort == TaskSortField.ID:
+            return (task.id,)
+        if sort == TaskSortField.CREATED_AT:
+            return task.created_at, task.id
+        return (0, task.due_date, task.id) if task.due_date is not None else (1, None, task.id)
+
+    return [task.id for task in sorted(tasks, key=key, reverse=order == SortOrder.DESC)]
+
+
+@pytest.fixture(params=["memory", "sqlite", "postgresql", "postgresql partitioned"])
+def repository(request):
+    """
+    Fixture to provide an empty task repository of each store. The partitioned tasks table has the partitions of
+    the month of BASE and the next one, the tasks created now are in its default partition.
+    """
+    if request.param == "memory":
+        yield InMemoryTaskRepository()
+        return
+
+    if request.param == "sqlite":
+        engine = create_engine(f"sqlite:///{request.getfixturevalue('database_path')}")
+    else:
+        engine = create_engine(request.getfixturevalue("postgres_url"))
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        if request.param == "postgresql partitioned":
+            with engine.begin() as connection:
+                partition_tasks_table(connection, months_ahead=1, now=BASE)
+
+    session = sessionmaker(autoflush=False, bind=engine)()
+
+    yield TaskRepositoryDatabase(session)
+
+    session.close()
+    if request.param != "sqlite":
+        models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def tasks(repository) -> list[Task]:
+    """
+    Fixture to provide 12 stored tasks: one per minute, every third one completed, due dates with ties and gaps
+    """
+    return repository.create_tasks([
+        new_task(f"Task {i}", minutes=i, status=TaskStatus.COMPLETED if i % 3 == 0 else TaskStatus.PENDING,
+                 due_days=None if i % 4 == 0 else i % 3)
+        for i in range(12)
+    ])
+
+
+class TestTaskRepositoryConformance:
+    """Test suite for the contract shared by the task repositories"""
+
+    def test_create_and_get_task(self, repository):
+        """Test that a created task gets an id and is read back"""
+        created = repository.create_task(new_task("Task", description="Details", due_days=2))
+
+        task = repository.get_task(created.id)
+
+        assert created.id > 0
+        assert (task.id, task.title, task.description, task.status) == \
+            (created.id, "Task", "Details", TaskStatus.PENDING)
+        assert task.due_date.replace(tzinfo=None) == BASE + timedelta(days=2)
+
+    def test_get_missing_task(self, repository):
+        """Test that reading a missing task returns None"""
+        assert repository.get_task(12345) is None
+
+    def test_edit_task(self, repository):
+        """Test that the editable fields are updated, a missing task is not created"""
+        task = repository.create_task(new_task("Task"))
+        task.title = "Edited"
+        task.description = "New"
+        task.due_date = BASE + timedelta(days=1)
+
+        edited = repository.edit_task(task)
+
+        assert (edited.title, edited.description) == ("Edited", "New")
+        assert repository.get_task(task.id).title == "Edited"
+        assert repository.edit_task(Task(12345, "Missing", None, BASE)) is None
+        assert repository.get_task(12345) is None
+
+    def test_complete_task(self, repository):
+        """Test that completing sets completed_at once, a second completion keeps the first time"""
+        task = repository.create_task(new_task("Task"))
+
+        first = repository.complete_task(task.id, BASE + timedelta(hours=1))
+        second = repository.complete_task(task.id, BASE + timedelta(hours=2))
+
+        assert first.status == second.status == TaskStatus.COMPLETED
+        assert second.completed_at.replace(tzinfo=None) == BASE + timedelta(hours=1)
+        assert repository.complete_task(12345, BASE) is None
+
+    def test_delete_task(self, repository):
+        """Test that a deleted task is gone, deleting it again returns False"""
+        task = repository.create_task(new_task("Task"))
+
+        assert repository.delete_task(task.id) is True
+        assert repository.get_task(task.id) is None
+        assert repository.delete_task(task.id) is False
+
+    def test_bulk_operations(self, repository):
+        """Test that the bulk operations keep the order of their input and report the missing tasks"""
+        created = repository.create_tasks([new_task("First"), new_task("Second"), new_task("Third")])
+        ids = [task.id for task in created]
+
+        completed = repository.complete_tasks([ids[1], 12345, ids[0]], BASE)
+        deleted = repository.delete_tasks([ids[2], 12345, ids[2]])
+        deleted_again = repository.delete_tasks([ids[2]])
+
+        assert [task.title for task in created] == ["First", "Second", "Third"]
+        assert ids == sorted(ids)
+        assert [task and task.id for task in completed] == [ids[1], None, ids[0]]
+        assert deleted == [True, False, True]
+        assert deleted_again == [False]
+        assert repository.create_tasks([]) == []
+
+    def test_filters(self, repository, tasks):
+        """Test the date range (inclusive), status and title filters"""
+        found = repository.get_tasks(from_date=BASE + timedelta(minutes=3), to_date=BASE + timedelta(minutes=9),
+                                     status=TaskStatus.COMPLETED, sort=TaskSortField.ID, order=SortOrder.ASC)
+        titled = repository.get_tasks(title_contains="task 1", sort=TaskSortField.ID, order=SortOrder.ASC)
+
+        assert [task.title for task in found] == ["Task 3", "Task 6", "Task 9"]
+        assert [task.title for task in titled] == ["Task 1", "Task 10", "Task 11"]
+
+    def test_substring_search(self, repository):
+        """Test that the substring search is case insensitive and matches the LIKE wildcards literally"""
+        repository.create_tasks([new_task("100% DONE"), new_task("1000 done"), new_task("a_b"), new_task("axb")])
+
+        assert [task.title for task in repository.get_tasks(q="0% done")] == ["100% DONE"]
+        assert [task.title for task in repository.get_tasks(q="a_b")] == ["a_b"]
+        assert len(repository.get_tasks(q="   ")) == 4
+
+    @pytest.mark.parametrize("sort", list(TaskSortField))
+    @pytest.mark.parametrize("order", list(SortOrder))
+    def test_sort_and_pages(self, repository, tasks, sort, order):
+        """Test every sort and order, and that walking the pages with the cursors returns the same tasks"""
+        expected = reference_order(tasks, sort, order)
+
+        pages = []
+        cursor = None
+        while True:
+            page = repository.get_tasks(limit=5, cursor=cursor, sort=sort, order=order)
+            pages += [task.id for task in page]
+            if len(page) < 5:
+                break
+            cursor = TaskCursor.after(page[-1], sort, order)
+
+        assert [task.id for task in repository.get_tasks(sort=sort, order=order)] == expected
+        assert pages == expected
+
+    def test_pages_with_filters(self, repository, tasks):
+        """Test the cursor pages of a filtered list"""
+        pending = [task for task in tasks if task.status == TaskStatus.PENDING]
+        expected = reference_order(pending, TaskSortField.DUE_DATE, SortOrder.ASC)
+
+        first = repository.get_tasks(status=TaskStatus.PENDING, limit=3, sort=TaskSortField.DUE_DATE,
+                                     order=SortOrder.ASC)
+        cursor = TaskCursor.after(first[-1], TaskSortField.DUE_DATE, SortOrder.ASC)
+        rest = repository.get_tasks(status=TaskStatus.PENDING, cursor=cursor, sort=TaskSortField.DUE_DATE,
+                                    order=SortOrder.ASC)
+
+        assert [task.id for task in first + rest] == expected
+
+    def test_full_text_search(self, repository):
+        """Test that every word must match and that a title match ranks above a description match"""
+        in_description = repository.create_task(new_task("Meeting", description="quarterly budget review"))
+        in_title = repository.create_task(new_task("Budget review", description="with the team"))
+        repository.create_task(new_task("Budget", description="alone"))
+
+        found = repository.get_tasks(q="budget review", search_mode=SearchMode.FULLTEXT)
+
+        assert [task.id for task in found] == [in_title.id, in_description.id]
+        assert len(repository.get_tasks(q="budget review", search_mode=SearchMode.FULLTEXT, limit=1)) == 1
+
+    def test_full_text_search_rejects_cursor(self, repository, tasks):
+        """Test that the relevance order can't be paged with a cursor"""
+        cursor = TaskCursor.after(tasks[0], TaskSortField.ID, SortOrder.DESC)
+
+        with pytest.raises(ValueError):
+            repository.get_tasks(q="task", search_mode=SearchMode.FULLTEXT, cursor=cursor)
+
+    def test_stream_task_batches(self, repository, tasks):
+        """Test that the batches hold the matching tasks by id"""
+        batches = list(repository.stream_task_batches(status=TaskStatus.PENDING, batch_size=3))
+
+        assert [len(batch) for batch in batches] == [3, 3, 2]
+        assert [record.id for batch in batches for record in batch] == \
+            [task.id for task in tasks if task.status == TaskStatus.PENDING]
+        assert batches[0][0].title == "Task 1"
+
+    def test_data_version(self, repository):
+        """Test that every change bumps the data version and reads don't"""
+        versions = [repository.get_data_version()]
+        task = repository.create_task(new_task("Task"))
+        versions.append(repository.get_data_version())
+        repository.get_tasks()
+        versions.append(repository.get_data_version())
+        repository.complete_task(task.id, BASE)
+        versions.append(repository.get_data_version())
+        repository.delete_task(task.id)
+        versions.append(repository.get_data_version())
+
+        assert versions[0] < versions[1] == versions[2] < versions[3] < versions[4]
+
+
+@pytest.fixture
+def stats_tasks(repository) -> list[Task]:
+    """
+    Fixture to provide 7 stored tasks for the stats, now being UTC_BASE plus 5 days: 3 completed in 60 s, 120 s
+    and a day, 4 pending (overdue, due soon, due later and without a due date, created before the daily counts)
+    """
+    def stored(title: str, created_days: float, completed_seconds: int | None = None, due_days: int | None = None,
+               description: str | None = None) -> Task:
+        created_at = UTC_BASE + timedelta(days=created_days)
+        return Task(None, title, description, created_at,
+                    TaskStatus.PENDING if completed_seconds is None else TaskStatus.COMPLETED,
+                    None if due_days is None else UTC_BASE + timedelta(days=5 + due_days),
+                    None if completed_seconds is None else created_at + timedelta(seconds=completed_seconds))
+
+    return repository.create_tasks([
+        stored("Task 0", 0, completed_seconds=60, description="monthly report"),
+        stored("Task 1", 0.001, completed_seconds=120),
+        stored("Task 2", 1, completed_seconds=86400),
+        stored("Task 3", 2, due_days=-1, description="report draft"),
+        stored("Task 4", 3, due_days=2),
+        stored("Task 5", 3, due_days=30),
+        stored("Other", -12),
+    ])
+
+
+class TestTaskRepositoryStats:
+    """Test suite for the stats of the task repositories"""
+
+    NOW = UTC_BASE + timedelta(days=5)
+
+    def test_stats(self, repository, stats_tasks):
+        """Test the counts, the daily counts (zero filled) and the nearest rank percentiles"""
+        stats = repository.get_stats(self.NOW, due_within_days=7, days=7)
+
+        assert stats.total == 7
+        assert stats.by_status == {TaskStatus.PENDING: 4, TaskStatus.COMPLETED: 3}
+        assert (stats.overdue, stats.due_soon, stats.due_within_days) == (1, 1, 7)
+        assert stats.daily == [
+            DailyCount(date(2025, 12, 31), 0, 0),
+            DailyCount(date(2026, 1, 1), 2, 2),
+            DailyCount(date(2026, 1, 2), 1, 0),
+            DailyCount(date(2026, 1, 3), 1, 1),
+            DailyCount(date(2026, 1, 4), 2, 0),
+            DailyCount(date(2026, 1, 5), 0, 0),
+            DailyCount(date(2026, 1, 6), 0, 0),
+        ]
+        assert stats.completion_time_percentiles == {50: 120, 90: 86400, 99: 86400}
+
+    def test_stats_with_filters(self, repository, stats_tasks):
+        """Test that the stats only count the matching tasks and that the daily counts end on the to_date day"""
+        titled = repository.get_stats(self.NOW, title_contains="task", status=TaskStatus.PENDING)
+        found = repository.get_stats(self.NOW, q="report", search_mode=SearchMode.FULLTEXT)
+        until = repository.get_stats(self.NOW, to_date=UTC_BASE + timedelta(days=2, hours=11), days=3)
+
+        assert titled.by_status == {TaskStatus.PENDING: 3, TaskStatus.COMPLETED: 0}
+        assert titled.completion_time_percentiles == {50: None, 90: None, 99: None}
+        assert (found.total, found.overdue, found.completion_time_percentiles[50]) == (2, 1, 60)
+        assert until.total == 5
+        assert until.daily == [DailyCount(date(2026, 1, 1), 2, 2), DailyCount(date(2026, 1, 2), 1, 0),
+                               DailyCount(date(2026, 1, 3), 1, 1)]
+
+    def test_stats_without_tasks(self, repository):
+        """Test that the stats of no task have the same size, with zeros and no percentile"""
+        stats = repository.get_stats(self.NOW, days=30)
+
+        assert stats.total == stats.overdue == stats.due_soon == 0
+        assert len(stats.daily) == 30
+        assert {(count.created, count.completed) for count in stats.daily} == {(0, 0)}
+        assert set(stats.completion_time_percentiles.values()) == {None}
+
+
+class TestTaskRepositoryChanges:
+    """Test suite for the changes of the tasks after a sync token"""
+
+    def test_changes_since_a_token(self, repository):
+        """Test that the changes after a token are the tasks written and deleted since, once each"""
+        first, second, third = repository.create_tasks([new_task("First"), new_task("Second"), new_task("Third")])
+        initial = repository.get_changes()
+
+        second = repository.complete_task(second.id, BASE)
+        first.title = "Edited"
+        repository.edit_task(first)
+        repository.delete_task(third.id)
+        # already completed, nothing changes
+        repository.complete_task(second.id, BASE + timedelta(hours=1))
+        fourth = repository.create_task(new_task("Fourth"))
+        changes = repository.get_changes(initial.token)
+
+        assert [task.id for task in initial.changed] == [first.id, second.id, third.id]
+        assert (initial.deleted, initial.has_more) == ([], False)
+        assert [task.id for task in changes.changed] == [second.id, first.id, fourth.id]
+        assert (changes.changed[0].status, changes.changed[1].title) == (TaskStatus.COMPLETED, "Edited")
+        assert changes.changed[0].updated_at == second.updated_at
+        assert changes.changed[0].updated_at >= initial.changed[1].updated_at
+        assert changes.deleted == [third.id]
+        assert repository.get_changes(changes.token).changed == []
+        assert repository.get_changes(changes.token).token.encode() == changes.token.encode()
+
+    def test_pages_in_the_order_of_the_changes(self, repository):
+        """Test that the changes come in the order of the writes, a page at a time"""
+        created = repository.create_tasks([new_task(f"Task {i}") for i in range(5)])
+        repository.delete_tasks([created[1].id, created[3].id])
+        repository.complete_task(created[0].id, BASE)
+
+        pages = []
+        token = None
+        while not pages or pages[-1].has_more:
+            pages.append(repository.get_changes(token, limit=1))
+            token = pages[-1].token
+
+        assert [(["changed"] if page.changed else ["deleted"]) + [task.id for task in page.changed] + page.deleted
+                for page in pages] == [
+            ["changed", created[2].id], ["changed", created[4].id], ["deleted", created[1].id],
+            ["deleted", created[3].id], ["changed", created[0].id]
+        ]
+
+    def test_token_from_another_store(self, repository):
+        """Test that a token newer than the tasks is refused"""
+        with pytest.raises(ChangeTokenExpiredError):
+            repository.get_changes(TaskChangeToken(repository.get_data_version() + 1, 0))
+
+    def test_changes_follow_the_commits(self, postgres_url):
+        """Test that a write committed after a sync comes after its token, even when its transaction started first"""
+        engine = create_engine(postgres_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        sessions = [sessionmaker(autoflush=False, bind=engine)() for _ in range(3)]
+        writer, other_writer, reader = (TaskRepositoryDatabase(session) for session in sessions)
+        try:
+            task = writer.create_task(new_task("Task"))
+            token = reader.get_changes().token
+
+            # the first transaction writes, then holds its commit back
+            sessions[0].execute(update(models.Task).where(models.Task.id == task.id).values(title="First"))
+            with ThreadPoolExecutor(1) as pool:
+                later = pool.submit(other_writer.create_task, new_task("Second"))
+                time.sleep(0.2)
+                synced = reader.get_changes(token)
+                sessions[0].commit()
+                later.result(10)
+            changes = reader.get_changes(synced.token)
+        finally:
+            for session in sessions:
+                session.close()
+            models.Base.metadata.drop_all(engine)
+            engine.dispose()
+
+        assert synced.changed == []
+        assert [task.title for task in changes.changed] == ["First", "Second"]
+
+
+@pytest.fixture
+def archived(repository) -> tuple[list[Task], list[Task]]:
+    """
+    Fixture to provide 6 tasks, one per minute, and the 2 of them archived: the first 4 are completed an hour apart,
+    in the reverse order of their creation, the 2 completed first are archived
+    """
+    created = repository.create_tasks([new_task(f"Task {i}", minutes=i) for i in range(6)])
+    for hours, task in enumerate(reversed(created[:4])):
+        repository.complete_task(task.id, BASE + timedelta(hours=hours))
+    repository.archive_tasks(BASE + timedelta(hours=1, minutes=30), 10)
+
+    return created, [created[3], created[2]]
+
+
+class TestTaskRepositoryArchive:
+    """Test suite for the archive of the old completed tasks"""
+
+    def test_archive_oldest_completions_first(self, repository):
+        """Test that the tasks completed first are archived, a batch at a time, the pending and recent ones stay"""
+        created = repository.create_tasks([new_task(f"Task {i}", minutes=i) for i in range(6)])
+        for hours, task in enumerate(reversed(created[:4])):
+            repository.complete_task(task.id, BASE + timedelta(hours=hours))
+        before = BASE + timedelta(hours=2, minutes=30)
+
+        batches = [repository.archive_tasks(before, 2), repository.archive_tasks(before, 2),
+                   repository.archive_tasks(before, 2)]
+
+        assert batches == [2, 1, 0]
+        assert [task.id for task in repository.get_tasks(sort=TaskSortField.ID, order=SortOrder.ASC)] == \
+            [created[0].id, created[4].id, created[5].id]
+
+    def test_archived_tasks_are_read_on_demand(self, repository, archived):
+        """
+        Test that the archived tasks are found by id, listed with include_archived or a date range, except for the
+        pending tasks and the full-text search
+        """
+        created, archived_tasks = archived
+        archived_ids = {task.id for task in archived_tasks}
+        everything = [task.id for task in reversed(created)]
+        day = {"from_date": BASE - timedelta(days=1), "to_date": BASE + timedelta(days=1)}
+
+        assert [task.id for task in repository.get_tasks()] == [task_id for task_id in everything
+                                                                if task_id not in archived_ids]
+        assert [task.id for task in repository.get_tasks(include_archived=True)] == everything
+        assert [task.id for task in repository.get_tasks(**day)] == everything
+        assert [task.id for task in repository.get_tasks(status=TaskStatus.COMPLETED, include_archived=True,
+                                                         sort=TaskSortField.ID, order=SortOrder.ASC)] == \
+            [created[0].id, created[1].id, created[2].id, created[3].id]
+        assert len(repository.get_tasks(status=TaskStatus.PENDING, include_archived=True)) == 2
+        assert repository.get_tasks(q="Task 3", include_archived=True)[0].id == created[3].id
+        assert repository.get_tasks(q="task", search_mode=SearchMode.FULLTEXT, include_archived=True,
+                                    limit=10) != []
+        assert created[3].id not in {task.id for task in repository.get_tasks(
+            q="task", search_mode=SearchMode.FULLTEXT, include_archived=True)}
+        assert repository.get_task(created[3].id).status == TaskStatus.COMPLETED
+        assert repository.get_stats(UTC_BASE).total == 4
+        assert repository.get_stats(UTC_BASE, include_archived=True).total == 6
+        assert sum(len(batch) for batch in repository.stream_task_batches()) == 4
+        assert [record.id for batch in repository.stream_task_batches(include_archived=True) for record in batch] \
+            == sorted(everything)
+
+    def test_pages_with_archived_tasks(self, repository, archived):
+        """Test that the pages of a list with the archived tasks follow each other like the pages of the tasks"""
+        created, _ = archived
+
+        for sort, order in ((TaskSortField.CREATED_AT, SortOrder.DESC), (TaskSortField.ID, SortOrder.ASC)):
+            ids, cursor = [], None
+            while page := repository.get_tasks(limit=4, cursor=cursor, sort=sort, order=order,
+                                               include_archived=True):
+                ids += [task.id for task in page]
+                cursor = TaskCursor.after(page[-1], sort, order)
+
+            assert ids == reference_order(created, sort, order)
+
+    def test_archived_tasks_are_read_only(self, repository, archived):
+        """Test that an archived task can't be edited, completing it returns it unchanged, deleting it removes it"""
+        _, (task, other) = archived
+        task.title = "Edited"
+
+        assert repository.edit_task(task) is None
+        assert repository.complete_task(task.id, BASE + timedelta(days=1)).completed_at == \
+            repository.get_task(task.id).completed_at
+        assert repository.complete_tasks([other.id], BASE)[0].id == other.id
+        assert repository.get_task(task.id).title == "Task 3"
+        version = repository.get_data_version()
+        assert repository.delete_task(task.id) is True
+        assert repository.delete_tasks([other.id, other.id]) == [True, True]
+        assert repository.get_task(task.id) is None
+        assert repository.get_tasks(include_archived=True, status=TaskStatus.COMPLETED) != []
+        assert repository.delete_task(task.id) is False
+        assert repository.get_data_version() > version
+
+    def test_archived_tasks_are_deleted_changes(self, repository):
+        """Test that the changes report the archived tasks as deleted, nothing changes when none is archived"""
+        first, second = repository.create_tasks([new_task("First"), new_task("Second")])
+        repository.complete_task(first.id, BASE)
+        token = repository.get_changes().token
+
+        assert repository.archive_tasks(BASE - timedelta(hours=1), 10) == 0
+        assert repository.get_changes(token).deleted == []
+        assert repository.archive_tasks(BASE + timedelta(hours=1), 10) == 1
+
+        changes = repository.get_changes(token)
+        assert (changes.changed, changes.deleted) == ([], [first.id])
+        assert [task.id for task in repository.get_changes().changed] == [second.id]
+
+    def test_archived_ids_are_not_given_again(self, repository):
+        """Test that a task created after the archive of the last one gets a new id"""
+        task = repository.create_task(new_task("Task"))
+        repository.complete_task(task.id, BASE)
+        repository.archive_tasks(BASE + timedelta(hours=1), 10)
+
+        assert repository.create_task(new_task("Next")).id > task.id
+
+
+class TestInMemoryTaskRepository:
+    """Test suite for the parts of InMemoryTaskRepository outside of the repository contract"""
+
+    def test_returned_tasks_are_copies(self):
+        """Test that changing a returned task doesn't change the stored one"""
+        repository = InMemoryTaskRepository()
+        task = repository.create_task(new_task("Task"))
+
+        task.title = "Changed"
+        repository.get_task(task.id).status = TaskStatus.COMPLETED
+
+        stored = repository.get_task(task.id)
+        assert (stored.title, stored.status) == ("Task", TaskStatus.PENDING)
+        assert repository.get_tasks(status=TaskStatus.COMPLETED) == []
+
+    def test_snapshot_and_restore(self, tmp_path):
+        """Test that a snapshot restores the tasks, the ids and the data version, and is skipped when unchanged"""
+        path = tmp_path / "tasks.json"
+        repository = InMemoryTaskRepository(str(path))
+        first, second = repository.create_tasks([new_task("First", due_days=1), new_task("Second", minutes=1)])
+        repository.complete_task(first.id, BASE)
+
+        assert repository.snapshot() is True
+        assert repository.snapshot() is False
+
+        restored = InMemoryTaskRepository(str(path))
+        third = restored.create_task(new_task("Third", minutes=2))
+
+        assert [task.title for task in restored.get_tasks()] == ["Third", "Second", "First"]
+        assert restored.get_task(first.id).status == TaskStatus.COMPLETED
+        assert restored.get_task(first.id).due_date == repository.get_task(first.id).due_date
+        assert third.id == second.id + 1
+        assert restored.get_data_version() == repository.get_data_version() + 1
+
+    def test_snapshot_keeps_the_archive(self, tmp_path):
+        """Test that the archived tasks are restored archived"""
+        path = tmp_path / "tasks.json"
+        repository = InMemoryTaskRepository(str(path))
+        first, second = repository.create_tasks([new_task("First"), new_task("Second", minutes=1)])
+        repository.complete_task(first.id, BASE)
+        repository.archive_tasks(BASE + timedelta(hours=1), 10)
+        repository.snapshot()
+
+        restored = InMemoryTaskRepository(str(path))
+
+        assert [task.id for task in restored.get_tasks()] == [second.id]
+        assert [task.id for task in restored.get_tasks(include_archived=True)] == [second.id, first.id]
+        assert restored.get_task(first.id).completed_at == repository.get_task(first.id).completed_at
+        assert restored.create_task(new_task("Third")).id == second.id + 1
+
+    def test_changes_after_restore(self, tmp_path):
+        """
+        Test that the tokens older than the snapshot are expired once restored, the one of the snapshot continues
+        (the tasks of the snapshot can come again)
+        """
+        path = tmp_path / "tasks.json"
+        repository = InMemoryTaskRepository(str(path))
+        first = repository.create_task(new_task("First"))
+        old_token = repository.get_changes().token
+        second = repository.create_task(new_task("Second"))
+        repository.delete_task(first.id)
+        token = repository.get_changes(old_token).token
+        repository.snapshot()
+
+        restored = InMemoryTaskRepository(str(path))
+        third = restored.create_task(new_task("Third"))
+
+        with pytest.raises(ChangeTokenExpiredError):
+            restored.get_changes(old_token)
+        assert [task.id for task in restored.get_changes().changed] == [second.id, third.id]
+        assert [task.id for task in restored.get_changes(token).changed] == [second.id, third.id]
+        assert restored.get_task(second.id).updated_at == second.updated_at
+
+    def test_snapshot_without_path(self):
+        """Test that a repository without a snapshot path can't save one"""
+        with pytest.raises(ValueError):
+            InMemoryTaskRepository().snapshot()
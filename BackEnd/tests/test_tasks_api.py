@@ -0,0 +1,566 @@
+"""API tests for the tasks routes, running against a SQLite database in both database modes."""
+import asyncio
+import csv
+import io
+import json
+import httpx
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import event
+from dependency_injector import providers
+from app.main import app, container
+from app.infrastructure.cache.cache_backend import LocalCacheBackend
+from app.infrastructure.cache.task_cache import TaskCache
+from app.domain.entities.task_changes import TaskChangeToken
+from app.services.task_archival import archive_completed_tasks
+
+# sync: TasksService + TaskRepositoryDatabase in the threadpool, asyncio: AsyncTasksService + AsyncTaskRepositoryDatabase
+DATABASE_MODES = ["sync", "asyncio"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("mode", DATABASE_MODES)
+class TestTasksApi:
+    """Test suite for the tasks routes"""
+
+    @pytest.fixture
+    def engine(self, use_database, mode):
+        """Fixture to point the API at the test database in the given mode, provides the (sync) engine"""
+        return use_database(mode)
+
+    @pytest.fixture
+    async def client(self, engine):
+        """Fixture to provide a client of the API using the test database"""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            yield client
+
+    async def create_task(self, client, title: str, description: str | None = None, due_date: str | None = None) -> dict:
+        response = await client.post("/api/tasks", json={"title": title, "description": description,
+                                                         "due_date": due_date})
+        assert response.status_code == 200
+
+        return response.json()
+
+    async def test_create_and_get_task(self, client):
+        """Test creating a task and reading it back"""
+        created = await self.create_task(client, "Test Task", "Test Description")
+
+        response = await client.get(f"/api/tasks/{created['id']}")
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Test Task"
+        assert response.json()["description"] == "Test Description"
+        assert response.json()["status"] == "pending"
+
+    async def test_get_task_not_found(self, client):
+        """Test getting a non-existent task"""
+        response = await client.get("/api/tasks/123")
+
+        assert response.status_code == 404
+
+    async def test_get_tasks_filters(self, client):
+        """Test listing tasks with the status and title filters"""
+        await self.create_task(client, "Buy milk")
+        task = await self.create_task(client, "Write report")
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+
+        all_tasks = (await client.get("/api/tasks")).json()
+        completed = (await client.get("/api/tasks", params={"status": "completed"})).json()
+        milk = (await client.get("/api/tasks", params={"title_contains": "milk"})).json()
+
+        assert len(all_tasks) == 2
+        assert [t["title"] for t in completed] == ["Write report"]
+        assert [t["title"] for t in milk] == ["Buy milk"]
+
+    @pytest.mark.parametrize("sort", ["created_at", "due_date", "id"])
+    @pytest.mark.parametrize("order", ["asc", "desc"])
+    async def test_get_tasks_pages(self, client, sort, order):
+        """Test that walking the pages with the cursor returns every task once, in the same order as one big page"""
+        for i in range(7):
+            due_date = None if i % 3 == 0 else f"2030-01-0{i % 2 + 1}T00:00:00"
+            await self.create_task(client, f"Task {i}", due_date=due_date)
+        expected = (await client.get("/api/tasks", params={"sort": sort, "order": order})).json()
+
+        pages = []
+        params = {"sort": sort, "order": order, "limit": 3}
+        while True:
+            response = await client.get("/api/tasks", params=params)
+            pages.append(response.json())
+            if "x-next-cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["x-next-cursor"]
+
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [task["id"] for page in pages for task in page] == [task["id"] for task in expected]
+
+    async def test_get_tasks_invalid_cursor(self, client):
+        """Test that a malformed cursor, or one from another sort, is rejected"""
+        await self.create_task(client, "Task 1")
+        await self.create_task(client, "Task 2")
+        cursor = (await client.get("/api/tasks", params={"limit": 1})).headers["x-next-cursor"]
+
+        malformed = await client.get("/api/tasks", params={"limit": 1, "cursor": "not-a-cursor"})
+        other_sort = await client.get("/api/tasks", params={"limit": 1, "cursor": cursor, "sort": "id"})
+
+        assert malformed.status_code == 400
+        assert other_sort.status_code == 400
+
+    async def test_search_substring(self, client):
+        """Test the substring search on the title, case-insensitive and with the LIKE wildcards matched literally"""
+        await self.create_task(client, "Buy MILK")
+        await self.create_task(client, "100% done")
+        await self.create_task(client, "1000 done")
+
+        milk = (await client.get("/api/tasks", params={"q": "milk"})).json()
+        percent = (await client.get("/api/tasks", params={"q": "0%", "search_mode": "substring"})).json()
+        title_percent = (await client.get("/api/tasks", params={"title_contains": "%"})).json()
+
+        assert [t["title"] for t in milk] == ["Buy MILK"]
+        assert [t["title"] for t in percent] == ["100% done"]
+        assert [t["title"] for t in title_percent] == ["100% done"]
+
+    async def test_search_fulltext(self, client):
+        """Test the full-text search: stemmed words of the title and description, title matches ranked first"""
+        await self.create_task(client, "Groceries", "buy apples and pears")
+        await self.create_task(client, "Read a book")
+        await self.create_task(client, "Apple pie", "for the party")
+        await self.create_task(client, "Cook dinner", "apples")
+
+        response = await client.get("/api/tasks", params={"q": "apple", "search_mode": "fulltext", "limit": 2})
+        all_matches = (await client.get("/api/tasks", params={"q": "apple", "search_mode": "fulltext"})).json()
+        both_words = (await client.get("/api/tasks", params={"q": "buy apples", "search_mode": "fulltext"})).json()
+
+        assert response.status_code == 200
+        assert response.json()[0]["title"] == "Apple pie"
+        assert len(response.json()) == 2
+        assert "x-next-cursor" not in response.headers
+        assert all_matches[0]["title"] == "Apple pie"
+        assert {t["title"] for t in all_matches} == {"Apple pie", "Groceries", "Cook dinner"}
+        assert [t["title"] for t in both_words] == ["Groceries"]
+
+    async def test_search_without_words(self, client):
+        """Test that a blank search text is no search"""
+        await self.create_task(client, "Task 1")
+        await self.create_task(client, "Task 2")
+
+        response = await client.get("/api/tasks", params={"q": "  ", "search_mode": "fulltext", "limit": 1})
+
+        assert response.status_code == 200
+        assert [t["title"] for t in response.json()] == ["Task 2"]
+        assert "x-next-cursor" in response.headers
+
+    async def test_search_fulltext_rejects_cursor(self, client):
+        """Test that the full-text search does not accept a page cursor"""
+        await self.create_task(client, "Task 1")
+        await self.create_task(client, "Task 2")
+        cursor = (await client.get("/api/tasks", params={"limit": 1})).headers["x-next-cursor"]
+
+        response = await client.get("/api/tasks", params={"q": "task", "search_mode": "fulltext", "cursor": cursor})
+
+        assert response.status_code == 400
+
+    async def test_complete_task(self, client):
+        """Test completing a task, and that completing it again keeps the timestamp"""
+        task = await self.create_task(client, "Task to complete")
+
+        response = await client.patch(f"/api/tasks/{task['id']}/complete")
+        first = (await client.get(f"/api/tasks/{task['id']}")).json()
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        second = (await client.get(f"/api/tasks/{task['id']}")).json()
+
+        assert response.status_code == 200
+        assert first["status"] == "completed"
+        assert first["completed_at"] is not None
+        assert second["completed_at"] == first["completed_at"]
+
+    async def test_write_routes_send_one_statement(self, client, engine):
+        """Test that completing and deleting a task each send a single statement"""
+        task = await self.create_task(client, "Task")
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        await client.delete(f"/api/tasks/{task['id']}")
+
+        assert [statement.split()[0] for statement in statements] == ["UPDATE", "DELETE"]
+
+    async def test_concurrent_completes(self, client):
+        """Test completing a task from parallel requests, then again: the task keeps its completed_at"""
+        task = await self.create_task(client, "Task")
+
+        responses = await asyncio.gather(*(client.patch(f"/api/tasks/{task['id']}/complete") for _ in range(10)))
+        completed = (await client.get(f"/api/tasks/{task['id']}")).json()
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        completed_again = (await client.get(f"/api/tasks/{task['id']}")).json()
+
+        assert [response.status_code for response in responses] == [200] * 10
+        assert completed["status"] == "completed"
+        assert completed_again["completed_at"] == completed["completed_at"]
+
+    async def test_complete_task_not_found(self, client):
+        """Test completing a non-existent task"""
+        response = await client.patch("/api/tasks/123/complete")
+
+        assert response.status_code == 404
+
+    async def test_delete_task(self, client):
+        """Test deleting a task"""
+        task = await self.create_task(client, "Task to delete")
+
+        response = await client.delete(f"/api/tasks/{task['id']}")
+        second_response = await client.delete(f"/api/tasks/{task['id']}")
+
+        assert response.status_code == 200
+        assert second_response.status_code == 404
+        assert (await client.get(f"/api/tasks/{task['id']}")).status_code == 404
+
+    async def test_bulk_create(self, client):
+        """Test creating several tasks in one request, returned in the order of the request"""
+        response = await client.post("/api/tasks/bulk", json={"tasks": [
+            {"title": f"Task {i}", "description": None if i % 2 else f"Description {i}"} for i in range(1500)
+        ]})
+
+        created = response.json()
+        assert response.status_code == 200
+        assert [task["title"] for task in created] == [f"Task {i}" for i in range(1500)]
+        assert created[0]["description"] == "Description 0"
+        assert created[1]["description"] is None
+        assert len({task["id"] for task in created}) == 1500
+        assert (await client.get(f"/api/tasks/{created[-1]['id']}")).json()["title"] == "Task 1499"
+
+    async def test_bulk_create_validation(self, client):
+        """Test that an empty bulk create is rejected"""
+        response = await client.post("/api/tasks/bulk", json={"tasks": []})
+
+        assert response.status_code == 422
+
+    async def test_bulk_complete(self, client):
+        """Test completing several tasks: per ID results, already completed tasks keep their completion time"""
+        first = await self.create_task(client, "Task 1")
+        second = await self.create_task(client, "Task 2")
+        await client.patch(f"/api/tasks/{first['id']}/complete")
+        first_completed_at = (await client.get(f"/api/tasks/{first['id']}")).json()["completed_at"]
+
+        response = await client.patch("/api/tasks/bulk/complete", json={"ids": [second["id"], 999, first["id"]]})
+
+        results = response.json()
+        assert response.status_code == 200
+        assert [(result["id"], result["found"]) for result in results] == [
+            (second["id"], True), (999, False), (first["id"], True)
+        ]
+        assert results[0]["task"]["status"] == "completed"
+        assert results[0]["task"]["completed_at"] is not None
+        assert results[1]["task"] is None
+        assert results[2]["task"]["completed_at"] == first_completed_at
+        assert (await client.get(f"/api/tasks/{second['id']}")).json()["status"] == "completed"
+
+    async def test_bulk_delete(self, client):
+        """Test deleting several tasks with one result per ID, repeated IDs are only reported once"""
+        first = await self.create_task(client, "Task 1")
+        second = await self.create_task(client, "Task 2")
+        kept = await self.create_task(client, "Task 3")
+
+        response = await client.request("DELETE", "/api/tasks/bulk",
+                                        json={"ids": [first["id"], 999, second["id"], first["id"]]})
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {"id": first["id"], "found": True}, {"id": 999, "found": False}, {"id": second["id"], "found": True}
+        ]
+        assert [task["id"] for task in (await client.get("/api/tasks")).json()] == [kept["id"]]
+
+    async def test_task_cache(self, client, engine):
+        """Test that with the local task cache an unchanged list is read once, and a write invalidates it"""
+        container.task_cache_mode.override("local")
+        container.task_cache.override(providers.Object(TaskCache(LocalCacheBackend(), ttl=60)))
+        list_selects = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: "ORDER BY" in statement and list_selects.append(statement))
+        try:
+            task = await self.create_task(client, "Task")
+            await client.get("/api/tasks")
+            await client.get("/api/tasks")
+            await client.patch(f"/api/tasks/{task['id']}/complete")
+            tasks = (await client.get("/api/tasks")).json()
+            stats = (await client.get("/api/cache/stats")).json()
+        finally:
+            container.task_cache_mode.reset_override()
+            container.task_cache.reset_override()
+
+        assert tasks[0]["status"] == "completed"
+        assert len(list_selects) == 2
+        assert stats == {"backend": "local", "hits": 1, "misses": 2}
+
+    async def test_get_tasks_not_modified(self, client, engine):
+        """Test that a list is answered with 304 Not Modified, without reading the tasks, until a task changes"""
+        task = await self.create_task(client, "Task")
+        first = await client.get("/api/tasks?status=pending&limit=10")
+        etag = first.headers["etag"]
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+        not_modified = await client.get("/api/tasks?limit=10&status=pending", headers={"If-None-Match": etag})
+        not_modified_statements = statements.copy()
+        listed = await client.get("/api/tasks", headers={"If-None-Match": f'"other", W/{etag}'})
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        changed = await client.get("/api/tasks?status=pending&limit=10", headers={"If-None-Match": etag})
+
+        assert first.headers["cache-control"] == "no-cache"
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        assert len(not_modified_statements) == 1
+        assert "data_versions" in not_modified_statements[0]
+        assert listed.status_code == 200
+        assert listed.headers["etag"] != etag
+        assert changed.status_code == 200
+        assert changed.json() == []
+        assert changed.headers["etag"] != etag
+
+    async def test_export_etag_and_cache(self, client, engine):
+        """Test that an export is answered with 304 with its ETag, and served from the cache until a task changes"""
+        task = await self.create_task(client, "Task")
+        first = await client.get("/api/tasks/summary", params={"format": "ndjson"})
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+        cached = await client.get("/api/tasks/summary", params={"format": "ndjson"})
+        not_modified = await client.get("/api/tasks/summary", params={"format": "ndjson"},
+                                        headers={"If-None-Match": "*"})
+        # the data version, read by each request
+        version_reads = statements.copy()
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        changed = await client.get("/api/tasks/summary", params={"format": "ndjson"},
+                                   headers={"If-None-Match": first.headers["etag"]})
+
+        assert len(version_reads) == 2
+        assert all("data_versions" in statement for statement in version_reads)
+        assert cached.content == first.content
+        assert cached.headers["etag"] == first.headers["etag"]
+        assert cached.headers["content-disposition"] == "attachment; filename=tasks_summary.ndjson"
+        assert not_modified.status_code == 304
+        assert changed.status_code == 200
+        assert parse_export("ndjson", changed.content)[0]["status"] == "completed"
+
+    async def test_export_summary(self, client):
+        """Test exporting the tasks summary"""
+        await self.create_task(client, "Task 1", "Description 1")
+        await self.create_task(client, "Task 2")
+
+        response = await client.get("/api/tasks/summary")
+        sheet = openpyxl.load_workbook(io.BytesIO(response.content)).active
+        rows = [[cell.value for cell in row] for row in sheet.iter_rows()]
+
+        assert response.status_code == 200
+        assert response.headers["content-disposition"] == "attachment; filename=tasks_summary.xlsx"
+        assert sheet.title == "Tasks"
+        assert rows[0] == ["Title", "Description", "Status", "Due Date", "Completed At", "Created At"]
+        assert [row[:3] for row in rows[1:]] == [["Task 1", "Description 1", "pending"], ["Task 2", None, "pending"]]
+
+    @pytest.mark.parametrize("export_format", ["csv", "ndjson", "parquet", "arrow"])
+    async def test_export_formats_with_filters(self, client, export_format):
+        """Test that every export format contains the tasks matching the filters, with all their fields"""
+        await self.create_task(client, "Buy milk", "2 liters", due_date="2030-01-01T10:00:00")
+        await self.create_task(client, "Buy bread")
+        task = await self.create_task(client, "Write report")
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+
+        response = await client.get("/api/tasks/summary", params={"format": export_format, "status": "pending",
+                                                                  "title_contains": "buy"})
+        rows = parse_export(export_format, response.content)
+
+        assert response.status_code == 200
+        assert response.headers["content-disposition"] == f"attachment; filename=tasks_summary.{export_format}"
+        assert [(row["title"], row["description"], row["status"]) for row in rows] == [
+            ("Buy milk", "2 liters", "pending"), ("Buy bread", None, "pending")
+        ]
+        assert rows[0]["due_date"].startswith("2030-01-01T10:00:00")
+        assert rows[1]["due_date"] is None
+        assert rows[0]["id"] < rows[1]["id"]
+
+    async def test_export_search(self, client):
+        """Test exporting the tasks matching a substring or a full-text search"""
+        await self.create_task(client, "Buy milk", "at the farm")
+        await self.create_task(client, "Write report", "about the farm")
+        await self.create_task(client, "Call mom")
+
+        substring = await client.get("/api/tasks/summary", params={"format": "ndjson", "q": "RE"})
+        full_text = await client.get("/api/tasks/summary", params={"format": "ndjson", "q": "farm",
+                                                                   "search_mode": "fulltext"})
+
+        assert [row["title"] for row in parse_export("ndjson", substring.content)] == ["Write report"]
+        assert [row["title"] for row in parse_export("ndjson", full_text.content)] == ["Buy milk", "Write report"]
+
+    async def test_task_stats(self, client):
+        """Test the stats of the tasks matching the filters"""
+        await self.create_task(client, "Buy milk", due_date="2000-01-01T10:00:00")
+        await self.create_task(client, "Buy bread", due_date="2999-01-01T10:00:00")
+        task = await self.create_task(client, "Write report")
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+
+        response = await client.get("/api/tasks/stats", params={"days": 3})
+        bought = (await client.get("/api/tasks/stats", params={"title_contains": "buy"})).json()
+        stats = response.json()
+
+        assert response.status_code == 200
+        assert stats["total"] == 3
+        assert stats["by_status"] == {"pending": 2, "completed": 1}
+        assert (stats["overdue"], stats["due_soon"], stats["due_within_days"]) == (1, 0, 7)
+        assert len(stats["daily"]) == 3
+        assert sum(day["created"] for day in stats["daily"]) == 3
+        assert sum(day["completed"] for day in stats["daily"]) == 1
+        assert set(stats["completion_time_percentiles"]) == {"50", "90", "99"}
+        assert stats["completion_time_percentiles"]["50"] >= 0
+        assert (bought["total"], len(bought["daily"]), bought["completion_time_percentiles"]["99"]) == (2, 30, None)
+
+    async def test_task_stats_validation(self, client):
+        """Test that the number of days is bounded"""
+        assert (await client.get("/api/tasks/stats", params={"days": 0})).status_code == 422
+        assert (await client.get("/api/tasks/stats", params={"days": 367})).status_code == 422
+        assert (await client.get("/api/tasks/stats", params={"due_within_days": -1})).status_code == 422
+
+    async def test_archived_tasks(self, client):
+        """
+        Test that the archival job moves the completed tasks out of the lists, they are still read by id and listed,
+        exported and counted with include_archived
+        """
+        first, second, third = [await self.create_task(client, title) for title in ("First", "Second", "Third")]
+        for task in (first, second):
+            await client.patch(f"/api/tasks/{task['id']}/complete")
+
+        # the tasks completed before a day from now, one per batch
+        archival = asyncio.create_task(archive_completed_tasks(
+            container.tasks_service, container.db_session_factory, container.async_db_session_factory, -1, 1, 3600
+        ))
+        try:
+            for _ in range(100):
+                if len((await client.get("/api/tasks")).json()) == 1:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            archival.cancel()
+
+        listed = (await client.get("/api/tasks")).json()
+        everything = (await client.get("/api/tasks", params={"include_archived": True})).json()
+        exported = await client.get("/api/tasks/summary", params={"format": "ndjson", "include_archived": True})
+        stats = (await client.get("/api/tasks/stats", params={"include_archived": True})).json()
+
+        assert [task["id"] for task in listed] == [third["id"]]
+        assert [task["id"] for task in everything] == [third["id"], second["id"], first["id"]]
+        assert len(exported.text.splitlines()) == 3
+        assert stats["by_status"] == {"pending": 1, "completed": 2}
+        assert (await client.get(f"/api/tasks/{first['id']}")).json()["status"] == "completed"
+        assert (await client.delete(f"/api/tasks/{first['id']}")).status_code == 200
+        assert (await client.get(f"/api/tasks/{first['id']}")).status_code == 404
+
+    async def test_task_changes(self, client):
+        """Test a full sync, then a sync of the changes since its token, a page at a time"""
+        first = await self.create_task(client, "First")
+        second = await self.create_task(client, "Second")
+        full = (await client.get("/api/tasks/changes")).json()
+
+        await client.patch(f"/api/tasks/{first['id']}/complete")
+        await client.delete(f"/api/tasks/{second['id']}")
+        third = await self.create_task(client, "Third")
+        page = (await client.get("/api/tasks/changes", params={"since": full["token"], "limit": 2})).json()
+        rest = (await client.get("/api/tasks/changes", params={"since": page["token"]})).json()
+
+        assert [task["id"] for task in full["changed"]] == [first["id"], second["id"]]
+        assert (full["deleted"], full["has_more"]) == ([], False)
+        assert full["changed"][0]["updated_at"] is not None
+        assert ([task["status"] for task in page["changed"]], page["deleted"], page["has_more"]) == \
+            (["completed"], [second["id"]], True)
+        assert ([task["id"] for task in rest["changed"]], rest["deleted"], rest["has_more"]) == \
+            ([third["id"]], [], False)
+
+    async def test_task_changes_tokens(self, client):
+        """Test that a malformed token is rejected and that a token of another store asks for a full sync"""
+        future = TaskChangeToken(1000, 0).encode()
+
+        assert (await client.get("/api/tasks/changes", params={"since": "nope"})).status_code == 400
+        assert (await client.get("/api/tasks/changes", params={"since": future})).status_code == 410
+        assert (await client.get("/api/tasks/changes", params={"limit": 0})).status_code == 422
+
+    async def test_task_events(self, client):
+        """Test that the stream sends the changes made after it started, and a reset when the broker closes"""
+        broker = container.task_event_broker()
+        before = await self.create_task(client, "Before")
+        stream = asyncio.create_task(client.get("/api/tasks/events"))
+        while broker.subscriptions == 0:
+            await asyncio.sleep(0.01)
+
+        task = await self.create_task(client, "Task")
+        await client.patch(f"/api/tasks/{task['id']}/complete")
+        await client.delete(f"/api/tasks/{task['id']}")
+        await client.patch("/api/tasks/bulk/complete", json={"ids": [before["id"], task["id"]]})
+        # the sync writes hand their events over to the event loop
+        await asyncio.sleep(0.1)
+        broker.close()
+        response = await stream
+
+        events = parse_server_sent_events(response.text)
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text.startswith("retry: 3000\n\n")
+        assert [(name, data.get("id")) for name, data in events] == [
+            ("created", task["id"]), ("updated", task["id"]), ("deleted", task["id"]), ("updated", before["id"]),
+            ("reset", None)
+        ]
+        assert events[0][1]["task"]["title"] == "Task"
+        assert events[1][1]["task"]["status"] == "completed"
+        assert events[2][1]["task"] is None
+        assert events[-1][1] == {"reason": "closed"}
+
+    async def test_task_events_limits(self, client):
+        """Test that the streams are limited per worker and that they can be disabled"""
+        broker = container.task_event_broker()
+        streams = [asyncio.create_task(client.get("/api/tasks/events")) for _ in range(broker.max_subscriptions)]
+        while broker.subscriptions < broker.max_subscriptions:
+            await asyncio.sleep(0.01)
+
+        busy = await client.get("/api/tasks/events")
+        broker.close()
+        await asyncio.gather(*streams)
+        with container.task_events_transport.override("none"):
+            disabled = await client.get("/api/tasks/events")
+
+        assert (busy.status_code, busy.headers["retry-after"]) == (503, "5")
+        assert disabled.status_code == 404
+
+
+def parse_export(export_format: str, content: bytes) -> list[dict]:
+    """
+    Read an export back as dicts, dates as ISO strings and missing values as None
+    :param export_format: the format of the export
+    :param content: the exported file
+    :return: the rows
+    """
+    if export_format == "csv":
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        return [{key: int(value) if key == "id" else value or None for key, value in row.items()} for row in rows]
+
+    if export_format == "ndjson":
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    table = pq.read_table(io.BytesIO(content)) if export_format == "parquet" else pa.ipc.open_stream(content).read_all()
+    return [
+        {key: value.isoformat() if hasattr(value, "isoformat") else value for key, value in row.items()}
+        for row in table.to_pylist()
+    ]
+
+
+def parse_server_sent_events(text: str) -> list[tuple[str, dict]]:
+    """
+    Read the events of a Server-Sent Events stream, without the comments and the retry field
+    :param text: the stream
+    :return: the name and the decoded data of each event
+    """
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith((":", "retry")))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+
+    return events
@@ -1,7 +1,11 @@
 """Unit tests for TasksService using a mock repository."""
+import openpyxl
 import pytest
+from io import BytesIO
 from datetime import datetime, timedelta
+from unittest import mock
 from app.services.tasks_service import TasksService
+from app.services.task_export import ExportFormat
 from app.domain.entities.task import Task, TaskStatus
 from tests.mock_task_repository import MockTaskRepository
 
@@ -134,6 +138,19 @@ class TestTasksService:
 
         assert result is False
 
+    def test_archive_tasks(self, service, mock_repo):
+        """Test archiving the tasks completed more than a number of days ago, a batch at a time"""
+        first, second, third = (service.create_task(title, None, None) for title in ("First", "Second", "Third"))
+        service.complete_task(first.id)
+        service.complete_task(second.id)
+
+        assert service.archive_tasks(1, 10) == 0
+        # completed before a day from now
+        assert service.archive_tasks(-1, 1) == 1
+        assert service.archive_tasks(-1, 1) == 1
+        assert [task.id for task in mock_repo.archived] == [first.id, second.id]
+        assert mock_repo.tasks == [third]
+
     def test_get_tasks_empty(self, service):
         """Test getting tasks when repository is empty"""
         tasks = service.get_tasks()
@@ -184,3 +201,27 @@ class TestTasksService:
         assert xlsx_data is not None
         assert isinstance(xlsx_data, bytes)
         assert len(xlsx_data) > 0
+
+    def test_stream_tasks_export_xlsx_in_chunks(self, service):
+        """Test that the streamed XLSX is produced in several chunks and contains every task."""
+        for i in range(3000):
+            service.create_task(f"Task {i}", f"Description {i}", None)
+
+        chunks = list(service.stream_tasks_export(ExportFormat.XLSX))
+        sheet = openpyxl.load_workbook(BytesIO(b"".join(chunks))).active
+        rows = list(sheet.iter_rows(values_only=True))
+
+        assert len(chunks) > 1
+        assert len(rows) == 3001
+        assert rows[1][:2] == ("Task 0", "Description 0")
+        assert rows[-1][:2] == ("Task 2999", "Description 2999")
+
+    def test_xlsx_does_not_depend_on_the_time(self, service):
+        """Test that the same tasks give the same XLSX bytes, whenever it is written (their ETag is strong)"""
+        service.create_task("Task", "Description", None)
+
+        with mock.patch("time.localtime", return_value=(2001, 2, 3, 4, 5, 6, 0, 0, 0)):
+            first = service.get_tasks_xlsx()
+        second = service.get_tasks_xlsx()
+
+        assert first == second